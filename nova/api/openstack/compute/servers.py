@@ -311,6 +311,7 @@ class ServersController(wsgi.Controller):
             context, sort_keys, sort_dirs, blacklist, ('host', 'node'))
 
         expected_attrs = []
+        columns = None
         if is_detail:
             if api_version_request.is_supported(req, '2.16'):
                 expected_attrs.append('services')
@@ -325,13 +326,15 @@ class ServersController(wsgi.Controller):
             # showing details
             expected_attrs = self._view_builder.get_show_expected_attrs(
                                                                 expected_attrs)
+        else:
+            columns = self._view_builder.get_index_columns()
 
         try:
             instance_list = self.compute_api.get_all(elevated or context,
                     search_opts=search_opts, limit=limit, marker=marker,
                     expected_attrs=expected_attrs, sort_keys=sort_keys,
                     sort_dirs=sort_dirs, cell_down_support=cell_down_support,
-                    all_tenants=all_tenants)
+                    all_tenants=all_tenants, columns=columns)
         except exception.MarkerNotFound:
             msg = _('marker [%s] not found') % marker
             raise exc.HTTPBadRequest(explanation=msg)
@@ -340,14 +343,17 @@ class ServersController(wsgi.Controller):
                       search_opts['flavor'])
             instance_list = objects.InstanceList()
 
+        stream_batch_size = CONF.api.list_servers_stream_batch_size
         if is_detail:
-            instance_list._context = context
-            instance_list.fill_faults()
             response = self._view_builder.detail(
-                req, instance_list, cell_down_support=cell_down_support)
+                req, instance_list, cell_down_support=cell_down_support,
+                stream_batch_size=stream_batch_size)
         else:
             response = self._view_builder.index(
-                req, instance_list, cell_down_support=cell_down_support)
+                req, instance_list, cell_down_support=cell_down_support,
+                stream_batch_size=stream_batch_size)
+        if isinstance(response, wsgi.JSONListStream):
+            return wsgi.ResponseObject(response)
         return response
 
     def _get_server(self, context, req, instance_uuid, is_detail=False,
@@ -14,6 +14,9 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import collections
+import itertools
+
 from oslo_log import log as logging
 from oslo_serialization import jsonutils
 
@@ -22,6 +25,7 @@ from nova.api.openstack import common
 from nova.api.openstack.compute.views import addresses as views_addresses
 from nova.api.openstack.compute.views import flavors as views_flavors
 from nova.api.openstack.compute.views import images as views_images
+from nova.api.openstack import wsgi
 from nova import availability_zones as avail_zone
 from nova.compute import api as compute
 from nova.compute import vm_states
@@ -142,6 +146,15 @@ class ViewBuilder(common.ViewBuilder):
         # results.
         return sorted(list(set(self._show_expected_attrs + expected_attrs)))
 
+    @staticmethod
+    def get_index_columns():
+        """Returns the list of the instance fields used by index
+
+        This should be used when getting the instances listed by index from
+        the database, so that only the necessary fields are loaded.
+        """
+        return ['uuid', 'display_name']
+
     def _show_from_down_cell(self, request, instance, show_extra_specs,
                              show_server_groups):
         """Function that constructs the partial response for the instance."""
@@ -410,14 +423,34 @@ class ViewBuilder(common.ViewBuilder):
                                                                    instance)
         return server
 
-    def index(self, request, instances, cell_down_support=False):
-        """Show a list of servers without many details."""
+    def index(self, request, instances, cell_down_support=False,
+              stream_batch_size=0):
+        """Show a list of servers without many details.
+
+        If stream_batch_size is set, the servers are rendered by batches of
+        that size while the response body is written, and a
+        wsgi.JSONListStream is returned.
+        """
         coll_name = self._collection_name
+        if stream_batch_size:
+            def render(instances):
+                return self._get_server_list(
+                    self.basic, request, instances, False,
+                    cell_down_support=cell_down_support)
+
+            return self._stream_list_view(render, request, instances,
+                                          coll_name, stream_batch_size)
         return self._list_view(self.basic, request, instances, coll_name,
                                False, cell_down_support=cell_down_support)
 
-    def detail(self, request, instances, cell_down_support=False):
-        """Detailed view of a list of instance."""
+    def detail(self, request, instances, cell_down_support=False,
+               stream_batch_size=0):
+        """Detailed view of a list of instance.
+
+        If stream_batch_size is set, the servers are rendered by batches of
+        that size while the response body is written, and a
+        wsgi.JSONListStream is returned.
+        """
         coll_name = self._collection_name + '/detail'
         context = request.environ['nova.context']
 
@@ -430,36 +463,101 @@ class ViewBuilder(common.ViewBuilder):
             show_extra_specs = False
         show_extended_attr = context.can(
             esa_policies.BASE_POLICY_NAME, fatal=False)
-
-        instance_uuids = [inst['uuid'] for inst in instances]
-        bdms = self._get_instance_bdms_in_multiple_cells(context,
-                                                         instance_uuids)
-
-        # NOTE(gmann): pass show_sec_grp=False in _list_view() because
-        # security groups for detail method will be added by separate
-        # call to self._add_security_grps by passing the all servers
-        # together. That help to avoid multiple neutron call for each server.
-        servers_dict = self._list_view(self.show, request, instances,
-                                       coll_name, show_extra_specs,
-                                       show_extended_attr=show_extended_attr,
-                                       # We process host_status in aggregate.
-                                       show_host_status=False,
-                                       show_sec_grp=False,
-                                       bdms=bdms,
-                                       cell_down_support=cell_down_support)
-
+        unknown_only = None
         if api_version_request.is_supported(request, min_version='2.16'):
             unknown_only = self._get_host_status_unknown_only(context)
+
+        def render(instances):
+            instance_uuids = [inst['uuid'] for inst in instances]
+            bdms, faults = self._get_instance_details_in_multiple_cells(
+                context, instance_uuids)
+            for instance in instances:
+                if 'fault' not in instance:
+                    # Otherwise the fault of each instance would be lazy
+                    # loaded from its cell when building its view.
+                    instance.fault = faults.get(instance.uuid)
+                    instance.obj_reset_changes(['fault'])
+
+            # NOTE(gmann): pass show_sec_grp=False in _get_server_list()
+            # because security groups for detail method will be added by
+            # separate call to self._add_security_grps by passing the all
+            # servers together. That help to avoid multiple neutron call for
+            # each server.
+            server_list = self._get_server_list(
+                self.show, request, instances, show_extra_specs,
+                show_extended_attr=show_extended_attr,
+                # We process host_status in aggregate.
+                show_host_status=False,
+                show_sec_grp=False,
+                bdms=bdms,
+                cell_down_support=cell_down_support)
+
             # If we're not allowed by policy to show host status at all, don't
             # bother requesting instance host status from the compute API.
             if unknown_only is not None:
-                self._add_host_status(list(servers_dict["servers"]), instances,
+                self._add_host_status(server_list, instances,
                                       unknown_only=unknown_only)
 
-        self._add_security_grps(request, list(servers_dict["servers"]),
-                                instances)
+            self._add_security_grps(request, server_list, instances)
+            return server_list
+
+        if stream_batch_size:
+            return self._stream_list_view(render, request, instances,
+                                          coll_name, stream_batch_size)
+
+        servers_dict = dict(servers=render(instances))
+        servers_links = self._get_collection_links(request,
+                                                   instances,
+                                                   coll_name)
+        if servers_links:
+            servers_dict["servers_links"] = servers_links
         return servers_dict
 
+    def _stream_list_view(self, render, request, instances, coll_name,
+                          batch_size):
+        """Provide a streamed view for a list of servers.
+
+        :param render: Function used to format a list of servers into a list
+                       of server dicts
+        :param request: API request
+        :param instances: List of servers
+        :param coll_name: Name of collection, used to generate the next link
+                          for a pagination query
+        :param batch_size: Number of servers formatted at once
+        :returns: wsgi.JSONListStream of the server data, formatted batch by
+                  batch when the response body is written
+        """
+        servers_links = self._get_collection_links(request,
+                                                   instances,
+                                                   coll_name)
+
+        def batches():
+            for start in range(0, len(instances), batch_size):
+                yield render(instances[start:start + batch_size])
+
+        extra = None
+        if servers_links:
+            extra = dict(servers_links=servers_links)
+        return wsgi.JSONListStream('servers', batches(), extra=extra)
+
+    def _get_server_list(self, func, request, servers, show_extra_specs,
+                         show_extended_attr=None, show_host_status=None,
+                         show_sec_grp=False, bdms=None,
+                         cell_down_support=False):
+        """Format a list of servers into a list of server dicts, see
+        _list_view().
+        """
+        return [func(request, server,
+                     show_extra_specs=show_extra_specs,
+                     show_extended_attr=show_extended_attr,
+                     show_host_status=show_host_status,
+                     show_sec_grp=show_sec_grp, bdms=bdms,
+                     cell_down_support=cell_down_support)["server"]
+                for server in servers
+                # Filter out the fake marker instance created by the
+                # fill_virtual_interface_list online data migration.
+                if server.uuid != virtual_interface.FAKE_UUID]
+
     def _list_view(self, func, request, servers, coll_name, show_extra_specs,
                    show_extended_attr=None, show_host_status=None,
                    show_sec_grp=False, bdms=None, cell_down_support=False):
@@ -483,16 +581,12 @@ class ViewBuilder(common.ViewBuilder):
                                   down.
         :returns: Server data in dictionary format
         """
-        server_list = [func(request, server,
-                            show_extra_specs=show_extra_specs,
-                            show_extended_attr=show_extended_attr,
-                            show_host_status=show_host_status,
-                            show_sec_grp=show_sec_grp, bdms=bdms,
-                            cell_down_support=cell_down_support)["server"]
-                       for server in servers
-                       # Filter out the fake marker instance created by the
-                       # fill_virtual_interface_list online data migration.
-                       if server.uuid != virtual_interface.FAKE_UUID]
+        server_list = self._get_server_list(
+            func, request, servers, show_extra_specs,
+            show_extended_attr=show_extended_attr,
+            show_host_status=show_host_status,
+            show_sec_grp=show_sec_grp, bdms=bdms,
+            cell_down_support=cell_down_support)
         servers_links = self._get_collection_links(request,
                                                    servers,
                                                    coll_name)
@@ -683,33 +777,69 @@ class ViewBuilder(common.ViewBuilder):
                 'security_groups', [{'name': 'default'}])
 
     @staticmethod
-    def _get_instance_bdms_in_multiple_cells(ctxt, instance_uuids):
+    def _get_instance_details_in_multiple_cells(ctxt, instance_uuids):
+        """Returns the block device mappings and the latest faults of the
+        instances.
+
+        The block device mappings and the faults of the instances of each
+        cell are looked up with a single call to the cell, so the number of
+        database queries does not depend on the number of instances.
+
+        :param ctxt: The (untargeted) request context
+        :param instance_uuids: The UUIDs of the instances
+        :returns: A tuple of the dict of the lists of block device mappings,
+            and of the dict of the latest faults, keyed by instance UUID
+        """
         inst_maps = objects.InstanceMappingList.get_by_instance_uuids(
                         ctxt, instance_uuids)
 
         cell_mappings = {}
+        uuids_by_cell = collections.defaultdict(list)
         for inst_map in inst_maps:
-            if (inst_map.cell_mapping is not None and
-                    inst_map.cell_mapping.uuid not in cell_mappings):
-                cell_mappings.update(
-                    {inst_map.cell_mapping.uuid: inst_map.cell_mapping})
+            if inst_map.cell_mapping is not None:
+                cell_mappings[inst_map.cell_mapping.uuid] = (
+                    inst_map.cell_mapping)
+                uuids_by_cell[inst_map.cell_mapping.uuid].append(
+                    inst_map.instance_uuid)
+
+        def get_details(cctxt):
+            cell_instance_uuids = uuids_by_cell[cctxt.cell_uuid]
+            bdms = objects.BlockDeviceMappingList.bdms_by_instance_uuid(
+                cctxt, cell_instance_uuids)
+            faults = objects.InstanceFaultList.get_latest_by_instance_uuids(
+                cctxt, cell_instance_uuids)
+            return bdms, faults
 
         bdms = {}
+        faults = {}
         results = nova_context.scatter_gather_cells(
                         ctxt, cell_mappings.values(),
-                        nova_context.CELL_TIMEOUT,
-                        objects.BlockDeviceMappingList.bdms_by_instance_uuid,
-                        instance_uuids)
+                        nova_context.CELL_TIMEOUT, get_details)
         for cell_uuid, result in results.items():
             if isinstance(result, Exception):
-                LOG.warning('Failed to get block device mappings for cell %s',
-                            cell_uuid)
+                LOG.warning('Failed to get block device mappings and faults '
+                            'for cell %s', cell_uuid)
             elif result is nova_context.did_not_respond_sentinel:
-                LOG.warning('Timeout getting block device mappings for cell '
-                            '%s', cell_uuid)
+                LOG.warning('Timeout getting block device mappings and faults '
+                            'for cell %s', cell_uuid)
             else:
-                bdms.update(result)
-        return bdms
+                cell_bdms, cell_faults = result
+                bdms.update(cell_bdms)
+                faults.update((fault.instance_uuid, fault)
+                              for fault in cell_faults)
+
+        # The faults of the instances without a mapping, or with a mapping
+        # without a cell, are looked up without targeting a cell, as
+        # _load_fault() does for a legacy environment or instance.
+        mapped_uuids = set(itertools.chain(*uuids_by_cell.values()))
+        unmapped_uuids = [uuid for uuid in instance_uuids
+                          if uuid not in mapped_uuids]
+        if unmapped_uuids:
+            faults.update(
+                (fault.instance_uuid, fault) for fault in
+                objects.InstanceFaultList.get_latest_by_instance_uuids(
+                    ctxt, unmapped_uuids))
+        return bdms, faults
 
     def _add_volumes_attachments(self, server, bdms,
                                  add_delete_on_termination):
@@ -223,6 +223,49 @@ class JSONDictSerializer(ActionDispatcher):
         return str(jsonutils.dumps(data))
 
 
+class JSONListStream(object):
+    """A JSON object whose main member is a list produced batch by batch.
+
+    The object is serialized incrementally as the body of the response is
+    written, so only one batch of the list is held in memory at a time. The
+    serialized object is the same as the one JSONDictSerializer would produce
+    for ``{key: [items of all the batches], **extra}``.
+    """
+
+    def __init__(self, key, batches, extra=None):
+        """Builds a streamed JSON object.
+
+        :param key: The name of the list member of the object.
+        :param batches: An iterable of the lists of items of the list member.
+        :param extra: An optional dict of the other members of the object,
+                      serialized after the list member.
+        """
+        self.key = key
+        self.batches = batches
+        self.extra = extra or {}
+
+    def __iter__(self):
+        yield ('{%s: [' % jsonutils.dumps(self.key)).encode('utf-8')
+        separator = ''
+        try:
+            for batch in self.batches:
+                if not batch:
+                    continue
+                chunk = ', '.join(jsonutils.dumps(item) for item in batch)
+                yield (separator + chunk).encode('utf-8')
+                separator = ', '
+        except Exception:
+            # The status and the headers of the response are already sent,
+            # the client only sees the response being cut short.
+            LOG.exception('Failed to serialize the %s of the response.',
+                          self.key)
+            raise
+        tail = ''.join(', %s: %s' % (jsonutils.dumps(key),
+                                     jsonutils.dumps(value))
+                       for key, value in self.extra.items())
+        yield (']%s}' % tail).encode('utf-8')
+
+
 def response(code):
     """Attaches response code to a method.
 
@@ -281,10 +324,13 @@ class ResponseObject(object):
 
         serializer = self.serializer
 
-        body = None
-        if self.obj is not None:
-            body = serializer.serialize(self.obj)
-        response = webob.Response(body=body)
+        if isinstance(self.obj, JSONListStream):
+            response = webob.Response(app_iter=self.obj)
+        else:
+            body = None
+            if self.obj is not None:
+                body = serializer.serialize(self.obj)
+            response = webob.Response(body=body)
         response.status_int = self.code
         for hdr, val in self._headers.items():
             # In Py3.X Headers must be a str that was first safely
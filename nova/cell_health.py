@@ -0,0 +1,153 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Health of the cells as seen by the scatter-gather calls of this process.
+
+The latency and the outcome of each call made to a cell by
+:func:`nova.context.scatter_gather_cells` are recorded against the cell. Once
+a cell failed ``[DEFAULT] cell_circuit_failure_threshold`` times in a row its
+circuit opens, and the scatter-gather calls stop calling it until a single
+probe call, made every ``[DEFAULT] cell_circuit_retry_interval`` seconds,
+succeeds.
+
+The health of the cells is reported in the Guru Meditation Report of the
+service.
+"""
+
+import time
+
+from oslo_log import log as logging
+from oslo_reports import guru_meditation_report as gmr
+from oslo_reports.models import with_default_views as mwdv
+
+import nova.conf
+from nova import trace
+
+CONF = nova.conf.CONF
+LOG = logging.getLogger(__name__)
+
+CIRCUIT_CLOSED = 'closed'
+CIRCUIT_OPEN = 'open'
+CIRCUIT_HALF_OPEN = 'half-open'
+
+# The health of the cells by cell UUID.
+_HEALTH = {}
+
+
+class CellHealth(object):
+    """The latencies and failures of the calls to a cell and the state of its
+    circuit.
+    """
+
+    def __init__(self):
+        self.latencies = trace.Histogram()
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.circuit = CIRCUIT_CLOSED
+        self.opened_at = None
+
+    def to_dict(self):
+        return {
+            'circuit': self.circuit,
+            'failures': self.failures,
+            'consecutive_failures': self.consecutive_failures,
+            'latencies': self.latencies.to_dict(),
+        }
+
+
+def _get(cell_uuid):
+    health = _HEALTH.get(cell_uuid)
+    if health is None:
+        health = _HEALTH[cell_uuid] = CellHealth()
+    return health
+
+
+def allow_call(cell_uuid):
+    """Returns whether a call to the cell should be made.
+
+    The calls to a cell whose circuit is open are not made, except for a
+    single probe call every ``[DEFAULT] cell_circuit_retry_interval`` seconds.
+    """
+    health = _HEALTH.get(cell_uuid)
+    if health is None or health.circuit == CIRCUIT_CLOSED:
+        return True
+    if (health.circuit == CIRCUIT_OPEN and
+            time.monotonic() - health.opened_at >=
+            CONF.cell_circuit_retry_interval):
+        # Let this call through as the probe; the other calls are still
+        # skipped until its result is recorded.
+        health.circuit = CIRCUIT_HALF_OPEN
+        return True
+    return False
+
+
+def record_call(cell_uuid, elapsed, failed):
+    """Records the outcome of a call to the cell.
+
+    :param cell_uuid: The UUID of the cell called.
+    :param elapsed: The time the call took, in seconds.
+    :param failed: Whether the call timed out or failed with an unexpected
+        error.
+    """
+    health = _get(cell_uuid)
+    health.latencies.add(elapsed)
+    if not failed:
+        if health.circuit != CIRCUIT_CLOSED:
+            LOG.info('Cell %s responded again, resuming the calls to it.',
+                     cell_uuid)
+        health.consecutive_failures = 0
+        health.circuit = CIRCUIT_CLOSED
+        health.opened_at = None
+        return
+
+    health.failures += 1
+    health.consecutive_failures += 1
+    threshold = CONF.cell_circuit_failure_threshold
+    if health.circuit == CIRCUIT_HALF_OPEN or (
+            health.circuit == CIRCUIT_CLOSED and threshold and
+            health.consecutive_failures >= threshold):
+        if health.circuit == CIRCUIT_CLOSED:
+            LOG.warning('Cell %(cell)s failed %(count)d times in a row, '
+                        'not calling it for %(interval)d seconds.',
+                        {'cell': cell_uuid,
+                         'count': health.consecutive_failures,
+                         'interval': CONF.cell_circuit_retry_interval})
+        health.circuit = CIRCUIT_OPEN
+        health.opened_at = time.monotonic()
+
+
+def get_health():
+    """Returns the primitives of the health of the cells by cell UUID."""
+    return {cell_uuid: health.to_dict()
+            for cell_uuid, health in _HEALTH.items()}
+
+
+def reset():
+    """Forgets the health of all the cells."""
+    _HEALTH.clear()
+
+
+def _report():
+    report = get_health()
+    for health in report.values():
+        # Render each histogram on a single line, as the default view sorts
+        # the keys.
+        latencies = health['latencies']
+        latencies['buckets'] = ', '.join(
+            '%s: %d' % ('<= %sms' % bound if bound is not None else 'more',
+                        count)
+            for bound, count in latencies['buckets'])
+    return mwdv.ModelWithDefaultViews(report)
+
+
+gmr.TextGuruMeditation.register_section('Cell Health', _report)
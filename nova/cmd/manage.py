@@ -65,6 +65,7 @@ from nova.objects import quotas as quotas_obj
 from nova.objects import virtual_interface as virtual_interface_obj
 from nova import rpc
 from nova.scheduler.client import report
+from nova.scheduler import rpcapi as scheduler_rpcapi
 from nova.scheduler import utils as scheduler_utils
 from nova import version
 
@@ -2620,11 +2621,96 @@ class PlacementCommands(object):
         return 0
 
 
+class SchedulerCommands(object):
+    """Commands for inspecting the scheduler services."""
+
+    @args('--host', metavar='<host>',
+          help=_('Host of the scheduler service to query. By default, any '
+                 'of the scheduler services answers.'))
+    @args('--limit', type=int, metavar='<limit>',
+          help=_('Maximum number of traces to show, most recent first.'))
+    @args('--histograms', action='store_true', default=False,
+          help=_('Show the histograms of the durations of each phase of the '
+                 'scheduling requests.'))
+    def trace(self, host=None, limit=None, histograms=False):
+        """Show the traces of the most recent scheduling requests.
+
+        For each of the most recent scheduling requests handled by a
+        scheduler service, show the time spent in each phase of the request:
+        the request filters, the placement query, loading the host states,
+        each filter and weigher, and claiming the resources.
+
+        Return codes:
+
+        * 0: Command completed successfully.
+        * 1: Tracing is disabled on the scheduler service.
+        * 2: The scheduler service did not answer.
+        """
+        if limit is not None and limit <= 0:
+            print(_('Must supply a positive value for limit'))
+            return 127
+
+        ctxt = context.get_admin_context()
+        try:
+            result = scheduler_rpcapi.SchedulerAPI().get_traces(
+                ctxt, host=host, limit=limit, histograms=histograms)
+        except messaging.MessagingTimeout:
+            print(_('The scheduler service did not answer.'))
+            return 2
+
+        if not result['enabled']:
+            print(_('Tracing is disabled on the scheduler service %s. Set '
+                    '[scheduler]/trace_buffer_size to enable it.') %
+                  result['host'])
+            return 1
+
+        print(_('Scheduler service: %s') % result['host'])
+        for trace in result['traces']:
+            print()
+            print(_('Request %(request_id)s started at %(started_at)s for '
+                    '%(num)d instance(s): %(result)s in %(duration)s ms') %
+                  {'request_id': trace['request_id'],
+                   'started_at': trace['started_at'],
+                   'num': len(trace['instance_uuids']),
+                   'result': trace['result'],
+                   'duration': trace['duration_ms']})
+            t = prettytable.PrettyTable(
+                [_('Phase'), _('Count'), _('Duration (ms)')])
+            t.align = 'l'
+            for phase in trace['phases']:
+                t.add_row([phase['name'], phase['count'],
+                           phase['duration_ms']])
+            print(t)
+
+        if histograms:
+            print()
+            if result['histograms'] is None:
+                print(_('Histograms are disabled on the scheduler service. '
+                        'Set [scheduler]/trace_histograms to enable them.'))
+                return 0
+            phase_histograms = sorted(result['histograms'].items())
+            field_names = [_('Phase'), _('Count'), _('Duration (ms)')]
+            if phase_histograms:
+                # The last bucket has no upper bound.
+                field_names.extend(
+                    '<= %s ms' % bound if bound is not None else _('More')
+                    for bound, count in phase_histograms[0][1]['buckets'])
+            t = prettytable.PrettyTable(field_names)
+            t.align = 'l'
+            for name, histogram in phase_histograms:
+                t.add_row([name, histogram['count'],
+                           histogram['duration_ms']] +
+                          [count for bound, count in histogram['buckets']])
+            print(t)
+        return 0
+
+
 CATEGORIES = {
     'api_db': ApiDbCommands,
     'cell_v2': CellV2Commands,
     'db': DbCommands,
-    'placement': PlacementCommands
+    'placement': PlacementCommands,
+    'scheduler': SchedulerCommands,
 }
 
 
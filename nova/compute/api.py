@@ -2807,7 +2807,7 @@ class API(base.Base):
 
     def get_all(self, context, search_opts=None, limit=None, marker=None,
                 expected_attrs=None, sort_keys=None, sort_dirs=None,
-                cell_down_support=False, all_tenants=False):
+                cell_down_support=False, all_tenants=False, columns=None):
         """Get all instances filtered by one of the given parameters.
 
         If there is no filter and the context is an admin, it will retrieve
@@ -2828,6 +2828,11 @@ class API(base.Base):
                                   down. If False, instances from
                                   unreachable cells will be omitted.
         :param all_tenants: True if the "all_tenants" filter was passed.
+        :param columns: An optional list of the instance fields which are
+                        needed by the caller. Only those fields, and the
+                        fields in expected_attrs, are loaded from the cell
+                        databases, see objects.InstanceList.get_by_filters().
+                        The instances still being built are returned whole.
 
         """
         if search_opts is None:
@@ -2944,17 +2949,24 @@ class API(base.Base):
         # Only subtract from limit if it is not None
         limit = (limit - len(build_req_instances)) if limit else limit
 
+        if filter_ip:
+            # The IP addresses are filtered below with the network info of
+            # the whole instances.
+            columns = None
+
         # We could arguably avoid joining on security_groups if we're using
         # neutron (which is the default) but if you're using neutron then the
         # security_group_instance_association table should be empty anyway
         # and the DB should optimize out that join, making it insignificant.
-        fields = ['metadata', 'info_cache', 'security_groups']
+        fields = []
+        if columns is None:
+            fields = ['metadata', 'info_cache', 'security_groups']
         if expected_attrs:
             fields.extend(expected_attrs)
 
         insts, down_cell_uuids = instance_list.get_instance_objects_sorted(
             context, filters, limit, marker, fields, sort_keys, sort_dirs,
-            cell_down_support=cell_down_support)
+            cell_down_support=cell_down_support, columns=columns)
 
         def _get_unique_filter_method():
             seen_uuids = set()
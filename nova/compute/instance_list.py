@@ -12,6 +12,7 @@
 
 import copy
 
+from nova import cache_utils
 from nova.compute import multi_cell_list
 import nova.conf
 from nova import context
@@ -23,6 +24,29 @@ from nova.objects import instance as instance_obj
 
 CONF = nova.conf.CONF
 
+_CURSOR_CACHE = None
+
+
+def _get_cursor_cache():
+    """Returns the cache of the positions of the cells at the end of the
+    pages of instances, or None if it is disabled.
+    """
+    global _CURSOR_CACHE
+
+    expiration = CONF.api.instance_list_cursor_expiration
+    if not expiration:
+        return None
+    if _CURSOR_CACHE is None:
+        _CURSOR_CACHE = cache_utils.get_client(expiration_time=expiration)
+    return _CURSOR_CACHE
+
+
+def reset_cursor_cache():
+    """Reset the cursor cache, mainly for testing purposes."""
+    global _CURSOR_CACHE
+
+    _CURSOR_CACHE = None
+
 
 class InstanceSortContext(multi_cell_list.RecordSortContext):
     def __init__(self, sort_keys, sort_dirs):
@@ -45,10 +69,11 @@ class InstanceSortContext(multi_cell_list.RecordSortContext):
 
 
 class InstanceLister(multi_cell_list.CrossCellLister):
-    def __init__(self, sort_keys, sort_dirs, cells=None, batch_size=None):
+    def __init__(self, sort_keys, sort_dirs, cells=None, batch_size=None,
+                 cursor_cache=None):
         super(InstanceLister, self).__init__(
             InstanceSortContext(sort_keys, sort_dirs), cells=cells,
-            batch_size=batch_size)
+            batch_size=batch_size, cursor_cache=cursor_cache)
 
     @property
     def marker_identifier(self):
@@ -91,13 +116,15 @@ class InstanceLister(multi_cell_list.CrossCellLister):
 # replicate these for every data type we implement.
 def get_instances_sorted(ctx, filters, limit, marker, columns_to_join,
                          sort_keys, sort_dirs, cell_mappings=None,
-                         batch_size=None, cell_down_support=False):
+                         batch_size=None, cell_down_support=False,
+                         cursor_cache=None, columns=None):
     instance_lister = InstanceLister(sort_keys, sort_dirs,
                                      cells=cell_mappings,
-                                     batch_size=batch_size)
+                                     batch_size=batch_size,
+                                     cursor_cache=cursor_cache)
     instance_generator = instance_lister.get_records_sorted(
         ctx, filters, limit, marker, columns_to_join=columns_to_join,
-        cell_down_support=cell_down_support)
+        cell_down_support=cell_down_support, columns=columns)
     return instance_lister, instance_generator
 
 
@@ -133,7 +160,8 @@ def get_instance_list_cells_batch_size(limit, cells):
 
 
 def get_instance_objects_sorted(ctx, filters, limit, marker, expected_attrs,
-                                sort_keys, sort_dirs, cell_down_support=False):
+                                sort_keys, sort_dirs, cell_down_support=False,
+                                columns=None):
     """Return a list of instances and information about down cells.
 
     This returns a tuple of (objects.InstanceList, list(of down cell
@@ -142,6 +170,10 @@ def get_instance_objects_sorted(ctx, filters, limit, marker, expected_attrs,
     of any cells that did not respond (or raised an error) are included
     in the list as the second element of the tuple. That list is empty
     if all cells responded.
+
+    If columns is a list of instance fields, only those fields, the uuid and
+    the sort keys of the instances are loaded from the cell databases, see
+    objects.InstanceList.get_by_filters().
     """
     query_cell_subset = CONF.api.instance_list_per_project_cells
     # NOTE(danms): Replicated in part from instance_get_all_by_sort_filters(),
@@ -163,7 +195,8 @@ def get_instance_objects_sorted(ctx, filters, limit, marker, expected_attrs,
     instance_lister, instance_generator = get_instances_sorted(ctx, filters,
         limit, marker, columns_to_join, sort_keys, sort_dirs,
         cell_mappings=cell_mappings, batch_size=batch_size,
-        cell_down_support=cell_down_support)
+        cell_down_support=cell_down_support,
+        cursor_cache=_get_cursor_cache(), columns=columns)
 
     if 'fault' in expected_attrs:
         # We join fault above, so we need to make sure we don't ask
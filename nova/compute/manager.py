@@ -27,6 +27,7 @@ terminating it.
 
 import base64
 import binascii
+import collections
 import contextlib
 import copy
 import functools
@@ -567,6 +568,9 @@ class ComputeManager(manager.Manager):
         # This is a dict, keyed by instance uuid, to a two-item tuple of
         # migration object and Future for the queued live migration.
         self._waiting_live_migrations = {}
+        # The time in seconds it took to update the resources of each node
+        # during the last run of update_available_resource.
+        self._node_update_durations = {}
 
         super(ComputeManager, self).__init__(service_name="compute",
                                              *args, **kwargs)
@@ -585,6 +589,7 @@ class ComputeManager(manager.Manager):
         compute_rpcapi.reset_globals()
         self.compute_rpcapi = compute_rpcapi.ComputeAPI()
         self.reportclient.clear_provider_cache()
+        self.rt.mark_providers_for_update()
 
     def _update_resource_tracker(self, context, instance):
         """Let the resource tracker know that an instance has changed state."""
@@ -3469,7 +3474,7 @@ class ComputeManager(manager.Manager):
             else:
                 # NOTE(gibi): Let the resource tracker set the instance
                 # host and drop the migration context as we need to hold the
-                # COMPUTE_RESOURCE_SEMAPHORE to avoid the race with
+                # lock of the node to avoid the race with
                 # _update_available_resources. See bug 1896463.
                 self.rt.finish_evacuation(instance, scheduled_node, migration)
 
@@ -9961,9 +9966,72 @@ class ComputeManager(manager.Manager):
                         "Failed to delete compute node resource provider "
                         "for compute node %s: %s", cn.uuid, str(e))
 
-        for nodename in nodenames:
-            self._update_available_resource_for_node(context, nodename,
-                                                     startup=startup)
+        self._update_available_resource_for_nodes(context, nodenames,
+                                                  startup=startup)
+
+    def _update_available_resource_for_nodes(self, context, nodenames,
+                                             startup=False):
+        """Updates the resources of the nodes with up to
+        ``[compute] resource_update_workers`` nodes at a time.
+
+        Each worker picks up the next node as soon as it is done with the
+        previous one, so a slow node only holds up its own worker. The nodes
+        which were the slowest to update during the previous run are started
+        first so that they do not delay the end of the run.
+        """
+        for nodename in set(self._node_update_durations) - set(nodenames):
+            del self._node_update_durations[nodename]
+        # The sort is stable, so the nodes which were never updated are taken
+        # in the order reported by the driver.
+        to_update = collections.deque(sorted(
+            nodenames, key=lambda node: -self._node_update_durations.get(
+                node, 0)))
+        num_nodes = len(to_update)
+
+        def update(nodename):
+            with timeutils.StopWatch() as timer:
+                self._update_available_resource_for_node(context, nodename,
+                                                         startup=startup)
+            self._node_update_durations[nodename] = timer.elapsed()
+            LOG.debug('Updated the resources of node %(node)s in %(secs).2f '
+                      'seconds.', {'node': nodename, 'secs': timer.elapsed()})
+
+        errors = []
+
+        def worker():
+            # Stop picking up nodes on the first error, as the serial update
+            # does.
+            while to_update and not errors:
+                try:
+                    update(to_update.popleft())
+                except Exception as exc:
+                    errors.append(exc)
+
+        workers = min(CONF.compute.resource_update_workers, num_nodes)
+        with timeutils.StopWatch() as timer:
+            if workers <= 1:
+                while to_update:
+                    update(to_update.popleft())
+            else:
+                for thread in [utils.spawn(worker) for _ in range(workers)]:
+                    thread.wait()
+                if errors:
+                    raise errors[0]
+
+        if 0 < CONF.update_resources_interval < timer.elapsed():
+            slowest = sorted(self._node_update_durations.items(),
+                             key=lambda item: item[1], reverse=True)[:5]
+            LOG.warning('Updating the resources of %(count)d nodes with '
+                        '%(workers)d workers took %(secs).2f seconds, which '
+                        'is longer than the update_resources_interval of '
+                        '%(interval)d seconds. The slowest nodes were: '
+                        '%(slowest)s. Consider increasing '
+                        '[compute] resource_update_workers.',
+                        {'count': num_nodes, 'workers': max(workers, 1),
+                         'secs': timer.elapsed(),
+                         'interval': CONF.update_resources_interval,
+                         'slowest': ', '.join(
+                             '%s (%.2fs)' % item for item in slowest)})
 
     def _get_compute_nodes_in_db(self, context, nodenames, use_slave=False,
                                  startup=False):
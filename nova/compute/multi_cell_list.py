@@ -11,11 +11,15 @@
 #    under the License.
 
 import abc
+import base64
+import collections
 import copy
+import hashlib
 import heapq
 
 import eventlet
 from oslo_log import log as logging
+from oslo_serialization import jsonutils
 
 import nova.conf
 from nova import context
@@ -26,6 +30,48 @@ LOG = logging.getLogger(__name__)
 
 CONF = nova.conf.CONF
 
+# The position of a cell in which all the records left are before the marker.
+_CELL_DONE = 'done'
+
+# The smallest first batch queried from a cell whose batch size is adapted to
+# its share of the previous page.
+_MIN_ADAPTIVE_BATCH_SIZE = 10
+
+
+def encode_cursor(positions, counts):
+    """Encodes the position of each cell at the end of a page, and the
+    number of records each cell contributed to the page, into an opaque
+    cursor.
+
+    :param positions: A dict, keyed by cell UUID, of None if the next page
+                      starts at the first record of the cell, _CELL_DONE if
+                      the cell has no record left, or a tuple of the marker
+                      identifier of the record the next page starts from and
+                      whether that record is included in the next page.
+    :param counts: A dict of the number of records of each cell in the page,
+                   keyed by cell UUID.
+    """
+    cursor = {'v': 1, 'p': positions, 'n': counts}
+    return base64.urlsafe_b64encode(
+        jsonutils.dump_as_bytes(cursor)).decode('ascii')
+
+
+def decode_cursor(cursor):
+    """Returns the positions and the counts encoded by encode_cursor(), or
+    None if the cursor is not valid.
+    """
+    try:
+        cursor = jsonutils.loads(base64.urlsafe_b64decode(cursor))
+        if cursor['v'] != 1:
+            return None
+        positions = {
+            cell_uuid: (tuple(position) if isinstance(position, list)
+                        else position)
+            for cell_uuid, position in cursor['p'].items()}
+        return positions, cursor['n']
+    except (TypeError, ValueError, KeyError, AttributeError):
+        return None
+
 
 class RecordSortContext(object):
     def __init__(self, sort_keys, sort_dirs):
@@ -122,10 +168,15 @@ class CrossCellLister(metaclass=abc.ABCMeta):
     your data type from cell databases.
 
     """
-    def __init__(self, sort_ctx, cells=None, batch_size=None):
+    def __init__(self, sort_ctx, cells=None, batch_size=None,
+                 cursor_cache=None):
         self.sort_ctx = sort_ctx
         self.cells = cells
         self.batch_size = batch_size
+        # When set, the position of each cell at the end of a page is kept in
+        # this cache, so that the next page is queried from where each cell
+        # left off, see get_records_sorted().
+        self.cursor_cache = cursor_cache
         self._cells_responded = set()
         self._cells_failed = set()
         self._cells_timed_out = set()
@@ -213,6 +264,17 @@ class CrossCellLister(metaclass=abc.ABCMeta):
         """
         pass
 
+    def _get_cursor_key(self, filters, marker):
+        """Returns the key of the cursor of the page ending with the marker
+        record in the cursor cache. The key covers everything that decides
+        the records of the next page, except the limit.
+        """
+        query = repr((self.__class__.__name__, self.sort_ctx.sort_keys,
+                      self.sort_ctx.sort_dirs, sorted(filters.items()),
+                      sorted(cell.uuid for cell in self.cells or [])))
+        return 'cell-list-cursor-%s-%s' % (
+            marker, hashlib.sha256(query.encode('utf-8')).hexdigest())
+
     def get_records_sorted(self, ctx, filters, limit, marker, **kwargs):
         """Get a cross-cell list of records matching filters.
 
@@ -233,6 +295,14 @@ class CrossCellLister(metaclass=abc.ABCMeta):
         output of this function. Meaning, we will still query $limit from each
         database, but only return $limit total results.
 
+        If a cursor cache was provided to the constructor, the position of
+        each cell at the end of a full page is kept in the cache under the
+        marker identifier of the last record of the page. When the next page
+        is requested with that marker, each cell is queried from its own
+        position, without looking up the marker record and its equivalent in
+        every cell. The first batch queried from each cell is also sized
+        according to the share of the previous page that came from that cell.
+
         :param cell_down_support: True if the API (and caller) support
                                   returning a minimal instance
                                   construct if the relevant cell is
@@ -245,17 +315,69 @@ class CrossCellLister(metaclass=abc.ABCMeta):
 
         cell_down_support = kwargs.pop('cell_down_support', False)
 
-        if marker:
-            # A marker identifier was provided from the API. Call this
-            # the 'global' marker as it determines where we start the
-            # process across all cells. Look up the record in
-            # whatever cell it is in and record the values for the
-            # sort keys so we can find the marker instance in each
-            # cell (called the 'local' marker).
-            global_marker_cell, global_marker_record = self.get_marker_record(
-                ctx, marker)
-            global_marker_values = [global_marker_record[key]
-                                    for key in self.sort_ctx.sort_keys]
+        # The positions in each cell where this page starts, and the number
+        # of records of the previous page from each cell, if the previous page
+        # ended with the marker record.
+        cursor = None
+        if marker and self.cursor_cache is not None:
+            cursor = self.cursor_cache.get(
+                self._get_cursor_key(filters, marker))
+            if cursor is not None:
+                cursor = decode_cursor(cursor)
+        start_positions, previous_counts = cursor or (None, {})
+        # The positions in each cell after the records returned so far.
+        positions = {}
+        counts = collections.Counter()
+
+        global_marker = {}
+
+        def get_global_marker():
+            if not global_marker:
+                # A marker identifier was provided from the API. Call this
+                # the 'global' marker as it determines where we start the
+                # process across all cells. Look up the record in
+                # whatever cell it is in and record the values for the
+                # sort keys so we can find the marker instance in each
+                # cell (called the 'local' marker).
+                global_marker_cell, global_marker_record = (
+                    self.get_marker_record(ctx, marker))
+                global_marker['cell'] = global_marker_cell
+                global_marker['values'] = [global_marker_record[key]
+                                           for key in self.sort_ctx.sort_keys]
+            return global_marker['cell'], global_marker['values']
+
+        if marker and start_positions is None:
+            get_global_marker()
+
+        def get_start_position(cctx):
+            """Returns the position in the cell where this page starts."""
+            if not marker:
+                return None
+
+            # The local marker is an identifier of a record in a cell
+            # that is found by the special method
+            # get_marker_by_values(). It should be the next record
+            # in order according to the sort provided, but after the
+            # marker instance which may have been in another cell.
+            global_marker_cell, global_marker_values = get_global_marker()
+            if cctx.cell_uuid == global_marker_cell:
+                local_marker = marker
+            else:
+                local_marker = self.get_marker_by_values(
+                    cctx, global_marker_values)
+            if not local_marker:
+                # There was a global marker but everything in our
+                # cell is _before_ that marker, so we return
+                # nothing. If we didn't have this clause, we'd
+                # pass marker=None to the query below and return a
+                # full unpaginated set for our cell.
+                return _CELL_DONE
+            # If we did find a marker in our cell, but it wasn't the global
+            # marker, the marker instance has not been returned to the user
+            # yet. Note that we do _not_ include the marker instance if our
+            # marker was the global one since that has already been sent to
+            # the user.
+            return local_marker, local_marker != marker
 
         def do_query(cctx):
             """Generate RecordWrapper(record) objects from a cell.
@@ -266,12 +388,34 @@ class CrossCellLister(metaclass=abc.ABCMeta):
             caller again. This is run against each cell by the
             scatter_gather routine.
             """
+            if start_positions is None or (
+                    cctx.cell_uuid not in start_positions):
+                position = get_start_position(cctx)
+                positions[cctx.cell_uuid] = position
+                yield from query_cell(cctx, position)
+                return
 
-            # The local marker is an identifier of a record in a cell
-            # that is found by the special method
-            # get_marker_by_values(). It should be the next record
-            # in order according to the sort provided, but after the
-            # marker instance which may have been in another cell.
+            position = start_positions[cctx.cell_uuid]
+            positions[cctx.cell_uuid] = position
+            records = query_cell(cctx, position)
+            try:
+                first = next(records)
+            except StopIteration:
+                return
+            except exception.MarkerNotFound:
+                # The record the cell left off at was deleted since the
+                # previous page, find the position again from the marker.
+                position = get_start_position(cctx)
+                positions[cctx.cell_uuid] = position
+                records = query_cell(cctx, position)
+            else:
+                yield first
+            yield from records
+
+        def query_cell(cctx, position):
+            """Generate RecordWrapper(record) objects from the position in
+            the cell.
+            """
             local_marker = None
 
             # Since the regular DB query routines take a marker and assume that
@@ -282,44 +426,29 @@ class CrossCellLister(metaclass=abc.ABCMeta):
 
             marker_id = self.marker_identifier
 
-            if marker:
-                if cctx.cell_uuid == global_marker_cell:
-                    local_marker = marker
-                else:
-                    local_marker = self.get_marker_by_values(
-                        cctx, global_marker_values)
-                if local_marker:
-                    if local_marker != marker:
-                        # We did find a marker in our cell, but it wasn't
-                        # the global marker. Thus, we will use it as our
-                        # marker in the main query below, but we also need
-                        # to prefix that result with this marker instance
-                        # since the result below will not return it and it
-                        # has not been returned to the user yet. Note that
-                        # we do _not_ prefix the marker instance if our
-                        # marker was the global one since that has already
-                        # been sent to the user.
-                        local_marker_filters = copy.copy(filters)
-                        if marker_id not in local_marker_filters:
-                            # If an $id filter was provided, it will
-                            # have included our marker already if this
-                            # instance is desired in the output
-                            # set. If it wasn't, we specifically query
-                            # for it. If the other filters would have
-                            # excluded it, then we'll get an empty set
-                            # here and not include it in the output as
-                            # expected.
-                            local_marker_filters[marker_id] = [local_marker]
-                        local_marker_prefix = self.get_by_filters(
-                            cctx, local_marker_filters, limit=1, marker=None,
-                            **kwargs)
-                else:
-                    # There was a global marker but everything in our
-                    # cell is _before_ that marker, so we return
-                    # nothing. If we didn't have this clause, we'd
-                    # pass marker=None to the query below and return a
-                    # full unpaginated set for our cell.
-                    return
+            if position == _CELL_DONE:
+                return
+            if position is not None:
+                local_marker, include_marker = position
+                if include_marker:
+                    # We will use the local marker as our marker in the main
+                    # query below, but we also need to prefix that result
+                    # with this marker instance since the result below will
+                    # not return it.
+                    local_marker_filters = copy.copy(filters)
+                    if marker_id not in local_marker_filters:
+                        # If an $id filter was provided, it will
+                        # have included our marker already if this
+                        # instance is desired in the output
+                        # set. If it wasn't, we specifically query
+                        # for it. If the other filters would have
+                        # excluded it, then we'll get an empty set
+                        # here and not include it in the output as
+                        # expected.
+                        local_marker_filters[marker_id] = [local_marker]
+                    local_marker_prefix = self.get_by_filters(
+                        cctx, local_marker_filters, limit=1, marker=None,
+                        **kwargs)
 
             if local_marker_prefix:
                 # Per above, if we had a matching marker object, that is
@@ -332,6 +461,18 @@ class CrossCellLister(metaclass=abc.ABCMeta):
             # batch.
             batch_size = self.batch_size or limit
 
+            # Size the first batch after the share of the previous page which
+            # came from this cell, with 10% more like the distributed batch
+            # strategy. The following batches, if any, are full ones.
+            first_batch_size = batch_size
+            if limit and batch_size and previous_counts:
+                share = (previous_counts.get(cctx.cell_uuid, 0) /
+                         sum(previous_counts.values()))
+                first_batch_size = min(
+                    batch_size,
+                    max(int(limit * share * 1.10) + 1,
+                        _MIN_ADAPTIVE_BATCH_SIZE))
+
             # Keep track of how many we have returned in all batches
             return_count = 0
 
@@ -343,10 +484,11 @@ class CrossCellLister(metaclass=abc.ABCMeta):
 
                 # Do not query a full batch if it would cause our total
                 # to exceed the limit
+                size = batch_size if return_count else first_batch_size
                 if limit:
-                    query_size = min(batch_size, limit - return_count)
+                    query_size = min(size, limit - return_count)
                 else:
-                    query_size = batch_size
+                    query_size = size
 
                 # Get one batch
                 query_result = self.get_by_filters(
@@ -438,8 +580,18 @@ class CrossCellLister(metaclass=abc.ABCMeta):
 
             yield item._db_record
             self._cells_responded.add(item.cell_uuid)
+            positions[item.cell_uuid] = (
+                item._db_record[self.marker_identifier], False)
+            counts[item.cell_uuid] += 1
             total_limit -= 1
             if total_limit == 0:
                 # We'll only hit this if limit was nonzero and we just
                 # generated our last one
+                if (self.cursor_cache is not None and
+                        not self._cells_failed and
+                        not self._cells_timed_out):
+                    self.cursor_cache.set(
+                        self._get_cursor_key(filters, positions[
+                            item.cell_uuid][0]),
+                        encode_cursor(positions, counts))
                 return
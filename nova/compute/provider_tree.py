@@ -99,22 +99,6 @@ class _Provider(object):
             ret.extend(child.get_provider_uuids())
         return ret
 
-    def find(self, search):
-        if self.name == search or self.uuid == search:
-            return self
-        if search in self.children:
-            return self.children[search]
-        if self.children:
-            for child in self.children.values():
-                # We already searched for the child by UUID above, so here we
-                # just check for a child name match
-                if child.name == search:
-                    return child
-                subchild = child.find(search)
-                if subchild:
-                    return subchild
-        return None
-
     def add_child(self, provider):
         self.children[provider.uuid] = provider
 
@@ -251,6 +235,10 @@ class ProviderTree(object):
         self.lock = lockutils.internal_lock(_LOCK_NAME)
         self.roots_by_uuid = {}
         self.roots_by_name = {}
+        # Flat indexes of all the providers in the tree, roots and
+        # descendants, so that looking up any provider is O(1).
+        self.providers_by_uuid = {}
+        self.providers_by_name = {}
 
     @property
     def roots(self):
@@ -317,15 +305,22 @@ class ProviderTree(object):
             # Sanity check for orphans.  Every parent UUID must either be None
             # (the provider is a root), or be in the tree already, or exist as
             # a key in to_add_by_uuid (we're adding it).
-            all_parents = set([None]) | set(to_add_by_uuid)
-            # NOTE(efried): Can't use get_provider_uuids directly because we're
-            # already under lock.
-            for root in self.roots:
-                all_parents |= set(root.get_provider_uuids())
             missing_parents = set()
+            # Map of parent UUID to the dicts of its children which we're
+            # adding, so that the providers can be added in top-down order
+            # without rescanning to_add_by_uuid.
+            children_by_parent_uuid = collections.defaultdict(list)
+            to_visit = collections.deque()
             for pd in to_add_by_uuid.values():
                 parent_uuid = pd.get('parent_provider_uuid')
-                if parent_uuid not in all_parents:
+                if parent_uuid in to_add_by_uuid:
+                    children_by_parent_uuid[parent_uuid].append(pd)
+                elif (parent_uuid is None or
+                        parent_uuid in self.providers_by_uuid):
+                    # Roots and children of providers already in the tree are
+                    # always okay to inject.
+                    to_visit.append(pd)
+                else:
                     missing_parents.add(parent_uuid)
             if missing_parents:
                 raise ValueError(
@@ -333,27 +328,11 @@ class ProviderTree(object):
                     ', '.join(missing_parents))
 
             # Ready to do the work.
-            # Use to_add_by_uuid to keep track of which providers are left to
-            # be added.
-            while to_add_by_uuid:
-                # Find a provider that's suitable to inject.
-                for uuid, pd in to_add_by_uuid.items():
-                    # Roots are always okay to inject (None won't be a key in
-                    # to_add_by_uuid).  Otherwise, we have to make sure we
-                    # already added the parent (and, by recursion, all
-                    # ancestors) if present in the input.
-                    parent_uuid = pd.get('parent_provider_uuid')
-                    if parent_uuid not in to_add_by_uuid:
-                        break
-                else:
-                    # This should never happen - we already ensured all parents
-                    # exist in the tree, which means we can't have any branches
-                    # that don't wind up at the root, which means we can't have
-                    # cycles.  But to quell the paranoia...
-                    raise ValueError(
-                        _("Unexpectedly failed to find parents already in the "
-                          "tree for any of the following: %s") %
-                        ','.join(set(to_add_by_uuid)))
+            num_added = 0
+            while to_visit:
+                pd = to_visit.popleft()
+                uuid = pd['uuid']
+                parent_uuid = pd.get('parent_provider_uuid')
 
                 # Add or replace the provider, either as a root or under its
                 # parent
@@ -368,20 +347,50 @@ class ProviderTree(object):
                     self.roots_by_uuid[provider.uuid] = provider
                     self.roots_by_name[provider.name] = provider
                 else:
-                    parent = self._find_with_lock(parent_uuid)
+                    parent = self.providers_by_uuid[parent_uuid]
                     parent.add_child(provider)
-
-                # Remove this entry to signify we're done with it.
-                to_add_by_uuid.pop(uuid)
+                self._index_with_lock(provider)
+                num_added += 1
+
+                # Now that its parent is in the tree, the children of this
+                # provider can be added.
+                to_visit.extend(children_by_parent_uuid.pop(uuid, []))
+
+            if num_added != len(to_add_by_uuid):
+                # This should never happen - we already ensured all parents
+                # exist in the tree, which means we can't have any branches
+                # that don't wind up at the root, which means we can't have
+                # cycles.  But to quell the paranoia...
+                raise ValueError(
+                    _("Unexpectedly failed to find parents already in the "
+                      "tree for any of the following: %s") %
+                    ','.join(set(pd['uuid']
+                                 for pds in children_by_parent_uuid.values()
+                                 for pd in pds)))
+
+    def _index_with_lock(self, provider):
+        self.providers_by_uuid[provider.uuid] = provider
+        self.providers_by_name[provider.name] = provider
+
+    def _unindex_with_lock(self, provider):
+        """Removes the provider and all its descendants from the indexes."""
+        to_unindex = [provider]
+        while to_unindex:
+            p = to_unindex.pop()
+            self.providers_by_uuid.pop(p.uuid, None)
+            if self.providers_by_name.get(p.name) is p:
+                del self.providers_by_name[p.name]
+            to_unindex.extend(p.children.values())
 
     def _remove_with_lock(self, name_or_uuid):
         found = self._find_with_lock(name_or_uuid)
         if found.parent_uuid:
-            parent = self._find_with_lock(found.parent_uuid)
+            parent = self.providers_by_uuid[found.parent_uuid]
             parent.remove_child(found)
         else:
             del self.roots_by_uuid[found.uuid]
             del self.roots_by_name[found.name]
+        self._unindex_with_lock(found)
 
     def remove(self, name_or_uuid):
         """Safely removes the provider identified by the supplied name_or_uuid
@@ -419,24 +428,19 @@ class ProviderTree(object):
             p = _Provider(name, uuid=uuid, generation=generation)
             self.roots_by_uuid[uuid] = p
             self.roots_by_name[name] = p
+            self._index_with_lock(p)
             return p.uuid
 
     def _find_with_lock(self, name_or_uuid, return_root=False):
-        # Optimization for large number of roots (e.g. ironic): if name_or_uuid
-        # represents a root, this is O(1).
-        found = self.roots_by_uuid.get(name_or_uuid)
-        if found:
-            return found
-        found = self.roots_by_name.get(name_or_uuid)
-        if found:
-            return found
-
-        # Okay, it's a child; do it the hard way.
-        for root in self.roots:
-            found = root.find(name_or_uuid)
-            if found:
-                return root if return_root else found
-        raise ValueError(_("No such provider %s") % name_or_uuid)
+        found = self.providers_by_uuid.get(name_or_uuid)
+        if not found:
+            found = self.providers_by_name.get(name_or_uuid)
+        if not found:
+            raise ValueError(_("No such provider %s") % name_or_uuid)
+        if return_root:
+            while found.parent_uuid:
+                found = self.providers_by_uuid[found.parent_uuid]
+        return found
 
     def data(self, name_or_uuid):
         """Return a point-in-time copy of the specified provider's data.
@@ -487,6 +491,7 @@ class ProviderTree(object):
             parent_node = self._find_with_lock(parent)
             p = _Provider(name, uuid, generation, parent_node.uuid)
             parent_node.add_child(p)
+            self._index_with_lock(p)
             return p.uuid
 
     def has_inventory(self, name_or_uuid):
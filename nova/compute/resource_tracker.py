@@ -20,9 +20,13 @@ model.
 """
 import collections
 import copy
+import functools
+import inspect
+import time
 
 from keystoneauth1 import exceptions as ks_exc
 import os_traits
+from oslo_concurrency import lockutils
 from oslo_log import log as logging
 from oslo_serialization import jsonutils
 from oslo_utils import excutils
@@ -53,7 +57,22 @@ from nova.virt import hardware
 CONF = nova.conf.CONF
 
 LOG = logging.getLogger(__name__)
+
+# The resources reported by the virt drivers which reflect the current usage
+# of the host rather than its inventory, so which do not require to update the
+# resource providers of the node in placement.
+_HOST_USAGE_RESOURCES = ('vcpus_used', 'memory_mb_used', 'local_gb_used',
+                         'disk_available_least')
+# The fields of the compute nodes set from the resources reported by the virt
+# drivers which are then computed from the usage of their instances.
+_NODE_USAGE_FIELDS = ('vcpus_used', 'memory_mb_used', 'local_gb_used',
+                      'numa_topology')
+# The fields of the compute nodes compared to detect the drift of the usage
+# tracked incrementally.
+_NODE_USAGE_DRIFT_FIELDS = ('vcpus_used', 'memory_mb_used', 'local_gb_used',
+                            'running_vms')
 COMPUTE_RESOURCE_SEMAPHORE = "compute_resources"
+PCI_DEVICES_SEMAPHORE = "compute_pci_devices"
 
 
 def _instance_in_resize_state(instance):
@@ -83,6 +102,31 @@ def _instance_is_live_migrating(instance):
     return False
 
 
+def _synchronized_node(get_nodename):
+    """Serializes the decorated ResourceTracker method with the other
+    operations on the same node, and records that it changed the usage of the
+    node.
+
+    :param get_nodename: Function returning the nodename from the arguments of
+                         the decorated method, keyed by name.
+    """
+    def decorator(function):
+        @functools.wraps(function)
+        def decorated_function(self, *args, **kwargs):
+            keyed_args = inspect.getcallargs(function, self, *args, **kwargs)
+            nodename = get_nodename(keyed_args)
+            with self._node_lock(nodename):
+                try:
+                    return function(self, *args, **kwargs)
+                finally:
+                    # Bumped once the operation is done, so that an audit of
+                    # the node which read the instances and migrations while
+                    # it was running reads them again.
+                    self.usage_generations[nodename] += 1
+        return decorated_function
+    return decorator
+
+
 class ResourceTracker(object):
     """Compute helper class for keeping track of resource usage as instances
     are built and destroyed.
@@ -96,23 +140,48 @@ class ResourceTracker(object):
         self.compute_nodes = {}
         # Dict of Stats objects, keyed by nodename
         self.stats = collections.defaultdict(compute_stats.Stats)
-        # Set of UUIDs of instances tracked on this host.
-        self.tracked_instances = set()
-        self.tracked_migrations = {}
+        # Dict of the sets of UUIDs of the instances tracked on each node,
+        # and of the migrations tracked on each node keyed by instance UUID,
+        # keyed by nodename. Each node has its own, since they are only
+        # changed under the lock of the node.
+        self.tracked_instances = collections.defaultdict(set)
+        self.tracked_migrations = collections.defaultdict(dict)
         self.is_bfv = {}  # dict, keyed by instance uuid, to is_bfv boolean
         monitor_handler = monitors.MonitorHandler(self)
         self.monitors = monitor_handler.monitors
         self.old_resources = collections.defaultdict(objects.ComputeNode)
+        # Dict of the inventory related resources last reported by the virt
+        # driver, and of the monotonic time of the last update of the resource
+        # providers in placement, keyed by nodename. A node missing from the
+        # latter has its providers updated on the next _update().
+        self.driver_resources = {}
+        self.provider_update_times = {}
+        # The number of 'performed' and 'skipped' updates of the resource
+        # providers in placement.
+        self.provider_updates = collections.Counter()
+        # The number of operations which changed the usage of each node, keyed
+        # by nodename, used to detect the claims racing with the audit of the
+        # node by _update_available_resource().
+        self.usage_generations = collections.Counter()
+        # Dict of the monotonic time of the last full reconciliation of the
+        # usage of each node with its instances and migrations, keyed by
+        # nodename. A node missing from it is reconciled on the next audit.
+        self.usage_reconcile_times = {}
+        # The number of 'reconciled' and 'incremental' audits of the usage of
+        # the nodes, and of the reconciliations which found that the usage
+        # tracked incrementally 'drifted'.
+        self.usage_audits = collections.Counter()
         self.reportclient = reportclient or report.SchedulerReportClient()
         self.ram_allocation_ratio = CONF.ram_allocation_ratio
         self.cpu_allocation_ratio = CONF.cpu_allocation_ratio
         self.disk_allocation_ratio = CONF.disk_allocation_ratio
         self.provider_tree = None
-        # Dict of assigned_resources, keyed by resource provider uuid
-        # the value is a dict again, keyed by resource class
-        # and value of this sub-dict is a set of Resource obj
+        # Dict of assigned_resources, keyed by nodename, the value is a dict
+        # keyed by resource provider uuid, the value is a dict again, keyed by
+        # resource class and value of this sub-dict is a set of Resource obj
         self.assigned_resources = collections.defaultdict(
-            lambda: collections.defaultdict(set))
+            lambda: collections.defaultdict(
+                lambda: collections.defaultdict(set)))
         # Retrieves dict of provider config data. This can fail with
         # nova.exception.ProviderConfigException if invalid or conflicting
         # data exists in the provider config files.
@@ -123,7 +192,25 @@ class ResourceTracker(object):
         # smarter logging.
         self.absent_providers = set()
 
-    @utils.synchronized(COMPUTE_RESOURCE_SEMAPHORE, fair=True)
+    def _node_lock(self, nodename):
+        """Returns the lock serializing the changes to the usage of the node.
+
+        The nodes are locked separately so that the claims on a node are not
+        blocked by the audit of another node.
+        """
+        return lockutils.lock(
+            '%s-%s' % (COMPUTE_RESOURCE_SEMAPHORE, nodename), fair=True)
+
+    def _pci_lock(self):
+        """Returns the lock serializing the accesses to the PCI devices, which
+        are shared by all the nodes of the host.
+
+        It is taken after the lock of a node when both are needed, and must
+        not be held while taking the lock of a node.
+        """
+        return lockutils.lock(PCI_DEVICES_SEMAPHORE, fair=True)
+
+    @_synchronized_node(lambda args: args['nodename'])
     def instance_claim(self, context, instance, nodename, allocations,
                        limits=None):
         """Indicate that some resources are needed for an upcoming compute
@@ -168,12 +255,14 @@ class ResourceTracker(object):
 
         cn = self.compute_nodes[nodename]
         pci_requests = instance.pci_requests
-        claim = claims.Claim(context, instance, nodename, self, cn,
-                             pci_requests, limits=limits)
+        # The claim tests the PCI devices.
+        with self._pci_lock():
+            claim = claims.Claim(context, instance, nodename, self, cn,
+                                 pci_requests, limits=limits)
 
         # self._set_instance_host_and_node() will save instance to the DB
         # so set instance.numa_topology first.  We need to make sure
-        # that numa_topology is saved while under COMPUTE_RESOURCE_SEMAPHORE
+        # that numa_topology is saved while under the lock of the node
         # so that the resource audit knows about any cpus we've pinned.
         instance_numa_topology = claim.claimed_numa_topology
         instance.numa_topology = instance_numa_topology
@@ -182,10 +271,11 @@ class ResourceTracker(object):
         if self.pci_tracker:
             # NOTE(jaypipes): ComputeNode.pci_device_pools is set below
             # in _update_usage_from_instance().
-            self.pci_tracker.claim_instance(context, pci_requests,
-                                            instance_numa_topology)
+            with self._pci_lock():
+                self.pci_tracker.claim_instance(context, pci_requests,
+                                                instance_numa_topology)
 
-        claimed_resources = self._claim_resources(allocations)
+        claimed_resources = self._claim_resources(nodename, allocations)
         instance.resources = claimed_resources
 
         # Mark resources in-use and update stats
@@ -197,7 +287,7 @@ class ResourceTracker(object):
 
         return claim
 
-    @utils.synchronized(COMPUTE_RESOURCE_SEMAPHORE, fair=True)
+    @_synchronized_node(lambda args: args['nodename'])
     def rebuild_claim(self, context, instance, nodename, allocations,
                       limits=None, image_meta=None, migration=None):
         """Create a claim for a rebuild operation."""
@@ -207,7 +297,7 @@ class ResourceTracker(object):
             move_type=fields.MigrationType.EVACUATION,
             image_meta=image_meta, limits=limits)
 
-    @utils.synchronized(COMPUTE_RESOURCE_SEMAPHORE, fair=True)
+    @_synchronized_node(lambda args: args['nodename'])
     def resize_claim(self, context, instance, instance_type, nodename,
                      migration, allocations, image_meta=None, limits=None):
         """Create a claim for a resize or cold-migration move.
@@ -219,7 +309,7 @@ class ResourceTracker(object):
                                 migration, allocations, image_meta=image_meta,
                                 limits=limits)
 
-    @utils.synchronized(COMPUTE_RESOURCE_SEMAPHORE, fair=True)
+    @_synchronized_node(lambda args: args['nodename'])
     def live_migration_claim(self, context, instance, nodename, migration,
                              limits, allocs):
         """Builds a MoveClaim for a live migration.
@@ -295,9 +385,11 @@ class ResourceTracker(object):
             for request in instance.pci_requests.requests:
                 if request.source == objects.InstancePCIRequest.NEUTRON_PORT:
                     new_pci_requests.requests.append(request)
-        claim = claims.MoveClaim(context, instance, nodename,
-                                 new_instance_type, image_meta, self, cn,
-                                 new_pci_requests, migration, limits=limits)
+        with self._pci_lock():
+            claim = claims.MoveClaim(context, instance, nodename,
+                                     new_instance_type, image_meta, self, cn,
+                                     new_pci_requests, migration,
+                                     limits=limits)
 
         claimed_pci_devices_objs = []
         # TODO(artom) The second part of this condition should not be
@@ -310,12 +402,13 @@ class ResourceTracker(object):
         if self.pci_tracker and not migration.is_live_migration:
             # NOTE(jaypipes): ComputeNode.pci_device_pools is set below
             # in _update_usage_from_instance().
-            claimed_pci_devices_objs = self.pci_tracker.claim_instance(
+            with self._pci_lock():
+                claimed_pci_devices_objs = self.pci_tracker.claim_instance(
                     context, new_pci_requests, claim.claimed_numa_topology)
         claimed_pci_devices = objects.PciDeviceList(
                 objects=claimed_pci_devices_objs)
 
-        claimed_resources = self._claim_resources(allocations)
+        claimed_resources = self._claim_resources(nodename, allocations)
         old_resources = instance.resources
 
         # TODO(jaypipes): Move claimed_numa_topology out of the Claim's
@@ -348,8 +441,8 @@ class ResourceTracker(object):
     def _create_migration(self, context, instance, new_instance_type,
                           nodename, move_type=None):
         """Create a migration record for the upcoming resize.  This should
-        be done while the COMPUTE_RESOURCES_SEMAPHORE is held so the resource
-        claim will not be lost if the audit process starts.
+        be done while the lock of the node is held so the resource claim will
+        not be lost if the audit process starts.
         """
         migration = objects.Migration(context=context.elevated())
         migration.dest_compute = self.host
@@ -374,8 +467,8 @@ class ResourceTracker(object):
 
         If a migration record was created already before the request made
         it to this compute host, only set up the migration so it's included in
-        resource tracking. This should be done while the
-        COMPUTE_RESOURCES_SEMAPHORE is held.
+        resource tracking. This should be done while the lock of the node is
+        held.
         """
         migration.dest_compute = self.host
         migration.dest_node = nodename
@@ -387,7 +480,7 @@ class ResourceTracker(object):
             migration.status = 'pre-migrating'
         migration.save()
 
-    def _claim_resources(self, allocations):
+    def _claim_resources(self, nodename, allocations):
         """Claim resources according to assigned resources from allocations
         and available resources in provider tree
         """
@@ -413,7 +506,7 @@ class ResourceTracker(object):
                     # populated with this resource class when updating
                     # provider tree.
                     continue
-                assigned = self.assigned_resources[rp_uuid][rc]
+                assigned = self.assigned_resources[nodename][rp_uuid][rc]
                 free = provider_data.resources[rc] - assigned
                 if amount > len(free):
                     reason = (_("Needed %(amount)d units of resource class "
@@ -426,12 +519,13 @@ class ResourceTracker(object):
                     claimed_resources.append(free.pop())
 
         if claimed_resources:
-            self._add_assigned_resources(claimed_resources)
+            self._add_assigned_resources(nodename, claimed_resources)
             return objects.ResourceList(objects=claimed_resources)
 
-    def _populate_assigned_resources(self, context, instance_by_uuid):
-        """Populate self.assigned_resources organized by resource class and
-        reource provider uuid, which is as following format:
+    def _populate_assigned_resources(self, context, nodename,
+                                     instance_by_uuid):
+        """Populate self.assigned_resources of the node organized by resource
+        class and reource provider uuid, which is as following format:
         {
         $RP_UUID: {
             $RESOURCE_CLASS: [objects.Resource, ...],
@@ -441,7 +535,7 @@ class ResourceTracker(object):
         resources = []
 
         # Get resources assigned to migrations
-        for mig in self.tracked_migrations.values():
+        for mig in self.tracked_migrations[nodename].values():
             mig_ctx = mig.instance.migration_context
             # We might have a migration whose instance hasn't arrived here yet.
             # Ignore it.
@@ -453,18 +547,21 @@ class ResourceTracker(object):
                 resources.extend(mig_ctx.new_resources or [])
 
         # Get resources assigned to instances
-        for uuid in self.tracked_instances:
+        for uuid in self.tracked_instances[nodename]:
             resources.extend(instance_by_uuid[uuid].resources or [])
 
-        self.assigned_resources.clear()
-        self._add_assigned_resources(resources)
+        self.assigned_resources[nodename].clear()
+        self._add_assigned_resources(nodename, resources)
 
-    def _check_resources(self, context):
-        """Check if there are assigned resources not found in provider tree"""
+    def _check_resources(self, context, nodename):
+        """Check if there are assigned resources of the node not found in
+        provider tree
+        """
         notfound = set()
-        for rp_uuid in self.assigned_resources:
+        assigned_resources = self.assigned_resources[nodename]
+        for rp_uuid in assigned_resources:
             provider_data = self.provider_tree.data(rp_uuid)
-            for rc, assigned in self.assigned_resources[rp_uuid].items():
+            for rc, assigned in assigned_resources[rp_uuid].items():
                 notfound |= (assigned - provider_data.resources[rc])
 
         if not notfound:
@@ -480,15 +577,16 @@ class ResourceTracker(object):
                    "and restore your configuration if necessary") % resources
         raise exception.AssignedResourceNotFound(reason=reason)
 
-    def _release_assigned_resources(self, resources):
-        """Remove resources from self.assigned_resources."""
+    def _release_assigned_resources(self, nodename, resources):
+        """Remove resources from self.assigned_resources of the node."""
         if not resources:
             return
         for resource in resources:
             rp_uuid = resource.provider_uuid
             rc = resource.resource_class
             try:
-                self.assigned_resources[rp_uuid][rc].remove(resource)
+                self.assigned_resources[nodename][rp_uuid][rc].remove(
+                    resource)
             except KeyError:
                 LOG.warning("Release resource %(rc)s: %(id)s of provider "
                             "%(rp_uuid)s, not tracked in "
@@ -496,19 +594,19 @@ class ResourceTracker(object):
                             {'rc': rc, 'id': resource.identifier,
                              'rp_uuid': rp_uuid})
 
-    def _add_assigned_resources(self, resources):
-        """Add resources to self.assigned_resources"""
+    def _add_assigned_resources(self, nodename, resources):
+        """Add resources to self.assigned_resources of the node"""
         if not resources:
             return
         for resource in resources:
             rp_uuid = resource.provider_uuid
             rc = resource.resource_class
-            self.assigned_resources[rp_uuid][rc].add(resource)
+            self.assigned_resources[nodename][rp_uuid][rc].add(resource)
 
     def _set_instance_host_and_node(self, instance, nodename):
         """Tag the instance as belonging to this host.  This should be done
-        while the COMPUTE_RESOURCES_SEMAPHORE is held so the resource claim
-        will not be lost if the audit process starts.
+        while the lock of the node is held so the resource claim will not be
+        lost if the audit process starts.
         """
         # NOTE(mriedem): ComputeManager._nil_out_instance_obj_host_and_node is
         # somewhat tightly coupled to the fields set in this method so if this
@@ -521,14 +619,14 @@ class ResourceTracker(object):
     def _unset_instance_host_and_node(self, instance):
         """Untag the instance so it no longer belongs to the host.
 
-        This should be done while the COMPUTE_RESOURCES_SEMAPHORE is held so
-        the resource claim will not be lost if the audit process starts.
+        This should be done while the lock of the node is held so the
+        resource claim will not be lost if the audit process starts.
         """
         instance.host = None
         instance.node = None
         instance.save()
 
-    @utils.synchronized(COMPUTE_RESOURCE_SEMAPHORE, fair=True)
+    @_synchronized_node(lambda args: args['nodename'])
     def abort_instance_claim(self, context, instance, nodename):
         """Remove usage from the given instance."""
         self._update_usage_from_instance(context, instance, nodename,
@@ -545,13 +643,15 @@ class ResourceTracker(object):
             pci_devices = self._get_migration_context_resource(
                 'pci_devices', instance, prefix=prefix)
             if pci_devices:
-                for pci_device in pci_devices:
-                    self.pci_tracker.free_device(pci_device, instance)
+                with self._pci_lock():
+                    for pci_device in pci_devices:
+                        self.pci_tracker.free_device(pci_device, instance)
 
-                dev_pools_obj = self.pci_tracker.stats.to_device_pools_obj()
+                    dev_pools_obj = (
+                        self.pci_tracker.stats.to_device_pools_obj())
                 self.compute_nodes[nodename].pci_device_pools = dev_pools_obj
 
-    @utils.synchronized(COMPUTE_RESOURCE_SEMAPHORE, fair=True)
+    @_synchronized_node(lambda args: args['migration'].source_node)
     def drop_move_claim_at_source(self, context, instance, migration):
         """Drop a move claim after confirming a resize or cold migration."""
         migration.status = 'confirmed'
@@ -567,7 +667,7 @@ class ResourceTracker(object):
         # though.
         instance.drop_migration_context()
 
-    @utils.synchronized(COMPUTE_RESOURCE_SEMAPHORE, fair=True)
+    @_synchronized_node(lambda args: args['migration'].dest_node)
     def drop_move_claim_at_dest(self, context, instance, migration):
         """Drop a move claim after reverting a resize or cold migration."""
 
@@ -585,7 +685,7 @@ class ResourceTracker(object):
         instance.revert_migration_context()
         instance.save(expected_task_state=[task_states.RESIZE_REVERTING])
 
-    @utils.synchronized(COMPUTE_RESOURCE_SEMAPHORE, fair=True)
+    @_synchronized_node(lambda args: args['nodename'])
     def drop_move_claim(self, context, instance, nodename,
                         instance_type=None, prefix='new_'):
         self._drop_move_claim(
@@ -614,8 +714,9 @@ class ResourceTracker(object):
         """
         # Remove usage for an instance that is tracked in migrations, such as
         # on the dest node during revert resize.
-        if instance['uuid'] in self.tracked_migrations:
-            migration = self.tracked_migrations.pop(instance['uuid'])
+        if instance['uuid'] in self.tracked_migrations[nodename]:
+            migration = self.tracked_migrations[nodename].pop(
+                instance['uuid'])
             if not instance_type:
                 instance_type = self._get_instance_type(instance, prefix,
                                                         migration)
@@ -623,8 +724,8 @@ class ResourceTracker(object):
         # as on the source node after a migration).
         # NOTE(lbeliveau): On resize on the same node, the instance is
         # included in both tracked_migrations and tracked_instances.
-        elif instance['uuid'] in self.tracked_instances:
-            self.tracked_instances.remove(instance['uuid'])
+        elif instance['uuid'] in self.tracked_instances[nodename]:
+            self.tracked_instances[nodename].remove(instance['uuid'])
 
         if instance_type is not None:
             numa_topology = self._get_migration_context_resource(
@@ -634,13 +735,13 @@ class ResourceTracker(object):
             self._drop_pci_devices(instance, nodename, prefix)
             resources = self._get_migration_context_resource(
                 'resources', instance, prefix=prefix)
-            self._release_assigned_resources(resources)
+            self._release_assigned_resources(nodename, resources)
             self._update_usage(usage, nodename, sign=-1)
 
             ctxt = context.elevated()
             self._update(ctxt, self.compute_nodes[nodename])
 
-    @utils.synchronized(COMPUTE_RESOURCE_SEMAPHORE, fair=True)
+    @_synchronized_node(lambda args: args['nodename'])
     def update_usage(self, context, instance, nodename):
         """Update the resource usage and stats after a change in an
         instance
@@ -652,7 +753,7 @@ class ResourceTracker(object):
 
         # don't update usage for this instance unless it submitted a resource
         # claim first:
-        if uuid in self.tracked_instances:
+        if uuid in self.tracked_instances[nodename]:
             self._update_usage_from_instance(context, instance, nodename)
             self._update(context.elevated(), self.compute_nodes[nodename])
 
@@ -704,7 +805,7 @@ class ResourceTracker(object):
 
         return False
 
-    def _init_compute_node(self, context, resources):
+    def _init_compute_node(self, context, resources, keep_usage=False):
         """Initialize the compute node if it does not already exist.
 
         The resource tracker will be inoperable if compute_node
@@ -717,6 +818,8 @@ class ResourceTracker(object):
 
         :param context: security context
         :param resources: initial values
+        :param keep_usage: Whether to keep the usage of the compute node
+            computed from its instances, if it already exists.
         :returns: True if a new compute_nodes table record was created,
             False otherwise
         """
@@ -726,7 +829,7 @@ class ResourceTracker(object):
         # to initialize
         if nodename in self.compute_nodes:
             cn = self.compute_nodes[nodename]
-            self._copy_resources(cn, resources)
+            self._copy_resources(cn, resources, keep_usage=keep_usage)
             self._setup_pci_tracker(context, cn, resources)
             return False
 
@@ -762,29 +865,39 @@ class ResourceTracker(object):
         return True
 
     def _setup_pci_tracker(self, context, compute_node, resources):
-        if not self.pci_tracker:
-            n_id = compute_node.id
-            self.pci_tracker = pci_manager.PciDevTracker(context, node_id=n_id)
-            if 'pci_passthrough_devices' in resources:
-                dev_json = resources.pop('pci_passthrough_devices')
-                self.pci_tracker.update_devices_from_hypervisor_resources(
-                        dev_json)
+        # The nodes are set up concurrently, only create one tracker.
+        with self._pci_lock():
+            if not self.pci_tracker:
+                n_id = compute_node.id
+                self.pci_tracker = pci_manager.PciDevTracker(context,
+                                                             node_id=n_id)
+                if 'pci_passthrough_devices' in resources:
+                    dev_json = resources.pop('pci_passthrough_devices')
+                    self.pci_tracker.update_devices_from_hypervisor_resources(
+                            dev_json)
 
-            dev_pools_obj = self.pci_tracker.stats.to_device_pools_obj()
-            compute_node.pci_device_pools = dev_pools_obj
+                dev_pools_obj = self.pci_tracker.stats.to_device_pools_obj()
+                compute_node.pci_device_pools = dev_pools_obj
 
-    def _copy_resources(self, compute_node, resources, initial=False):
-        """Copy resource values to supplied compute_node."""
+    def _copy_resources(self, compute_node, resources, initial=False,
+                        keep_usage=False):
+        """Copy resource values to supplied compute_node.
+
+        If keep_usage is True, the usage of the compute node and the stats of
+        its instances are kept instead of being reset to the values reported
+        by the virt driver.
+        """
         nodename = resources['hypervisor_hostname']
         stats = self.stats[nodename]
-        # purge old stats and init with anything passed in by the driver
-        # NOTE(danms): Preserve 'failed_builds' across the stats clearing,
-        # as that is not part of resources
-        # TODO(danms): Stop doing this when we get a column to store this
-        # directly
-        prev_failed_builds = stats.get('failed_builds', 0)
-        stats.clear()
-        stats['failed_builds'] = prev_failed_builds
+        if not keep_usage:
+            # purge old stats and init with anything passed in by the driver
+            # NOTE(danms): Preserve 'failed_builds' across the stats clearing,
+            # as that is not part of resources
+            # TODO(danms): Stop doing this when we get a column to store this
+            # directly
+            prev_failed_builds = stats.get('failed_builds', 0)
+            stats.clear()
+            stats['failed_builds'] = prev_failed_builds
         stats.digest_stats(resources.get('stats'))
         compute_node.stats = stats
 
@@ -815,9 +928,18 @@ class ResourceTracker(object):
             if conf_alloc_ratio not in (0.0, None):
                 setattr(compute_node, attr, conf_alloc_ratio)
 
+        usage = {}
+        if keep_usage:
+            usage = {field: getattr(compute_node, field)
+                     for field in _NODE_USAGE_FIELDS
+                     if compute_node.obj_attr_is_set(field)}
+
         # now copy rest to compute_node
         compute_node.update_from_virt_driver(resources)
 
+        for field, value in usage.items():
+            setattr(compute_node, field, value)
+
     def remove_node(self, nodename):
         """Handle node removal/rebalance.
 
@@ -827,6 +949,12 @@ class ResourceTracker(object):
         self.stats.pop(nodename, None)
         self.compute_nodes.pop(nodename, None)
         self.old_resources.pop(nodename, None)
+        self.driver_resources.pop(nodename, None)
+        self.provider_update_times.pop(nodename, None)
+        self.usage_reconcile_times.pop(nodename, None)
+        self.tracked_instances.pop(nodename, None)
+        self.tracked_migrations.pop(nodename, None)
+        self.assigned_resources.pop(nodename, None)
 
     def _get_host_metrics(self, context, nodename):
         """Get the metrics from monitors and
@@ -911,76 +1039,188 @@ class ResourceTracker(object):
                               'another host\'s instance!',
                           {'uuid': migration.instance_uuid})
 
-    @utils.synchronized(COMPUTE_RESOURCE_SEMAPHORE, fair=True)
     def _update_available_resource(self, context, resources, startup=False):
-
-        # initialize the compute node object, creating it
-        # if it does not already exist.
-        is_new_compute_node = self._init_compute_node(context, resources)
-
         nodename = resources['hypervisor_hostname']
 
-        # if we could not init the compute node the tracker will be
-        # disabled and we should quit now
-        if self.disabled(nodename):
-            return
-
-        # Grab all instances assigned to this node:
-        instances = objects.InstanceList.get_by_host_and_node(
-            context, self.host, nodename,
-            expected_attrs=['system_metadata',
-                            'numa_topology',
-                            'flavor', 'migration_context',
-                            'resources'])
+        with self._node_lock(nodename):
+            # Mark the resource providers of the node for update if the
+            # inventory reported by the virt driver changed. This must be
+            # checked before the resources are consumed below.
+            driver_resources = {key: value for key, value in resources.items()
+                                if key not in _HOST_USAGE_RESOURCES}
+            inventory_changed = (
+                driver_resources != self.driver_resources.get(nodename))
+            if inventory_changed:
+                self.driver_resources[nodename] = copy.deepcopy(
+                    driver_resources)
+                self.mark_providers_for_update(nodename)
+
+            # Unless it is time to reconcile the usage of the node with its
+            # instances and migrations, keep the usage tracked incrementally by
+            # the claims and drops since the last reconciliation.
+            reconcile = (inventory_changed or
+                         nodename not in self.compute_nodes or
+                         self._need_usage_reconcile(nodename, startup))
+            tracked_usage = None
+            if reconcile:
+                # Forget the last reconciliation in case this one fails.
+                reconciled_at = self.usage_reconcile_times.pop(nodename, None)
+                # Keep the usage tracked incrementally since then to check
+                # its drift.
+                if (reconciled_at is not None and
+                        CONF.compute.usage_reconcile_interval):
+                    cn = self.compute_nodes[nodename]
+                    tracked_usage = {field: getattr(cn, field)
+                                     for field in _NODE_USAGE_DRIFT_FIELDS}
+
+            # initialize the compute node object, creating it
+            # if it does not already exist.
+            is_new_compute_node = self._init_compute_node(
+                context, resources, keep_usage=not reconcile)
+
+            # if we could not init the compute node the tracker will be
+            # disabled and we should quit now
+            if self.disabled(nodename):
+                return
+
+            generation = self.usage_generations[nodename]
+
+        # Read the instances and migrations of the node and the metrics of the
+        # host without holding the lock of the node, so that these do not
+        # block the claims on the node. The usage is then computed from them
+        # under the lock.
+        if reconcile:
+            instances, migrations = self._get_node_usage(context, nodename)
+        metrics = self._get_host_metrics(context, nodename)
 
+        with self._node_lock(nodename):
+            cn = self.compute_nodes[nodename]
+            if reconcile:
+                if self.usage_generations[nodename] != generation:
+                    # A claim, or a drop, on the node completed meanwhile,
+                    # which the instances and migrations read above may not
+                    # reflect.
+                    LOG.debug('The usage of node %s changed during its '
+                              'audit, reading its instances and migrations '
+                              'again.', nodename)
+                    instances, migrations = self._get_node_usage(
+                        context, nodename)
+                instance_by_uuid = self._reconcile_usage(
+                    context, nodename, instances, migrations,
+                    is_new_compute_node)
+                self.usage_reconcile_times[nodename] = time.monotonic()
+                self.usage_audits['reconciled'] += 1
+                self._check_usage_drift(cn, tracked_usage)
+            else:
+                self.usage_audits['incremental'] += 1
+                LOG.debug('Kept the usage of node %(node)s tracked '
+                          'incrementally (reconciled: %(reconciled)d, '
+                          'incremental: %(incremental)d).',
+                          {'node': nodename,
+                           'reconciled': self.usage_audits['reconciled'],
+                           'incremental': self.usage_audits['incremental']})
+
+            self._report_final_resource_view(nodename)
+
+            # TODO(pmurray): metrics should not be a json string in
+            # ComputeNode, but it is. This should be changed in ComputeNode
+            cn.metrics = jsonutils.dumps(metrics)
+
+            if reconcile:
+                # Update assigned resources to self.assigned_resources
+                self._populate_assigned_resources(
+                    context, nodename, instance_by_uuid)
+
+            # update the compute_node
+            self._update(context, cn, startup=startup)
+            LOG.debug('Compute_service record updated for %(host)s:%(node)s',
+                      {'host': self.host, 'node': nodename})
+
+            # Check if there is any resource assigned but not found
+            # in provider tree
+            if startup:
+                self._check_resources(context, nodename)
+
+    def _reconcile_usage(self, context, nodename, instances, migrations,
+                         is_new_compute_node):
+        """Computes the usage of the node from its instances and migrations
+        again.
+
+        :returns: The instances of the node, keyed by UUID.
+        """
         # Now calculate usage based on instance utilization:
         instance_by_uuid = self._update_usage_from_instances(
             context, instances, nodename)
 
-        # Grab all in-progress migrations and error migrations:
-        migrations = objects.MigrationList.get_in_progress_and_error(
-            context, self.host, nodename)
-
         self._pair_instances_to_migrations(migrations, instance_by_uuid)
         self._update_usage_from_migrations(context, migrations, nodename)
 
-        # A new compute node means there won't be a resource provider yet since
-        # that would be created via the _update() call below, and if there is
-        # no resource provider then there are no allocations against it.
+        # A new compute node means there won't be a resource provider yet
+        # since that would be created via the _update() call below, and if
+        # there is no resource provider then there are no allocations
+        # against it.
         if not is_new_compute_node:
             self._remove_deleted_instances_allocations(
                 context, self.compute_nodes[nodename], migrations,
                 instance_by_uuid)
 
-        cn = self.compute_nodes[nodename]
-
-        # NOTE(yjiang5): Because pci device tracker status is not cleared in
-        # this periodic task, and also because the resource tracker is not
-        # notified when instances are deleted, we need remove all usages
-        # from deleted instances.
-        self.pci_tracker.clean_usage(instances, migrations)
-        dev_pools_obj = self.pci_tracker.stats.to_device_pools_obj()
-        cn.pci_device_pools = dev_pools_obj
-
-        self._report_final_resource_view(nodename)
-
-        metrics = self._get_host_metrics(context, nodename)
-        # TODO(pmurray): metrics should not be a json string in ComputeNode,
-        # but it is. This should be changed in ComputeNode
-        cn.metrics = jsonutils.dumps(metrics)
+        # NOTE(yjiang5): Because pci device tracker status is not cleared
+        # in this periodic task, and also because the resource tracker is
+        # not notified when instances are deleted, we need remove all
+        # usages from deleted instances.
+        with self._pci_lock():
+            self.pci_tracker.clean_usage(instances, migrations)
+            dev_pools_obj = self.pci_tracker.stats.to_device_pools_obj()
+        self.compute_nodes[nodename].pci_device_pools = dev_pools_obj
 
-        # Update assigned resources to self.assigned_resources
-        self._populate_assigned_resources(context, instance_by_uuid)
+        return instance_by_uuid
 
-        # update the compute_node
-        self._update(context, cn, startup=startup)
-        LOG.debug('Compute_service record updated for %(host)s:%(node)s',
-                  {'host': self.host, 'node': nodename})
+    def _need_usage_reconcile(self, nodename, startup):
+        """Returns whether the usage of the node must be reconciled with its
+        instances and migrations.
 
-        # Check if there is any resource assigned but not found
-        # in provider tree
-        if startup:
-            self._check_resources(context)
+        It is on startup, after a failed reconciliation and at least every
+        CONF.compute.usage_reconcile_interval seconds.
+        """
+        interval = CONF.compute.usage_reconcile_interval
+        reconciled_at = self.usage_reconcile_times.get(nodename)
+        return (startup or not interval or reconciled_at is None or
+                time.monotonic() - reconciled_at >= interval)
+
+    def _check_usage_drift(self, compute_node, tracked_usage):
+        """Logs the difference between the usage of the node tracked
+        incrementally since the last reconciliation, if any, and the usage
+        it was reconciled to.
+        """
+        if tracked_usage is None:
+            return
+        drift = {field: getattr(compute_node, field) - value
+                 for field, value in tracked_usage.items()
+                 if getattr(compute_node, field) != value}
+        if drift:
+            self.usage_audits['drifted'] += 1
+            LOG.info('The usage of node %(node)s tracked incrementally '
+                     'drifted from its instances and migrations by '
+                     '%(drift)s (drifted: %(drifted)d, reconciled: '
+                     '%(reconciled)d).',
+                     {'node': compute_node.hypervisor_hostname,
+                      'drift': drift,
+                      'drifted': self.usage_audits['drifted'],
+                      'reconciled': self.usage_audits['reconciled']})
+
+    def _get_node_usage(self, context, nodename):
+        """Returns the instances assigned to the node and its in-progress and
+        error migrations.
+        """
+        instances = objects.InstanceList.get_by_host_and_node(
+            context, self.host, nodename,
+            expected_attrs=['system_metadata',
+                            'numa_topology',
+                            'flavor', 'migration_context',
+                            'resources'])
+        migrations = objects.MigrationList.get_in_progress_and_error(
+            context, self.host, nodename)
+        return instances, migrations
 
     def _get_compute_node(self, context, nodename):
         """Returns compute node for the host and nodename."""
@@ -1067,13 +1307,42 @@ class ResourceTracker(object):
     def _resource_change(self, compute_node):
         """Check to see if any resources have changed."""
         nodename = compute_node.hypervisor_hostname
+        # No field was set since the compute node was last saved or found
+        # unchanged, so there is no need to compare it.
+        if (nodename in self.old_resources and
+                not compute_node.obj_what_changed()):
+            return False
         old_compute = self.old_resources[nodename]
         if not obj_base.obj_equal_prims(
                 compute_node, old_compute, ['updated_at']):
             self.old_resources[nodename] = copy.deepcopy(compute_node)
             return True
+        # The fields were set to the values they already had.
+        compute_node.obj_reset_changes(recursive=True)
         return False
 
+    def mark_providers_for_update(self, nodename=None):
+        """Update the resource providers of the node, or of all the nodes if
+        None, in placement on the next _update(), even if nothing changed.
+        """
+        if nodename is None:
+            self.provider_update_times.clear()
+        else:
+            self.provider_update_times.pop(nodename, None)
+
+    def _need_providers_update(self, nodename, startup):
+        """Returns whether the resource providers of the node must be updated
+        in placement.
+
+        They are when the inventory reported by the virt driver changed, on
+        startup, after a failed update and at least every
+        CONF.compute.provider_update_interval seconds.
+        """
+        interval = CONF.compute.provider_update_interval
+        updated_at = self.provider_update_times.get(nodename)
+        return (startup or not interval or updated_at is None or
+                time.monotonic() - updated_at >= interval)
+
     def _sync_compute_service_disabled_trait(self, context, traits):
         """Synchronize the COMPUTE_STATUS_DISABLED trait on the node provider.
 
@@ -1140,8 +1409,13 @@ class ResourceTracker(object):
     @retrying.retry(stop_max_attempt_number=4,
                     retry_on_exception=lambda e: isinstance(
                         e, exception.ResourceProviderUpdateConflict))
+    @utils.synchronized(COMPUTE_RESOURCE_SEMAPHORE, fair=True)
     def _update_to_placement(self, context, compute_node, startup):
-        """Send resource and inventory changes to placement."""
+        """Send resource and inventory changes to placement.
+
+        The updates of all the nodes are serialized, since each one flushes a
+        copy of the whole provider tree of the host.
+        """
         # NOTE(jianghuaw): Some resources(e.g. VGPU) are not saved in the
         # object of compute_node; instead the inventory data for these
         # resource is reported by driver's update_provider_tree(). So even if
@@ -1225,10 +1499,24 @@ class ResourceTracker(object):
                 with excutils.save_and_reraise_exception(logger=LOG):
                     self.old_resources[nodename] = old_compute
 
-        self._update_to_placement(context, compute_node, startup)
+        if self._need_providers_update(nodename, startup):
+            # Forget the last update in case this one fails.
+            self.provider_update_times.pop(nodename, None)
+            self._update_to_placement(context, compute_node, startup)
+            self.provider_update_times[nodename] = time.monotonic()
+            self.provider_updates['performed'] += 1
+        else:
+            self.provider_updates['skipped'] += 1
+            LOG.debug('Skipped the update of the resource providers of node '
+                      '%(node)s in placement since nothing changed '
+                      '(performed: %(performed)d, skipped: %(skipped)d).',
+                      {'node': nodename,
+                       'performed': self.provider_updates['performed'],
+                       'skipped': self.provider_updates['skipped']})
 
         if self.pci_tracker:
-            self.pci_tracker.save(context)
+            with self._pci_lock():
+                self.pci_tracker.save(context)
 
     def _update_usage(self, usage, nodename, sign=1):
         # TODO(stephenfin): We don't use the CPU, RAM and disk fields for much
@@ -1292,7 +1580,7 @@ class ResourceTracker(object):
                     migration.source_node == nodename)
         same_node = (incoming and outbound)
 
-        tracked = uuid in self.tracked_instances
+        tracked = uuid in self.tracked_instances[nodename]
         itype = None
         numa_topology = None
         sign = 0
@@ -1350,21 +1638,23 @@ class ResourceTracker(object):
             usage = self._get_usage_dict(
                         itype, instance, numa_topology=numa_topology)
             if self.pci_tracker and sign:
-                self.pci_tracker.update_pci_for_instance(
-                    context, instance, sign=sign)
+                with self._pci_lock():
+                    self.pci_tracker.update_pci_for_instance(
+                        context, instance, sign=sign)
             self._update_usage(usage, nodename)
             if self.pci_tracker:
-                obj = self.pci_tracker.stats.to_device_pools_obj()
+                with self._pci_lock():
+                    obj = self.pci_tracker.stats.to_device_pools_obj()
                 cn.pci_device_pools = obj
             else:
                 obj = objects.PciDevicePoolList()
                 cn.pci_device_pools = obj
-            self.tracked_migrations[uuid] = migration
+            self.tracked_migrations[nodename][uuid] = migration
 
     def _update_usage_from_migrations(self, context, migrations, nodename):
         filtered = {}
         instances = {}
-        self.tracked_migrations.clear()
+        self.tracked_migrations[nodename].clear()
 
         # do some defensive filtering against bad migrations records in the
         # database:
@@ -1435,19 +1725,19 @@ class ResourceTracker(object):
         """Update usage for a single instance."""
 
         uuid = instance['uuid']
-        is_new_instance = uuid not in self.tracked_instances
+        is_new_instance = uuid not in self.tracked_instances[nodename]
         # NOTE(sfinucan): Both brand new instances as well as instances that
         # are being unshelved will have is_new_instance == True
         is_removed_instance = not is_new_instance and (is_removed or
             instance['vm_state'] in vm_states.ALLOW_RESOURCE_REMOVAL)
 
         if is_new_instance:
-            self.tracked_instances.add(uuid)
+            self.tracked_instances[nodename].add(uuid)
             sign = 1
 
         if is_removed_instance:
-            self.tracked_instances.remove(uuid)
-            self._release_assigned_resources(instance.resources)
+            self.tracked_instances[nodename].remove(uuid)
+            self._release_assigned_resources(nodename, instance.resources)
             sign = -1
 
         cn = self.compute_nodes[nodename]
@@ -1458,9 +1748,10 @@ class ResourceTracker(object):
         # if it's a new or deleted instance:
         if is_new_instance or is_removed_instance:
             if self.pci_tracker:
-                self.pci_tracker.update_pci_for_instance(context,
-                                                         instance,
-                                                         sign=sign)
+                with self._pci_lock():
+                    self.pci_tracker.update_pci_for_instance(context,
+                                                             instance,
+                                                             sign=sign)
             # new instance, update compute node resource usage:
             self._update_usage(self._get_usage_dict(instance, instance),
                                nodename, sign=sign)
@@ -1473,7 +1764,8 @@ class ResourceTracker(object):
 
         cn.current_workload = stats.calculate_workload()
         if self.pci_tracker:
-            obj = self.pci_tracker.stats.to_device_pools_obj()
+            with self._pci_lock():
+                obj = self.pci_tracker.stats.to_device_pools_obj()
             cn.pci_device_pools = obj
         else:
             cn.pci_device_pools = objects.PciDevicePoolList()
@@ -1484,7 +1776,7 @@ class ResourceTracker(object):
         instances assigned to the local compute host, even if they are not
         currently powered on.
         """
-        self.tracked_instances.clear()
+        self.tracked_instances[nodename].clear()
 
         cn = self.compute_nodes[nodename]
         # set some initial values, reserve room for host/hypervisor:
@@ -1527,8 +1819,10 @@ class ResourceTracker(object):
             # the (potentially expensive) context.elevated construction below.
             return
         read_deleted_context = context.elevated(read_deleted='yes')
+        tracked_instances = self.tracked_instances[cn.hypervisor_hostname]
+        instance_uuids = []
         for consumer_uuid, alloc in allocations.items():
-            if consumer_uuid in self.tracked_instances:
+            if consumer_uuid in tracked_instances:
                 LOG.debug("Instance %s actively managed on this compute host "
                           "and has allocations in placement: %s.",
                           consumer_uuid, alloc)
@@ -1538,28 +1832,37 @@ class ResourceTracker(object):
                           "and has allocations in placement: %s.",
                           consumer_uuid, alloc)
                 continue
-
-            # We know these are instances now, so proceed
-            instance_uuid = consumer_uuid
+            # We know these are instances now
+            instance_uuids.append(consumer_uuid)
+
+        # Look up the instances which are not assigned to this node, including
+        # the deleted ones, with a single query.
+        unknown_uuids = [instance_uuid for instance_uuid in instance_uuids
+                         if instance_uuid not in instance_by_uuid]
+        if unknown_uuids:
+            instance_by_uuid = dict(instance_by_uuid)
+            for instance in objects.InstanceList.get_by_filters(
+                    read_deleted_context, {'uuid': unknown_uuids},
+                    expected_attrs=[]):
+                instance_by_uuid[instance.uuid] = instance
+
+        deleted_instance_uuids = []
+        for instance_uuid in instance_uuids:
+            alloc = allocations[instance_uuid]
             instance = instance_by_uuid.get(instance_uuid)
             if not instance:
-                try:
-                    instance = objects.Instance.get_by_uuid(
-                        read_deleted_context, consumer_uuid,
-                        expected_attrs=[])
-                except exception.InstanceNotFound:
-                    # The instance isn't even in the database. Either the
-                    # scheduler _just_ created an allocation for it and we're
-                    # racing with the creation in the cell database, or the
-                    #  instance was deleted and fully archived before we got a
-                    # chance to run this. The former is far more likely than
-                    # the latter. Avoid deleting allocations for a building
-                    # instance here.
-                    LOG.info("Instance %(uuid)s has allocations against this "
-                             "compute host but is not found in the database.",
-                             {'uuid': instance_uuid},
-                             exc_info=False)
-                    continue
+                # The instance isn't even in the database. Either the
+                # scheduler _just_ created an allocation for it and we're
+                # racing with the creation in the cell database, or the
+                #  instance was deleted and fully archived before we got a
+                # chance to run this. The former is far more likely than
+                # the latter. Avoid deleting allocations for a building
+                # instance here.
+                LOG.info("Instance %(uuid)s has allocations against this "
+                         "compute host but is not found in the database.",
+                         {'uuid': instance_uuid},
+                         exc_info=False)
+                continue
 
             # NOTE(mriedem): A cross-cell migration will work with instance
             # records across two cells once the migration is confirmed/reverted
@@ -1576,8 +1879,7 @@ class ResourceTracker(object):
                           "Deleting allocations that remained for this "
                           "instance against this compute host: %s.",
                           instance_uuid, alloc)
-                self.reportclient.delete_allocation_for_instance(context,
-                                                                 instance_uuid)
+                deleted_instance_uuids.append(instance_uuid)
                 continue
             if not instance.host:
                 # Allocations related to instances being scheduled should not
@@ -1633,6 +1935,28 @@ class ResourceTracker(object):
                             "%s.",
                             instance_uuid, instance.host, instance.node, alloc)
 
+        if deleted_instance_uuids:
+            self._delete_allocations_for_instances(
+                context, deleted_instance_uuids)
+
+    def _delete_allocations_for_instances(self, context, instance_uuids):
+        """Deletes the allocations of the deleted instances from placement at
+        once, or one by one if that fails, for example if one of them changed
+        meanwhile.
+        """
+        try:
+            self.reportclient.delete_allocations_for_instances(
+                context, instance_uuids)
+            return
+        except exception.AllocationDeleteFailed as e:
+            if len(instance_uuids) == 1:
+                raise
+            LOG.info('Failed to delete the allocations of the deleted '
+                     'instances at once, deleting them one by one: %s', e)
+        for instance_uuid in instance_uuids:
+            self.reportclient.delete_allocation_for_instance(
+                context, instance_uuid)
+
     def delete_allocation_for_evacuated_instance(self, context, instance, node,
                                                  node_type='source'):
         # Clean up the instance allocation from this node in placement
@@ -1872,7 +2196,6 @@ class ResourceTracker(object):
         """Resets the failed_builds stats for the given node."""
         self.stats[nodename].build_succeeded()
 
-    @utils.synchronized(COMPUTE_RESOURCE_SEMAPHORE, fair=True)
     def claim_pci_devices(self, context, pci_requests, instance_numa_topology):
         """Claim instance PCI resources
 
@@ -1883,12 +2206,12 @@ class ResourceTracker(object):
             instance
         :returns: a list of nova.objects.PciDevice objects
         """
-        result = self.pci_tracker.claim_instance(
-            context, pci_requests, instance_numa_topology)
-        self.pci_tracker.save(context)
+        with self._pci_lock():
+            result = self.pci_tracker.claim_instance(
+                context, pci_requests, instance_numa_topology)
+            self.pci_tracker.save(context)
         return result
 
-    @utils.synchronized(COMPUTE_RESOURCE_SEMAPHORE, fair=True)
     def unclaim_pci_devices(self, context, pci_device, instance):
         """Deallocate PCI devices
 
@@ -1897,40 +2220,41 @@ class ResourceTracker(object):
             be freed
         :param instance: the objects.Instance the PCI resources are freed from
         """
-        self.pci_tracker.free_device(pci_device, instance)
-        self.pci_tracker.save(context)
+        with self._pci_lock():
+            self.pci_tracker.free_device(pci_device, instance)
+            self.pci_tracker.save(context)
 
-    @utils.synchronized(COMPUTE_RESOURCE_SEMAPHORE, fair=True)
     def allocate_pci_devices_for_instance(self, context, instance):
         """Allocate instance claimed PCI resources
 
         :param context: security context
         :param instance: instance object
         """
-        self.pci_tracker.allocate_instance(instance)
-        self.pci_tracker.save(context)
+        with self._pci_lock():
+            self.pci_tracker.allocate_instance(instance)
+            self.pci_tracker.save(context)
 
-    @utils.synchronized(COMPUTE_RESOURCE_SEMAPHORE, fair=True)
     def free_pci_device_allocations_for_instance(self, context, instance):
         """Free instance allocated PCI resources
 
         :param context: security context
         :param instance: instance object
         """
-        self.pci_tracker.free_instance_allocations(context, instance)
-        self.pci_tracker.save(context)
+        with self._pci_lock():
+            self.pci_tracker.free_instance_allocations(context, instance)
+            self.pci_tracker.save(context)
 
-    @utils.synchronized(COMPUTE_RESOURCE_SEMAPHORE, fair=True)
     def free_pci_device_claims_for_instance(self, context, instance):
         """Free instance claimed PCI resources
 
         :param context: security context
         :param instance: instance object
         """
-        self.pci_tracker.free_instance_claims(context, instance)
-        self.pci_tracker.save(context)
+        with self._pci_lock():
+            self.pci_tracker.free_instance_claims(context, instance)
+            self.pci_tracker.save(context)
 
-    @utils.synchronized(COMPUTE_RESOURCE_SEMAPHORE, fair=True)
+    @_synchronized_node(lambda args: args['node'])
     def finish_evacuation(self, instance, node, migration):
         instance.apply_migration_context()
         # NOTE (ndipanov): This save will now update the host and node
@@ -346,6 +346,64 @@ minimum value for this is 100 records per batch.
 Related options:
 
 * instance_list_cells_batch_strategy
+* max_limit
+"""),
+    cfg.IntOpt("instance_list_cursor_expiration",
+        min=0,
+        default=0,
+        help="""
+Number of seconds the position of each cell database at the end of a page of
+an instance list is kept, to list the next page.
+
+Each page of a paginated instance list, past the first one, starts after the
+marker instance, which is the last instance of the previous page. By default,
+the API looks up the marker instance and then, in each cell database, the
+first instance which sorts after it, before listing the page. When this option
+is set, the API keeps the position of each cell database at the end of each
+page in the cache configured in the ``[cache]`` section, or in memory if it is
+disabled, and queries the next page from those positions. The first batch of
+instances requested from each cell database is also sized according to the
+share of the previous page which came from that cell database.
+
+Possible values:
+
+* 0: Look up the marker instance in each cell database for each page. This is
+  the default.
+* Any positive integer in seconds.
+
+Related options:
+
+* instance_list_cells_batch_strategy
+* ``[cache] enabled``
+"""),
+    cfg.IntOpt("list_servers_stream_batch_size",
+        min=0,
+        default=0,
+        help="""
+Number of servers rendered at once in the streamed responses of the server
+lists.
+
+By default, the ``GET /servers`` and ``GET /servers/detail`` responses are
+rendered entirely in memory and encoded as a whole before being sent. When
+this option is set, the servers of those responses are rendered and encoded
+by batches of this size while the response is written, so that only one batch
+of rendered servers is held in memory at a time. For the detailed list, the
+block device mappings, the host status and the security groups of the servers
+are looked up once per batch instead of once per response.
+
+Since the status and the headers of a streamed response are sent before its
+servers are rendered, an error while rendering a batch, for instance when
+the networking service does not respond, cuts the response short instead of
+returning an error status.
+
+Possible values:
+
+* 0: Render the server lists entirely before sending them. This is the
+  default.
+* Any positive integer.
+
+Related options:
+
 * max_limit
 """),
     cfg.BoolOpt("list_records_by_skipping_down_cells",
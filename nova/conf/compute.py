@@ -788,6 +788,11 @@ This option specifies the number of seconds between attempts to update a
 provider's inventories, aggregates and traits in the local cache of the compute
 node.
 
+Each refresh lists the providers of the tree of the compute node along with
+their generations, which change with their inventories, aggregates and traits.
+Only the providers whose generation changed since they were cached are fetched
+again.
+
 A value of zero disables cache refresh completely.
 
 The cache can be cleared manually at any time by sending SIGHUP to the compute
@@ -796,6 +801,117 @@ process, causing it to be repopulated the next time the data is accessed.
 Possible values:
 
 * Any positive integer in seconds, or zero to disable refresh.
+"""),
+    cfg.IntOpt('provider_sync_workers',
+        default=1,
+        min=1,
+        help="""
+Number of resource providers whose inventories, aggregates and traits are
+synchronized with the placement service concurrently.
+
+Each periodic update of the compute node resources first compares the whole
+provider tree reported by the virt driver with the local cache, then flushes
+the changed providers to the placement service. With the default value the
+providers are flushed one after the other. Compute services managing many
+resource providers, for example the ironic driver managing thousands of
+baremetal nodes, can use several workers to flush them concurrently. The calls
+for a given provider are always issued in order, so its generation is
+respected.
+
+Possible values:
+
+* Any positive integer. 1 flushes the providers serially.
+"""),
+    cfg.IntOpt('provider_update_interval',
+        default=0,
+        min=0,
+        help="""
+Maximum interval in seconds between two updates of the resource providers of a
+compute node in placement when nothing changed.
+
+By default the resource providers of the compute nodes are updated in placement
+each time the resource usage of the compute nodes changes, for example when an
+instance is created or deleted, and on each run of the
+``update_resources_interval`` periodic task. Each update asks the virt driver
+to rebuild the provider tree of the compute node, even though most of them
+change nothing.
+
+When this option is set, the resource providers are only updated when the
+inventory reported by the virt driver through the compute node resources
+changed, on startup, after a failed update, when the compute service receives
+SIGHUP and at least every ``provider_update_interval`` seconds. Changes only
+visible in the provider tree built by the virt driver, for example the state
+of the nodes managed by the ironic driver or the mediated devices created by
+the libvirt driver, can then take up to this interval to be reflected in
+placement.
+
+Possible values:
+
+* 0: Update the resource providers each time. This is the default.
+* Any positive integer in seconds.
+
+Related options:
+
+* ``update_resources_interval``
+"""),
+    cfg.IntOpt('usage_reconcile_interval',
+        default=0,
+        min=0,
+        help="""
+Interval in seconds between two full reconciliations of the resource usage of
+a compute node with its instances and migrations.
+
+By default, each run of the ``update_resources_interval`` periodic task loads
+all the instances and in-progress migrations of each compute node from the
+database and computes its resource usage from them again. On compute nodes
+running many instances this is a lot of database and CPU work.
+
+When this option is set, the periodic task only does this full reconciliation
+on startup, when the inventory reported by the virt driver changed, after a
+failed reconciliation and at least every ``usage_reconcile_interval`` seconds.
+In between, the resource usage of the compute node is only updated by the
+claims and the releases of resources by the instances, like when they are
+created, resized, migrated or deleted. Changes which bypass the compute
+service, for example the instances deleted while it was down, are then only
+accounted for by the next full reconciliation, which logs the difference
+between the resource usage it computed and the one tracked incrementally.
+
+Possible values:
+
+* 0: Reconcile the resource usage on each run of the periodic task. This is
+  the default.
+* Any positive integer in seconds.
+
+Related options:
+
+* ``update_resources_interval``
+"""),
+    cfg.IntOpt('resource_update_workers',
+        default=1,
+        min=1,
+        help="""
+Number of compute nodes whose resources are updated concurrently by the
+``update_available_resource`` periodic task.
+
+With the default value the resources of the compute nodes managed by the
+compute service are updated one after the other. Compute services managing
+many compute nodes, for example the ironic driver managing thousands of
+baremetal nodes, can use several workers so that a run of the periodic task
+completes within ``update_resources_interval``. Each worker moves on to the
+next compute node as soon as it is done with its current one, so a slow compute
+node does not hold up the others, and the compute nodes which were the slowest
+to update during the previous run are started first. A warning listing the
+slowest compute nodes is logged when a run takes longer than
+``update_resources_interval``.
+
+Possible values:
+
+* Any positive integer. 1 updates the compute nodes serially.
+
+Related options:
+
+* ``update_resources_interval``
+* ``[compute] provider_sync_workers``
 """),
    cfg.StrOpt('cpu_shared_set',
         help="""
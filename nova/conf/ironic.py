@@ -89,6 +89,31 @@ Related options:
              'Nodes matching the partition_key value will be distributed '
              'between all services specified here. '
              'If partition_key is unset, this option is ignored.'),
+    cfg.IntOpt(
+        'node_cache_full_refresh_interval',
+        default=0,
+        min=0,
+        help="""
+Interval in seconds between two full refreshes of the cache of the nodes
+managed by this service.
+
+By default, the cache of the nodes is refreshed by listing all the nodes from
+Ironic with all the fields used by the driver, on each run of the
+``update_resources_interval`` periodic task. When this option is set, only the
+UUID, the instance UUID and the last update time of the nodes are listed in
+between the full refreshes, and the other fields are only fetched for the
+nodes which were updated since they were cached. This reduces the load on the
+Ironic API of the compute services managing many nodes.
+
+Possible values:
+
+* 0: Refresh the whole cache each time. This is the default.
+* Any positive integer in seconds.
+
+Related options:
+
+* ``[DEFAULT] update_resources_interval``
+"""),
 ]
 
 
@@ -24,15 +24,43 @@ placement_group = cfg.OptGroup(
     title='Placement Service Options',
     help="Configuration options for connecting to the placement API service")
 
+placement_opts = [
+    cfg.IntOpt('connection_pool_size',
+        default=10,
+        min=1,
+        help="""
+Maximum number of connections to the placement service kept open for reuse.
+
+The placement client keeps the connections to the placement service open in a
+pool and reuses them for the next requests. Services issuing many concurrent
+requests to placement, for example the compute service syncing many resource
+providers with ``[compute] provider_sync_workers``, should use at least as many
+connections as concurrent requests, otherwise the connections exceeding the
+pool size are closed after each request.
+"""),
+    cfg.IntOpt('connection_keepalive',
+        default=60,
+        min=1,
+        help="""
+Number of seconds a pooled connection to the placement service stays idle
+before TCP keep-alive probes are sent on it.
+
+This keeps the idle connections of the pool open through firewalls and load
+balancers dropping idle connections, and detects the dead ones.
+"""),
+]
+
 
 def register_opts(conf):
     conf.register_group(placement_group)
+    conf.register_opts(placement_opts, group=placement_group)
     confutils.register_ksa_opts(conf, placement_group, DEFAULT_SERVICE_TYPE)
 
 
 def list_opts():
     return {
         placement_group.name: (
+            placement_opts +
             ks_loading.get_session_conf_options() +
             ks_loading.get_auth_common_conf_options() +
             ks_loading.get_auth_plugin_conf_options('password') +
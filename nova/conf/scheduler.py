@@ -62,8 +62,9 @@ Periodic task interval.
 
 This value controls how often (in seconds) to run periodic tasks in the
 scheduler. The specific tasks that are run for each period are determined by
-the particular scheduler being used. Currently there are no in-tree scheduler
-driver that use this option.
+the particular scheduler being used. The FilterScheduler uses it to refresh
+the scheduler services sharing the compute nodes when ``[scheduler]
+host_partitioning`` is enabled.
 
 If this is larger than the nova-service 'service_down_time' setting, the
 ComputeFilter (if enabled) may think the compute service is down. As each
@@ -79,6 +80,7 @@ Possible values:
 Related options:
 
 * ``nova-service service_down_time``
+* ``[scheduler] host_partitioning``
 """),
     cfg.IntOpt("max_attempts",
         default=3,
@@ -130,6 +132,28 @@ etc. of the scheduler.
 
 This option is only used by the FilterScheduler; if you use a different
 scheduler, this option has no effect.
+"""),
+    cfg.BoolOpt("compact_allocation_candidates",
+        default=False,
+        help="""
+Keep a compact representation of the allocation candidates received from the
+placement service during a scheduling operation.
+
+When enabled, the response from the placement service is made compact while
+it is decoded: the provider summaries are stored in slotted objects, and the
+identical capacities and usages, allocations, trait lists and strings are
+shared between the candidates. With 10000 compute nodes having nested
+resource providers, as measured by
+``tools/allocation-candidates-benchmark.py``, this reduces the peak memory
+used to decode the response from about 85 MB to about 36 MB, and the memory
+kept for the rest of the scheduling operation from about 84 MB to about
+31 MB. However, decoding the response takes about 1.5 to 2 times as long.
+This is worth it in deployments where the scheduler memory usage, rather than
+the scheduling latency, is the limit.
+
+Related options:
+
+* max_placement_results
 """),
     cfg.IntOpt("workers",
         min=0,
@@ -137,6 +161,40 @@ scheduler, this option has no effect.
 Number of workers for the nova-scheduler service. The default will be the
 number of CPUs available if using the "filter_scheduler" scheduler driver,
 otherwise the default will be 1.
+"""),
+    cfg.StrOpt("host_partitioning",
+        default="none",
+        choices=[
+            ("none", "Every scheduler considers all the compute nodes."),
+            ("compute", "The compute nodes are partitioned between the "
+                        "schedulers using a hash ring of their UUIDs."),
+            ("cell", "The cells are partitioned between the schedulers using "
+                     "a hash ring of their UUIDs."),
+        ],
+        help="""
+Partition the compute nodes between the nova-scheduler services.
+
+By default, every scheduler loads and keeps the state of all the compute nodes
+matching the requests it handles, so adding schedulers does not reduce the
+memory and CPU used by each of them. When partitioning is enabled, the
+scheduler services which are up are placed on a consistent hash ring and each
+scheduler only loads the state of the compute nodes of its shard. The scheduler
+handling a request asks every scheduler, including itself, for the best hosts
+of its shard, merges them by weight and claims the resources of the best ones.
+
+The weights of the hosts are normalized within each shard, so the hosts
+selected may differ slightly from the ones a single scheduler would select.
+Hosts are only selected once per request, except for the instances of server
+groups with an affinity policy which are all placed on the same host, and only
+the allocation candidates from placement are considered.
+
+All the schedulers must use the same value, and the ring is refreshed every
+``[scheduler] periodic_task_interval`` seconds. This option is only used by
+the FilterScheduler.
+
+Related options:
+
+* ``[scheduler] periodic_task_interval``
 """),
     cfg.BoolOpt("query_placement_for_routed_network_aggregates",
                 default=False,
@@ -217,6 +275,41 @@ metadata. This feature requires host support and is currently supported by the
 following compute drivers:
 
 - ``libvirt.LibvirtDriver`` (since Ussuri (21.0.0))
+"""),
+    cfg.IntOpt("trace_buffer_size",
+               default=100,
+               min=0,
+               help="""
+Number of scheduling request traces kept in memory by each scheduler.
+
+A trace records the time spent in each phase of a scheduling request: the
+request filters, the placement query, loading the host states, each filter
+and weigher, and claiming the resources. The traces of the most recent
+requests can be retrieved with the ``nova-manage scheduler trace`` command.
+Recording the traces is cheap enough to be left enabled in production.
+
+Possible values:
+
+* 0: Disables the tracing of the scheduling requests.
+* Any positive integer: The number of most recent traces to keep.
+
+Related options:
+
+* ``[scheduler] trace_histograms``
+"""),
+    cfg.BoolOpt("trace_histograms",
+                default=False,
+                help="""
+Keep histograms of the time spent in each phase of the scheduling requests.
+
+When enabled, the scheduler also keeps a histogram of the durations of every
+phase, including each filter and weigher, of all the requests traced since it
+started, which is returned by ``nova-manage scheduler trace --histograms``.
+
+Related options:
+
+* ``[scheduler] trace_buffer_size``: Must be greater than 0 for the requests to
+  be traced.
 """),
 ]
 
@@ -731,7 +824,102 @@ Possible values:
 Related options:
 
 * aggregate_image_properties_isolation_namespace
-""")]
+"""),
+    cfg.BoolOpt(
+        "host_state_cache_enabled",
+        default=False,
+        help="""
+Enable the incremental host state cache.
+
+By default the scheduler loads every compute node record from every cell and
+rebuilds the host state of each of them for every scheduling request. When
+this option is enabled, the scheduler instead keeps the compute node records
+and host states in memory and, for each cell, only loads the compute nodes
+which were created, updated or deleted since the previous poll of that cell.
+This can greatly reduce scheduling latency in large deployments.
+
+Note that compute service records are still loaded on every request since
+they are needed to determine whether a compute service is up.
+
+This option is only used by the FilterScheduler and its subclasses; if you use
+a different scheduler, this option has no effect.
+
+Related options:
+
+* host_state_cache_refresh_interval
+"""),
+    cfg.IntOpt(
+        "host_state_cache_refresh_interval",
+        default=10,
+        min=-1,
+        help="""
+Interval, in seconds, at which the host state cache is refreshed in the
+background.
+
+Refreshing the cache in the background keeps the number of compute nodes
+which have to be loaded while handling a scheduling request small.
+
+Possible values:
+
+* A positive integer, where the integer corresponds to the refresh interval
+  in seconds.
+* 0 to use the default periodic task interval (60 seconds).
+* -1 to disable background refreshing. The cache is then only refreshed
+  when handling scheduling requests.
+
+Related options:
+
+* host_state_cache_enabled
+"""),
+    cfg.IntOpt(
+        "claim_concurrency",
+        default=1,
+        min=1,
+        help="""
+Maximum number of concurrent resource claims for a multi-create request.
+
+When set to a value greater than 1, the scheduler first selects a host for
+each instance of a multi-create request and then claims the resources of all
+the instances in the placement service concurrently, using at most this
+number of concurrent requests. Only the instances whose claims failed are
+filtered and weighed again, against the remaining hosts.
+
+Requests for instances in a server group are always scheduled and claimed
+one instance at a time.
+
+Possible values:
+
+* An integer, where the integer corresponds to the maximum number of
+  concurrent claims. 1 claims the resources of one instance at a time.
+"""),
+    cfg.IntOpt(
+        "filter_results_cache_size",
+        default=0,
+        min=0,
+        help="""
+Number of distinct requests for which the results of the static filters are
+cached.
+
+Static filters are the filters whose result for a host only depends on the
+host, its aggregates, and the flavor extra specs and image properties of the
+request: ``ImagePropertiesFilter``, ``ComputeCapabilitiesFilter``,
+``AggregateInstanceExtraSpecsFilter`` and
+``AggregateImagePropertiesIsolation``. Their results are cached per host for
+each combination of flavor extra specs and image properties. For requests
+sharing a flavor and an image, the static filters then only run against the
+hosts updated since the previous request.
+
+The cached results of a host are discarded when the host is updated, and all
+the cached results are discarded when an aggregate is updated or deleted.
+
+Possible values:
+
+* 0 to disable the cache.
+* A positive integer, where the integer corresponds to the number of
+  combinations of flavor extra specs and image properties for which the
+  results are cached. The least recently used results are discarded first.
+"""),
+]
 
 metrics_group = cfg.OptGroup(name="metrics",
                              title="Metrics parameters",
@@ -50,6 +50,46 @@ Related Options:
 
 * report_interval (service_down_time should not be less than report_interval)
 * scheduler.periodic_task_interval
+"""),
+    cfg.IntOpt('cell_circuit_failure_threshold',
+               default=0,
+               min=0,
+               help="""
+Number of consecutive failed calls to a cell after which the calls to the cell
+are stopped.
+
+The services calling all the cells in parallel, for example to list the
+instances or to count the quota usage, wait for the slowest cell to respond,
+up to a timeout. When the database of a cell is unreachable or very slow, each
+of these calls waits for the whole timeout. When this option is set, a cell
+which timed out or failed with an unexpected error this many times in a row
+is no longer called, and is handled as a cell which did not respond, until a
+single probe call made every ``cell_circuit_retry_interval`` seconds
+succeeds.
+
+The number of failures, the state of the calls and the distribution of the
+latencies of each cell are reported in the Guru Meditation Report of the
+service.
+
+Possible values:
+
+* 0: Always call all the cells. This is the default.
+* Any positive integer.
+
+Related Options:
+
+* cell_circuit_retry_interval
+"""),
+    cfg.IntOpt('cell_circuit_retry_interval',
+               default=30,
+               min=1,
+               help="""
+Interval in seconds between two probe calls to a cell which is no longer
+called because it failed too many times in a row.
+
+Related Options:
+
+* cell_circuit_failure_threshold
 """),
     cfg.BoolOpt('periodic_enable',
                default=True,
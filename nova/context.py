@@ -19,6 +19,7 @@
 
 from contextlib import contextmanager
 import copy
+import time
 
 import eventlet.queue
 import eventlet.timeout
@@ -29,6 +30,7 @@ from oslo_db.sqlalchemy import enginefacade
 from oslo_log import log as logging
 from oslo_utils import timeutils
 
+from nova import cell_health
 from nova import exception
 from nova.i18n import _
 from nova import objects
@@ -409,26 +411,37 @@ def scatter_gather_cells(context, cell_mappings, timeout, fn, *args, **kwargs):
     :param kwargs: The kwargs for the function to call for each cell
     :returns: A dict {cell_uuid: result} containing the joined results. The
               did_not_respond_sentinel will be returned if a cell did not
-              respond within the timeout. The exception object will
+              respond within the timeout, or was not called because its
+              circuit is open, see nova.cell_health. The exception object will
               be returned if the call to a cell raised an exception. The
               exception will be logged.
     """
     greenthreads = []
     queue = eventlet.queue.LightQueue()
     results = {}
+    skipped = []
+    start = time.monotonic()
 
     def gather_result(cell_uuid, fn, *args, **kwargs):
+        failed = False
         try:
             result = fn(*args, **kwargs)
         except Exception as e:
             # Only log the exception traceback for non-nova exceptions.
             if not isinstance(e, exception.NovaException):
                 LOG.exception('Error gathering result from cell %s', cell_uuid)
+                # The nova exceptions are expected errors, like a record not
+                # found, rather than a sign that the cell is unhealthy.
+                failed = True
             result = e.__class__(e.args)
+        cell_health.record_call(cell_uuid, time.monotonic() - start, failed)
         # The queue is already synchronized.
         queue.put((cell_uuid, result))
 
     for cell_mapping in cell_mappings:
+        if not cell_health.allow_call(cell_mapping.uuid):
+            skipped.append(cell_mapping.uuid)
+            continue
         with target_cell(context, cell_mapping) as cctxt:
             greenthreads.append((cell_mapping.uuid,
                                  utils.spawn(gather_result, cell_mapping.uuid,
@@ -449,11 +462,16 @@ def scatter_gather_cells(context, cell_mappings, timeout, fn, *args, **kwargs):
         if cell_uuid not in results:
             greenthread.kill()
             results[cell_uuid] = did_not_respond_sentinel
+            cell_health.record_call(cell_uuid, time.monotonic() - start, True)
             LOG.warning('Timed out waiting for response from cell %s',
                         cell_uuid)
         else:
             greenthread.wait()
 
+    for cell_uuid in skipped:
+        results[cell_uuid] = did_not_respond_sentinel
+        LOG.debug('Not calling cell %s whose circuit is open', cell_uuid)
+
     return results
 
 
@@ -596,15 +596,18 @@ def instance_get_all_by_filters(context, filters, sort_key='created_at',
 
 def instance_get_all_by_filters_sort(context, filters, limit=None,
                                      marker=None, columns_to_join=None,
-                                     sort_keys=None, sort_dirs=None):
+                                     sort_keys=None, sort_dirs=None,
+                                     columns=None):
     """Get all instances that match all filters sorted by multiple keys.
 
-    sort_keys and sort_dirs must be a list of strings.
+    sort_keys and sort_dirs must be a list of strings. If columns is a list
+    of strings, only those columns of the instances are loaded, in addition
+    to the uuid, the sort keys and the joined columns.
     """
     return IMPL.instance_get_all_by_filters_sort(
         context, filters, limit=limit, marker=marker,
         columns_to_join=columns_to_join, sort_keys=sort_keys,
-        sort_dirs=sort_dirs)
+        sort_dirs=sort_dirs, columns=columns)
 
 
 def instance_get_by_sort_filters(context, sort_keys, sort_dirs, values):
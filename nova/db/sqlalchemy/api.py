@@ -44,6 +44,7 @@ from sqlalchemy import MetaData
 from sqlalchemy import or_
 from sqlalchemy.orm import aliased
 from sqlalchemy.orm import joinedload
+from sqlalchemy.orm import load_only
 from sqlalchemy.orm import noload
 from sqlalchemy.orm import subqueryload
 from sqlalchemy.orm import undefer
@@ -1288,7 +1289,8 @@ def _build_instance_get(context, columns_to_join=None):
     return query.order_by(models.Instance.id)
 
 
-def _instances_fill_metadata(context, instances, manual_joins=None):
+def _instances_fill_metadata(context, instances, manual_joins=None,
+                             columns=None):
     """Selectively fill instances with manually-joined metadata. Note that
     instance will be converted to a dict.
 
@@ -1297,6 +1299,9 @@ def _instances_fill_metadata(context, instances, manual_joins=None):
     :param manual_joins: list of tables to manually join (can be any
                          combination of 'metadata' and 'system_metadata' or
                          None to take the default of both)
+    :param columns: list of the keys of the instances to convert, if they
+                    were queried with only some of their columns loaded, or
+                    None to convert all of them
     """
     uuids = [inst['uuid'] for inst in instances]
 
@@ -1326,7 +1331,12 @@ def _instances_fill_metadata(context, instances, manual_joins=None):
 
     filled_instances = []
     for inst in instances:
-        inst = dict(inst)
+        if columns is not None:
+            # Converting the whole instance would load the deferred columns
+            # one instance at a time.
+            inst = {column: inst[column] for column in columns}
+        else:
+            inst = dict(inst)
         inst['system_metadata'] = sys_meta[inst['uuid']]
         inst['metadata'] = meta[inst['uuid']]
         if 'pci_devices' in manual_joins:
@@ -1430,7 +1440,7 @@ def _get_query_nova_resource_by_changes_time(query, filters, model_object):
 @pick_context_manager_reader_allow_async
 def instance_get_all_by_filters_sort(context, filters, limit=None, marker=None,
                                      columns_to_join=None, sort_keys=None,
-                                     sort_dirs=None):
+                                     sort_dirs=None, columns=None):
     """Return instances that match all filters sorted by the given keys.
     Deleted instances will be returned by default, unless there's a filter that
     says otherwise.
@@ -1492,6 +1502,11 @@ def instance_get_all_by_filters_sort(context, filters, limit=None, marker=None,
     |        'not-tags-any: [some-not-any-tag, some-another-not-any-tag]
     |    }
 
+    The columns of the instances table to load can be restricted by passing
+    a list of column names as ``columns``. The uuid and the sort keys are
+    always loaded, as well as the joined columns, and the other columns are
+    left out of the returned instances.
+
     """
     # NOTE(mriedem): If the limit is 0 there is no point in even going
     # to the database since nothing is going to be returned anyway.
@@ -1516,6 +1531,14 @@ def instance_get_all_by_filters_sort(context, filters, limit=None, marker=None,
         else:
             query_prefix = query_prefix.options(joinedload(column))
 
+    if columns is not None:
+        columns = list(collections.OrderedDict.fromkeys(
+            ['uuid'] + list(columns) + sort_keys))
+        query_prefix = query_prefix.options(load_only(*columns))
+        # Keep the joined columns along with the loaded ones.
+        columns.extend(collections.OrderedDict.fromkeys(
+            column.split('.')[0] for column in columns_to_join_new))
+
     # Note: order_by is done in the sqlalchemy.utils.py paginate_query(),
     # no need to do it here as well
 
@@ -1646,7 +1669,8 @@ def instance_get_all_by_filters_sort(context, filters, limit=None, marker=None,
     except db_exc.InvalidSortKey:
         raise exception.InvalidSortKey()
 
-    return _instances_fill_metadata(context, query_prefix.all(), manual_joins)
+    return _instances_fill_metadata(context, query_prefix.all(), manual_joins,
+                                    columns=columns)
 
 
 @require_context
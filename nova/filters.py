@@ -17,9 +17,12 @@
 Filter support
 """
 
+import time
+
 from oslo_log import log as logging
 
 from nova import loadables
+from nova import trace as nova_trace
 
 LOG = logging.getLogger(__name__)
 
@@ -77,15 +80,21 @@ class BaseFilterHandler(loadables.BaseLoader):
         part_filter_results = []
         full_filter_results = []
         log_msg = "%(cls_name)s: (start: %(start)s, end: %(end)s)"
+        trace = nova_trace.current()
         for filter_ in filters:
             if filter_.run_filter_for_index(index):
                 cls_name = filter_.__class__.__name__
                 start_count = len(list_objs)
+                if trace is not None:
+                    start = time.monotonic()
                 objs = filter_.filter_all(list_objs, spec_obj)
                 if objs is None:
                     LOG.debug("Filter %s says to stop filtering", cls_name)
                     return
                 list_objs = list(objs)
+                if trace is not None:
+                    trace.record('filter:' + cls_name,
+                                 time.monotonic() - start)
                 end_count = len(list_objs)
                 part_filter_results.append(log_msg % {"cls_name": cls_name,
                         "start": start_count, "end": end_count})
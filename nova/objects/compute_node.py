@@ -494,6 +494,38 @@ class ComputeNodeList(base.ObjectListBase, base.NovaObject):
         return base.obj_make_list(context, cls(context), objects.ComputeNode,
                                   db_computes)
 
+    @staticmethod
+    @db.select_db_reader_mode
+    def _db_compute_node_get_all_changed_since(context, changes_since,
+                                               use_slave=False):
+        # NOTE: Soft-deleting a compute node does not bump updated_at so
+        # we also need to look at deleted_at, and a freshly created record
+        # only has created_at set.
+        db_computes = sa_api.model_query(
+            context, models.ComputeNode, read_deleted='yes').filter(
+            or_(models.ComputeNode.updated_at >= changes_since,
+                models.ComputeNode.created_at >= changes_since,
+                models.ComputeNode.deleted_at >= changes_since)).all()
+        return db_computes
+
+    @classmethod
+    def get_all_changed_since(cls, context, changes_since, use_slave=False):
+        """Return ComputeNode records created, updated or deleted since a time.
+
+        Unlike the other query methods, this also returns soft-deleted
+        records so that callers caching compute nodes can evict them.
+
+        :param context: nova auth request context
+        :param changes_since: naive UTC datetime; only records with a
+            created_at, updated_at or deleted_at value at or after this time
+            are returned
+        :param use_slave: whether to read from the slave database connection
+        """
+        db_computes = cls._db_compute_node_get_all_changed_since(
+            context, changes_since, use_slave=use_slave)
+        return base.obj_make_list(context, cls(context), objects.ComputeNode,
+                                  db_computes)
+
 
 def _get_node_empty_ratio(context, max_count):
     """Query the DB for non-deleted compute_nodes with 0.0/None alloc ratios
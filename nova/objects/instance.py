@@ -380,6 +380,10 @@ class Instance(base.NovaPersistentObject, base.NovaObject,
         for field in instance.fields:
             if field in INSTANCE_OPTIONAL_ATTRS:
                 continue
+            elif field not in db_inst:
+                # The instance was queried with only some of its columns, see
+                # InstanceList.get_by_filters().
+                continue
             elif field == 'deleted':
                 instance.deleted = db_inst['deleted'] == db_inst['id']
             elif field == 'cleaned':
@@ -1284,7 +1288,8 @@ class InstanceList(base.ObjectListBase, base.NovaObject):
     # Version 2.4: Add get_counts()
     # Version 2.5: Add get_uuids_by_host_and_node()
     # Version 2.6: Add get_uuids_by_hosts()
-    VERSION = '2.6'
+    # Version 2.7: Add columns to get_by_filters()
+    VERSION = '2.7'
 
     fields = {
         'objects': fields.ListOfObjectsField('Instance'),
@@ -1295,12 +1300,14 @@ class InstanceList(base.ObjectListBase, base.NovaObject):
     def _get_by_filters_impl(cls, context, filters,
                        sort_key='created_at', sort_dir='desc', limit=None,
                        marker=None, expected_attrs=None, use_slave=False,
-                       sort_keys=None, sort_dirs=None):
-        if sort_keys or sort_dirs:
+                       sort_keys=None, sort_dirs=None, columns=None):
+        if sort_keys or sort_dirs or columns is not None:
+            if not (sort_keys or sort_dirs):
+                sort_keys, sort_dirs = [sort_key], [sort_dir]
             db_inst_list = db.instance_get_all_by_filters_sort(
                 context, filters, limit=limit, marker=marker,
                 columns_to_join=_expected_cols(expected_attrs),
-                sort_keys=sort_keys, sort_dirs=sort_dirs)
+                sort_keys=sort_keys, sort_dirs=sort_dirs, columns=columns)
         else:
             db_inst_list = db.instance_get_all_by_filters(
                 context, filters, sort_key, sort_dir, limit=limit,
@@ -1311,11 +1318,19 @@ class InstanceList(base.ObjectListBase, base.NovaObject):
     def get_by_filters(cls, context, filters,
                        sort_key='created_at', sort_dir='desc', limit=None,
                        marker=None, expected_attrs=None, use_slave=False,
-                       sort_keys=None, sort_dirs=None):
+                       sort_keys=None, sort_dirs=None, columns=None):
+        """Returns the instances matching the filters.
+
+        :param columns: An optional list of the columns of the instances to
+            load. The uuid and the sort keys are always loaded, the other
+            fields of the instances are left unset, and accessing them raises
+            ObjectActionError unless they are lazy-loadable.
+        """
         db_inst_list = cls._get_by_filters_impl(
             context, filters, sort_key=sort_key, sort_dir=sort_dir,
             limit=limit, marker=marker, expected_attrs=expected_attrs,
-            use_slave=use_slave, sort_keys=sort_keys, sort_dirs=sort_dirs)
+            use_slave=use_slave, sort_keys=sort_keys, sort_dirs=sort_dirs,
+            columns=columns)
         # NOTE(melwitt): _make_instance_list could result in joined objects'
         # (from expected_attrs) _from_db_object methods being called during
         # Instance._from_db_object, each of which might choose to perform
@@ -401,7 +401,8 @@ class PciDevTracker(object):
     def clean_usage(self, instances, migrations):
         """Remove all usages for instances not passed in the parameter.
 
-        The caller should hold the COMPUTE_RESOURCE_SEMAPHORE lock
+        The caller should hold the locks of the nodes of the resource tracker
+        using the PCI devices
         """
         existed = set(inst['uuid'] for inst in instances)
         existed |= set(mig['instance_uuid'] for mig in migrations)
@@ -14,18 +14,23 @@
 #    under the License.
 
 import collections
+import collections.abc
 import contextlib
 import copy
 import functools
 import random
+import socket
+import threading
 import time
 import typing as ty
 
 from keystoneauth1 import exceptions as ks_exc
+from keystoneauth1 import session as ks_session
 import os_resource_classes as orc
 import os_traits
 from oslo_log import log as logging
 from oslo_middleware import request_id
+from oslo_serialization import jsonutils
 from oslo_utils import excutils
 from oslo_utils import versionutils
 import retrying
@@ -58,6 +63,163 @@ ProviderAllocInfo = collections.namedtuple(
     'ProviderAllocInfo', ['allocations'])
 
 
+class ProviderResource(collections.abc.Mapping):
+    """Capacity and usage of a resource class on a resource provider, as
+    found in the provider summaries of GET /allocation_candidates.
+
+    Read-only mapping, like the dict it replaces.
+    """
+
+    __slots__ = ('capacity', 'used')
+
+    def __init__(self, capacity, used):
+        self.capacity = capacity
+        self.used = used
+
+    def __getitem__(self, key):
+        if key not in self.__slots__:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __iter__(self):
+        return iter(self.__slots__)
+
+    def __len__(self):
+        return len(self.__slots__)
+
+    def to_dict(self):
+        return {'capacity': self.capacity, 'used': self.used}
+
+    def __eq__(self, other):
+        if isinstance(other, collections.abc.Mapping):
+            return self.to_dict() == (
+                other.to_dict() if isinstance(other, type(self))
+                else other)
+        return NotImplemented
+
+    def __repr__(self):
+        return 'ProviderResource(%r)' % self.to_dict()
+
+
+class ProviderSummary(collections.abc.Mapping):
+    """Summary of a resource provider involved in allocation candidates.
+
+    Read-only mapping, like the dict it replaces.
+    """
+
+    __slots__ = ('resources', 'traits', 'parent_provider_uuid',
+                 'root_provider_uuid')
+
+    def __init__(self, resources, traits, parent_provider_uuid,
+                 root_provider_uuid):
+        # Dict, keyed by resource class, of ProviderResource
+        self.resources = resources
+        self.traits = traits
+        self.parent_provider_uuid = parent_provider_uuid
+        self.root_provider_uuid = root_provider_uuid
+
+    def __getitem__(self, key):
+        if key not in self.__slots__:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __iter__(self):
+        return iter(self.__slots__)
+
+    def __len__(self):
+        return len(self.__slots__)
+
+    def to_dict(self):
+        return {
+            'resources': {rc: res.to_dict()
+                          for rc, res in self.resources.items()},
+            'traits': list(self.traits),
+            'parent_provider_uuid': self.parent_provider_uuid,
+            'root_provider_uuid': self.root_provider_uuid,
+        }
+
+    def __eq__(self, other):
+        if isinstance(other, collections.abc.Mapping):
+            return self.to_dict() == (
+                other.to_dict() if isinstance(other, type(self))
+                else other)
+        return NotImplemented
+
+    def __repr__(self):
+        return 'ProviderSummary(%r)' % self.to_dict()
+
+
+def _compact_object_hook():
+    """Returns an object_hook for the JSON decoder which makes the objects of
+    a GET /allocation_candidates response compact as soon as they are
+    decoded, see decode_allocation_candidates().
+
+    The decoder calls the hook with the innermost objects first, so the
+    capacities and usages are shared before the provider summaries holding
+    them are built, and the allocations before the allocation requests.
+    """
+    # The JSON decoder already shares the identical keys, not the values.
+    strings = {}
+    intern = strings.setdefault
+    resources_by_usage = {}
+    allocations_by_amounts = {}
+    lists = {}
+
+    def hook(obj):
+        if 'capacity' in obj:
+            # The capacity and usage of a resource class in a summary.
+            usage = (obj['capacity'], obj['used'])
+            shared = resources_by_usage.get(usage)
+            if shared is None:
+                shared = resources_by_usage[usage] = ProviderResource(*usage)
+            return shared
+        if 'resources' in obj:
+            if len(obj) == 1:
+                # An allocation against a resource provider.
+                amounts = tuple(obj['resources'].items())
+                return allocations_by_amounts.setdefault(amounts, obj)
+            if 'traits' in obj:
+                parent = obj['parent_provider_uuid']
+                root = obj['root_provider_uuid']
+                return ProviderSummary(
+                    obj['resources'],
+                    tuple(intern(trait, trait) for trait in obj['traits']),
+                    intern(parent, parent) if parent is not None else None,
+                    intern(root, root))
+        elif 'mappings' in obj:
+            for group, rp_uuids in obj['mappings'].items():
+                rp_uuids = tuple(intern(rp_uuid, rp_uuid)
+                                 for rp_uuid in rp_uuids)
+                shared = lists.get(rp_uuids)
+                if shared is None:
+                    shared = lists[rp_uuids] = list(rp_uuids)
+                obj['mappings'][group] = shared
+        return obj
+    return hook
+
+
+def decode_allocation_candidates(text):
+    """Decodes the body of a GET /allocation_candidates response into a
+    compact representation:
+
+    * provider summaries become ProviderSummary objects, and their
+      capacity and usage per resource class become shared ProviderResource
+      objects;
+    * the identical allocations of resources found in most allocation
+      requests are shared between them;
+    * the provider UUIDs, resource classes and traits are deduplicated.
+
+    The objects are made compact while the response is decoded, so the
+    plain decoded response is never held in memory as a whole. The objects
+    are recognized by their keys, as returned by the placement microversion
+    get_allocation_candidates() requests.
+
+    The objects making up the allocation requests are shared, so they must
+    be copied before being modified, as claim_resources() does.
+    """
+    return jsonutils.loads(text, object_hook=_compact_object_hook())
+
+
 def warn_limit(self, msg):
     if self._warn_count:
         self._warn_count -= 1
@@ -164,6 +326,63 @@ def get_placement_request_id(response):
         return response.headers.get(request_id.HTTP_RESP_HEADER_REQUEST_ID)
 
 
+class _PooledKeepAliveAdapter(ks_session.TCPKeepAliveAdapter):
+    """Pools the connections to placement and sends TCP keep-alive probes on
+    them once idle for CONF.placement.connection_keepalive seconds.
+    """
+
+    def __init__(self, keepalive, **kwargs):
+        self.keepalive = keepalive
+        super(_PooledKeepAliveAdapter, self).__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        if 'socket_options' not in kwargs:
+            socket_options = [
+                (socket.IPPROTO_TCP, socket.TCP_NODELAY, 1),
+                (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1),
+            ]
+            # Not all the platforms support tuning the keep-alive probes.
+            if hasattr(socket, 'TCP_KEEPIDLE'):
+                socket_options.append(
+                    (socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, self.keepalive))
+            if hasattr(socket, 'TCP_KEEPINTVL'):
+                socket_options.append(
+                    (socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, 15))
+            if hasattr(socket, 'TCP_KEEPCNT'):
+                socket_options.append(
+                    (socket.IPPROTO_TCP, socket.TCP_KEEPCNT, 4))
+            kwargs['socket_options'] = socket_options
+        super(_PooledKeepAliveAdapter, self).init_poolmanager(*args, **kwargs)
+
+
+class _InFlightRequest(object):
+    """A GET request being sent to placement, which the identical requests
+    issued meanwhile wait for rather than sending it again.
+    """
+
+    def __init__(self, write_count, global_request_id):
+        # The number of write requests completed when the request was sent.
+        self.write_count = write_count
+        self.global_request_id = global_request_id
+        self.response = None
+        self.error = None
+        self._done = threading.Event()
+
+    def finish(self, response=None, error=None):
+        self.response = response
+        self.error = error
+        self._done.set()
+
+    def wait(self):
+        """Waits for the response of the request and returns a copy of it,
+        or raises a copy of its error, so that each caller gets its own.
+        """
+        self._done.wait()
+        if self.error is not None:
+            raise copy.copy(self.error)
+        return copy.copy(self.response)
+
+
 # TODO(mriedem): Consider making SchedulerReportClient a global singleton so
 # that things like the compute API do not have to lazy-load it. That would
 # likely require inspecting methods that use a ProviderTree cache to see if
@@ -187,6 +406,15 @@ class SchedulerReportClient(object):
         self._client = self._create_client()
         # NOTE(danms): Keep track of how naggy we've been
         self._warn_count = 0
+        # The number of placement API calls issued, keyed by HTTP method
+        self._call_counts = collections.Counter()
+        # The number of write requests which returned
+        self._completed_writes = 0
+        # The GET requests being sent, keyed by URL and microversion, and the
+        # number of identical GET requests which waited for them instead
+        self._in_flight_gets = {}
+        self._in_flight_lock = threading.Lock()
+        self._coalesced_count = 0
 
     def clear_provider_cache(self, init=False):
         if not init:
@@ -227,35 +455,104 @@ class SchedulerReportClient(object):
         """Create the HTTP session accessing the placement service."""
         # Flush provider tree and associations so we start from a clean slate.
         self.clear_provider_cache(init=True)
-        client = self._adapter or utils.get_sdk_adapter('placement')
+        client = self._adapter
+        if client is None:
+            client = utils.get_sdk_adapter('placement')
+            # Replace the default connection pools of the session.
+            adapter = _PooledKeepAliveAdapter(
+                CONF.placement.connection_keepalive,
+                pool_maxsize=CONF.placement.connection_pool_size)
+            for scheme in ('https://', 'http://'):
+                client.session.session.mount(scheme, adapter)
         # Set accept header on every request to ensure we notify placement
         # service of our response body media type preferences.
         client.additional_headers = {'accept': 'application/json'}
         return client
 
     def get(self, url, version=None, global_request_id=None):
-        return self._client.get(url, microversion=version,
-                                global_request_id=global_request_id)
+        """Sends a GET request to placement, unless an identical one is
+        already in flight, in which case its response is returned instead.
+
+        A GET request only waits for a request sent after the last write
+        request returned, so that the callers see their own writes.
+        """
+        key = (url, version)
+        with self._in_flight_lock:
+            in_flight = self._in_flight_gets.get(key)
+            if (in_flight is not None and
+                    in_flight.write_count == self._completed_writes):
+                self._coalesced_count += 1
+            else:
+                in_flight = None
+                request = self._in_flight_gets[key] = _InFlightRequest(
+                    self._completed_writes, global_request_id)
+        if in_flight is not None:
+            try:
+                response = in_flight.wait()
+            except Exception as exc:
+                with excutils.save_and_reraise_exception():
+                    self._log_coalesced(url, global_request_id, in_flight,
+                                        getattr(exc, 'request_id', None))
+            self._log_coalesced(url, global_request_id, in_flight,
+                                get_placement_request_id(response))
+            return response
+
+        self._call_counts['GET'] += 1
+        try:
+            response = self._client.get(url, microversion=version,
+                                        global_request_id=global_request_id)
+        except Exception as exc:
+            with excutils.save_and_reraise_exception():
+                request.finish(error=exc)
+        else:
+            request.finish(response=response)
+        finally:
+            with self._in_flight_lock:
+                if self._in_flight_gets.get(key) is request:
+                    del self._in_flight_gets[key]
+        return response
+
+    @staticmethod
+    def _log_coalesced(url, global_request_id, in_flight, placement_req_id):
+        LOG.debug('GET %(url)s for request %(global_request_id)s was served '
+                  'by the identical placement request %(placement_req_id)s '
+                  'sent for request %(sender)s.',
+                  {'url': url, 'global_request_id': global_request_id,
+                   'placement_req_id': placement_req_id,
+                   'sender': in_flight.global_request_id})
+
+    @contextlib.contextmanager
+    def _write(self, method):
+        self._call_counts[method] += 1
+        try:
+            yield
+        finally:
+            # The write may have been applied even if it failed.
+            with self._in_flight_lock:
+                self._completed_writes += 1
 
     def post(self, url, data, version=None, global_request_id=None):
         # NOTE(sdague): using json= instead of data= sets the
         # media type to application/json for us. Placement API is
         # more sensitive to this than other APIs in the OpenStack
         # ecosystem.
-        return self._client.post(url, json=data, microversion=version,
-                                 global_request_id=global_request_id)
+        with self._write('POST'):
+            return self._client.post(url, json=data, microversion=version,
+                                     global_request_id=global_request_id)
 
     def put(self, url, data, version=None, global_request_id=None):
         # NOTE(sdague): using json= instead of data= sets the
         # media type to application/json for us. Placement API is
         # more sensitive to this than other APIs in the OpenStack
         # ecosystem.
-        return self._client.put(url, json=data, microversion=version,
-                                global_request_id=global_request_id)
+        with self._write('PUT'):
+            return self._client.put(url, json=data, microversion=version,
+                                    global_request_id=global_request_id)
 
     def delete(self, url, version=None, global_request_id=None):
-        return self._client.delete(url, microversion=version,
-                                   global_request_id=global_request_id)
+        with self._write('DELETE'):
+            return self._client.delete(url, microversion=version,
+                                       global_request_id=global_request_id)
 
     @safe_connect
     def get_allocation_candidates(self, context, resources):
@@ -268,9 +565,15 @@ class SchedulerReportClient(object):
         the requested resource constraints.
 
         The provider summaries is a dict, keyed by resource provider UUID, of
-        inventory and capacity information and traits for any resource
+        the inventory and capacity information and traits of any resource
         provider involved in the allocation_requests.
 
+        If [scheduler]/compact_allocation_candidates is True, the response is
+        decoded with decode_allocation_candidates(): the provider summaries
+        are ProviderSummary objects and the allocation_requests share the
+        objects they are made of, so they must be copied before being
+        modified.
+
         :returns: A tuple with a list of allocation_request dicts, a dict of
                   provider information, and the microversion used to request
                   this data from placement, or (None, None, None) if the
@@ -298,7 +601,10 @@ class SchedulerReportClient(object):
         resp = self.get(url, version=version,
                         global_request_id=context.global_id)
         if resp.status_code == 200:
-            data = resp.json()
+            if CONF.scheduler.compact_allocation_candidates:
+                data = decode_allocation_candidates(resp.text)
+            else:
+                data = resp.json()
             return (data['allocation_requests'], data['provider_summaries'],
                     version)
 
@@ -630,6 +936,7 @@ class SchedulerReportClient(object):
         # - "Cascading generations" - i.e. a change to a leaf node percolates
         #   generation bump up the tree so that we bounce 409 the next time we
         #   try to update anything and have to refresh.
+        generations = {}
         if (self._provider_tree.exists(uuid) and
                 not self._associations_stale(uuid)):
             uuids_to_refresh = [
@@ -656,15 +963,33 @@ class SchedulerReportClient(object):
                 # But do mark it as having just been "refreshed".
                 self._association_refresh_time[uuid] = time.time()
 
+            # The generation of a provider changes with its inventories,
+            # aggregates and traits, so those of the providers whose
+            # generation did not change are still valid. Keep them, since
+            # populate_from_iterable replaces the providers in the cache.
+            unchanged = [
+                self._provider_tree.data(rp['uuid'])
+                for rp in rps_to_refresh
+                if self._is_generation_unchanged(rp['uuid'], rp['generation'])]
+
             self._provider_tree.populate_from_iterable(
                 rps_to_refresh or [created_rp])
 
+            for pd in unchanged:
+                self._provider_tree.update_inventory(
+                    pd.uuid, pd.inventory, generation=pd.generation)
+                self._provider_tree.update_aggregates(pd.uuid, pd.aggregates)
+                self._provider_tree.update_traits(pd.uuid, pd.traits)
+            generations = {pd.uuid: pd.generation for pd in unchanged}
+
             uuids_to_refresh = [rp['uuid'] for rp in rps_to_refresh]
 
         # At this point, the whole tree exists in the local cache.
 
         for uuid_to_refresh in uuids_to_refresh:
-            self._refresh_associations(context, uuid_to_refresh, force=True)
+            self._refresh_associations(
+                context, uuid_to_refresh, force=True,
+                generation=generations.get(uuid_to_refresh))
 
         return uuid
 
@@ -732,7 +1057,7 @@ class SchedulerReportClient(object):
         return curr
 
     def _refresh_associations(self, context, rp_uuid, force=False,
-                              refresh_sharing=True):
+                              refresh_sharing=True, generation=None):
         """Refresh inventories, aggregates, traits, and (optionally) aggregate-
         associated sharing providers for the specified resource provider uuid.
 
@@ -748,6 +1073,11 @@ class SchedulerReportClient(object):
                                 by aggregate with the specified provider,
                                 including their inventories, traits, and
                                 aggregates (but not *their* sharing providers).
+        :param generation: The generation of the provider in placement, if
+                           known. If the associations of the provider were
+                           already cached with this generation, they have not
+                           changed and are not fetched again; only the sharing
+                           providers are refreshed.
         :raise: On various placement API errors, one of:
                 - ResourceProviderAggregateRetrievalFailed
                 - ResourceProviderTraitRetrievalFailed
@@ -756,34 +1086,13 @@ class SchedulerReportClient(object):
                 communication fails.
         """
         if force or self._associations_stale(rp_uuid):
-            # Refresh inventories
-            msg = "Refreshing inventories for resource provider %s"
-            LOG.debug(msg, rp_uuid)
-            self._refresh_and_get_inventory(context, rp_uuid)
-            # Refresh aggregates
-            agg_info = self._get_provider_aggregates(context, rp_uuid)
-            # If @safe_connect makes the above return None, this will raise
-            # TypeError. Good.
-            aggs, generation = agg_info.aggregates, agg_info.generation
-            msg = ("Refreshing aggregate associations for resource provider "
-                   "%s, aggregates: %s")
-            LOG.debug(msg, rp_uuid, ','.join(aggs or ['None']))
-
-            # NOTE(efried): This will blow up if called for a RP that doesn't
-            # exist in our _provider_tree.
-            self._provider_tree.update_aggregates(
-                rp_uuid, aggs, generation=generation)
-
-            # Refresh traits
-            trait_info = self.get_provider_traits(context, rp_uuid)
-            traits, generation = trait_info.traits, trait_info.generation
-            msg = ("Refreshing trait associations for resource provider %s, "
-                   "traits: %s")
-            LOG.debug(msg, rp_uuid, ','.join(traits or ['None']))
-            # NOTE(efried): This will blow up if called for a RP that doesn't
-            # exist in our _provider_tree.
-            self._provider_tree.update_traits(
-                rp_uuid, traits, generation=generation)
+            if self._is_generation_unchanged(rp_uuid, generation):
+                LOG.debug("Generation %s of resource provider %s has not "
+                          "changed, skipping the refresh of its inventories, "
+                          "aggregates and traits", generation, rp_uuid)
+                aggs = self._provider_tree.data(rp_uuid).aggregates
+            else:
+                aggs = self._refresh_provider_associations(context, rp_uuid)
 
             if refresh_sharing:
                 # Refresh providers associated by aggregate
@@ -798,14 +1107,64 @@ class SchedulerReportClient(object):
                             generation=rp['generation'])
                     # Now we have to (populate or) refresh that provider's
                     # traits, aggregates, and inventories (but not *its*
-                    # aggregate-associated providers). No need to override
-                    # force=True for newly-added providers - the missing
-                    # timestamp will always trigger them to refresh.
+                    # aggregate-associated providers), unless its generation
+                    # did not change. No need to override force=True for
+                    # newly-added providers - the missing timestamp will
+                    # always trigger them to refresh.
                     self._refresh_associations(context, rp['uuid'],
                                                force=force,
-                                               refresh_sharing=False)
+                                               refresh_sharing=False,
+                                               generation=rp['generation'])
             self._association_refresh_time[rp_uuid] = time.time()
 
+    def _refresh_provider_associations(self, context, rp_uuid):
+        """Fetch the inventories, aggregates and traits of the specified
+        resource provider into the cache.
+
+        :returns: The aggregates of the provider.
+        """
+        # Refresh inventories
+        msg = "Refreshing inventories for resource provider %s"
+        LOG.debug(msg, rp_uuid)
+        self._refresh_and_get_inventory(context, rp_uuid)
+        # Refresh aggregates
+        agg_info = self._get_provider_aggregates(context, rp_uuid)
+        # If @safe_connect makes the above return None, this will raise
+        # TypeError. Good.
+        aggs, generation = agg_info.aggregates, agg_info.generation
+        msg = ("Refreshing aggregate associations for resource provider "
+               "%s, aggregates: %s")
+        LOG.debug(msg, rp_uuid, ','.join(aggs or ['None']))
+
+        # NOTE(efried): This will blow up if called for a RP that doesn't
+        # exist in our _provider_tree.
+        self._provider_tree.update_aggregates(
+            rp_uuid, aggs, generation=generation)
+
+        # Refresh traits
+        trait_info = self.get_provider_traits(context, rp_uuid)
+        traits, generation = trait_info.traits, trait_info.generation
+        msg = ("Refreshing trait associations for resource provider %s, "
+               "traits: %s")
+        LOG.debug(msg, rp_uuid, ','.join(traits or ['None']))
+        # NOTE(efried): This will blow up if called for a RP that doesn't
+        # exist in our _provider_tree.
+        self._provider_tree.update_traits(
+            rp_uuid, traits, generation=generation)
+        return aggs
+
+    def _is_generation_unchanged(self, rp_uuid, generation):
+        """Respond True if the associations of the provider were cached with
+        the specified generation, i.e. they did not change since.
+        """
+        if generation is None or not self._association_refresh_time.get(
+                rp_uuid):
+            return False
+        try:
+            return self._provider_tree.data(rp_uuid).generation == generation
+        except ValueError:
+            return False
+
     def _associations_stale(self, uuid):
         """Respond True if aggregates and traits have not been refreshed
         "recently".
@@ -1306,6 +1665,39 @@ class SchedulerReportClient(object):
         :raises: keystoneauth1.exceptions.base.ClientException on failure to
                  communicate with the placement API
         """
+        start = time.monotonic()
+        calls_before = collections.Counter(self._call_counts)
+        coalesced_before = self._coalesced_count
+        flushed = None
+        try:
+            flushed = self._update_from_provider_tree(
+                context, new_tree, allocations)
+        finally:
+            calls = self._call_counts - calls_before
+            failed = flushed is None
+            summary = {
+                'result': 'Failed to sync' if failed else 'Synced',
+                'flushed': 0 if failed else flushed,
+                'total': len(new_tree.get_provider_uuids()),
+                'elapsed': time.monotonic() - start,
+                'count': sum(calls.values()),
+                'calls': ', '.join('%s: %d' % (method, count)
+                                   for method, count in sorted(calls.items())),
+                'coalesced': self._coalesced_count - coalesced_before,
+                'workers': CONF.compute.provider_sync_workers,
+            }
+            log = LOG.info if calls else LOG.debug
+            log('%(result)s %(flushed)d of %(total)d resource providers with '
+                'placement in %(elapsed).3f seconds, issuing %(count)d calls '
+                '(%(calls)s) and coalescing %(coalesced)d with %(workers)d '
+                'workers.', summary)
+
+    def _update_from_provider_tree(self, context, new_tree, allocations):
+        """Implements update_from_provider_tree.
+
+        :returns: The number of providers whose inventories, aggregates or
+                  traits were flushed.
+        """
         # NOTE(efried): We currently do not handle the "rename" case.  This is
         # where new_tree contains a provider named Y whose UUID already exists
         # but is named X.
@@ -1412,19 +1804,22 @@ class SchedulerReportClient(object):
                 self._delete_provider(uuid)
 
         # At this point the local cache should have all the same providers as
-        # new_tree.  Whether we added them or not, walk through and diff/flush
-        # inventories, traits, and aggregates as necessary. Note that, if we
-        # reshaped above, any inventory changes have already been done. But the
-        # helper methods are set up to check and short out when the relevant
-        # property does not differ from what's in the cache.
+        # new_tree.  Whether we added them or not, diff the whole tree against
+        # the cache and flush inventories, traits, and aggregates of the
+        # providers which changed. Note that, if we reshaped above, any
+        # inventory changes have already been done.
         # If we encounter any error and remove a provider from the cache, all
         # its descendants are also removed, and set_*_for_provider methods on
         # it wouldn't be able to get started. Walking the tree in bottom-up
         # order ensures we at least try to process all of the providers. (We
         # get the UUIDs in bottom-up order by reversing new_uuids, which was
         # given to us in top-down order per ProviderTree.get_provider_uuids().)
-        for uuid in reversed(new_uuids):
-            pd = new_tree.data(uuid)
+        to_flush = collections.deque(
+            pd for pd in (new_tree.data(uuid) for uuid in reversed(new_uuids))
+            if self._has_provider_changed(pd))
+        num_flushed = len(to_flush)
+
+        def flush(pd):
             with catch_all(pd.uuid):
                 self.set_inventory_for_provider(
                     context, pd.uuid, pd.inventory)
@@ -1432,6 +1827,50 @@ class SchedulerReportClient(object):
                     context, pd.uuid, pd.aggregates)
                 self.set_traits_for_provider(context, pd.uuid, pd.traits)
 
+        workers = min(CONF.compute.provider_sync_workers, num_flushed)
+        if workers <= 1:
+            while to_flush:
+                flush(to_flush.popleft())
+            return num_flushed
+
+        # The calls for a provider are issued in order by a single worker, so
+        # each of them is made with the generation returned by the previous
+        # one. The providers are independent from each other in placement.
+        errors = []
+
+        def worker():
+            # Stop picking up providers on the first error, as the serial
+            # flush does.
+            while to_flush and not errors:
+                try:
+                    flush(to_flush.popleft())
+                except Exception as exc:
+                    errors.append(exc)
+
+        for thread in [utils.spawn(worker) for _ in range(workers)]:
+            thread.wait()
+        if errors:
+            # Other workers may have failed afterwards because the failing
+            # provider's tree was cleared from the cache; the first error is
+            # the one to report.
+            raise errors[0]
+        return num_flushed
+
+    def _has_provider_changed(self, pd):
+        """Returns whether the inventory, aggregates or traits of the provider
+        data pd differ from those in the cache.
+        """
+        try:
+            return (
+                self._provider_tree.has_inventory_changed(
+                    pd.uuid, pd.inventory) or
+                self._provider_tree.have_aggregates_changed(
+                    pd.uuid, pd.aggregates) or
+                self._provider_tree.have_traits_changed(pd.uuid, pd.traits))
+        except ValueError:
+            # Not in the cache; let the set_*_for_provider methods handle it.
+            return True
+
     # TODO(efried): Cut users of this method over to get_allocs_for_consumer
     def get_allocations_for_consumer(self, context, consumer):
         """Legacy method for allocation retrieval.
@@ -2119,6 +2558,71 @@ class SchedulerReportClient(object):
             raise exception.AllocationDeleteFailed(consumer_uuid=uuid,
                                                    error=r.text)
 
+    @safe_connect
+    def delete_allocations_for_instances(self, context, uuids):
+        """Delete the allocations of several instances from placement at once
+
+        The consumer generation of each instance is read, then the empty
+        allocations of all the instances are posted in a single request, which
+        placement applies atomically.
+
+        :param context: The security context
+        :param uuids: the UUIDs of the instances which will be used as the
+                      consumer UUIDs towards placement
+        :return: Returns the list of the UUIDs of the instances whose
+                 allocations were deleted by this call, skipping those which
+                 do not have allocations.
+        :raises AllocationDeleteFailed: If the allocations cannot be read from
+                placement or any of them is changed by another process while
+                we tried to delete them. None of the allocations is deleted
+                then.
+        """
+        payload = {}
+        for uuid in uuids:
+            r = self.get('/allocations/%s' % uuid,
+                         global_request_id=context.global_id,
+                         version=CONSUMER_GENERATION_VERSION)
+            if not r:
+                LOG.warning('Unable to delete allocation for instance '
+                            '%(uuid)s. Got %(code)i while retrieving existing '
+                            'allocations: (%(text)s)',
+                            {'uuid': uuid,
+                             'code': r.status_code,
+                             'text': r.text})
+                raise exception.AllocationDeleteFailed(consumer_uuid=uuid,
+                                                       error=r.text)
+            allocations = r.json()
+            if allocations['allocations'] == {}:
+                LOG.debug('Cannot delete allocation for %s consumer in '
+                          'placement as consumer does not exist', uuid)
+                continue
+            # removing all resources from the allocation will auto delete the
+            # consumer in placement
+            payload[uuid] = {
+                'allocations': {},
+                'project_id': allocations['project_id'],
+                'user_id': allocations['user_id'],
+                'consumer_generation': allocations['consumer_generation'],
+            }
+
+        if not payload:
+            return []
+
+        r = self.post('/allocations', payload,
+                      global_request_id=context.global_id,
+                      version=CONSUMER_GENERATION_VERSION)
+        consumer_uuids = ', '.join(payload)
+        if r.status_code != 204:
+            LOG.warning('Unable to delete allocations for instances '
+                        '%(uuids)s: (%(code)i %(text)s)',
+                        {'uuids': consumer_uuids,
+                         'code': r.status_code,
+                         'text': r.text})
+            raise exception.AllocationDeleteFailed(
+                consumer_uuid=consumer_uuids, error=r.text)
+        LOG.info('Deleted allocations for instances %s', consumer_uuids)
+        return list(payload)
+
     def get_allocations_for_resource_provider(self, context, rp_uuid):
         """Retrieves the allocations for a specific provider.
 
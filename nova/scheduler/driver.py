@@ -65,3 +65,16 @@ class Scheduler(metaclass=abc.ABCMeta):
         by the scheduler driver, one for each requested instance.
         """
         return []
+
+    def select_shard_candidates(self, context, spec_obj, compute_uuids,
+            limit):
+        """Returns the best hosts of the shard of this scheduler, as a dict
+        with the Selection objects representing the hosts and their raw
+        weights as 'candidates', and the ranges of the raw weights of each
+        weigher as 'ranges'.
+
+        Only scheduler drivers supporting the partitioning of the compute
+        nodes between the schedulers need to implement this, the others have
+        no hosts to offer.
+        """
+        return {'ranges': [], 'candidates': []}
@@ -19,9 +19,16 @@ You can customize this scheduler by specifying your own Host Filters and
 Weighing Functions.
 """
 
+import collections
+import itertools
+import logging as py_logging
+import operator
 import random
 
+import eventlet
 from oslo_log import log as logging
+import oslo_messaging as messaging
+from oslo_serialization import jsonutils
 
 from nova.compute import utils as compute_utils
 import nova.conf
@@ -30,20 +37,88 @@ from nova.i18n import _
 from nova import objects
 from nova.objects import fields as fields_obj
 from nova import rpc
+from nova import trace as nova_trace
 from nova.scheduler.client import report
 from nova.scheduler import driver
+from nova.scheduler import rpcapi as scheduler_rpcapi
+from nova.scheduler import sharding
 from nova.scheduler import utils
+from nova import weights
 
 CONF = nova.conf.CONF
 LOG = logging.getLogger(__name__)
 
 
+class _SortedHosts(collections.abc.Sequence):
+    """The HostState objects returned by _get_sorted_hosts().
+
+    The hosts are only pulled from the sorted iterator as they are accessed,
+    so that the hosts which are never reached by the claims or the
+    alternates aren't sorted at all.
+
+    :param sorted_hosts: An iterator over the sorted HostState objects.
+    :param filtered_hosts: The same HostState objects, in no particular
+                           order, which is enough to filter them again.
+    """
+
+    def __init__(self, sorted_hosts, filtered_hosts):
+        self._sorted_hosts = iter(sorted_hosts)
+        self._hosts = []
+        self.filtered_hosts = filtered_hosts
+
+    def _pull(self, count=None):
+        """Pulls hosts from the iterator until count hosts are available, or
+        all of them if count is None.
+        """
+        needed = None if count is None else count - len(self._hosts)
+        if needed is None or needed > 0:
+            self._hosts.extend(itertools.islice(self._sorted_hosts, needed))
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            stop = index.stop
+            if (stop is None or stop < 0 or (index.start or 0) < 0 or
+                    (index.step or 1) < 0):
+                stop = None
+        else:
+            stop = index + 1 if index >= 0 else None
+        self._pull(stop)
+        return self._hosts[index]
+
+    def __iter__(self):
+        for index in itertools.count():
+            if index >= len(self._hosts):
+                self._pull(index + 1)
+                if index >= len(self._hosts):
+                    return
+            yield self._hosts[index]
+
+    def __len__(self):
+        return len(self.filtered_hosts)
+
+    def __bool__(self):
+        return bool(self.filtered_hosts)
+
+    def __repr__(self):
+        return repr(list(self))
+
+
 class FilterScheduler(driver.Scheduler):
     """Scheduler that can be used for filtering and weighing."""
     def __init__(self, *args, **kwargs):
         super(FilterScheduler, self).__init__(*args, **kwargs)
         self.notifier = rpc.get_notifier('scheduler')
         self.placement_client = report.SchedulerReportClient()
+        self.shards = None
+        if CONF.scheduler.host_partitioning != 'none':
+            self.shards = sharding.SchedulerShards(
+                CONF.scheduler.host_partitioning, CONF.host)
+            self.scheduler_rpcapi = scheduler_rpcapi.SchedulerAPI()
+
+    def run_periodic_tasks(self, context):
+        if self.shards is not None:
+            self.shards.update_hosts(
+                self.hosts_up(context, scheduler_rpcapi.RPC_TOPIC))
 
     def select_destinations(self, context, spec_obj, instance_uuids,
             alloc_reqs_by_rp_uuid, provider_summaries,
@@ -139,6 +214,28 @@ class FilterScheduler(driver.Scheduler):
         """
         elevated = context.elevated()
 
+        if (self.shards is not None and instance_uuids and
+                self.USES_ALLOCATION_CANDIDATES and
+                alloc_reqs_by_rp_uuid is not None):
+            # During an upgrade, the other schedulers may not be able to
+            # return the best hosts of their shards yet, in which case this
+            # scheduler falls back to consider all the compute nodes itself.
+            if self.scheduler_rpcapi.supports_select_shard_candidates(
+                    elevated):
+                try:
+                    return self._schedule_sharded(elevated, spec_obj,
+                        instance_uuids, provider_summaries,
+                        alloc_reqs_by_rp_uuid, allocation_request_version,
+                        return_alternates)
+                except messaging.UnsupportedVersion as exc:
+                    LOG.warning('Unable to get the best hosts of the other '
+                                'shards, scheduling against all the compute '
+                                'nodes instead: %s', exc)
+            else:
+                LOG.debug('The scheduler RPC API version cap does not allow '
+                          'to get the best hosts of the other shards, '
+                          'scheduling against all the compute nodes instead.')
+
         # Find our local list of acceptable hosts by repeatedly
         # filtering and weighing our options. Each time we choose a
         # host, we virtually consume resources on it so subsequent
@@ -147,8 +244,9 @@ class FilterScheduler(driver.Scheduler):
         # Note: remember, we are using a generator-iterator here. So only
         # traverse this list once. This can bite you if the hosts
         # are being scanned in a filter or weighing function.
-        hosts = self._get_all_host_states(elevated, spec_obj,
-            provider_summaries)
+        with nova_trace.phase('host_states'):
+            hosts = self._get_all_host_states(elevated, spec_obj,
+                provider_summaries)
 
         # NOTE(sbauza): The RequestSpec.num_instances field contains the number
         # of instances created when the RequestSpec was used to first boot some
@@ -185,6 +283,22 @@ class FilterScheduler(driver.Scheduler):
                                            hosts, num_alts,
                                            instance_uuids=instance_uuids)
 
+        if (CONF.filter_scheduler.claim_concurrency > 1 and
+                len(instance_uuids) > 1 and
+                spec_obj.instance_group is None):
+            # NOTE: Server groups are excluded since the (anti-)affinity
+            # filters rely on the hosts of the previous instances of the
+            # request, which are only known once their claims succeeded.
+            claimed_instance_uuids, claimed_hosts, hosts, num = (
+                self._schedule_and_claim_in_batch(elevated, spec_obj,
+                    instance_uuids, hosts, alloc_reqs_by_rp_uuid,
+                    allocation_request_version))
+            self._ensure_sufficient_hosts(context, claimed_hosts,
+                    num_instances, claimed_instance_uuids)
+            return self._get_alternate_hosts(
+                claimed_hosts, spec_obj, hosts, num, num_alts,
+                alloc_reqs_by_rp_uuid, allocation_request_version)
+
         # A list of the instance UUIDs that were successfully claimed against
         # in the placement API. If we are not able to successfully claim for
         # all involved instances, we use this list to remove those allocations
@@ -235,9 +349,12 @@ class FilterScheduler(driver.Scheduler):
                 # information in the provider summaries, we'll just try to
                 # claim resources using the first allocation_request
                 alloc_req = alloc_reqs[0]
-                if utils.claim_resources(elevated, self.placement_client,
-                        spec_obj, instance_uuid, alloc_req,
-                        allocation_request_version=allocation_request_version):
+                with nova_trace.phase('claims'):
+                    claimed = utils.claim_resources(elevated,
+                        self.placement_client, spec_obj, instance_uuid,
+                        alloc_req,
+                        allocation_request_version=allocation_request_version)
+                if claimed:
                     claimed_host = host
                     break
 
@@ -270,6 +387,369 @@ class FilterScheduler(driver.Scheduler):
             alloc_reqs_by_rp_uuid, allocation_request_version)
         return selections_to_return
 
+    def _schedule_sharded(self, context, spec_obj, instance_uuids,
+            provider_summaries, alloc_reqs_by_rp_uuid,
+            allocation_request_version, return_alternates):
+        """Returns a list of lists of Selection objects like _schedule(), when
+        the compute nodes are partitioned between the schedulers.
+
+        The best hosts of every shard are merged by weight, then the
+        resources of each instance are claimed against the best host with
+        enough resources left once the claims of the previous instances of
+        the request are consumed, or against the host of the first instance
+        for server groups with the affinity policy. The hosts which were
+        selected for fewer instances of the request are tried first, since
+        the weights of the hosts are not computed again, except for server
+        groups with the soft-affinity policy which try the host of the first
+        instance, then the hosts selected for more instances first.
+
+        :raises: messaging.UnsupportedVersion if another scheduler is not
+                 able to return the best hosts of its shard.
+        """
+        num_instances = len(instance_uuids)
+        num_alts = (CONF.scheduler.max_attempts - 1
+                    if return_alternates else 0)
+        with nova_trace.phase('shard_candidates'):
+            candidates = self._get_shard_candidates(context, spec_obj,
+                list(provider_summaries),
+                num_instances + CONF.scheduler.max_attempts)
+        candidates = [candidate for candidate in candidates
+                      if candidate.compute_node_uuid in alloc_reqs_by_rp_uuid]
+
+        group = (spec_obj.instance_group if 'instance_group' in spec_obj
+                 else None)
+        policy = group.policy if group is not None else None
+        max_server_per_host = 1
+        if policy == 'anti-affinity' and group.rules:
+            max_server_per_host = int(group.rules.get('max_server_per_host',
+                                                      1))
+        # The resources claimed for the instances of the request, keyed by
+        # resource provider UUID, then by resource class.
+        consumed = collections.defaultdict(collections.Counter)
+
+        def _has_room(candidate):
+            alloc_req = alloc_reqs_by_rp_uuid[candidate.compute_node_uuid][0]
+            for rp_uuid, alloc in alloc_req['allocations'].items():
+                summary = provider_summaries.get(rp_uuid) or {}
+                resources = summary.get('resources') or {}
+                for rc, amount in alloc.get('resources', {}).items():
+                    resource = resources.get(rc)
+                    if resource is None:
+                        continue
+                    if (resource['used'] + consumed[rp_uuid][rc] + amount >
+                            resource['capacity']):
+                        return False
+            return True
+
+        def _consume(candidate):
+            alloc_req = alloc_reqs_by_rp_uuid[candidate.compute_node_uuid][0]
+            for rp_uuid, alloc in alloc_req['allocations'].items():
+                consumed[rp_uuid].update(alloc.get('resources', {}))
+            # Like _consume_selected_host(), add the selected host to the
+            # server group for the next instances of the request.
+            if group is not None:
+                group.hosts.append(candidate.service_host)
+                # hosts has to be not part of the updates when saving
+                group.obj_reset_changes(['hosts'])
+
+        def _passes_group(candidate):
+            # The anti-affinity filter of the shards only accounted for the
+            # members of the group which existed before the request.
+            return (policy != 'anti-affinity' or
+                    group.hosts.count(candidate.service_host) <
+                    max_server_per_host)
+
+        claimed_instance_uuids = []
+        claimed = []
+        # The number of instances of the request claimed against each host,
+        # keyed by compute node UUID.
+        num_claimed = collections.Counter()
+        failed = set()
+        for instance_uuid in instance_uuids:
+            if policy == 'affinity' and claimed:
+                choices = claimed[:1]
+            elif policy == 'soft-affinity' and claimed:
+                choices = [candidate for candidate in candidates
+                           if candidate.compute_node_uuid not in failed and
+                           _has_room(candidate)]
+                # The sorts are stable, so the hosts selected for as many
+                # instances are still sorted by weight, and the host of the
+                # first instance comes first while it has room left.
+                choices.sort(key=lambda candidate: -num_claimed[
+                    candidate.compute_node_uuid])
+                choices.sort(key=lambda candidate: (
+                    candidate.compute_node_uuid !=
+                    claimed[0].compute_node_uuid))
+            else:
+                choices = [candidate for candidate in candidates
+                           if candidate.compute_node_uuid not in failed and
+                           _passes_group(candidate) and _has_room(candidate)]
+                # The sort is stable, so the hosts selected for as many
+                # instances are still sorted by weight.
+                choices.sort(key=lambda candidate: num_claimed[
+                    candidate.compute_node_uuid])
+                # Like _get_sorted_hosts(), randomize the first host among the
+                # best ones.
+                subset = choices[:CONF.filter_scheduler.host_subset_size]
+                if subset:
+                    chosen = random.choice(subset)
+                    choices.remove(chosen)
+                    choices.insert(0, chosen)
+
+            selected = None
+            for candidate in choices:
+                alloc_req = alloc_reqs_by_rp_uuid[
+                    candidate.compute_node_uuid][0]
+                with nova_trace.phase('claims'):
+                    claimed_resources = utils.claim_resources(context,
+                        self.placement_client, spec_obj, instance_uuid,
+                        alloc_req,
+                        allocation_request_version=allocation_request_version)
+                if claimed_resources:
+                    selected = candidate
+                    break
+                failed.add(candidate.compute_node_uuid)
+
+            if selected is None:
+                LOG.debug("Unable to successfully claim against any host.")
+                break
+            _consume(selected)
+            claimed_instance_uuids.append(instance_uuid)
+            claimed.append(selected)
+            num_claimed[selected.compute_node_uuid] += 1
+
+        if len(claimed) < num_instances:
+            self._cleanup_allocations(context, claimed_instance_uuids)
+            LOG.debug('There are %(hosts)d hosts available but '
+                      '%(required_count)d instances requested to build.',
+                      {'hosts': len(claimed),
+                       'required_count': num_instances})
+            reason = _('There are not enough hosts available.')
+            raise exception.NoValidHost(reason=reason)
+
+        selections_to_return = []
+        for selected in claimed:
+            selected_plus_alts = [self._get_shard_selection(selected,
+                alloc_reqs_by_rp_uuid, allocation_request_version)]
+            # Like _get_alternate_hosts(), the alternates are the best
+            # unclaimed hosts from the same cell.
+            for candidate in candidates:
+                if len(selected_plus_alts) >= num_alts + 1:
+                    break
+                if (candidate.cell_uuid == selected.cell_uuid and
+                        candidate.compute_node_uuid not in num_claimed):
+                    selected_plus_alts.append(self._get_shard_selection(
+                        candidate, alloc_reqs_by_rp_uuid,
+                        allocation_request_version))
+            selections_to_return.append(selected_plus_alts)
+        return selections_to_return
+
+    def _get_shard_candidates(self, context, spec_obj, compute_uuids, limit):
+        """Returns the best limit hosts of each shard as Selection objects,
+        sorted by descending weight.
+
+        The weights normalized by each shard are only meaningful within the
+        shard, so the raw weights of the hosts of all the shards are
+        normalized together again before sorting them.
+        """
+        def _get_candidates(host):
+            if host is None:
+                return self.select_shard_candidates(context, spec_obj,
+                                                    compute_uuids, limit)
+            try:
+                return self.scheduler_rpcapi.select_shard_candidates(
+                    context, host, spec_obj, compute_uuids, limit)
+            except messaging.UnsupportedVersion:
+                raise
+            except messaging.MessagingException as exc:
+                # The hosts of the shard are only lost for this request, the
+                # ring is rebuilt without the scheduler once it is down.
+                LOG.warning('Unable to get the best hosts of the shard of '
+                            'the scheduler %(host)s: %(error)s',
+                            {'host': host, 'error': exc})
+                return {'ranges': [], 'candidates': []}
+
+        peers = self.shards.get_peers()
+        pool = eventlet.GreenPool(size=len(peers) + 1)
+        results = [result for result in pool.imap(
+                       nova_trace.propagate(_get_candidates), [None] + peers)
+                   if result['candidates']]
+        ranges = weights.merge_ranges(
+            [result['ranges'] for result in results])
+        candidates_by_uuid = {}
+        for result in results:
+            for candidate in result['candidates']:
+                weight = weights.combine_weights(candidate['raw_weights'],
+                    candidate['multipliers'], ranges)
+                # A compute node may be in two shards while the schedulers
+                # don't agree on the scheduler services which are up.
+                uuid = candidate['selection'].compute_node_uuid
+                if (uuid not in candidates_by_uuid or
+                        candidates_by_uuid[uuid][0] < weight):
+                    candidates_by_uuid[uuid] = (weight,
+                                                candidate['selection'])
+        candidates = sorted(candidates_by_uuid.values(),
+                            key=operator.itemgetter(0), reverse=True)
+        return [selection for weight, selection in candidates]
+
+    @staticmethod
+    def _get_shard_selection(candidate, alloc_reqs_by_rp_uuid,
+                             allocation_request_version):
+        selection = candidate.obj_clone()
+        # TODO(jaypipes): Loop through all allocation_requests instead of just
+        # trying the first one.
+        selection.allocation_request = jsonutils.dumps(
+            alloc_reqs_by_rp_uuid[candidate.compute_node_uuid][0])
+        selection.allocation_request_version = allocation_request_version
+        return selection
+
+    def select_shard_candidates(self, context, spec_obj, compute_uuids,
+            limit):
+        """Returns the best limit hosts of the shard of this scheduler among
+        the compute nodes with the given UUIDs.
+
+        The hosts are returned as a list of dicts, sorted by descending
+        weight, with the Selection object of each host, and its raw weight
+        and weight multiplier for each weigher, so that the hosts of all the
+        shards can be normalized together. The ranges of the raw weights of
+        each weigher over the hosts of the shard are returned along with it.
+        """
+        elevated = context.elevated()
+        with nova_trace.phase('host_states'):
+            hosts = self.host_manager.get_host_states_by_uuids(elevated,
+                compute_uuids, spec_obj, shards=self.shards)
+        filtered_hosts = self.host_manager.get_filtered_hosts(hosts,
+                                                              spec_obj)
+        if not filtered_hosts:
+            return {'ranges': [], 'candidates': []}
+        ranges = []
+        weighed_hosts = self.host_manager.get_weighed_hosts(filtered_hosts,
+            spec_obj, limit=limit, ranges=ranges)
+        candidates = [{'raw_weights': weighed_host.raw_weights,
+                       'multipliers': weighed_host.multipliers,
+                       'selection': objects.Selection.from_host_state(
+                           weighed_host.obj)}
+                      for weighed_host in itertools.islice(weighed_hosts,
+                                                           limit)]
+        return {'ranges': ranges, 'candidates': candidates}
+
+    def _schedule_and_claim_in_batch(self, context, spec_obj, instance_uuids,
+            hosts, alloc_reqs_by_rp_uuid, allocation_request_version):
+        """Selects a host for each instance and then claims the resources of
+        all the instances concurrently in the placement API.
+
+        Hosts are selected like in _schedule(), except that the resources of
+        an instance are only consumed locally before selecting the host of
+        the next instance. The instances whose claims failed are then
+        scheduled again against the remaining hosts, excluding the hosts
+        their claims failed against.
+
+        :returns: A tuple of the list of the UUIDs of the instances whose
+                  resources were claimed, the list of the hosts they were
+                  claimed against, the last list of sorted hosts and the index
+                  it was sorted with.
+        """
+        claimed_hosts_by_uuid = {}
+        pending_uuids = list(instance_uuids)
+        num = 0
+        index = 0
+        while pending_uuids:
+            selected = []
+            for instance_uuid in pending_uuids:
+                # See the comment in _schedule() about updating the
+                # instance_uuid of the request spec.
+                spec_obj.instance_uuid = instance_uuid
+                spec_obj.obj_reset_changes(['instance_uuid'])
+
+                index = num
+                hosts = self._get_sorted_hosts(spec_obj, hosts, index)
+                num += 1
+                selected_host = None
+                for host in hosts:
+                    if host.uuid in alloc_reqs_by_rp_uuid:
+                        selected_host = host
+                        break
+                    LOG.debug("A host state with uuid = '%s' that did not "
+                              "have a matching allocation_request was "
+                              "encountered while scheduling. This host was "
+                              "skipped.", host.uuid)
+                if selected_host is None:
+                    break
+                selected.append((instance_uuid, selected_host))
+                self._consume_selected_host(selected_host, spec_obj,
+                                            instance_uuid=instance_uuid)
+
+            if not selected:
+                LOG.debug("Unable to find a host for the remaining instances.")
+                break
+
+            with nova_trace.phase('claims'):
+                results = self._claim_resources_concurrently(context,
+                    spec_obj, selected, alloc_reqs_by_rp_uuid,
+                    allocation_request_version)
+
+            failed_uuids = []
+            failed_hosts = set()
+            errors = []
+            for (instance_uuid, host), result in zip(selected, results):
+                if isinstance(result, Exception):
+                    errors.append(result)
+                elif result:
+                    claimed_hosts_by_uuid[instance_uuid] = host
+                else:
+                    failed_uuids.append(instance_uuid)
+                    failed_hosts.add(host)
+
+            if errors:
+                # Don't leak the allocations of the instances whose claims
+                # succeeded.
+                self._cleanup_allocations(context,
+                                          list(claimed_hosts_by_uuid))
+                raise errors[0]
+
+            if len(selected) < len(pending_uuids) or not failed_uuids:
+                # Either all the pending instances were claimed or some of
+                # them could not be matched to any host, in which case the
+                # request will fail anyway.
+                break
+
+            LOG.debug("Unable to claim resources for instances %(uuids)s, "
+                      "scheduling them again.", {'uuids': failed_uuids})
+            pending_uuids = failed_uuids
+            hosts = [host for host in hosts if host not in failed_hosts]
+
+        # Keep the order of the instances of the request.
+        claimed_instance_uuids = [instance_uuid
+                                  for instance_uuid in instance_uuids
+                                  if instance_uuid in claimed_hosts_by_uuid]
+        claimed_hosts = [claimed_hosts_by_uuid[instance_uuid]
+                         for instance_uuid in claimed_instance_uuids]
+        return claimed_instance_uuids, claimed_hosts, hosts, index
+
+    def _claim_resources_concurrently(self, context, spec_obj, selected,
+            alloc_reqs_by_rp_uuid, allocation_request_version):
+        """Claims the resources of each (instance_uuid, host) tuple of
+        selected in the placement API, using at most
+        CONF.filter_scheduler.claim_concurrency concurrent claims.
+
+        :returns: A list with, for each tuple of selected, the result of
+                  utils.claim_resources() or the exception it raised.
+        """
+        def _claim(instance_uuid, host):
+            # TODO(jaypipes): Loop through all allocation_requests instead
+            # of just trying the first one.
+            alloc_req = alloc_reqs_by_rp_uuid[host.uuid][0]
+            try:
+                return utils.claim_resources(context, self.placement_client,
+                        spec_obj, instance_uuid, alloc_req,
+                        allocation_request_version=allocation_request_version)
+            except Exception as exc:
+                return exc
+
+        pool = eventlet.GreenPool(
+            size=CONF.filter_scheduler.claim_concurrency)
+        return list(pool.starmap(nova_trace.propagate(_claim), selected))
+
     def _ensure_sufficient_hosts(self, context, hosts, required_count,
             claimed_uuids=None):
         """Checks that we have selected a host for each requested instance. If
@@ -435,44 +915,63 @@ class FilterScheduler(driver.Scheduler):
         """Returns a list of HostState objects that match the required
         scheduling constraints for the request spec object and have been sorted
         according to the weighers.
+
+        The list is a _SortedHosts sequence, on which the hosts past the ones
+        which may be claimed against or returned as alternates are only
+        sorted once they are reached.
         """
-        filtered_hosts = self.host_manager.get_filtered_hosts(host_states,
-            spec_obj, index)
+        if isinstance(host_states, _SortedHosts):
+            # The order of the hosts to filter doesn't matter, so don't sort
+            # the hosts which weren't reached since they were last sorted.
+            host_states = host_states.filtered_hosts
+        filtered_hosts = list(self.host_manager.get_filtered_hosts(
+            host_states, spec_obj, index))
 
         LOG.debug("Filtered %(hosts)s", {'hosts': filtered_hosts})
 
         if not filtered_hosts:
             return []
 
+        # Only the hosts which may be claimed against or returned as
+        # alternates need to be sorted up front, the others are only sorted
+        # if the claims get past them.
         weighed_hosts = self.host_manager.get_weighed_hosts(filtered_hosts,
-            spec_obj)
+            spec_obj, limit=(CONF.filter_scheduler.host_subset_size +
+                             CONF.scheduler.max_attempts))
+        weighed_hosts = iter(weighed_hosts)
         if CONF.filter_scheduler.shuffle_best_same_weighed_hosts:
             # NOTE(pas-ha) Randomize best hosts, relying on weighed_hosts
             # being already sorted by weight in descending order.
             # This decreases possible contention and rescheduling attempts
             # when there is a large number of hosts having the same best
             # weight, especially so when host_subset_size is 1 (default)
-            best_hosts = [w for w in weighed_hosts
-                          if w.weight == weighed_hosts[0].weight]
+            best_hosts = []
+            for weighed_host in weighed_hosts:
+                if best_hosts and weighed_host.weight != best_hosts[0].weight:
+                    weighed_hosts = itertools.chain([weighed_host],
+                                                    weighed_hosts)
+                    break
+                best_hosts.append(weighed_host)
             random.shuffle(best_hosts)
-            weighed_hosts = best_hosts + weighed_hosts[len(best_hosts):]
-        # Log the weighed hosts before stripping off the wrapper class so that
-        # the weight value gets logged.
-        LOG.debug("Weighed %(hosts)s", {'hosts': weighed_hosts})
+            weighed_hosts = itertools.chain(best_hosts, weighed_hosts)
+        if LOG.isEnabledFor(py_logging.DEBUG):
+            # Log the weighed hosts before stripping off the wrapper class so
+            # that the weight value gets logged.
+            weighed_hosts = list(weighed_hosts)
+            LOG.debug("Weighed %(hosts)s", {'hosts': weighed_hosts})
         # Strip off the WeighedHost wrapper class...
-        weighed_hosts = [h.obj for h in weighed_hosts]
+        weighed_hosts = _SortedHosts((h.obj for h in weighed_hosts),
+                                     filtered_hosts)
 
         # We randomize the first element in the returned list to alleviate
         # congestion where the same host is consistently selected among
         # numerous potential hosts for similar request specs.
         host_subset_size = CONF.filter_scheduler.host_subset_size
-        if host_subset_size < len(weighed_hosts):
-            weighed_subset = weighed_hosts[0:host_subset_size]
-        else:
-            weighed_subset = weighed_hosts
-        chosen_host = random.choice(weighed_subset)
-        weighed_hosts.remove(chosen_host)
-        return [chosen_host] + weighed_hosts
+        chosen_host = random.choice(weighed_hosts[0:host_subset_size])
+        return _SortedHosts(itertools.chain([chosen_host],
+                                            (host for host in weighed_hosts
+                                             if host is not chosen_host)),
+                            filtered_hosts)
 
     def _get_all_host_states(self, context, spec_obj, provider_summaries):
         """Template method, so a subclass can implement caching."""
@@ -30,6 +30,39 @@ class BaseHostFilter(filters.BaseFilter):
     # existing compute node, etc.
     RUN_ON_REBUILD = False
 
+    # Set to True in a subclass if the filter should be evaluated once for
+    # all the hosts through host_passes_all() rather than once per host. This
+    # lets a filter compute the request-specific parts of its decision only
+    # once, or share a decision between hosts in the same aggregates.
+    BULK_FILTER = False
+
+    # Set to True in a subclass if the result of the filter for a host only
+    # depends on the HostState, its aggregates, and the flavor extra specs
+    # and image properties of the request. The HostManager can then cache
+    # the results of the filter between requests, see
+    # [filter_scheduler]/filter_results_cache_size.
+    CACHEABLE = False
+
+    def filter_all(self, filter_obj_list, spec_obj):
+        """Yield HostStates that pass the filter.
+
+        Filters setting BULK_FILTER are evaluated for all the hosts at once
+        through host_passes_all(), other filters are evaluated for each host
+        through _filter_one().
+        """
+        if not self.BULK_FILTER:
+            return super(BaseHostFilter, self).filter_all(filter_obj_list,
+                                                          spec_obj)
+        # Do this here so we don't get scheduler.filters.utils
+        from nova.scheduler import utils
+        host_states = list(filter_obj_list)
+        if not self.RUN_ON_REBUILD and utils.request_is_rebuild(spec_obj):
+            # If we don't filter, default to passing all the hosts.
+            return host_states
+        mask = self.host_passes_all(host_states, spec_obj)
+        return [host_state for host_state, passes in zip(host_states, mask)
+                if passes]
+
     def _filter_one(self, obj, spec):
         """Return True if the object passes the filter, otherwise False."""
         # Do this here so we don't get scheduler.filters.utils
@@ -49,6 +82,16 @@ class BaseHostFilter(filters.BaseFilter):
         """
         raise NotImplementedError()
 
+    def host_passes_all(self, host_states, spec_obj):
+        """Return a list of booleans, one for each HostState in host_states,
+        which is True if the HostState passes the filter, otherwise False.
+
+        Only used if BULK_FILTER is set. Can be overridden in a subclass,
+        otherwise host_passes() is called for each HostState.
+        """
+        return [self.host_passes(host_state, spec_obj)
+                for host_state in host_states]
+
 
 class HostFilterHandler(filters.BaseFilterHandler):
     def __init__(self):
@@ -33,6 +33,8 @@ class AggregateImagePropertiesIsolation(filters.BaseHostFilter):
 
     RUN_ON_REBUILD = True
 
+    CACHEABLE = True
+
     def host_passes(self, host_state, spec_obj):
         """Checks a host in an aggregate that metadata key/value match
         with image properties.
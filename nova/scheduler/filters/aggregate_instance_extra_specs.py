@@ -35,6 +35,23 @@ class AggregateInstanceExtraSpecsFilter(filters.BaseHostFilter):
 
     RUN_ON_REBUILD = False
 
+    CACHEABLE = True
+
+    BULK_FILTER = True
+
+    def host_passes_all(self, host_states, spec_obj):
+        # The result only depends on the aggregates of a host so only match
+        # the extra specs once for each distinct set of aggregates.
+        passes_by_aggregates = {}
+        mask = []
+        for host_state in host_states:
+            key = utils.aggregates_key(host_state)
+            if key not in passes_by_aggregates:
+                passes_by_aggregates[key] = self.host_passes(host_state,
+                                                             spec_obj)
+            mask.append(passes_by_aggregates[key])
+        return mask
+
     def host_passes(self, host_state, spec_obj):
         """Return a list of hosts that can create instance_type
 
@@ -31,6 +31,8 @@ class ComputeCapabilitiesFilter(filters.BaseHostFilter):
 
     RUN_ON_REBUILD = False
 
+    CACHEABLE = True
+
     def _get_capabilities(self, host_state, scope):
         cap = host_state
         for index in range(0, len(scope)):
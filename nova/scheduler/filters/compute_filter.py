@@ -26,6 +26,8 @@ class ComputeFilter(filters.BaseHostFilter):
 
     RUN_ON_REBUILD = False
 
+    BULK_FILTER = True
+
     def __init__(self):
         self.servicegroup_api = servicegroup.API()
 
@@ -46,3 +48,17 @@ class ComputeFilter(filters.BaseHostFilter):
                             "while", {'host_state': host_state})
                 return False
         return True
+
+    def host_passes_all(self, host_states, spec_obj):
+        # The nodes of a host, like the ironic nodes managed by a single
+        # nova-compute service, share the same service record, so only check
+        # the state of each service once.
+        passes_by_service = {}
+        mask = []
+        for host_state in host_states:
+            key = host_state.service.get('id', host_state.host)
+            if key not in passes_by_service:
+                passes_by_service[key] = self.host_passes(host_state,
+                                                          spec_obj)
+            mask.append(passes_by_service[key])
+        return mask
@@ -40,6 +40,8 @@ class ImagePropertiesFilter(filters.BaseHostFilter):
 
     RUN_ON_REBUILD = True
 
+    CACHEABLE = True
+
     # Image Properties and Compute Capabilities do not change within
     # a request
     run_filter_once_per_request = True
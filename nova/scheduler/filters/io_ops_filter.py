@@ -29,6 +29,8 @@ class IoOpsFilter(filters.BaseHostFilter):
 
     RUN_ON_REBUILD = False
 
+    BULK_FILTER = True
+
     def _get_max_io_ops_per_host(self, host_state, spec_obj):
         return CONF.filter_scheduler.max_io_ops_per_host
 
@@ -36,9 +38,26 @@ class IoOpsFilter(filters.BaseHostFilter):
         """Use information about current vm and task states collected from
         compute node statistics to decide whether to filter.
         """
-        num_io_ops = host_state.num_io_ops
         max_io_ops = self._get_max_io_ops_per_host(
             host_state, spec_obj)
+        return self._host_passes(host_state, max_io_ops)
+
+    def host_passes_all(self, host_states, spec_obj):
+        # The limit only depends on the aggregates of a host so only look it
+        # up once for each distinct set of aggregates.
+        max_io_ops_by_aggregates = {}
+        mask = []
+        for host_state in host_states:
+            key = utils.aggregates_key(host_state)
+            if key not in max_io_ops_by_aggregates:
+                max_io_ops_by_aggregates[key] = (
+                    self._get_max_io_ops_per_host(host_state, spec_obj))
+            mask.append(self._host_passes(host_state,
+                                          max_io_ops_by_aggregates[key]))
+        return mask
+
+    def _host_passes(self, host_state, max_io_ops):
+        num_io_ops = host_state.num_io_ops
         passes = num_io_ops < max_io_ops
         if not passes:
             LOG.debug("%(host_state)s fails I/O ops check: Max IOs per host "
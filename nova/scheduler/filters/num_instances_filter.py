@@ -29,13 +29,32 @@ class NumInstancesFilter(filters.BaseHostFilter):
 
     RUN_ON_REBUILD = False
 
+    BULK_FILTER = True
+
     def _get_max_instances_per_host(self, host_state, spec_obj):
         return CONF.filter_scheduler.max_instances_per_host
 
     def host_passes(self, host_state, spec_obj):
-        num_instances = host_state.num_instances
         max_instances = self._get_max_instances_per_host(
             host_state, spec_obj)
+        return self._host_passes(host_state, max_instances)
+
+    def host_passes_all(self, host_states, spec_obj):
+        # The limit only depends on the aggregates of a host so only look it
+        # up once for each distinct set of aggregates.
+        max_instances_by_aggregates = {}
+        mask = []
+        for host_state in host_states:
+            key = utils.aggregates_key(host_state)
+            if key not in max_instances_by_aggregates:
+                max_instances_by_aggregates[key] = (
+                    self._get_max_instances_per_host(host_state, spec_obj))
+            mask.append(self._host_passes(host_state,
+                                          max_instances_by_aggregates[key]))
+        return mask
+
+    def _host_passes(self, host_state, max_instances):
+        num_instances = host_state.num_instances
         passes = num_instances < max_instances
         if not passes:
             LOG.debug("%(host_state)s fails num_instances check: Max "
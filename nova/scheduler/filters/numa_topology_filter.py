@@ -29,6 +29,12 @@ class NUMATopologyFilter(filters.BaseHostFilter):
     # request and therefore do not need to run this filter on rebuild.
     RUN_ON_REBUILD = False
 
+    def __init__(self):
+        # Hosts with the same topology and usage get the same fit, so share
+        # the results between them rather than walking the permutations of
+        # their NUMA cells again and again.
+        self.fit_cache = hardware.NUMAFitCache()
+
     def _satisfies_cpu_policy(self, host_state, extra_specs, image_props):
         """Check that the host_state provided satisfies any available
         CPU policy requirements.
@@ -68,6 +74,7 @@ class NUMATopologyFilter(filters.BaseHostFilter):
         # doing this. That's a large, non-backportable cleanup however, so for
         # now we just duplicate spec_obj to prevent changes propagating to
         # future filter calls.
+        requested_spec_topology = spec_obj.numa_topology
         spec_obj = spec_obj.obj_clone()
 
         ram_ratio = host_state.ram_allocation_ratio
@@ -101,7 +108,8 @@ class NUMATopologyFilter(filters.BaseHostFilter):
                         host_topology, requested_topology,
                         limits=limits,
                         pci_requests=pci_requests,
-                        pci_stats=host_state.pci_stats))
+                        pci_stats=host_state.pci_stats,
+                        cache=self.fit_cache))
             if not instance_topology:
                 LOG.debug("%(host)s, %(node)s fails NUMA topology "
                           "requirements. The instance does not fit on this "
@@ -110,6 +118,9 @@ class NUMATopologyFilter(filters.BaseHostFilter):
                           instance_uuid=spec_obj.instance_uuid)
                 return False
             host_state.limits['numa_topology'] = limits
+            # Let the host reuse this fit if it is selected for the request
+            host_state.set_numa_fit(requested_spec_topology, limits,
+                                    instance_topology)
             return True
         elif requested_topology:
             LOG.debug("%(host)s, %(node)s fails NUMA topology requirements. "
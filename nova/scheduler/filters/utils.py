@@ -30,6 +30,16 @@ def aggregate_values_from_key(host_state, key_name):
               }
 
 
+def aggregates_key(host_state):
+    """Returns a hashable key identifying the aggregates of a host.
+
+    The HostManager shares the same Aggregate objects between all the hosts
+    in an aggregate, so hosts with the same key are in the same aggregates
+    and have the same aggregate metadata.
+    """
+    return frozenset(id(aggr) for aggr in host_state.aggregates)
+
+
 def aggregate_metadata_get_by_host(host_state, key=None):
     """Returns a dict of all metadata based on a metadata key for a specific
     host. If the key is not provided, returns a dict of all metadata.
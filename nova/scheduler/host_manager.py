@@ -18,6 +18,8 @@ Manage hosts in the current zone.
 """
 
 import collections
+import copy
+import datetime
 import functools
 import time
 try:
@@ -28,6 +30,7 @@ except ImportError:
 
 import iso8601
 from oslo_log import log as logging
+from oslo_serialization import jsonutils
 from oslo_utils import timeutils
 
 import nova.conf
@@ -36,6 +39,7 @@ from nova import exception
 from nova import objects
 from nova.pci import stats as pci_stats
 from nova.scheduler import filters
+from nova.scheduler import utils as scheduler_utils
 from nova.scheduler import weights
 from nova import utils
 from nova.virt import hardware
@@ -45,6 +49,12 @@ CONF = nova.conf.CONF
 
 LOG = logging.getLogger(__name__)
 HOST_INSTANCE_SEMAPHORE = "host_instance"
+HOST_STATE_CACHE_SEMAPHORE = "host_state_cache"
+# NOTE: Number of seconds subtracted from the time of the previous poll of a
+# cell when asking it for the compute nodes changed since then. This accounts
+# for clock drift between the scheduler and the services writing the compute
+# node records, at the cost of reloading a few unchanged records.
+HOST_STATE_CACHE_POLL_OVERLAP = 5
 
 
 class ReadOnlyDict(IterableUserDict):
@@ -121,6 +131,12 @@ class HostState(object):
         self.vcpus_used = 0
         self.pci_stats = None
         self.numa_topology = None
+        # Fit of the instance NUMA topology computed by the
+        # NUMATopologyFilter, see set_numa_fit()
+        self.numa_fit = None
+        # Shared cache of the deserialized NUMA topologies, set by the
+        # HostManager
+        self.numa_topology_cache = None
 
         # Additional host information from the compute node stats:
         self.num_instances = 0
@@ -183,6 +199,25 @@ class HostState(object):
 
         return _locked_update(self, compute, service, aggregates, inst_dict)
 
+    def copy(self):
+        """Returns a copy of the host state which can consume requests
+        without changing this host state.
+
+        The NUMA topology and the PCI stats of the host are replaced, not
+        modified, when a request is consumed, so they are shared with the
+        copy.
+        """
+
+        @utils.synchronized(self._lock_name)
+        def _locked_copy(self):
+            host_state = copy.copy(self)
+            host_state.limits = dict(self.limits)
+            host_state.instances = dict(self.instances)
+            host_state.numa_fit = None
+            return host_state
+
+        return _locked_copy(self)
+
     def _update_from_compute_node(self, compute):
         """Update information about a host from a ComputeNode object."""
         # NOTE(jichenjc): if the compute record is just created but not updated
@@ -224,8 +259,11 @@ class HostState(object):
         self.vcpus_used = compute.vcpus_used
         self.updated = compute.updated_at
         # the ComputeNode.numa_topology field is a StringField so deserialize
-        self.numa_topology = objects.NUMATopology.obj_from_db_obj(
-            compute.numa_topology) if compute.numa_topology else None
+        if self.numa_topology_cache is not None:
+            self.numa_topology = self.numa_topology_cache.get(compute)
+        else:
+            self.numa_topology = objects.NUMATopology.obj_from_db_obj(
+                compute.numa_topology) if compute.numa_topology else None
         self.pci_stats = pci_stats.PciDeviceStats(
             stats=compute.pci_device_pools)
 
@@ -262,6 +300,35 @@ class HostState(object):
         # update failed_builds counter reported by the compute
         self.failed_builds = int(self.stats.get('failed_builds', 0))
 
+    def set_numa_fit(self, requested_topology, limits, fitted_topology):
+        """Record the fit of a requested instance NUMA topology onto the
+        current NUMA topology of the host, so that consuming the request on
+        this host doesn't have to compute it again.
+
+        :param requested_topology: the InstanceNUMATopology of the RequestSpec
+        :param limits: the NUMATopologyLimits the fit was computed with
+        :param fitted_topology: the fitted InstanceNUMATopology
+        """
+        self.numa_fit = (self.numa_topology, requested_topology, limits,
+                         fitted_topology)
+
+    def _pop_numa_fit(self, requested_topology, limits):
+        """Returns the fit recorded by set_numa_fit() if it was computed for
+        the current NUMA topology of the host and the given request and
+        limits, None otherwise.
+        """
+        numa_fit, self.numa_fit = self.numa_fit, None
+        if numa_fit is None:
+            return None
+        host_topology, requested, fit_limits, fitted_topology = numa_fit
+        # NOTE: The objects are compared by identity. The host topology is
+        # replaced, not modified, when the host is updated or consumes a
+        # request, and concurrent requests use different RequestSpecs.
+        if (host_topology is self.numa_topology and
+                requested is requested_topology and fit_limits is limits):
+            return fitted_topology
+        return None
+
     def consume_from_request(self, spec_obj):
         """Incrementally update host state from a RequestSpec object."""
 
@@ -295,11 +362,19 @@ class HostState(object):
             pci_requests = None
 
         # Calculate the NUMA usage...
+        limits = self.limits.get('numa_topology')
+        numa_fit = self._pop_numa_fit(spec_obj.numa_topology, limits)
         if self.numa_topology and spec_obj.numa_topology:
-            spec_obj.numa_topology = hardware.numa_fit_instance_to_host(
-                self.numa_topology, spec_obj.numa_topology,
-                limits=self.limits.get('numa_topology'),
-                pci_requests=pci_requests, pci_stats=self.pci_stats)
+            # Reuse the fit computed by the NUMATopologyFilter unless PCI
+            # devices are requested, as these depend on the PCI pools which
+            # may have been consumed since then.
+            if numa_fit is not None and not pci_requests:
+                spec_obj.numa_topology = numa_fit
+            else:
+                spec_obj.numa_topology = hardware.numa_fit_instance_to_host(
+                    self.numa_topology, spec_obj.numa_topology,
+                    limits=limits,
+                    pci_requests=pci_requests, pci_stats=self.pci_stats)
 
             self.numa_topology = hardware.numa_usage_from_instance_numa(
                 self.numa_topology, spec_obj.numa_topology)
@@ -309,6 +384,9 @@ class HostState(object):
             instance_cells = None
             if spec_obj.numa_topology:
                 instance_cells = spec_obj.numa_topology.cells
+            # The PCI stats may be shared with the copies of the host state,
+            # see copy().
+            self.pci_stats = copy.deepcopy(self.pci_stats)
             self.pci_stats.apply_requests(pci_requests, instance_cells)
 
         # NOTE(sbauza): By considering all cases when the scheduler is called
@@ -326,6 +404,286 @@ class HostState(object):
                  'num_instances': self.num_instances})
 
 
+class HostStateCache(object):
+    """Versioned cache of ComputeNode records and their HostState objects.
+
+    Compute node records are cached per cell and only the records which were
+    created, updated or deleted since the previous poll of a cell are loaded
+    again. Every poll bumps the cache generation, which is recorded for each
+    (re)loaded compute node so that the HostManager only rebuilds the host
+    states of the compute nodes which actually changed.
+
+    The cached host states are only updated from the compute node records,
+    the scheduling requests consume their resources from copies of them.
+    """
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        # Dict, keyed by cell UUID, of dicts of ComputeNode objects keyed by
+        # compute node UUID
+        self.computes_by_cell = collections.defaultdict(dict)
+        # Dict, keyed by cell UUID, of the time the cell was last polled
+        self.last_poll_by_cell = {}
+        # Dict, keyed by compute node UUID, of the generation at which the
+        # compute node record was last loaded
+        self.compute_generations = {}
+        # Dict, keyed by (host, nodename), of HostState objects
+        self.host_states = {}
+        # Dict, keyed by (host, nodename), of the generation of the compute
+        # node record each HostState was last updated from
+        self.host_state_generations = {}
+        self.generation = 0
+        self.stats = {
+            'full_polls': 0,
+            'delta_polls': 0,
+            'computes_loaded': 0,
+            'host_state_hits': 0,
+            'host_state_misses': 0,
+            'refresh_time_by_cell': {},
+        }
+
+    @utils.synchronized(HOST_STATE_CACHE_SEMAPHORE)
+    def update_cell(self, cell_uuid, computes, poll_time, full, elapsed):
+        """Apply the result of a poll of a cell to the cache, unless a poll
+        of the cell which started later was already applied, or the cache was
+        cleared since this delta poll started.
+
+        :param cell_uuid: UUID of the polled cell
+        :param computes: ComputeNodeList loaded from the cell, which can
+            contain soft-deleted records for a delta poll
+        :param poll_time: time at which the poll started
+        :param full: True if all compute nodes were loaded from the cell
+        :param elapsed: time in seconds the poll took
+        :returns: True if the poll was applied, False if it was dropped
+        """
+        last_poll = self.last_poll_by_cell.get(cell_uuid)
+        if ((last_poll is not None and poll_time < last_poll) or
+                (last_poll is None and not full)):
+            LOG.debug('Dropping an outdated poll of cell %s from the host '
+                      'state cache.', cell_uuid)
+            return False
+        self.generation += 1
+        cell_computes = self.computes_by_cell[cell_uuid]
+        if full:
+            for compute in cell_computes.values():
+                self._evict(compute)
+            cell_computes.clear()
+            self.stats['full_polls'] += 1
+        else:
+            self.stats['delta_polls'] += 1
+        for compute in computes:
+            if 'deleted' in compute and compute.deleted:
+                cached = cell_computes.pop(compute.uuid, None)
+                if cached is not None:
+                    self._evict(cached)
+                continue
+            cell_computes[compute.uuid] = compute
+            self.compute_generations[compute.uuid] = self.generation
+        self.last_poll_by_cell[cell_uuid] = poll_time
+        self.stats['computes_loaded'] += len(computes)
+        self.stats['refresh_time_by_cell'][cell_uuid] = elapsed
+        LOG.debug('Refreshed host state cache for cell %(cell)s in '
+                  '%(elapsed).3f seconds (%(type)s poll): %(count)d compute '
+                  'node records loaded, %(total)d cached.',
+                  {'cell': cell_uuid, 'elapsed': elapsed,
+                   'type': 'full' if full else 'delta',
+                   'count': len(computes), 'total': len(cell_computes)})
+        return True
+
+    def _evict(self, compute):
+        self.compute_generations.pop(compute.uuid, None)
+        state_key = (compute.host, compute.hypervisor_hostname)
+        self.host_states.pop(state_key, None)
+        self.host_state_generations.pop(state_key, None)
+
+    def get_changes_since(self, cell_uuid):
+        """Returns the time from which a cell should be polled for changes,
+        or None if all the compute nodes of the cell have to be loaded.
+        """
+        last_poll = self.last_poll_by_cell.get(cell_uuid)
+        if last_poll is None:
+            return None
+        return last_poll - datetime.timedelta(
+            seconds=HOST_STATE_CACHE_POLL_OVERLAP)
+
+    def get_computes(self, cell_uuid, compute_uuids=None):
+        """Returns the cached ComputeNode objects of a cell.
+
+        :param cell_uuid: UUID of the cell
+        :param compute_uuids: optional set of compute node UUIDs to restrict
+            the returned compute nodes to
+        """
+        cell_computes = self.computes_by_cell.get(cell_uuid, {})
+        if compute_uuids is None:
+            return list(cell_computes.values())
+        return [cell_computes[uuid] for uuid in compute_uuids
+                if uuid in cell_computes]
+
+    def host_state_is_current(self, state_key, compute):
+        """Returns True if a cached HostState is up to date with the last
+        loaded record of its compute node, False if it has to be updated from
+        that record.
+        """
+        generation = self.compute_generations.get(compute.uuid)
+        current = (generation is not None and
+                   self.host_state_generations.get(state_key) == generation)
+        if current:
+            self.stats['host_state_hits'] += 1
+        else:
+            self.stats['host_state_misses'] += 1
+        return current
+
+    def set_host_state_current(self, state_key, compute):
+        """Records that a cached HostState was updated from the last loaded
+        record of its compute node.
+        """
+        generation = self.compute_generations.get(compute.uuid)
+        if generation is not None:
+            self.host_state_generations[state_key] = generation
+
+    def get_stats(self):
+        """Returns a copy of the cache statistics, including the ratio of
+        host states served from the cache without being rebuilt.
+        """
+        stats = dict(self.stats)
+        stats['refresh_time_by_cell'] = dict(stats['refresh_time_by_cell'])
+        lookups = stats['host_state_hits'] + stats['host_state_misses']
+        stats['host_state_hit_rate'] = (
+            float(stats['host_state_hits']) / lookups if lookups else 0.0)
+        stats['generation'] = self.generation
+        return stats
+
+
+class NUMATopologyCache(object):
+    """Cache of the deserialized NUMA topologies of the compute nodes.
+
+    The ComputeNode.numa_topology field is a serialized NUMATopology object
+    which is expensive to deserialize for large hosts, and which rarely
+    changes. Deserialized topologies are cached by compute node UUID along
+    with the serialized value they were built from, and are only rebuilt when
+    that value changes.
+
+    The cached NUMATopology objects are shared by all the HostStates built
+    from the same compute node, so they must not be modified. This holds for
+    the scheduler which only replaces the NUMA topology of a HostState when
+    it consumes a request.
+    """
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        # Dict, keyed by compute node UUID, of (serialized, NUMATopology)
+        # tuples
+        self.topologies = {}
+        self.stats = {'hits': 0, 'misses': 0}
+
+    def get(self, compute):
+        """Returns the deserialized NUMA topology of a compute node, or None
+        if it doesn't have one.
+        """
+        serialized = compute.numa_topology
+        if not serialized:
+            self.topologies.pop(compute.uuid, None)
+            return None
+        cached = self.topologies.get(compute.uuid)
+        if cached is not None and cached[0] == serialized:
+            self.stats['hits'] += 1
+            return cached[1]
+        self.stats['misses'] += 1
+        topology = objects.NUMATopology.obj_from_db_obj(serialized)
+        self.topologies[compute.uuid] = (serialized, topology)
+        return topology
+
+
+class FilterResultsCache(object):
+    """Cache of the results of the static host filters.
+
+    Results are cached per request signature, which is built from the
+    flavor extra specs and the image properties of the request, and then per
+    host. The result cached for a host is only used while the HostState was
+    not updated, either from its compute node record or by consuming the
+    resources of a request. The least recently used request signatures are
+    discarded once more than max_size of them are cached.
+    """
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        # OrderedDict, keyed by request signature, of dicts keyed by
+        # (host, nodename) of (HostState.updated, passes) tuples
+        self.results = collections.OrderedDict()
+        self.stats = {'hits': 0, 'misses': 0}
+
+    @staticmethod
+    def get_request_key(spec_obj):
+        """Returns the signature of the parts of a RequestSpec the static
+        filters depend on.
+        """
+        extra_specs = {}
+        if ('flavor' in spec_obj and spec_obj.flavor and
+                'extra_specs' in spec_obj.flavor):
+            extra_specs = spec_obj.flavor.extra_specs
+        image_props = {}
+        if ('image' in spec_obj and spec_obj.image and
+                'properties' in spec_obj.image):
+            props = spec_obj.image.properties
+            image_props = {name: getattr(props, name)
+                           for name in props.obj_fields
+                           if props.obj_attr_is_set(name)}
+        return jsonutils.dumps([extra_specs, image_props], sort_keys=True)
+
+    def get_results(self, request_key, max_size):
+        """Returns the dict of cached results for a request signature."""
+        results = self.results.pop(request_key, None)
+        if results is None:
+            results = {}
+        self.results[request_key] = results
+        while len(self.results) > max_size:
+            self.results.popitem(last=False)
+        return results
+
+    def filter_hosts(self, request_key, max_size, host_states, filter_fn):
+        """Returns the HostStates passing the static filters.
+
+        :param request_key: signature of the request, see get_request_key()
+        :param max_size: number of request signatures to keep results for
+        :param host_states: list of HostStates to filter
+        :param filter_fn: function running the static filters against the
+            list of HostStates it is given, and returning the ones passing
+        """
+        results = self.get_results(request_key, max_size)
+        passing = []
+        unknown = []
+        for host_state in host_states:
+            cached = results.get((host_state.host, host_state.nodename))
+            # NOTE: HostState.updated is reset when a multi-create request
+            # fails, in which case the host state isn't trusted anymore.
+            if (cached is None or host_state.updated is None or
+                    cached[0] != host_state.updated):
+                unknown.append(host_state)
+            elif cached[1]:
+                passing.append(host_state)
+        self.stats['hits'] += len(host_states) - len(unknown)
+        self.stats['misses'] += len(unknown)
+        if not unknown:
+            return passing
+
+        passing_ids = set(id(host_state)
+                          for host_state in filter_fn(unknown) or [])
+        for host_state in unknown:
+            if host_state.updated is not None:
+                results[(host_state.host, host_state.nodename)] = (
+                    host_state.updated, id(host_state) in passing_ids)
+        passing_ids.update(id(host_state) for host_state in passing)
+        # Keep the order of the hosts.
+        return [host_state for host_state in host_states
+                if id(host_state) in passing_ids]
+
+
 class HostManager(object):
     """Base HostManager class."""
 
@@ -334,6 +692,14 @@ class HostManager(object):
         return HostState(host, node, cell)
 
     def __init__(self):
+        # Incremental cache of the compute nodes and their host states, only
+        # used if [filter_scheduler]/host_state_cache_enabled is True
+        self.host_state_cache = HostStateCache()
+        # Cache of the results of the static filters, only used if
+        # [filter_scheduler]/filter_results_cache_size is set
+        self.filter_results_cache = FilterResultsCache()
+        # Cache of the deserialized NUMA topologies of the compute nodes
+        self.numa_topology_cache = NUMATopologyCache()
         self.refresh_cells_caches()
         self.filter_handler = filters.HostFilterHandler()
         filter_classes = self.filter_handler.get_matching_classes(
@@ -378,6 +744,8 @@ class HostManager(object):
             self._update_aggregate(aggregates)
 
     def _update_aggregate(self, aggregate):
+        # The static filters depend on the aggregates and their metadata.
+        self.filter_results_cache.clear()
         self.aggs_by_id[aggregate.id] = aggregate
         for host in aggregate.hosts:
             self.host_aggregates_map[host].add(aggregate.id)
@@ -391,6 +759,7 @@ class HostManager(object):
     def delete_aggregate(self, aggregate):
         """Deletes internal HostManager information about a specific aggregate.
         """
+        self.filter_results_cache.clear()
         if aggregate.id in self.aggs_by_id:
             del self.aggs_by_id[aggregate.id]
         for host in self.host_aggregates_map:
@@ -601,13 +970,38 @@ class HostManager(object):
                     return []
             hosts = name_to_cls_map.values()
 
-        return self.filter_handler.get_filtered_objects(self.enabled_filters,
+        enabled_filters = self.enabled_filters
+        cache_size = CONF.filter_scheduler.filter_results_cache_size
+        # NOTE: The static filters only run for the first instance of a
+        # request, and rebuilds skip some filters so their results must not
+        # be cached.
+        if (cache_size and index == 0 and
+                not scheduler_utils.request_is_rebuild(spec_obj)):
+            cached_filters = [f for f in enabled_filters if f.CACHEABLE]
+            if cached_filters:
+                enabled_filters = [f for f in enabled_filters
+                                   if not f.CACHEABLE]
+
+                def _run_cached_filters(host_states):
+                    return self.filter_handler.get_filtered_objects(
+                        cached_filters, host_states, spec_obj, index)
+
+                hosts = self.filter_results_cache.filter_hosts(
+                    self.filter_results_cache.get_request_key(spec_obj),
+                    cache_size, list(hosts), _run_cached_filters)
+
+        return self.filter_handler.get_filtered_objects(enabled_filters,
                 hosts, spec_obj, index)
 
-    def get_weighed_hosts(self, hosts, spec_obj):
-        """Weigh the hosts."""
+    def get_weighed_hosts(self, hosts, spec_obj, limit=None, ranges=None):
+        """Weigh the hosts.
+
+        If limit is set, only the best limit weighed hosts are returned. If
+        ranges is a list, the raw weights are kept like with
+        nova.weights.BaseWeightHandler.get_weighed_objects().
+        """
         return self.weight_handler.get_weighed_objects(self.weighers,
-                hosts, spec_obj)
+                hosts, spec_obj, limit=limit, ranges=ranges)
 
     def _get_computes_for_cells(self, context, cells, compute_uuids=None):
         """Get a tuple of compute node and service information.
@@ -634,6 +1028,10 @@ class HostManager(object):
                 return services, objects.ComputeNodeList.get_all_by_uuids(
                     cctxt, compute_uuids)
 
+        if CONF.filter_scheduler.host_state_cache_enabled:
+            return self._get_cached_computes_for_cells(context, cells,
+                                                       compute_uuids)
+
         timeout = context_module.CELL_TIMEOUT
         results = context_module.scatter_gather_cells(context, cells, timeout,
                                                       targeted_operation)
@@ -651,6 +1049,73 @@ class HostManager(object):
                                  for service in _services})
         return compute_nodes, services
 
+    def _get_cached_computes_for_cells(self, context, cells,
+                                       compute_uuids=None):
+        """Get a tuple of compute node and service information, refreshing
+        the host state cache with the compute nodes which changed since the
+        previous poll of each cell.
+
+        Takes the same parameters and returns the same tuple as
+        _get_computes_for_cells.
+        """
+        cache = self.host_state_cache
+        changes_since = {cell.uuid: cache.get_changes_since(cell.uuid)
+                         for cell in cells}
+
+        def targeted_operation(cctxt):
+            timer = timeutils.StopWatch()
+            timer.start()
+            services = objects.ServiceList.get_by_binary(
+                cctxt, 'nova-compute', include_disabled=True)
+            since = changes_since[cctxt.cell_uuid]
+            if since is None:
+                computes = objects.ComputeNodeList.get_all(cctxt)
+            else:
+                computes = objects.ComputeNodeList.get_all_changed_since(
+                    cctxt, since)
+            return services, computes, timer.elapsed()
+
+        poll_time = timeutils.utcnow()
+        timeout = context_module.CELL_TIMEOUT
+        results = context_module.scatter_gather_cells(context, cells, timeout,
+                                                      targeted_operation)
+        if compute_uuids is not None:
+            compute_uuids = set(compute_uuids)
+        compute_nodes = collections.defaultdict(list)
+        services = {}
+        for cell_uuid, result in results.items():
+            if isinstance(result, Exception):
+                LOG.warning('Failed to get computes for cell %s', cell_uuid)
+            elif result is context_module.did_not_respond_sentinel:
+                LOG.warning('Timeout getting computes for cell %s', cell_uuid)
+            else:
+                _services, _compute_nodes, elapsed = result
+                # Concurrent requests poll the cells concurrently. If this
+                # poll is dropped, the cached compute nodes are at least as
+                # recent as the ones it loaded.
+                cache.update_cell(cell_uuid, _compute_nodes, poll_time,
+                                  changes_since[cell_uuid] is None, elapsed)
+                compute_nodes[cell_uuid].extend(
+                    cache.get_computes(cell_uuid, compute_uuids))
+                services.update({service.host: service
+                                 for service in _services})
+        return compute_nodes, services
+
+    def refresh_host_state_cache(self, context):
+        """Refresh the host state cache for all the enabled cells.
+
+        This is run periodically by the scheduler manager so that scheduling
+        requests only have to load the few compute nodes which changed since
+        the last refresh.
+        """
+        timer = timeutils.StopWatch()
+        timer.start()
+        self._get_cached_computes_for_cells(context, self.enabled_cells,
+                                            compute_uuids=[])
+        LOG.debug('Refreshed host state cache in %(elapsed).3f seconds: '
+                  '%(stats)s', {'elapsed': timer.elapsed(),
+                                'stats': self.host_state_cache.get_stats()})
+
     def _get_cell_by_host(self, ctxt, host):
         '''Get CellMapping object of a cell the given host belongs to.'''
         try:
@@ -750,9 +1215,19 @@ class HostManager(object):
         # Dict, keyed by host name, to cell UUID to be used to look up the
         # cell a particular host is in (used with self.cells).
         self.host_to_cell_uuid = {}
-
-    def get_host_states_by_uuids(self, context, compute_uuids, spec_obj):
-
+        # The host state cache is also reset so that the compute nodes of
+        # every cell are fully reloaded on the next request.
+        self.host_state_cache.clear()
+
+    def get_host_states_by_uuids(self, context, compute_uuids, spec_obj,
+                                 shards=None):
+        """Returns a generator over the HostStates of the compute nodes
+        with the given UUIDs, or of all the compute nodes if compute_uuids is
+        None.
+
+        If shards is set, only the compute nodes in the shard of this
+        scheduler are considered.
+        """
         if not self.cells:
             LOG.warning("No cells were found")
         # Restrict to a single cell if and only if the request spec has a
@@ -770,6 +1245,10 @@ class HostManager(object):
         else:
             cells = self.enabled_cells
 
+        if shards is not None:
+            cells = shards.filter_cells(cells)
+            compute_uuids = shards.filter_compute_uuids(compute_uuids)
+
         compute_nodes, services = self._get_computes_for_cells(
             context, cells, compute_uuids=compute_uuids)
         return self._get_host_states(context, compute_nodes, services)
@@ -779,6 +1258,7 @@ class HostManager(object):
 
         Also updates the HostStates internal mapping for the HostManager.
         """
+        use_cache = CONF.filter_scheduler.host_state_cache_enabled
         # Get resource usage across the available compute nodes:
         host_state_map = {}
         seen_nodes = set()
@@ -795,16 +1275,23 @@ class HostManager(object):
                 node = compute.hypervisor_hostname
                 state_key = (host, node)
                 host_state = host_state_map.get(state_key)
+                updated_compute = compute
+                if not host_state and use_cache:
+                    host_state = self._get_cached_host_state(
+                        state_key, cell_uuid, compute)
+                    host_state_map[state_key] = host_state
+                    updated_compute = None
                 if not host_state:
                     host_state = self.host_state_cls(host, node,
                                                      cell_uuid,
                                                      compute=compute)
+                    host_state.numa_topology_cache = self.numa_topology_cache
                     host_state_map[state_key] = host_state
                 # We force to update the aggregates info each time a
                 # new request comes in, because some changes on the
                 # aggregates could have been happening after setting
                 # this field for the first time
-                host_state.update(compute,
+                host_state.update(updated_compute,
                                   dict(service),
                                   self._get_aggregates_info(host),
                                   self._get_instance_info(context, compute))
@@ -813,6 +1300,30 @@ class HostManager(object):
 
         return (host_state_map[host] for host in seen_nodes)
 
+    def _get_cached_host_state(self, state_key, cell_uuid, compute):
+        """Returns a copy of the cached HostState of a compute node, which
+        is only rebuilt from the compute node record if the record was
+        reloaded since the last update.
+
+        The copy is consumed by the request instead of the cached HostState,
+        so that the resources consumed by a request are not left in the cache.
+        """
+        cache = self.host_state_cache
+        host_state = cache.host_states.get(state_key)
+        if not host_state:
+            host_state = self.host_state_cls(state_key[0], state_key[1],
+                                             cell_uuid, compute=compute)
+            host_state.numa_topology_cache = self.numa_topology_cache
+            cache.host_states[state_key] = host_state
+        if not cache.host_state_is_current(state_key, compute):
+            host_state.update(compute)
+            # The update is skipped if the record is not complete yet, or
+            # older than the one the host state was updated from.
+            if (host_state.uuid == compute.uuid and
+                    host_state.updated == compute.updated_at):
+                cache.set_host_state_current(state_key, compute)
+        return host_state.copy()
+
     def _get_aggregates_info(self, host):
         return [self.aggs_by_id[agg_id] for agg_id in
                 self.host_aggregates_map[host]]
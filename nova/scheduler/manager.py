@@ -33,8 +33,10 @@ from nova import manager
 from nova import objects
 from nova.objects import host_mapping as host_mapping_obj
 from nova import quota
+from nova import trace as nova_trace
 from nova.scheduler.client import report
 from nova.scheduler import request_filter
+from nova.scheduler import trace as scheduler_trace
 from nova.scheduler import utils
 
 
@@ -50,7 +52,7 @@ HOST_MAPPING_EXISTS_WARNING = False
 class SchedulerManager(manager.Manager):
     """Chooses a host to run instances on."""
 
-    target = messaging.Target(version='4.5')
+    target = messaging.Target(version='4.7')
 
     _sentinel = object()
 
@@ -61,6 +63,11 @@ class SchedulerManager(manager.Manager):
             CONF.scheduler.driver,
             invoke_on_load=True
         ).driver
+        self.traces = None
+        if CONF.scheduler.trace_buffer_size:
+            self.traces = scheduler_trace.TraceBuffer(
+                CONF.scheduler.trace_buffer_size,
+                histograms=CONF.scheduler.trace_histograms)
 
         super(SchedulerManager, self).__init__(
             service_name='scheduler', *args, **kwargs
@@ -94,6 +101,14 @@ class SchedulerManager(manager.Manager):
     def _run_periodic_tasks(self, context):
         self.driver.run_periodic_tasks(context)
 
+    @periodic_task.periodic_task(
+        spacing=CONF.filter_scheduler.host_state_cache_refresh_interval,
+        run_immediately=True)
+    def _refresh_host_state_cache(self, context):
+        if not CONF.filter_scheduler.host_state_cache_enabled:
+            return
+        self.driver.host_manager.refresh_host_state_cache(context)
+
     def reset(self):
         # NOTE(tssurya): This is a SIGHUP handler which will reset the cells
         # and enabled cells caches in the host manager. So every time an
@@ -139,6 +154,14 @@ class SchedulerManager(manager.Manager):
                                                            request_spec,
                                                            filter_properties)
 
+        request_id = ctxt.request_id if ctxt else None
+        with scheduler_trace.tracing(self.traces, request_id, instance_uuids):
+            return self._select_destinations(ctxt, spec_obj, instance_uuids,
+                                             return_objects,
+                                             return_alternates)
+
+    def _select_destinations(self, ctxt, spec_obj, instance_uuids,
+                             return_objects, return_alternates):
         is_rebuild = utils.request_is_rebuild(spec_obj)
         alloc_reqs_by_rp_uuid, provider_summaries, allocation_request_version \
             = None, None, None
@@ -146,15 +169,17 @@ class SchedulerManager(manager.Manager):
             # Only process the Placement request spec filters when Placement
             # is used.
             try:
-                request_filter.process_reqspec(ctxt, spec_obj)
+                with nova_trace.phase('request_filters'):
+                    request_filter.process_reqspec(ctxt, spec_obj)
             except exception.RequestFilterFailed as e:
                 raise exception.NoValidHost(reason=e.message)
 
             resources = utils.resources_from_request_spec(
                 ctxt, spec_obj, self.driver.host_manager,
                 enable_pinning_translate=True)
-            res = self.placement_client.get_allocation_candidates(ctxt,
-                                                                  resources)
+            with nova_trace.phase('placement'):
+                res = self.placement_client.get_allocation_candidates(
+                    ctxt, resources)
             if res is None:
                 # We have to handle the case that we failed to connect to the
                 # Placement service and the safe_connect decorator on
@@ -181,8 +206,9 @@ class SchedulerManager(manager.Manager):
                 resources = utils.resources_from_request_spec(
                     ctxt, spec_obj, self.driver.host_manager,
                     enable_pinning_translate=False)
-                res = self.placement_client.get_allocation_candidates(
-                    ctxt, resources)
+                with nova_trace.phase('placement'):
+                    res = self.placement_client.get_allocation_candidates(
+                        ctxt, resources)
                 if res:
                     # merge the allocation requests and provider summaries from
                     # the two requests together
@@ -219,6 +245,42 @@ class SchedulerManager(manager.Manager):
             return jsonutils.to_primitive(selection_dicts)
         return selections
 
+    def select_shard_candidates(self, ctxt, spec_obj, compute_uuids, limit):
+        """Returns the best hosts of the shard of this scheduler for the
+        RequestSpec, among the compute nodes with the given UUIDs.
+
+        This is called by the scheduler handling a scheduling request when
+        ``[scheduler] host_partitioning`` is enabled.
+
+        :returns: A dict with, as 'candidates', a list of at most limit dicts,
+                  sorted by descending weight, with the Selection object
+                  representing a host as 'selection' and its raw weight and
+                  weight multiplier for each weigher as 'raw_weights' and
+                  'multipliers', and as 'ranges' the minimum and maximum raw
+                  weights of each weigher over the hosts of the shard.
+        """
+        return self.driver.select_shard_candidates(ctxt, spec_obj,
+                                                   compute_uuids, limit)
+
+    def get_traces(self, ctxt, limit=None, histograms=False):
+        """Returns the traces of the most recent scheduling requests.
+
+        :param limit: The maximum number of traces to return, most recent
+                      first, or None to return all the traces kept.
+        :param histograms: Whether to return the histograms of the durations
+                           of the phases of the requests.
+        :returns: A dict with the 'host' of this scheduler, whether tracing is
+                  'enabled', the 'traces' and, if requested and enabled, the
+                  'histograms' keyed by phase name.
+        """
+        result = {'host': self.host, 'enabled': self.traces is not None,
+                  'traces': [], 'histograms': None}
+        if self.traces is not None:
+            result['traces'] = self.traces.get_traces(limit=limit)
+            if histograms:
+                result['histograms'] = self.traces.get_histograms()
+        return result
+
     def update_aggregates(self, ctxt, aggregates):
         """Updates HostManager internal aggregates information.
 
@@ -105,6 +105,8 @@ class SchedulerAPI(object):
 
         * 4.5 - Modify select_destinations() to optionally return a list of
                 lists of Selection objects, along with zero or more alternates.
+        * 4.6 - Add get_traces()
+        * 4.7 - Add select_shard_candidates()
     '''
 
     VERSION_ALIASES = {
@@ -159,6 +161,28 @@ class SchedulerAPI(object):
             timeout=CONF.long_rpc_timeout)
         return cctxt.call(ctxt, 'select_destinations', **msg_args)
 
+    def get_traces(self, ctxt, host=None, limit=None, histograms=False):
+        # NOTE: Without a host, any of the schedulers answers.
+        version = '4.6'
+        if host:
+            cctxt = self.client.prepare(server=host, version=version)
+        else:
+            cctxt = self.client.prepare(version=version)
+        return cctxt.call(ctxt, 'get_traces', limit=limit,
+                          histograms=histograms)
+
+    def supports_select_shard_candidates(self, ctxt):
+        """Returns whether we can send 4.7, needed to partition the compute
+        nodes between the schedulers.
+        """
+        return self.client.can_send_version('4.7')
+
+    def select_shard_candidates(self, ctxt, host, spec_obj, compute_uuids,
+                                limit):
+        cctxt = self.client.prepare(server=host, version='4.7')
+        return cctxt.call(ctxt, 'select_shard_candidates', spec_obj=spec_obj,
+                          compute_uuids=compute_uuids, limit=limit)
+
     def update_aggregates(self, ctxt, aggregates):
         # NOTE(sbauza): Yes, it's a fanout, we need to update all schedulers
         cctxt = self.client.prepare(fanout=True, version='4.1')
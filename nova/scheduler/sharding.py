@@ -0,0 +1,85 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Partitioning of the compute nodes between the scheduler services.
+"""
+
+from oslo_log import log as logging
+from tooz import hashring as hash_ring
+
+LOG = logging.getLogger(__name__)
+
+_HASH_RING_PARTITIONS = 2 ** 5
+
+
+class SchedulerShards(object):
+    """Partitions the compute nodes, or the cells, between the scheduler
+    services using a consistent hash ring of their UUIDs.
+
+    Each scheduler builds the ring from the scheduler services which are up,
+    so the schedulers agree on the shard of every compute node as long as
+    they see the same services.
+    """
+
+    def __init__(self, mode, host):
+        """Initializes the shards of a single scheduler.
+
+        :param mode: 'compute' to partition the compute nodes or 'cell' to
+                     partition the cells.
+        :param host: The host of this scheduler service.
+        """
+        self.mode = mode
+        self.host = host
+        self.hosts = []
+        self.hash_ring = None
+        self.update_hosts([])
+
+    def update_hosts(self, hosts):
+        """Rebuilds the ring if the scheduler services changed.
+
+        :param hosts: The hosts of the scheduler services which are up. This
+                      scheduler is always part of the ring.
+        """
+        hosts = sorted(set(hosts) | {self.host})
+        if hosts == self.hosts:
+            return
+        LOG.info('Partitioning the %(mode)s nodes between the schedulers '
+                 '%(hosts)s', {'mode': self.mode, 'hosts': hosts})
+        self.hosts = hosts
+        self.hash_ring = hash_ring.HashRing(
+            set(host.lower() for host in hosts),
+            partitions=_HASH_RING_PARTITIONS)
+
+    def get_peers(self):
+        """Returns the hosts of the other schedulers of the ring."""
+        return [host for host in self.hosts if host != self.host]
+
+    def _owns(self, uuid):
+        return self.host.lower() in self.hash_ring.get_nodes(
+            uuid.encode('utf-8'))
+
+    def filter_cells(self, cells):
+        """Returns the cells whose compute nodes may be in the shard of this
+        scheduler.
+        """
+        if self.mode != 'cell':
+            return cells
+        return [cell for cell in cells if self._owns(cell.uuid)]
+
+    def filter_compute_uuids(self, compute_uuids):
+        """Returns the compute node UUIDs which may be in the shard of this
+        scheduler. None, meaning all the compute nodes, is returned as is.
+        """
+        if self.mode != 'compute' or compute_uuids is None:
+            return compute_uuids
+        return [uuid for uuid in compute_uuids if self._owns(uuid)]
@@ -0,0 +1,88 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Traces of the time spent in each phase of the scheduling requests.
+
+The scheduler manager starts a trace for each select_destinations() call,
+the code handling the request records the time spent in each phase (request
+filters, placement, host states, each filter and weigher, claims) against
+the current trace (see :mod:`nova.trace`) and the finished traces are kept
+in a bounded in-memory buffer which can be retrieved over RPC, for example
+with ``nova-manage scheduler trace``.
+"""
+
+import collections
+import contextlib
+
+from nova import trace as nova_trace
+
+
+class TraceBuffer(object):
+    """Keeps the last size traces and, optionally, the histograms of the
+    durations of their phases since the service started.
+    """
+
+    def __init__(self, size, histograms=False):
+        self._traces = collections.deque(maxlen=size)
+        self._histograms = {} if histograms else None
+
+    def add(self, trace):
+        self._traces.append(trace)
+        if self._histograms is None:
+            return
+        for name, (count, elapsed) in trace.phases.items():
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = nova_trace.Histogram()
+            histogram.add(elapsed)
+
+    def get_traces(self, limit=None):
+        """Returns the primitives of the last limit traces, most recent
+        first.
+        """
+        traces = list(self._traces)
+        traces.reverse()
+        if limit is not None:
+            traces = traces[:limit]
+        return [trace.to_dict() for trace in traces]
+
+    def get_histograms(self):
+        """Returns the primitives of the phase histograms keyed by phase name,
+        or None if the histograms are disabled.
+        """
+        if self._histograms is None:
+            return None
+        return {name: histogram.to_dict()
+                for name, histogram in self._histograms.items()}
+
+
+@contextlib.contextmanager
+def tracing(buffer, request_id, instance_uuids):
+    """Traces the request handled in the context and adds the trace to
+    buffer. Nothing is traced if buffer is None.
+    """
+    if buffer is None:
+        yield None
+        return
+    trace = nova_trace.Trace(request_id, instance_uuids)
+    nova_trace.set_current(trace)
+    try:
+        yield trace
+    except Exception as exc:
+        trace.finish(exc.__class__.__name__)
+        raise
+    else:
+        trace.finish('Success')
+    finally:
+        nova_trace.set_current(None)
+        buffer.add(trace)
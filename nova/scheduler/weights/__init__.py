@@ -17,6 +17,7 @@
 Scheduler host weights
 """
 
+from nova.scheduler.filters import utils as filters_utils
 from nova import weights
 
 
@@ -33,7 +34,24 @@ class WeighedHost(weights.WeighedObject):
 
 class BaseHostWeigher(weights.BaseWeigher):
     """Base class for host weights."""
-    pass
+
+    # Set to True if weight_multiplier() only depends on the configuration
+    # and on the aggregate metadata of the host, so it is only computed once
+    # for all the hosts in the same aggregates.
+    AGGREGATE_MULTIPLIER = False
+
+    def weight_multipliers(self, host_states):
+        if not self.AGGREGATE_MULTIPLIER:
+            return super(BaseHostWeigher, self).weight_multipliers(
+                host_states)
+        multipliers = []
+        cache = {}
+        for host_state in host_states:
+            key = filters_utils.aggregates_key(host_state)
+            if key not in cache:
+                cache[key] = self.weight_multiplier(host_state)
+            multipliers.append(cache[key])
+        return multipliers
 
 
 class HostWeightHandler(weights.BaseWeightHandler):
@@ -23,6 +23,8 @@ CONF = nova.conf.CONF
 
 
 class BuildFailureWeigher(weights.BaseHostWeigher):
+    AGGREGATE_MULTIPLIER = True
+
     def weight_multiplier(self, host_state):
         """Override the weight multiplier. Note this is negated."""
         return -1 * utils.get_weight_multiplier(
@@ -34,3 +36,6 @@ class BuildFailureWeigher(weights.BaseHostWeigher):
            weight by number of failed builds.
         """
         return host_state.failed_builds
+
+    def _weigh_objects(self, host_states, weight_properties):
+        return [host_state.failed_builds for host_state in host_states]
@@ -30,6 +30,7 @@ CONF = nova.conf.CONF
 
 
 class CPUWeigher(weights.BaseHostWeigher):
+    AGGREGATE_MULTIPLIER = True
     minval = 0
 
     def weight_multiplier(self, host_state):
@@ -44,3 +45,7 @@ class CPUWeigher(weights.BaseHostWeigher):
             host_state.vcpus_total * host_state.cpu_allocation_ratio -
             host_state.vcpus_used)
         return vcpus_free
+
+    def _weigh_objects(self, host_states, weight_properties):
+        return [host_state.vcpus_total * host_state.cpu_allocation_ratio -
+                host_state.vcpus_used for host_state in host_states]
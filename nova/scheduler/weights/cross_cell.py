@@ -24,6 +24,7 @@ CONF = conf.CONF
 
 
 class CrossCellWeigher(weights.BaseHostWeigher):
+    AGGREGATE_MULTIPLIER = True
 
     def weight_multiplier(self, host_state):
         """How weighted this weigher should be."""
@@ -44,6 +45,28 @@ class CrossCellWeigher(weights.BaseHostWeigher):
             cell, -1 if cross-cell move and host_state is *not* within the
             preferred cell, 0 for all other cases
         """
+        preferred_cell = self._get_preferred_cell(weight_properties)
+        if preferred_cell is None:
+            # We don't know or don't care what cell we're going to be in, so
+            # noop.
+            return 0
+        # Determine if the given host is in the "preferred" cell from the
+        # request spec. If it is, weigh it higher, otherwise the host is in
+        # another cell, so weigh it lower.
+        return 1 if host_state.cell_uuid == preferred_cell else -1
+
+    def _weigh_objects(self, host_states, weight_properties):
+        preferred_cell = self._get_preferred_cell(weight_properties)
+        if preferred_cell is None:
+            return [0] * len(host_states)
+        return [1 if host_state.cell_uuid == preferred_cell else -1
+                for host_state in host_states]
+
+    @staticmethod
+    def _get_preferred_cell(weight_properties):
+        """Returns the uuid of the preferred cell for a cross-cell move or
+        None if the request is not a cross-cell move.
+        """
         # RequestSpec.requested_destination.cell should only be set for
         # move operations. The allow_cross_cell_move value will only be True if
         # policy allows.
@@ -52,12 +75,5 @@ class CrossCellWeigher(weights.BaseHostWeigher):
                 'cell' in weight_properties.requested_destination and
                 weight_properties.requested_destination.cell and
                 weight_properties.requested_destination.allow_cross_cell_move):
-            # Determine if the given host is in the "preferred" cell from
-            # the request spec. If it is, weigh it higher.
-            if (host_state.cell_uuid ==
-                    weight_properties.requested_destination.cell.uuid):
-                return 1
-            # The host is in another cell, so weigh it lower.
-            return -1
-        # We don't know or don't care what cell we're going to be in, so noop.
-        return 0
+            return weight_properties.requested_destination.cell.uuid
+        return None
@@ -29,6 +29,7 @@ CONF = nova.conf.CONF
 
 
 class DiskWeigher(weights.BaseHostWeigher):
+    AGGREGATE_MULTIPLIER = True
     minval = 0
 
     def weight_multiplier(self, host_state):
@@ -40,3 +41,6 @@ class DiskWeigher(weights.BaseHostWeigher):
     def _weigh_object(self, host_state, weight_properties):
         """Higher weights win.  We want spreading to be the default."""
         return host_state.free_disk_mb
+
+    def _weigh_objects(self, host_states, weight_properties):
+        return [host_state.free_disk_mb for host_state in host_states]
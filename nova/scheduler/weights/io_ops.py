@@ -29,6 +29,7 @@ CONF = nova.conf.CONF
 
 
 class IoOpsWeigher(weights.BaseHostWeigher):
+    AGGREGATE_MULTIPLIER = True
     minval = 0
 
     def weight_multiplier(self, host_state):
@@ -42,3 +43,6 @@ class IoOpsWeigher(weights.BaseHostWeigher):
         to be the default.
         """
         return host_state.num_io_ops
+
+    def _weigh_objects(self, host_states, weight_properties):
+        return [host_state.num_io_ops for host_state in host_states]
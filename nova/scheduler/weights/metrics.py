@@ -36,6 +36,8 @@ CONF = nova.conf.CONF
 
 
 class MetricsWeigher(weights.BaseHostWeigher):
+    AGGREGATE_MULTIPLIER = True
+
     def __init__(self):
         self._parse_setting()
 
@@ -51,6 +53,10 @@ class MetricsWeigher(weights.BaseHostWeigher):
             host_state, 'metrics_weight_multiplier',
             CONF.metrics.weight_multiplier)
 
+    def skip_if_no_multiplier(self):
+        # Missing metrics must fail the scheduling whatever the multiplier.
+        return not CONF.metrics.required
+
     def _weigh_object(self, host_state, weight_properties):
         value = 0.0
 
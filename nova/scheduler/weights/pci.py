@@ -37,6 +37,7 @@ MAX_DEVS = 100
 
 
 class PCIWeigher(weights.BaseHostWeigher):
+    AGGREGATE_MULTIPLIER = True
 
     def weight_multiplier(self, host_state):
         """Override the weight multiplier."""
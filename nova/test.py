@@ -52,6 +52,7 @@ from oslotest import base
 from oslotest import mock_fixture
 import testtools
 
+from nova import cell_health
 from nova.compute import rpcapi as compute_rpcapi
 from nova import context
 from nova import exception
@@ -228,6 +229,7 @@ class TestCase(base.BaseTestCase):
         api.CELLS = []
         context.CELL_CACHE = {}
         context.CELLS = []
+        cell_health.reset()
 
         self.computes = {}
         self.cell_mappings = {}
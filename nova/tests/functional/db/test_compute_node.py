@@ -10,8 +10,11 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import datetime
+
 from oslo_serialization import jsonutils
 from oslo_utils.fixture import uuidsentinel
+from oslo_utils import timeutils
 
 import nova.conf
 from nova import context
@@ -170,6 +173,39 @@ class ComputeNodeTestCase(test.TestCase):
         self.assertEqual(1, len(cns))
         self.assertEqual(cn1.uuid, cns[0].uuid)
 
+    def test_get_all_changed_since(self):
+        cn1 = fake_compute_obj.obj_clone()
+        cn1._context = self.context
+        cn1.create()
+
+        cn2 = fake_compute_obj.obj_clone()
+        cn2._context = self.context
+        cn2.host += '-alt'
+        cn2.create()
+
+        cn3 = fake_compute_obj.obj_clone()
+        cn3._context = self.context
+        cn3.host += '-del'
+        cn3.create()
+
+        cns = objects.ComputeNodeList.get_all_changed_since(
+            self.context, timeutils.utcnow() + datetime.timedelta(hours=1))
+        self.assertEqual(0, len(cns))
+
+        since = timeutils.utcnow() - datetime.timedelta(seconds=1)
+        cn1.vcpus_used = 1
+        cn1.save()
+        cn3.destroy()
+
+        # The created records are returned as well as the updated and the
+        # (soft) deleted ones.
+        cns = objects.ComputeNodeList.get_all_changed_since(self.context,
+                                                            since)
+        self.assertEqual(sorted([cn1.uuid, cn2.uuid, cn3.uuid]),
+                         sorted(cn.uuid for cn in cns))
+        deleted = [cn.uuid for cn in cns if cn.deleted]
+        self.assertEqual([cn3.uuid], deleted)
+
     def test_numa_topology_online_migration_when_load(self):
         """Ensure legacy NUMA topology objects are reserialized to o.vo's."""
         cn = fake_compute_obj.obj_clone()
@@ -942,6 +942,57 @@ class SchedulerReportClientTests(test.TestCase):
             resp = self.client.get('/resource_providers/%s' % uuid)
             self.assertEqual(404, resp.status_code)
 
+    def test_update_from_provider_tree_workers(self):
+        """Flush many providers, as the ironic driver does, with several
+        workers.
+        """
+        self.flags(provider_sync_workers=4, group='compute')
+        inv = {
+            orc.VCPU: {
+                'total': 8,
+                'reserved': 0,
+                'min_unit': 1,
+                'max_unit': 8,
+                'step_size': 1,
+                'allocation_ratio': 1.0,
+            },
+        }
+        nodes = [getattr(uuids, 'node%d' % i) for i in range(10)]
+        new_tree = provider_tree.ProviderTree()
+        for i, node in enumerate(nodes):
+            new_tree.new_root('node%d' % i, node)
+            new_tree.update_inventory(node, inv)
+            new_tree.update_traits(node, ['CUSTOM_BAREMETAL'])
+        self.client.update_from_provider_tree(self.context, new_tree)
+        for node in nodes:
+            self.assertEqual(
+                inv,
+                self.client._get_inventory(
+                    self.context, node)['inventories'])
+            self.assertEqual(
+                set(['CUSTOM_BAREMETAL']),
+                self.client.get_provider_traits(self.context, node).traits)
+
+        # Only the changed providers are flushed.
+        new_tree.update_aggregates(nodes[3], [uuids.agg])
+        with mock.patch.object(self.client, 'set_inventory_for_provider',
+                               wraps=self.client.set_inventory_for_provider
+                               ) as mock_set_inv:
+            self.client.update_from_provider_tree(self.context, new_tree)
+        mock_set_inv.assert_called_once_with(self.context, nodes[3], inv)
+        self.assertEqual(
+            set([uuids.agg]),
+            self.client._get_provider_aggregates(
+                self.context, nodes[3]).aggregates)
+
+        # A failure is raised and only invalidates the failing provider.
+        new_tree.update_traits(nodes[5], ['MOTSUC_FOO'])
+        self.assertRaises(
+            exception.ResourceProviderSyncFailed,
+            self.client.update_from_provider_tree, self.context, new_tree)
+        self.assertFalse(self.client._provider_tree.exists(nodes[5]))
+        self.assertTrue(self.client._provider_tree.exists(nodes[4]))
+
     def test_non_tree_aggregate_membership(self):
         """There are some methods of the reportclient that interact with the
         reportclient's provider_tree cache of information on a best-effort
@@ -1310,6 +1361,23 @@ class SchedulerReportClientTests(test.TestCase):
             self.context, self.compute_name)
         self.assertAllocations(expected, actual)
 
+    def test_delete_allocations_for_instances(self):
+        self._set_up_provider_tree()
+        self._set_up_provider_tree_allocs()
+
+        # The consumers without allocations are skipped.
+        deleted = self.client.delete_allocations_for_instances(
+            self.context, [uuids.cn_inst1, uuids.cn_inst2, uuids.missing])
+        self.assertEqual(set([uuids.cn_inst1, uuids.cn_inst2]), set(deleted))
+
+        # Only the allocations of othercn_inst are left.
+        self.assertEqual({}, self.client.get_allocations_for_provider_tree(
+            self.context, self.compute_name))
+        self.assertEqual(
+            set([uuids.othercn, uuids.ssp]),
+            set(self.client.get_allocs_for_consumer(
+                self.context, uuids.othercn_inst)['allocations']))
+
     def test_reshape(self):
         """Smoke test the report client shim for the reshaper API."""
         # Simulate placement API communication failure
@@ -722,7 +722,8 @@ class ServersControllerTest(ControllerTest):
             marker=None, search_opts={'deleted': False,
                                       'project_id': self.project_id},
             sort_dirs=['desc'], sort_keys=['created_at'],
-            cell_down_support=False, all_tenants=False)
+            cell_down_support=False, all_tenants=False,
+            columns=['uuid', 'display_name'])
 
     def test_get_server_list_with_reservation_id(self):
         req = self.req(self.path_with_query % 'reservation_id=foo')
@@ -816,7 +817,8 @@ class ServersControllerTest(ControllerTest):
             limit=1000, marker=None,
             search_opts={'deleted': False, 'project_id': self.project_id},
             sort_dirs=['desc'], sort_keys=['created_at'],
-            cell_down_support=False, all_tenants=False)
+            cell_down_support=False, all_tenants=False,
+            columns=None)
 
     def test_get_server_details_with_bad_name(self):
         req = self.req(self.path_detail_with_query % 'name=%2Binstance')
@@ -840,6 +842,42 @@ class ServersControllerTest(ControllerTest):
         expected = {'limit': ['3'], 'marker': [fakes.get_fake_uuid(2)]}
         self.assertThat(params, matchers.DictMatches(expected))
 
+    def test_get_servers_streamed(self):
+        expected = self.controller.index(
+            self.req(self.path_with_query % 'limit=3'))
+        self.flags(list_servers_stream_batch_size=2, group='api')
+        req = self.req(self.path_with_query % 'limit=3')
+        res = self.controller.index(req)
+
+        self.assertIsInstance(res, os_wsgi.ResponseObject)
+        self.assertIsInstance(res.obj, os_wsgi.JSONListStream)
+        body = res.serialize(req, 'application/json').body
+        self.assertEqual(expected, jsonutils.loads(body))
+
+    @mock.patch('nova.network.security_group_api.'
+                'get_instances_security_groups_bindings', return_value={})
+    def test_get_server_details_streamed(self, mock_sg):
+        expected = self.controller.detail(
+            self.req(self.path_detail_with_query % 'limit=3'))
+        self.assertEqual(1, mock_sg.call_count)
+        mock_sg.reset_mock()
+        self.flags(list_servers_stream_batch_size=2, group='api')
+        req = self.req(self.path_detail_with_query % 'limit=3')
+        res = self.controller.detail(req)
+
+        # Nothing is rendered until the body is written.
+        mock_sg.assert_not_called()
+        body = jsonutils.loads(res.serialize(req, 'application/json').body)
+        # The fake servers are built anew, with new timestamps, so only
+        # compare the ids and the keys of the servers.
+        self.assertEqual([(s['id'], sorted(s)) for s in expected['servers']],
+                         [(s['id'], sorted(s)) for s in body['servers']])
+        self.assertEqual(expected['servers_links'], body['servers_links'])
+        # The security groups are looked up once per batch.
+        self.assertEqual(2, mock_sg.call_count)
+        self.assertEqual([2, 1], [len(call[0][1])
+                                  for call in mock_sg.call_args_list])
+
     def test_get_server_details_with_limit_bad_value(self):
         req = self.req(self.path_detail_with_query % 'limit=aaa')
         self.assertRaises(exception.ValidationError,
@@ -935,7 +973,8 @@ class ServersControllerTest(ControllerTest):
         self.mock_get_all.assert_called_once_with(
             mock.ANY, search_opts=mock.ANY, limit=mock.ANY, marker=mock.ANY,
             expected_attrs=mock.ANY, sort_keys=[], sort_dirs=[],
-            cell_down_support=False, all_tenants=False)
+            cell_down_support=False, all_tenants=False,
+            columns=['uuid', 'display_name'])
 
     def test_get_servers_ignore_locked_sort_key(self):
         # Prior to microversion 2.73 locked sort key is ignored.
@@ -945,7 +984,8 @@ class ServersControllerTest(ControllerTest):
         self.mock_get_all.assert_called_once_with(
             mock.ANY, search_opts=mock.ANY, limit=mock.ANY, marker=mock.ANY,
             expected_attrs=mock.ANY, sort_keys=[], sort_dirs=[],
-            cell_down_support=False, all_tenants=False)
+            cell_down_support=False, all_tenants=False,
+            columns=None)
 
     def test_get_servers_ignore_sort_key_only_one_dir(self):
         req = self.req(self.path_with_query %
@@ -954,7 +994,8 @@ class ServersControllerTest(ControllerTest):
         self.mock_get_all.assert_called_once_with(
             mock.ANY, search_opts=mock.ANY, limit=mock.ANY, marker=mock.ANY,
             expected_attrs=mock.ANY, sort_keys=['user_id'],
-            sort_dirs=['asc'], cell_down_support=False, all_tenants=False)
+            sort_dirs=['asc'], cell_down_support=False, all_tenants=False,
+            columns=['uuid', 'display_name'])
 
     def test_get_servers_ignore_sort_key_with_no_sort_dir(self):
         req = self.req(self.path_with_query %
@@ -963,7 +1004,8 @@ class ServersControllerTest(ControllerTest):
         self.mock_get_all.assert_called_once_with(
             mock.ANY, search_opts=mock.ANY, limit=mock.ANY, marker=mock.ANY,
             expected_attrs=mock.ANY, sort_keys=['user_id'], sort_dirs=[],
-            cell_down_support=False, all_tenants=False)
+            cell_down_support=False, all_tenants=False,
+            columns=['uuid', 'display_name'])
 
     def test_get_servers_ignore_sort_key_with_bad_sort_dir(self):
         req = self.req(self.path_with_query %
@@ -972,7 +1014,8 @@ class ServersControllerTest(ControllerTest):
         self.mock_get_all.assert_called_once_with(
             mock.ANY, search_opts=mock.ANY, limit=mock.ANY, marker=mock.ANY,
             expected_attrs=mock.ANY, sort_keys=[], sort_dirs=[],
-            cell_down_support=False, all_tenants=False)
+            cell_down_support=False, all_tenants=False,
+            columns=['uuid', 'display_name'])
 
     def test_get_servers_non_admin_with_admin_only_sort_key(self):
         req = self.req(self.path_with_query %
@@ -988,13 +1031,15 @@ class ServersControllerTest(ControllerTest):
         self.mock_get_all.assert_called_once_with(
             mock.ANY, search_opts=mock.ANY, limit=mock.ANY, marker=mock.ANY,
             expected_attrs=mock.ANY, sort_keys=['node'], sort_dirs=['desc'],
-            cell_down_support=False, all_tenants=False)
+            cell_down_support=False, all_tenants=False,
+            columns=None)
 
     def test_get_servers_with_bad_option(self):
         def fake_get_all(context, search_opts=None,
                          limit=None, marker=None,
                          expected_attrs=None, sort_keys=None, sort_dirs=None,
-                         cell_down_support=False, all_tenants=False):
+                         cell_down_support=False, all_tenants=False,
+                         columns=None):
             db_list = [fakes.stub_instance(100, uuid=uuids.fake)]
             return instance_obj._make_instance_list(
                 context, objects.InstanceList(), db_list, FIELDS)
@@ -1011,14 +1056,16 @@ class ServersControllerTest(ControllerTest):
             limit=1000, marker=None,
             search_opts={'deleted': False, 'project_id': self.project_id},
             sort_dirs=['desc'], sort_keys=['created_at'],
-            cell_down_support=False, all_tenants=False)
+            cell_down_support=False, all_tenants=False,
+            columns=['uuid', 'display_name'])
 
     def test_get_servers_with_locked_filter(self):
         # Prior to microversion 2.73 locked filter parameter is ignored.
         def fake_get_all(context, search_opts=None,
                          limit=None, marker=None,
                          expected_attrs=None, sort_keys=None, sort_dirs=None,
-                         cell_down_support=False, all_tenants=False):
+                         cell_down_support=False, all_tenants=False,
+                         columns=None):
             db_list = [fakes.stub_instance(100, uuid=uuids.fake)]
             return instance_obj._make_instance_list(
                 context, objects.InstanceList(), db_list, FIELDS)
@@ -1035,13 +1082,15 @@ class ServersControllerTest(ControllerTest):
             limit=1000, marker=None,
             search_opts={'deleted': False, 'project_id': self.project_id},
             sort_dirs=['desc'], sort_keys=['created_at'],
-            cell_down_support=False, all_tenants=False)
+            cell_down_support=False, all_tenants=False,
+            columns=['uuid', 'display_name'])
 
     def test_get_servers_allows_image(self):
         def fake_get_all(context, search_opts=None,
                          limit=None, marker=None,
                          expected_attrs=None, sort_keys=None, sort_dirs=None,
-                         cell_down_support=False, all_tenants=False):
+                         cell_down_support=False, all_tenants=False,
+                         columns=None):
             self.assertIsNotNone(search_opts)
             self.assertIn('image', search_opts)
             self.assertEqual(search_opts['image'], '12345')
@@ -1196,7 +1245,8 @@ class ServersControllerTest(ControllerTest):
         def fake_get_all(context, search_opts=None,
                          limit=None, marker=None,
                          expected_attrs=None, sort_keys=None, sort_dirs=None,
-                         cell_down_support=False, all_tenants=False):
+                         cell_down_support=False, all_tenants=False,
+                         columns=None):
             self.assertIsNotNone(search_opts)
             self.assertIn('flavor', search_opts)
             # flavor is an integer ID
@@ -1232,7 +1282,8 @@ class ServersControllerTest(ControllerTest):
         def fake_get_all(context, search_opts=None,
                          limit=None, marker=None,
                          expected_attrs=None, sort_keys=None, sort_dirs=None,
-                         cell_down_support=False, all_tenants=False):
+                         cell_down_support=False, all_tenants=False,
+                         columns=None):
             self.assertIsNotNone(search_opts)
             self.assertIn('vm_state', search_opts)
             self.assertEqual(search_opts['vm_state'], [vm_states.ACTIVE])
@@ -1251,7 +1302,8 @@ class ServersControllerTest(ControllerTest):
         def fake_get_all(context, search_opts=None,
                          limit=None, marker=None,
                          expected_attrs=None, sort_keys=None, sort_dirs=None,
-                         cell_down_support=False, all_tenants=False):
+                         cell_down_support=False, all_tenants=False,
+                         columns=None):
             self.assertIsNotNone(search_opts)
             self.assertIn('task_state', search_opts)
             self.assertEqual([task_states.REBOOT_PENDING,
@@ -1275,7 +1327,8 @@ class ServersControllerTest(ControllerTest):
         def fake_get_all(context, search_opts=None,
                          limit=None, marker=None,
                          expected_attrs=None, sort_keys=None, sort_dirs=None,
-                         cell_down_support=False, all_tenants=False):
+                         cell_down_support=False, all_tenants=False,
+                         columns=None):
             self.assertIn('vm_state', search_opts)
             self.assertEqual(search_opts['vm_state'],
                              [vm_states.ACTIVE, vm_states.STOPPED])
@@ -1308,7 +1361,8 @@ class ServersControllerTest(ControllerTest):
         def fake_get_all(context, search_opts=None,
                          limit=None, marker=None,
                          expected_attrs=None, sort_keys=None, sort_dirs=None,
-                         cell_down_support=False, all_tenants=False):
+                         cell_down_support=False, all_tenants=False,
+                         columns=None):
             self.assertIn('vm_state', search_opts)
             self.assertEqual(search_opts['vm_state'], ['deleted'])
 
@@ -1368,7 +1422,8 @@ class ServersControllerTest(ControllerTest):
         def fake_get_all(context, search_opts=None,
                          limit=None, marker=None,
                          expected_attrs=None, sort_keys=None, sort_dirs=None,
-                         cell_down_support=False, all_tenants=False):
+                         cell_down_support=False, all_tenants=False,
+                         columns=None):
             self.assertIsNotNone(search_opts)
             self.assertIn('name', search_opts)
             self.assertEqual(search_opts['name'], 'whee.*')
@@ -1396,7 +1451,8 @@ class ServersControllerTest(ControllerTest):
         def fake_get_all(context, search_opts=None,
                          limit=None, marker=None,
                          expected_attrs=None, sort_keys=None, sort_dirs=None,
-                         cell_down_support=False, all_tenants=False):
+                         cell_down_support=False, all_tenants=False,
+                         columns=None):
             self.assertIsNotNone(search_opts)
             self.assertIn('changes-since', search_opts)
             changes_since = datetime.datetime(2011, 1, 24, 17, 8, 1,
@@ -1436,7 +1492,8 @@ class ServersControllerTest(ControllerTest):
         def fake_get_all(context, search_opts=None,
                          limit=None, marker=None,
                          expected_attrs=None, sort_keys=None, sort_dirs=None,
-                         cell_down_support=False, all_tenants=False):
+                         cell_down_support=False, all_tenants=False,
+                         columns=None):
             self.assertIsNotNone(search_opts)
             # Allowed by user
             self.assertIn('name', search_opts)
@@ -1465,7 +1522,8 @@ class ServersControllerTest(ControllerTest):
         def fake_get_all(context, search_opts=None,
                          limit=None, marker=None,
                          expected_attrs=None, sort_keys=None, sort_dirs=None,
-                         cell_down_support=False, all_tenants=False):
+                         cell_down_support=False, all_tenants=False,
+                         columns=None):
             self.assertIsNotNone(search_opts)
             # Allowed by user
             self.assertIn('name', search_opts)
@@ -1498,7 +1556,8 @@ class ServersControllerTest(ControllerTest):
         def fake_get_all(context, search_opts=None,
                          limit=None, marker=None,
                          expected_attrs=None, sort_keys=None, sort_dirs=None,
-                         cell_down_support=False, all_tenants=False):
+                         cell_down_support=False, all_tenants=False,
+                         columns=None):
             self.assertIsNotNone(search_opts)
             # Allowed by user
             self.assertIn('name', search_opts)
@@ -1536,7 +1595,8 @@ class ServersControllerTest(ControllerTest):
         def fake_get_all(context, search_opts=None,
                          limit=None, marker=None,
                          expected_attrs=None, sort_keys=None, sort_dirs=None,
-                         cell_down_support=False, all_tenants=False):
+                         cell_down_support=False, all_tenants=False,
+                         columns=None):
             self.assertIsNotNone(search_opts)
             self.assertIn('ip', search_opts)
             self.assertEqual(search_opts['ip'], r'10\..*')
@@ -1558,7 +1618,8 @@ class ServersControllerTest(ControllerTest):
         def fake_get_all(context, search_opts=None,
                          limit=None, marker=None,
                          expected_attrs=None, sort_keys=None, sort_dirs=None,
-                         cell_down_support=False, all_tenants=False):
+                         cell_down_support=False, all_tenants=False,
+                         columns=None):
             self.assertIsNotNone(search_opts)
             self.assertIn('ip6', search_opts)
             self.assertEqual(search_opts['ip6'], 'ffff.*')
@@ -1581,7 +1642,8 @@ class ServersControllerTest(ControllerTest):
         def fake_get_all(context, search_opts=None,
                          limit=None, marker=None,
                          expected_attrs=None, sort_keys=None, sort_dirs=None,
-                         cell_down_support=False, all_tenants=False):
+                         cell_down_support=False, all_tenants=False,
+                         columns=None):
             self.assertIsNotNone(search_opts)
             self.assertIn('ip6', search_opts)
             self.assertEqual(search_opts['ip6'], 'ffff.*')
@@ -1604,7 +1666,8 @@ class ServersControllerTest(ControllerTest):
         def fake_get_all(context, search_opts=None,
                          limit=None, marker=None,
                          expected_attrs=None, sort_keys=None, sort_dirs=None,
-                         cell_down_support=False, all_tenants=False):
+                         cell_down_support=False, all_tenants=False,
+                         columns=None):
             self.assertIsNotNone(search_opts)
             self.assertIn('access_ip_v4', search_opts)
             self.assertEqual(search_opts['access_ip_v4'], 'ffff.*')
@@ -1627,7 +1690,8 @@ class ServersControllerTest(ControllerTest):
         def fake_get_all(context, search_opts=None,
                          limit=None, marker=None,
                          expected_attrs=None, sort_keys=None, sort_dirs=None,
-                         cell_down_support=False, all_tenants=False):
+                         cell_down_support=False, all_tenants=False,
+                         columns=None):
             self.assertIsNotNone(search_opts)
             self.assertIn('access_ip_v6', search_opts)
             self.assertEqual(search_opts['access_ip_v6'], 'ffff.*')
@@ -1767,7 +1831,8 @@ class ServersControllerTest(ControllerTest):
         def fake_get_all(context, search_opts=None,
                          limit=None, marker=None,
                          expected_attrs=None, sort_keys=None, sort_dirs=None,
-                         cell_down_support=False, all_tenants=False):
+                         cell_down_support=False, all_tenants=False,
+                         columns=None):
             cur = api_version_request.APIVersionRequest(self.wsgi_api_version)
             v216 = api_version_request.APIVersionRequest('2.16')
             if cur >= v216:
@@ -2472,7 +2537,8 @@ class ServerControllerTestV266(ControllerTest):
         def fake_get_all(context, search_opts=None,
                          limit=None, marker=None,
                          expected_attrs=None, sort_keys=None, sort_dirs=None,
-                         cell_down_support=False, all_tenants=False):
+                         cell_down_support=False, all_tenants=False,
+                         columns=None):
             self.assertIsNotNone(search_opts)
             self.assertIn('changes-before', search_opts)
             changes_before = datetime.datetime(2011, 1, 24, 17, 8, 1,
@@ -2510,7 +2576,8 @@ class ServerControllerTestV266(ControllerTest):
         def fake_get_all(context, search_opts=None,
                          limit=None, marker=None,
                          expected_attrs=None, sort_keys=None, sort_dirs=None,
-                         cell_down_support=False, all_tenants=False):
+                         cell_down_support=False, all_tenants=False,
+                         columns=None):
             self.assertIsNotNone(search_opts)
             self.assertIn('changes-since', search_opts)
             changes_since = datetime.datetime(2011, 1, 23, 17, 8, 1,
@@ -2582,7 +2649,8 @@ class ServersControllerTestV273(ControllerTest):
         def fake_get_all(context, search_opts=None,
                          limit=None, marker=None,
                          expected_attrs=None, sort_keys=None, sort_dirs=None,
-                         cell_down_support=False, all_tenants=False):
+                         cell_down_support=False, all_tenants=False,
+                         columns=None):
             db_list = [fakes.stub_instance(
                        100, uuid=uuids.fake, locked_by='fake')]
             return instance_obj._make_instance_list(
@@ -2602,13 +2670,15 @@ class ServersControllerTestV273(ControllerTest):
             limit=1000, marker=None,
             search_opts=search,
             sort_dirs=['desc'], sort_keys=['created_at'],
-            cell_down_support=False, all_tenants=False)
+            cell_down_support=False, all_tenants=False,
+            columns=['uuid', 'display_name'])
 
     def test_get_servers_with_locked_filter_invalid_value(self):
         def fake_get_all(context, search_opts=None,
                          limit=None, marker=None,
                          expected_attrs=None, sort_keys=None, sort_dirs=None,
-                         cell_down_support=False, all_tenants=False):
+                         cell_down_support=False, all_tenants=False,
+                         columns=None):
             db_list = [fakes.stub_instance(
                        100, uuid=uuids.fake, locked_by='fake')]
             return instance_obj._make_instance_list(
@@ -2625,7 +2695,8 @@ class ServersControllerTestV273(ControllerTest):
         def fake_get_all(context, search_opts=None,
                          limit=None, marker=None,
                          expected_attrs=None, sort_keys=None, sort_dirs=None,
-                         cell_down_support=False, all_tenants=False):
+                         cell_down_support=False, all_tenants=False,
+                         columns=None):
             db_list = [fakes.stub_instance(
                        100, uuid=uuids.fake, locked_by='fake')]
             return instance_obj._make_instance_list(
@@ -2642,7 +2713,8 @@ class ServersControllerTestV273(ControllerTest):
         def fake_get_all(context, search_opts=None,
                          limit=None, marker=None,
                          expected_attrs=None, sort_keys=None, sort_dirs=None,
-                         cell_down_support=False, all_tenants=False):
+                         cell_down_support=False, all_tenants=False,
+                         columns=None):
             db_list = [fakes.stub_instance(
                        100, uuid=uuids.fake, locked_by='fake')]
             return instance_obj._make_instance_list(
@@ -2661,7 +2733,8 @@ class ServersControllerTestV273(ControllerTest):
             limit=1000, marker=None,
             search_opts={'deleted': False, 'project_id': self.project_id},
             sort_dirs=['desc'], sort_keys=['locked'],
-            cell_down_support=False, all_tenants=False)
+            cell_down_support=False, all_tenants=False,
+            columns=['uuid', 'display_name'])
 
 
 class ServersControllerTestV275(ControllerTest):
@@ -7194,18 +7267,65 @@ class ServersViewBuilderTest(test.TestCase):
     @mock.patch('nova.context.scatter_gather_cells')
     def test_get_volumes_attached_with_faily_cells(self, mock_sg):
         bdms = fake_bdms_get_all_by_instance_uuids()
+        fault = objects.InstanceFault(instance_uuid=self.instance.uuid)
         # just faking a nova list scenario
         mock_sg.return_value = {
-            uuids.cell1: bdms[0],
+            uuids.cell1: (bdms[0], [fault]),
             uuids.cell2: exception.BDMNotFound(id='fake')
         }
         ctxt = context.RequestContext('fake', fakes.FAKE_PROJECT_ID)
-        result = self.view_builder._get_instance_bdms_in_multiple_cells(
+        result = self.view_builder._get_instance_details_in_multiple_cells(
             ctxt, [self.instance.uuid])
         # will get the result from cell1
-        self.assertEqual(result, bdms[0])
+        self.assertEqual((bdms[0], {self.instance.uuid: fault}), result)
         mock_sg.assert_called_once()
 
+    @mock.patch('nova.network.security_group_api.'
+                'get_instances_security_groups_bindings', return_value={})
+    @mock.patch('nova.objects.InstanceFaultList.get_latest_by_instance_uuids')
+    @mock.patch('nova.objects.BlockDeviceMappingList.bdms_by_instance_uuid',
+                return_value={})
+    @mock.patch('nova.objects.InstanceMappingList.get_by_instance_uuids')
+    def test_detail_lookups_per_cell(self, mock_im, mock_bdms, mock_faults,
+                                     mock_sg):
+        cells = [self.cell_mappings['cell0'], self.cell_mappings['cell1']]
+        for count in (2, 20):
+            instances = []
+            for i in range(count):
+                instance = self.instance.obj_clone()
+                instance.uuid = uuidutils.generate_uuid()
+                instance.vm_state = vm_states.ERROR
+                instances.append(instance)
+            instances = objects.InstanceList(objects=instances)
+            mock_im.return_value = [
+                objects.InstanceMapping(instance_uuid=instance.uuid,
+                                        cell_mapping=cells[i % 2])
+                for i, instance in enumerate(instances)]
+            mock_faults.return_value = objects.InstanceFaultList(
+                objects=[objects.InstanceFault(
+                    instance_uuid=instances[0].uuid, code=404,
+                    message='fake', details='', host='fake',
+                    created_at=timeutils.utcnow())])
+            for mock_call in (mock_im, mock_bdms, mock_faults, mock_sg):
+                mock_call.reset_mock()
+
+            output = self.view_builder.detail(self.request, instances)
+
+            self.assertEqual(count, len(output['servers']))
+            self.assertEqual('fake', output['servers'][0]['fault']['message'])
+            # One query of the instance mappings, one query of the block
+            # device mappings and one of the faults per cell, and one query
+            # of the security groups, whatever the number of servers.
+            self.assertEqual(1, mock_im.call_count)
+            self.assertEqual(2, mock_bdms.call_count)
+            self.assertEqual(2, mock_faults.call_count)
+            self.assertEqual(1, mock_sg.call_count)
+            self.assertEqual(
+                sorted(range(count), key=lambda i: i % 2),
+                [[instance.uuid for instance in instances].index(uuid)
+                 for call in mock_bdms.call_args_list
+                 for uuid in call[0][1]])
+
     def test_build_server(self):
         expected_server = {
             "server": {
@@ -194,6 +194,34 @@ class JSONDictSerializerTest(test.NoDBTestCase):
         self.assertEqual(result, expected_json)
 
 
+class JSONListStreamTest(test.NoDBTestCase):
+    def test_iter(self):
+        stream = wsgi.JSONListStream(
+            'servers', iter([[{'id': 1}, {'id': 2}], [], [{'id': 3}]]),
+            extra={'servers_links': [{'rel': 'next'}]})
+        expected = wsgi.JSONDictSerializer().serialize(
+            {'servers': [{'id': 1}, {'id': 2}, {'id': 3}],
+             'servers_links': [{'rel': 'next'}]})
+        chunks = list(stream)
+        self.assertEqual(4, len(chunks))
+        self.assertEqual(expected, b''.join(chunks).decode('utf-8'))
+
+    def test_iter_empty(self):
+        stream = wsgi.JSONListStream('servers', iter([]))
+        self.assertEqual({'servers': []},
+                         jsonutils.loads(b''.join(stream)))
+
+    def test_iter_fails(self):
+        def batches():
+            yield [{'id': 1}]
+            raise test.TestingException()
+
+        stream = iter(wsgi.JSONListStream('servers', batches()))
+        self.assertEqual(b'{"servers": [', next(stream))
+        self.assertEqual(b'{"id": 1}', next(stream))
+        self.assertRaises(test.TestingException, next, stream)
+
+
 class JSONDeserializerTest(test.NoDBTestCase):
     def test_json(self):
         data = """{"a": {
@@ -823,6 +851,16 @@ class ResponseObjectTest(test.NoDBTestCase):
         hdrs['hEADER'] = 'bar'
         self.assertEqual(robj['hEADER'], 'foo')
 
+    def test_serialize_stream(self):
+        robj = wsgi.ResponseObject(
+            wsgi.JSONListStream('servers', iter([[{'id': 1}]])))
+        robj['Header'] = 'foo'
+        response = robj.serialize(mock.sentinel.request, 'application/json')
+        self.assertEqual('foo', response.headers['Header'])
+        self.assertEqual('application/json', response.headers['Content-Type'])
+        self.assertEqual({'servers': [{'id': 1}]},
+                         jsonutils.loads(response.body))
+
 
 class ValidBodyTest(test.NoDBTestCase):
 
@@ -22,6 +22,7 @@ import ddt
 import fixtures
 import mock
 from oslo_db import exception as db_exc
+import oslo_messaging as messaging
 from oslo_serialization import jsonutils
 from oslo_utils.fixture import uuidsentinel
 from oslo_utils import uuidutils
@@ -2989,6 +2990,85 @@ class TestNovaManagePlacement(test.NoDBTestCase):
         self.assertEqual((1, 0), ret)
 
 
+class TestNovaManageScheduler(test.NoDBTestCase):
+    """Unit tests for the nova-manage scheduler commands."""
+
+    def setUp(self):
+        super(TestNovaManageScheduler, self).setUp()
+        self.output = StringIO()
+        self.useFixture(fixtures.MonkeyPatch('sys.stdout', self.output))
+        self.cli = manage.SchedulerCommands()
+
+    @mock.patch('nova.scheduler.rpcapi.SchedulerAPI.get_traces')
+    def test_trace(self, mock_get_traces):
+        mock_get_traces.return_value = {
+            'host': 'sched1', 'enabled': True, 'histograms': None,
+            'traces': [{
+                'request_id': 'req-1',
+                'instance_uuids': [uuidsentinel.instance],
+                'started_at': '2021-01-01T00:00:00.000000',
+                'result': 'Success', 'duration_ms': 12.5,
+                'phases': [
+                    {'name': 'placement', 'count': 1, 'duration_ms': 8.0},
+                    {'name': 'filter:ComputeFilter', 'count': 1,
+                     'duration_ms': 0.25}]}]}
+
+        self.assertEqual(0, self.cli.trace(host='sched1', limit=1))
+
+        mock_get_traces.assert_called_once_with(
+            test.MatchType(context.RequestContext), host='sched1', limit=1,
+            histograms=False)
+        output = self.output.getvalue()
+        self.assertIn('Scheduler service: sched1', output)
+        self.assertIn('Request req-1 started at 2021-01-01T00:00:00.000000 '
+                      'for 1 instance(s): Success in 12.5 ms', output)
+        self.assertIn('filter:ComputeFilter', output)
+        self.assertIn('0.25', output)
+
+    @mock.patch('nova.scheduler.rpcapi.SchedulerAPI.get_traces')
+    def test_trace_histograms(self, mock_get_traces):
+        mock_get_traces.return_value = {
+            'host': 'sched1', 'enabled': True, 'traces': [],
+            'histograms': {
+                'placement': {'count': 3, 'duration_ms': 30.0,
+                              'buckets': [[10, 2], [None, 1]]}}}
+
+        self.assertEqual(0, self.cli.trace(histograms=True))
+
+        output = self.output.getvalue()
+        self.assertIn('<= 10 ms', output)
+        self.assertIn('More', output)
+        self.assertIn('placement', output)
+
+    @mock.patch('nova.scheduler.rpcapi.SchedulerAPI.get_traces')
+    def test_trace_histograms_disabled(self, mock_get_traces):
+        mock_get_traces.return_value = {
+            'host': 'sched1', 'enabled': True, 'traces': [],
+            'histograms': None}
+
+        self.assertEqual(0, self.cli.trace(histograms=True))
+        self.assertIn('Histograms are disabled', self.output.getvalue())
+
+    @mock.patch('nova.scheduler.rpcapi.SchedulerAPI.get_traces')
+    def test_trace_disabled(self, mock_get_traces):
+        mock_get_traces.return_value = {
+            'host': 'sched1', 'enabled': False, 'traces': [],
+            'histograms': None}
+
+        self.assertEqual(1, self.cli.trace())
+        self.assertIn('Tracing is disabled on the scheduler service sched1',
+                      self.output.getvalue())
+
+    @mock.patch('nova.scheduler.rpcapi.SchedulerAPI.get_traces',
+                side_effect=messaging.MessagingTimeout)
+    def test_trace_timeout(self, mock_get_traces):
+        self.assertEqual(2, self.cli.trace())
+        self.assertIn('did not answer', self.output.getvalue())
+
+    def test_trace_invalid_limit(self):
+        self.assertEqual(127, self.cli.trace(limit=0))
+
+
 class TestNovaManageMain(test.NoDBTestCase):
     """Tests the nova-manage:main() setup code."""
 
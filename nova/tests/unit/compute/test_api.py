@@ -6069,11 +6069,55 @@ class _ComputeAPIUnitTestMixIn(object):
                 cell_down_support=False)
             fields = ['metadata', 'info_cache', 'security_groups']
             mock_inst_get.assert_called_once_with(self.context, {}, None, None,
-                fields, None, None, cell_down_support=False)
+                fields, None, None, cell_down_support=False,
+                columns=None)
             for i, instance in enumerate(cell_instances):
                 self.assertEqual(instance, insts[i])
             mock_get_ims.assert_not_called()
 
+    @mock.patch.object(objects.BuildRequestList, 'get_by_filters')
+    def test_get_all_columns(self, mock_buildreq_get):
+        mock_buildreq_get.return_value = objects.BuildRequestList()
+        cell_instances = self._list_of_instances(2)
+        with mock.patch('nova.compute.instance_list.'
+                        'get_instance_objects_sorted') as mock_inst_get:
+            mock_inst_get.return_value = objects.InstanceList(
+                self.context, objects=cell_instances), []
+            insts = self.compute_api.get_all(
+                self.context, expected_attrs=['flavor'],
+                columns=['uuid', 'display_name'])
+            # Only the expected attributes are joined.
+            mock_inst_get.assert_called_once_with(
+                self.context, {}, None, None, ['flavor'], None, None,
+                cell_down_support=False, columns=['uuid', 'display_name'])
+            self.assertEqual(cell_instances, insts.objects)
+
+    @mock.patch.object(neutron_api.API, 'has_substr_port_filtering_extension',
+                       return_value=False)
+    @mock.patch.object(objects.BuildRequestList, 'get_by_filters',
+                       new_callable=mock.NonCallableMock)
+    def test_get_all_columns_ip_filter(self, mock_buildreq_get,
+                                       mock_check_ext):
+        cell_instances = self._list_of_instances(2)
+        with test.nested(
+            mock.patch('nova.compute.instance_list.'
+                       'get_instance_objects_sorted'),
+            mock.patch.object(self.compute_api, '_ip_filter')
+        ) as (mock_inst_get, mock_ip_filter):
+            mock_inst_get.return_value = objects.InstanceList(
+                self.context, objects=cell_instances), []
+            self.compute_api.get_all(
+                self.context, search_opts={'ip': 'fake'},
+                columns=['uuid', 'display_name'])
+            # The instances are filtered by IP address in memory, with their
+            # network info, so they are loaded whole.
+            fields = ['metadata', 'info_cache', 'security_groups']
+            mock_inst_get.assert_called_once_with(
+                self.context, {'ip': 'fake'}, None, None, fields, None, None,
+                cell_down_support=False, columns=None)
+            mock_ip_filter.assert_called_once_with(mock.ANY, {'ip': 'fake'},
+                                                   None)
+
     @mock.patch.object(objects.BuildRequestList, 'get_by_filters')
     @mock.patch.object(objects.InstanceMappingList,
                        'get_not_deleted_by_cell_and_project')
@@ -6099,7 +6143,8 @@ class _ComputeAPIUnitTestMixIn(object):
             fields = ['metadata', 'info_cache', 'security_groups']
             mock_inst_get.assert_called_once_with(self.context, {},
                                                   3, None, fields, None, None,
-                                                  cell_down_support=True)
+                                                  cell_down_support=True,
+                                                  columns=None)
             for i, instance in enumerate(partial_instances + full_instances):
                 self.assertTrue(obj_base.obj_equal_prims(instance, insts[i]))
             # With an original limit of 3, and 0 build requests but 2 instances
@@ -6436,7 +6481,8 @@ class _ComputeAPIUnitTestMixIn(object):
             fields = ['metadata', 'info_cache', 'security_groups']
             mock_inst_get.assert_called_once_with(
                 self.context, {'foo': 'bar'}, None, None,
-                fields, ['baz'], ['desc'], cell_down_support=False)
+                fields, ['baz'], ['desc'], cell_down_support=False,
+                columns=None)
             for i, instance in enumerate(build_req_instances + cell_instances):
                 self.assertEqual(instance, instances[i])
 
@@ -6471,7 +6517,8 @@ class _ComputeAPIUnitTestMixIn(object):
             fields = ['metadata', 'info_cache', 'security_groups']
             mock_inst_get.assert_called_once_with(
                 self.context, {'foo': 'bar'}, None, None,
-                fields, ['baz'], ['desc'], cell_down_support=False)
+                fields, ['baz'], ['desc'], cell_down_support=False,
+                columns=None)
             for i, instance in enumerate(build_req_instances + cell_instances):
                 self.assertEqual(instance, instances[i])
 
@@ -6506,7 +6553,8 @@ class _ComputeAPIUnitTestMixIn(object):
             fields = ['metadata', 'info_cache', 'security_groups']
             mock_inst_get.assert_called_once_with(
                 self.context, {'foo': 'bar'}, 8, None,
-                fields, ['baz'], ['desc'], cell_down_support=False)
+                fields, ['baz'], ['desc'], cell_down_support=False,
+                columns=None)
             for i, instance in enumerate(build_req_instances + cell_instances):
                 self.assertEqual(instance, instances[i])
 
@@ -6544,7 +6592,8 @@ class _ComputeAPIUnitTestMixIn(object):
             mock_inst_get.assert_called_once_with(
                 mock.ANY, {'foo': 'bar'},
                 8, None,
-                fields, ['baz'], ['desc'], cell_down_support=False)
+                fields, ['baz'], ['desc'], cell_down_support=False,
+                columns=None)
             for i, instance in enumerate(build_req_instances +
                                          cell_instances):
                 self.assertEqual(instance, instances[i])
@@ -7271,7 +7320,8 @@ class ComputeAPIUnitTestCase(_ComputeAPIUnitTestMixIn, test.NoDBTestCase):
             fields = ['metadata', 'info_cache', 'security_groups']
             mock_inst_get.assert_called_once_with(
                 self.context, {'ip': 'fake', 'uuid': ['fake_device_id']},
-                None, None, fields, ['baz'], ['desc'], cell_down_support=False)
+                None, None, fields, ['baz'], ['desc'], cell_down_support=False,
+                columns=None)
 
     @mock.patch.object(neutron_api.API, 'has_substr_port_filtering_extension')
     @mock.patch.object(neutron_api.API, 'list_ports')
@@ -7299,7 +7349,8 @@ class ComputeAPIUnitTestCase(_ComputeAPIUnitTestMixIn, test.NoDBTestCase):
             fields = ['metadata', 'info_cache', 'security_groups']
             mock_inst_get.assert_called_once_with(
                 self.context, {'ip6': 'fake', 'uuid': ['fake_device_id']},
-                None, None, fields, ['baz'], ['desc'], cell_down_support=False)
+                None, None, fields, ['baz'], ['desc'], cell_down_support=False,
+                columns=None)
 
     @mock.patch.object(neutron_api.API, 'has_substr_port_filtering_extension')
     @mock.patch.object(neutron_api.API, 'list_ports')
@@ -7333,7 +7384,8 @@ class ComputeAPIUnitTestCase(_ComputeAPIUnitTestMixIn, test.NoDBTestCase):
             mock_inst_get.assert_called_once_with(
                 self.context, {'ip': 'fake1', 'ip6': 'fake2',
                                'uuid': ['fake_device_id', 'fake_device_id']},
-                None, None, fields, ['baz'], ['desc'], cell_down_support=False)
+                None, None, fields, ['baz'], ['desc'], cell_down_support=False,
+                columns=None)
 
     @mock.patch.object(neutron_api.API, 'has_substr_port_filtering_extension')
     @mock.patch.object(neutron_api.API, 'list_ports')
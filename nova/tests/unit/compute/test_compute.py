@@ -5658,8 +5658,8 @@ class ComputeTestCase(BaseTestCase,
         instance.system_metadata = {}
         instance.save()
 
-        self.rt.tracked_migrations[instance.uuid] = (migration,
-                                                     instance.flavor)
+        self.rt.tracked_migrations[NODENAME][instance.uuid] = (
+            migration, instance.flavor)
         cn = self.rt.compute_nodes[NODENAME]
         cn.numa_topology = jsonutils.dumps(
             host_numa_topology.obj_to_primitive())
@@ -5721,7 +5721,7 @@ class ComputeTestCase(BaseTestCase,
         instance.save()
 
         self.rt.pci_tracker = mock.Mock()
-        self.rt.tracked_migrations[instance.uuid] = migration
+        self.rt.tracked_migrations[NODENAME][instance.uuid] = migration
 
         with test.nested(
             mock.patch.object(self.compute.network_api,
@@ -387,6 +387,69 @@ class ComputeManagerUnitTestCase(test.NoDBTestCase,
             else:
                 self.assertFalse(db_node.destroy.called)
 
+    @mock.patch.object(manager.ComputeManager,
+                       '_update_available_resource_for_node')
+    def test_update_available_resource_for_nodes_workers(self, update_mock):
+        self.flags(resource_update_workers=3, group='compute')
+        nodes = ['node%d' % i for i in range(5)]
+        with mock.patch.object(
+                manager.utils, 'spawn', wraps=manager.utils.spawn) as spawn:
+            self.compute._update_available_resource_for_nodes(
+                self.context, nodes, startup=True)
+        self.assertEqual(3, spawn.call_count)
+        update_mock.assert_has_calls(
+            [mock.call(self.context, node, startup=True) for node in nodes],
+            any_order=True)
+        self.assertEqual(set(nodes),
+                         set(self.compute._node_update_durations))
+
+        # The slowest nodes of the previous run are started first and the
+        # nodes which are gone are forgotten.
+        self.compute._node_update_durations = {
+            'node0': 1, 'node1': 3, 'node2': 2, 'node3': 0, 'node4': 4}
+        self.flags(resource_update_workers=1, group='compute')
+        update_mock.reset_mock()
+        self.compute._update_available_resource_for_nodes(
+            self.context, nodes[:4])
+        self.assertEqual(
+            [mock.call(self.context, node, startup=False)
+             for node in ('node1', 'node2', 'node0', 'node3')],
+            update_mock.call_args_list)
+        self.assertEqual(set(nodes[:4]),
+                         set(self.compute._node_update_durations))
+
+    @mock.patch.object(manager.ComputeManager,
+                       '_update_available_resource_for_node')
+    def test_update_available_resource_for_nodes_workers_error(
+            self, update_mock):
+        self.flags(resource_update_workers=2, group='compute')
+        update_mock.side_effect = [
+            None, exception.ReshapeFailed(error='error'), None]
+        self.assertRaises(
+            exception.ReshapeFailed,
+            self.compute._update_available_resource_for_nodes,
+            self.context, ['node%d' % i for i in range(10)], startup=True)
+        # The workers stop picking up nodes after the error.
+        self.assertLessEqual(update_mock.call_count, 3)
+
+    @mock.patch.object(manager, 'LOG')
+    @mock.patch.object(manager.timeutils.StopWatch, 'elapsed',
+                       return_value=7)
+    @mock.patch.object(manager.ComputeManager,
+                       '_update_available_resource_for_node')
+    def test_update_available_resource_for_nodes_slow(
+            self, update_mock, mock_elapsed, mock_log):
+        self.compute._update_available_resource_for_nodes(
+            self.context, ['node1'])
+        mock_log.warning.assert_not_called()
+
+        self.flags(update_resources_interval=5)
+        self.compute._update_available_resource_for_nodes(
+            self.context, ['node1'])
+        mock_log.warning.assert_called_once()
+        self.assertEqual('node1 (7.00s)',
+                         mock_log.warning.call_args[0][1]['slowest'])
+
     @mock.patch('nova.scheduler.client.report.SchedulerReportClient.'
                 'delete_resource_provider')
     @mock.patch.object(manager.ComputeManager,
@@ -5720,6 +5783,11 @@ class ComputeManagerUnitTestCase(test.NoDBTestCase,
         times = reportclient._association_refresh_time
         self.assertEqual({}, times)
 
+    def test_reset_marks_providers_for_update(self):
+        self.compute.rt.provider_update_times['fake-node'] = 1
+        self.compute.reset()
+        self.assertEqual({}, self.compute.rt.provider_update_times)
+
     @mock.patch('nova.objects.BlockDeviceMappingList.get_by_instance_uuid')
     @mock.patch('nova.compute.manager.ComputeManager._delete_instance')
     def test_terminate_instance_no_bdm_volume_id(self, mock_delete_instance,
@@ -8595,8 +8663,8 @@ class ComputeManagerMigrationTestCase(test.NoDBTestCase,
                              mock_finish_revert,
                              mock_drop_move_claim):
 
-            self.compute.rt.tracked_migrations[self.instance['uuid']] = (
-                self.migration, None)
+            self.compute.rt.tracked_migrations[self.instance['node']][
+                self.instance['uuid']] = (self.migration, None)
             self.instance.migration_context = objects.MigrationContext()
             self.migration.source_compute = self.instance['host']
             self.migration.source_node = self.instance['node']
@@ -86,6 +86,21 @@ class TestInstanceList(test.NoDBTestCase):
 
         self.assertEqual(insts_one, insts_two)
 
+    @mock.patch('nova.db.api.instance_get_all_by_filters_sort')
+    def test_get_instances_sorted_columns(self, mock_inst):
+        # A cell may be queried again for the records past its last one.
+        mock_inst.side_effect = list(self.insts.values()) + [[]] * 3
+
+        obj, insts = instance_list.get_instances_sorted(
+            self.context, {}, None, None, [], ['hostname'], ['asc'],
+            cell_mappings=self.cells, columns=['hostname'])
+        self.assertEqual(9, len(list(insts)))
+
+        # The columns are queried from each cell.
+        self.assertTrue(mock_inst.called)
+        for call in mock_inst.call_args_list:
+            self.assertEqual(['hostname'], call[1]['columns'])
+
     @mock.patch('nova.objects.BuildRequestList.get_by_filters')
     @mock.patch('nova.compute.instance_list.get_instances_sorted')
     @mock.patch('nova.objects.CellMappingList.get_by_project_id')
@@ -100,7 +115,8 @@ class TestInstanceList(test.NoDBTestCase):
                                         None, None,
                                         cell_mappings=mock_cm.return_value,
                                         batch_size=1000,
-                                        cell_down_support=False)
+                                        cell_down_support=False,
+                                        cursor_cache=None, columns=None)
 
     @mock.patch('nova.context.CELLS', new=FAKE_CELLS)
     @mock.patch('nova.context.load_cells')
@@ -118,7 +134,8 @@ class TestInstanceList(test.NoDBTestCase):
                                         None, None,
                                         cell_mappings=FAKE_CELLS,
                                         batch_size=100,
-                                        cell_down_support=False)
+                                        cell_down_support=False,
+                                        cursor_cache=None, columns=None)
         mock_cm.assert_not_called()
         mock_lc.assert_called_once_with()
 
@@ -138,7 +155,8 @@ class TestInstanceList(test.NoDBTestCase):
                                         None, None,
                                         cell_mappings=FAKE_CELLS,
                                         batch_size=100,
-                                        cell_down_support=False)
+                                        cell_down_support=False,
+                                        cursor_cache=None, columns=None)
         mock_lc.assert_called_once_with()
 
     @mock.patch('nova.context.CELLS', new=FAKE_CELLS)
@@ -159,7 +177,8 @@ class TestInstanceList(test.NoDBTestCase):
                                         None, None,
                                         cell_mappings=FAKE_CELLS,
                                         batch_size=100,
-                                        cell_down_support=False)
+                                        cell_down_support=False,
+                                        cursor_cache=None, columns=None)
         mock_cm.assert_not_called()
         mock_lc.assert_called_once_with()
 
@@ -249,6 +268,19 @@ class TestInstanceList(test.NoDBTestCase):
         # constructing partial results later.
         self.assertEqual(uuid_initial, uuid_final)
 
+    def test_get_cursor_cache_disabled(self):
+        self.assertIsNone(instance_list._get_cursor_cache())
+
+    @mock.patch('nova.cache_utils.get_client')
+    def test_get_cursor_cache(self, mock_client):
+        self.flags(instance_list_cursor_expiration=300, group='api')
+        self.addCleanup(instance_list.reset_cursor_cache)
+        self.assertEqual(mock_client.return_value,
+                         instance_list._get_cursor_cache())
+        self.assertEqual(mock_client.return_value,
+                         instance_list._get_cursor_cache())
+        mock_client.assert_called_once_with(expiration_time=300)
+
     def test_batch_size_fixed(self):
         fixed_size = 200
         self.flags(instance_list_cells_batch_strategy='fixed', group='api')
@@ -10,6 +10,7 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import base64
 from contextlib import contextmanager
 import copy
 import datetime
@@ -178,12 +179,13 @@ class TestLister(multi_cell_list.CrossCellLister):
     CONTEXT_CLS = TestListContext
 
     def __init__(self, data, sort_keys, sort_dirs,
-                 cells=None, batch_size=None):
+                 cells=None, batch_size=None, cursor_cache=None):
         self._data = data
         self._count_by_cell = {}
         super(TestLister, self).__init__(self.CONTEXT_CLS(sort_keys,
                                                           sort_dirs),
-                                         cells=cells, batch_size=batch_size)
+                                         cells=cells, batch_size=batch_size,
+                                         cursor_cache=cursor_cache)
 
     @property
     def marker_identifier(self):
@@ -435,3 +437,137 @@ class TestBaseClass(test.NoDBTestCase):
         self.assertEqual(sorted([cell.uuid for cell in cells
                                  if cell.uuid != uuids.cell1]),
                          gmbv_summary['called_in_cell'])
+
+
+class FakeCursorCache(object):
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value):
+        self.data[key] = value
+
+
+class MarkerNotFoundLister(TestLister):
+    def get_by_filters(self, ctx, filters, limit, marker, **kwargs):
+        if marker == 'gone':
+            raise exception.MarkerNotFound(marker=marker)
+        return super(MarkerNotFoundLister, self).get_by_filters(
+            ctx, filters, limit, marker, **kwargs)
+
+
+@mock.patch('nova.context.target_cell', new=target_cell_cheater)
+class TestCursor(test.NoDBTestCase):
+    def setUp(self):
+        super(TestCursor, self).setUp()
+        self.data = [{'id': 'foo-%i' % i} for i in range(0, 300)]
+        self.cells = [objects.CellMapping(uuid=getattr(uuids, 'cell%i' % i),
+                                          name='cell%i' % i)
+                      for i in range(0, 3)]
+        self.cache = FakeCursorCache()
+        self.ctx = context.RequestContext()
+
+    def _set_cursor(self, lister, marker, positions, counts):
+        self.cache.set(lister._get_cursor_key({}, marker),
+                       multi_cell_list.encode_cursor(positions, counts))
+
+    def test_encode_decode(self):
+        positions = {uuids.cell0: None,
+                     uuids.cell1: multi_cell_list._CELL_DONE,
+                     uuids.cell2: ('foo', True)}
+        counts = {uuids.cell0: 3, uuids.cell2: 7}
+        self.assertEqual(
+            (positions, counts),
+            multi_cell_list.decode_cursor(
+                multi_cell_list.encode_cursor(positions, counts)))
+
+    def test_decode_invalid(self):
+        self.assertIsNone(multi_cell_list.decode_cursor('foo'))
+        self.assertIsNone(multi_cell_list.decode_cursor(
+            base64.urlsafe_b64encode(b'{"v": 2, "p": {}, "n": {}}')))
+
+    def test_cursor_key(self):
+        lister = TestLister([], ['id'], ['asc'], cells=self.cells)
+        key = lister._get_cursor_key({'deleted': False}, 'foo')
+        self.assertTrue(key.startswith('cell-list-cursor-foo-'))
+        self.assertEqual(
+            key, lister._get_cursor_key({'deleted': False}, 'foo'))
+        self.assertNotEqual(
+            key, lister._get_cursor_key({'deleted': True}, 'foo'))
+        lister = TestLister([], ['id'], ['desc'], cells=self.cells)
+        self.assertNotEqual(
+            key, lister._get_cursor_key({'deleted': False}, 'foo'))
+
+    def test_next_page_from_cursor(self):
+        lister = TestLister(self.data, [], [], cells=self.cells,
+                            cursor_cache=self.cache)
+        result = list(lister.get_records_sorted(self.ctx, {}, 10, None))
+        self.assertEqual(1, len(self.cache.data))
+        self.assertIsNotNone(self.cache.get(
+            lister._get_cursor_key({}, result[-1]['id'])))
+
+        result = list(lister.get_records_sorted(self.ctx, {}, 10,
+                                                result[-1]['id']))
+        self.assertEqual(10, len(result))
+
+        # The markers were not looked up for the second page.
+        self.assertEqual(0, lister.call_summary('get_marker_record')['total'])
+        self.assertEqual(
+            0, lister.call_summary('get_marker_by_values')['total'])
+        self.assertEqual(2, len(self.cache.data))
+
+    def test_next_page_without_cursor(self):
+        lister = TestLister(self.data, [], [], cells=self.cells,
+                            cursor_cache=self.cache)
+        list(lister.get_records_sorted(self.ctx, {}, 10, 'foo'))
+        self.assertEqual(
+            1, lister.call_summary('get_marker_record')['total'])
+        self.assertEqual(
+            2, lister.call_summary('get_marker_by_values')['total'])
+
+    def test_no_cursor_for_partial_page(self):
+        lister = TestLister(self.data[:5], [], [], cells=self.cells,
+                            cursor_cache=self.cache)
+        list(lister.get_records_sorted(self.ctx, {}, 10, None))
+        self.assertEqual({}, self.cache.data)
+
+    def test_adaptive_first_batch(self):
+        lister = TestLister(self.data, [], [], cells=self.cells,
+                            batch_size=100, cursor_cache=self.cache)
+        self._set_cursor(lister, 'foo',
+                         {uuids.cell0: ('foo', False),
+                          uuids.cell1: ('bar', False),
+                          uuids.cell2: multi_cell_list._CELL_DONE},
+                         {uuids.cell0: 90, uuids.cell1: 10})
+        list(lister.get_records_sorted(self.ctx, {}, 100, 'foo'))
+
+        self.assertEqual(
+            sorted([uuids.cell0, uuids.cell1]),
+            lister.call_summary('get_by_filters')['called_in_cell'])
+        calls = {cell: methods['get_by_filters']
+                 for cell, methods in lister._count_by_cell.items()}
+        # The first batch of each cell is sized after its share of the
+        # previous page, plus 10%.
+        self.assertEqual(100, calls[uuids.cell0][0])
+        self.assertEqual(12, calls[uuids.cell1][0])
+        self.assertEqual(0, lister.call_summary('get_marker_record')['total'])
+
+    def test_cursor_marker_not_found(self):
+        lister = MarkerNotFoundLister(self.data, [], [], cells=self.cells,
+                                      cursor_cache=self.cache)
+        self._set_cursor(lister, 'foo',
+                         {uuids.cell0: ('gone', False),
+                          uuids.cell1: ('foo', False),
+                          uuids.cell2: multi_cell_list._CELL_DONE},
+                         {uuids.cell0: 5, uuids.cell1: 5})
+        result = list(lister.get_records_sorted(self.ctx, {}, 10, 'foo'))
+        self.assertEqual(10, len(result))
+
+        # Only the cell whose record was gone looked up the marker.
+        self.assertEqual(
+            [None], lister.call_summary('get_marker_record')['called_in_cell'])
+        self.assertEqual(
+            [uuids.cell0],
+            lister.call_summary('get_marker_by_values')['called_in_cell'])
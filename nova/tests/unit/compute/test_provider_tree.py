@@ -430,6 +430,57 @@ class TestProviderTree(test.NoDBTestCase):
         self.assertEqual([uuids.root, uuids.child], pt.get_provider_uuids())
         self.assertFalse(pt.exists(uuids.grandchild))
 
+    def test_populate_from_iterable_deep_tree(self):
+        # A chain of providers, given bottom-up, is added top-down.
+        plist = [{'uuid': getattr(uuids, 'rp%d' % i), 'name': 'rp%d' % i,
+                  'parent_provider_uuid': (getattr(uuids, 'rp%d' % (i - 1))
+                                           if i else None)}
+                 for i in range(10)]
+        pt = provider_tree.ProviderTree()
+        pt.populate_from_iterable(reversed(plist))
+        self.assertEqual([pd['uuid'] for pd in plist],
+                         pt.get_provider_uuids())
+        with pt.lock:
+            self.assertEqual(uuids.rp0, pt._find_with_lock(
+                'rp9', return_root=True).uuid)
+
+    def test_indexes(self):
+        # root
+        #   +-> child
+        #   |      +-> grandchild
+        pt = provider_tree.ProviderTree()
+        pt.new_root('root', uuids.root)
+        pt.new_child('child', uuids.root, uuid=uuids.child)
+        pt.populate_from_iterable([{
+            'uuid': uuids.grandchild,
+            'name': 'grandchild',
+            'parent_provider_uuid': uuids.child,
+        }])
+        self.assertEqual({uuids.root, uuids.child, uuids.grandchild},
+                         set(pt.providers_by_uuid))
+        self.assertEqual({'root', 'child', 'grandchild'},
+                         set(pt.providers_by_name))
+        self.assertEqual(uuids.child, pt.data('child').uuid)
+        self.assertEqual([uuids.root, uuids.child, uuids.grandchild],
+                         pt.get_provider_uuids_in_tree('grandchild'))
+
+        # Replacing the child with a new name drops its descendants and its
+        # old name from the indexes.
+        pt.populate_from_iterable([{
+            'uuid': uuids.child,
+            'name': 'new_child',
+            'parent_provider_uuid': uuids.root,
+        }])
+        self.assertEqual({uuids.root, uuids.child},
+                         set(pt.providers_by_uuid))
+        self.assertEqual({'root', 'new_child'}, set(pt.providers_by_name))
+        self.assertFalse(pt.exists('child'))
+        self.assertTrue(pt.exists('new_child'))
+
+        pt.remove(uuids.root)
+        self.assertEqual({}, pt.providers_by_uuid)
+        self.assertEqual({}, pt.providers_by_name)
+
     def test_has_inventory_changed_no_existing_rp(self):
         pt = self._pt_with_cns()
         self.assertRaises(
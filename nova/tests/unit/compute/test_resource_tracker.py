@@ -10,9 +10,11 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import contextlib
 import copy
 import datetime
 
+from eventlet import greenthread
 from keystoneauth1 import exceptions as ks_exc
 import mock
 import os_resource_classes as orc
@@ -23,6 +25,7 @@ from oslo_utils import timeutils
 from oslo_utils import units
 
 from nova.compute import claims
+from nova.compute import manager
 from nova.compute.monitors import base as monitor_base
 from nova.compute import power_state
 from nova.compute import provider_tree
@@ -613,6 +616,371 @@ class TestUpdateAvailableResources(BaseTestCase):
 
         self.assertFalse(get_mock.called)
 
+    @mock.patch('nova.objects.InstancePCIRequests.get_by_instance',
+                return_value=objects.InstancePCIRequests(requests=[]))
+    @mock.patch('nova.objects.PciDeviceList.get_by_compute_node',
+                return_value=objects.PciDeviceList())
+    @mock.patch('nova.objects.ComputeNode.get_by_host_and_nodename')
+    @mock.patch('nova.objects.MigrationList.get_in_progress_and_error')
+    @mock.patch('nova.objects.InstanceList.get_by_host_and_node')
+    def test_mark_providers_for_update(self, get_mock, migr_mock,
+                                       get_cn_mock, pci_mock,
+                                       instance_pci_mock):
+        self._setup_rt()
+        get_mock.return_value = []
+        migr_mock.return_value = []
+        get_cn_mock.return_value = _COMPUTE_NODE_FIXTURES[0]
+        resources = copy.deepcopy(_VIRT_DRIVER_AVAIL_RESOURCES)
+        self.driver_mock.get_available_resource.side_effect = (
+            lambda nodename: copy.deepcopy(resources))
+
+        def check_marked(marked):
+            self.rt.provider_update_times[_NODENAME] = 1
+            self._update_available_resources()
+            self.assertEqual(
+                marked, _NODENAME not in self.rt.provider_update_times)
+
+        # The first resources reported by the driver, its usage and the same
+        # resources.
+        check_marked(True)
+        resources['memory_mb_used'] = 256
+        check_marked(False)
+        check_marked(False)
+        # A change of the inventory.
+        resources['local_gb'] = 12
+        check_marked(True)
+        check_marked(False)
+
+    @mock.patch('time.monotonic')
+    @mock.patch('nova.objects.InstancePCIRequests.get_by_instance',
+                return_value=objects.InstancePCIRequests(requests=[]))
+    @mock.patch('nova.objects.PciDeviceList.get_by_compute_node',
+                return_value=objects.PciDeviceList())
+    @mock.patch('nova.objects.ComputeNode.get_by_host_and_nodename')
+    @mock.patch('nova.objects.MigrationList.get_in_progress_and_error')
+    @mock.patch('nova.objects.InstanceList.get_by_host_and_node')
+    def test_usage_reconcile_interval(self, get_mock, migr_mock,
+                                      get_cn_mock, pci_mock,
+                                      instance_pci_mock, mock_monotonic):
+        self.flags(usage_reconcile_interval=300, group='compute')
+        self._setup_rt()
+        get_mock.return_value = []
+        migr_mock.return_value = []
+        get_cn_mock.return_value = _COMPUTE_NODE_FIXTURES[0]
+        resources = copy.deepcopy(_VIRT_DRIVER_AVAIL_RESOURCES)
+        self.driver_mock.get_available_resource.side_effect = (
+            lambda nodename: copy.deepcopy(resources))
+
+        def check_reconciled(now, reconciled, startup=False):
+            mock_monotonic.return_value = now
+            get_mock.reset_mock()
+            migr_mock.reset_mock()
+            update_mock = self._update_available_resources(startup=startup)
+            self.assertEqual(reconciled, get_mock.called)
+            self.assertEqual(reconciled, migr_mock.called)
+            update_mock.assert_called_once_with(
+                mock.ANY, self.rt.compute_nodes[_NODENAME], startup=startup)
+
+        check_reconciled(1000, True)
+        cn = self.rt.compute_nodes[_NODENAME]
+        self.assertEqual(0, cn.memory_mb_used)
+
+        # A claim between the audits.
+        cn.memory_mb_used = 256
+        cn.running_vms = 1
+        resources['memory_mb_used'] = 128
+        check_reconciled(1100, False)
+        # The usage tracked incrementally is kept.
+        self.assertEqual(256, cn.memory_mb_used)
+        self.assertEqual(1, cn.running_vms)
+        self.assertEqual({'reconciled': 1, 'incremental': 1},
+                         self.rt.usage_audits)
+
+        # The interval elapsed, and the usage is reconciled with the
+        # instances which do not include the claimed one anymore.
+        check_reconciled(1300, True)
+        self.assertEqual(0, cn.memory_mb_used)
+        self.assertEqual(0, cn.running_vms)
+        self.assertEqual({'reconciled': 2, 'incremental': 1, 'drifted': 1},
+                         self.rt.usage_audits)
+
+        # Always on startup, and when the inventory changed.
+        check_reconciled(1310, True, startup=True)
+        check_reconciled(1320, False)
+        resources['memory_mb'] = 1024
+        check_reconciled(1330, True)
+        check_reconciled(1340, False)
+        self.assertEqual({'reconciled': 4, 'incremental': 3, 'drifted': 1},
+                         self.rt.usage_audits)
+
+    @mock.patch('nova.objects.InstancePCIRequests.get_by_instance',
+                return_value=objects.InstancePCIRequests(requests=[]))
+    @mock.patch('nova.objects.PciDeviceList.get_by_compute_node',
+                return_value=objects.PciDeviceList())
+    @mock.patch('nova.objects.ComputeNode.get_by_host_and_nodename')
+    @mock.patch('nova.objects.MigrationList.get_in_progress_and_error')
+    @mock.patch('nova.objects.InstanceList.get_by_host_and_node')
+    def test_usage_reconcile_failed(self, get_mock, migr_mock, get_cn_mock,
+                                    pci_mock, instance_pci_mock):
+        self.flags(usage_reconcile_interval=300, group='compute')
+        self._setup_rt()
+        get_mock.return_value = []
+        migr_mock.return_value = []
+        get_cn_mock.return_value = _COMPUTE_NODE_FIXTURES[0]
+        self._update_available_resources()
+        self.assertIn(_NODENAME, self.rt.usage_reconcile_times)
+
+        # Reconcile on the next audit since this one failed.
+        self.rt.usage_reconcile_times[_NODENAME] -= 300
+        get_mock.side_effect = exc.NotFound
+        self.assertRaises(exc.NotFound, self._update_available_resources)
+        self.assertNotIn(_NODENAME, self.rt.usage_reconcile_times)
+
+        get_mock.side_effect = None
+        get_mock.reset_mock()
+        self._update_available_resources()
+        get_mock.assert_called_once()
+        self.assertIn(_NODENAME, self.rt.usage_reconcile_times)
+
+    @mock.patch('nova.objects.InstancePCIRequests.get_by_instance',
+                return_value=objects.InstancePCIRequests(requests=[]))
+    @mock.patch('nova.objects.PciDeviceList.get_by_compute_node',
+                return_value=objects.PciDeviceList())
+    @mock.patch('nova.objects.ComputeNode.get_by_host_and_nodename')
+    @mock.patch('nova.objects.MigrationList.get_in_progress_and_error')
+    @mock.patch('nova.objects.InstanceList.get_by_host_and_node')
+    def test_usage_read_without_node_lock(self, get_mock, migr_mock,
+                                          get_cn_mock, pci_mock,
+                                          instance_pci_mock):
+        self._setup_rt()
+        get_cn_mock.return_value = _COMPUTE_NODE_FIXTURES[0]
+        locked = set()
+        orig_node_lock = self.rt._node_lock
+
+        @contextlib.contextmanager
+        def fake_node_lock(nodename):
+            with orig_node_lock(nodename):
+                locked.add(nodename)
+                yield
+                locked.remove(nodename)
+
+        def fake_get(*args, **kwargs):
+            self.assertNotIn(_NODENAME, locked)
+            return []
+
+        get_mock.side_effect = fake_get
+        migr_mock.side_effect = fake_get
+        with mock.patch.object(self.rt, '_node_lock',
+                               side_effect=fake_node_lock):
+            update_mock = self._update_available_resources()
+
+        get_mock.assert_called_once_with(
+            mock.ANY, _HOSTNAME, _NODENAME, expected_attrs=mock.ANY)
+        migr_mock.assert_called_once_with(mock.ANY, _HOSTNAME, _NODENAME)
+        update_mock.assert_called_once_with(
+            mock.ANY, self.rt.compute_nodes[_NODENAME], startup=False)
+
+    @mock.patch('nova.objects.InstancePCIRequests.get_by_instance',
+                return_value=objects.InstancePCIRequests(requests=[]))
+    @mock.patch('nova.objects.PciDeviceList.get_by_compute_node',
+                return_value=objects.PciDeviceList())
+    @mock.patch('nova.objects.ComputeNode.get_by_host_and_nodename')
+    @mock.patch('nova.objects.MigrationList.get_in_progress_and_error')
+    @mock.patch('nova.objects.InstanceList.get_by_host_and_node')
+    def test_usage_changed_during_audit(self, get_mock, migr_mock,
+                                        get_cn_mock, pci_mock,
+                                        instance_pci_mock):
+        self._setup_rt()
+        get_cn_mock.return_value = _COMPUTE_NODE_FIXTURES[0]
+        migr_mock.return_value = []
+        instance = _INSTANCE_FIXTURES[0].obj_clone()
+
+        def fake_get(*args, **kwargs):
+            if get_mock.call_count == 1:
+                # A claim on the node completes while its usage is read.
+                self.rt.usage_generations[_NODENAME] += 1
+                return []
+            return [instance]
+
+        get_mock.side_effect = fake_get
+        with mock.patch.object(
+                self.rt, '_update_usage_from_instances',
+                return_value={}) as update_usage_mock:
+            self._update_available_resources()
+
+        self.assertEqual(2, get_mock.call_count)
+        self.assertEqual(2, migr_mock.call_count)
+        update_usage_mock.assert_called_once_with(
+            mock.ANY, [instance], _NODENAME)
+
+    def _setup_two_nodes(self, get_mock, migr_mock, get_cn_mock):
+        """Sets up the resource tracker of a host with a second node,
+        'other-node', and an instance on each node.
+        """
+        self._setup_rt()
+        other_node = 'other-node'
+        cn = _COMPUTE_NODE_FIXTURES[0]
+        fields = {field: getattr(cn, field) for field in cn.fields
+                  if cn.obj_attr_is_set(field)}
+        fields.update(id=2, uuid=uuids.cn2, hypervisor_hostname=other_node)
+        cns = {_NODENAME: cn.obj_clone(),
+               other_node: objects.ComputeNode(**fields)}
+        get_cn_mock.side_effect = lambda ctx, host, nodename: cns[nodename]
+
+        def fake_get_resources(nodename):
+            resources = copy.deepcopy(_VIRT_DRIVER_AVAIL_RESOURCES)
+            resources['hypervisor_hostname'] = nodename
+            return resources
+
+        self.driver_mock.get_available_resource.side_effect = (
+            fake_get_resources)
+
+        instances = {
+            _NODENAME: [self._fake_instance(uuids.inst1, _NODENAME)],
+            other_node: [self._fake_instance(uuids.inst2, other_node)],
+        }
+        get_mock.side_effect = (
+            lambda ctx, host, nodename, **kwargs: instances[nodename])
+        migr_mock.return_value = []
+        return other_node
+
+    @staticmethod
+    def _fake_instance(uuid, nodename):
+        instance = _INSTANCE_FIXTURES[0].obj_clone()
+        instance.uuid = uuid
+        instance.node = nodename
+        instance.numa_topology = None
+        instance.pci_requests = objects.InstancePCIRequests(requests=[])
+        return instance
+
+    @mock.patch('nova.compute.utils.is_volume_backed_instance',
+                return_value=False)
+    @mock.patch('nova.objects.Instance.save')
+    @mock.patch('nova.objects.InstancePCIRequests.get_by_instance',
+                return_value=objects.InstancePCIRequests(requests=[]))
+    @mock.patch('nova.objects.PciDeviceList.get_by_compute_node',
+                return_value=objects.PciDeviceList())
+    @mock.patch('nova.objects.ComputeNode.get_by_host_and_nodename')
+    @mock.patch('nova.objects.MigrationList.get_in_progress_and_error')
+    @mock.patch('nova.objects.InstanceList.get_by_host_and_node')
+    def test_claim_on_other_node_during_audit(self, get_mock, migr_mock,
+                                              get_cn_mock, pci_mock,
+                                              instance_pci_mock, save_mock,
+                                              bfv_mock):
+        other_node = self._setup_two_nodes(get_mock, migr_mock, get_cn_mock)
+        ctx = mock.MagicMock()
+        claimed = self._fake_instance(uuids.claimed, None)
+        claimed.host = None
+
+        def fake_get_allocations(context, rp_uuid):
+            if rp_uuid == uuids.cn2:
+                # A claim on the first node while the other node is audited.
+                self.rt.instance_claim(ctx, claimed, _NODENAME, None)
+            return report.ProviderAllocInfo(allocations={})
+
+        self.report_client_mock.get_allocations_for_resource_provider.\
+            side_effect = fake_get_allocations
+        with mock.patch.object(self.rt, '_update'):
+            self.rt.update_available_resource(ctx, _NODENAME)
+            self.rt.update_available_resource(ctx, other_node)
+
+        # The audit of the other node neither failed nor dropped the
+        # instances of the first node, including the claimed one.
+        self.assertEqual({uuids.inst1, uuids.claimed},
+                         self.rt.tracked_instances[_NODENAME])
+        self.assertEqual({uuids.inst2}, self.rt.tracked_instances[other_node])
+        self.assertEqual(256, self.rt.compute_nodes[_NODENAME].memory_mb_used)
+        self.assertEqual(128, self.rt.compute_nodes[other_node].memory_mb_used)
+
+        # So the claim can be aborted.
+        with mock.patch.object(self.rt, '_update'):
+            self.rt.abort_instance_claim(ctx, claimed, _NODENAME)
+        self.assertEqual({uuids.inst1}, self.rt.tracked_instances[_NODENAME])
+        self.assertEqual(128, self.rt.compute_nodes[_NODENAME].memory_mb_used)
+
+    @mock.patch('time.monotonic', return_value=1000)
+    @mock.patch('nova.compute.utils.is_volume_backed_instance',
+                return_value=False)
+    @mock.patch('nova.objects.InstancePCIRequests.get_by_instance',
+                return_value=objects.InstancePCIRequests(requests=[]))
+    @mock.patch('nova.objects.PciDeviceList.get_by_compute_node',
+                return_value=objects.PciDeviceList())
+    @mock.patch('nova.objects.ComputeNode.get_by_host_and_nodename')
+    @mock.patch('nova.objects.MigrationList.get_in_progress_and_error')
+    @mock.patch('nova.objects.InstanceList.get_by_host_and_node')
+    def test_usage_reconcile_other_node(self, get_mock, migr_mock,
+                                        get_cn_mock, pci_mock,
+                                        instance_pci_mock, bfv_mock,
+                                        mock_monotonic):
+        self.flags(usage_reconcile_interval=300, group='compute')
+        other_node = self._setup_two_nodes(get_mock, migr_mock, get_cn_mock)
+        ctx = mock.MagicMock()
+        with mock.patch.object(self.rt, '_update'):
+            self.rt.update_available_resource(ctx, _NODENAME)
+            self.rt.update_available_resource(ctx, other_node)
+
+            # Only the first node is reconciled on the next audits.
+            mock_monotonic.return_value = 1100
+            del self.rt.usage_reconcile_times[_NODENAME]
+            self.rt.update_available_resource(ctx, _NODENAME)
+            self.rt.update_available_resource(ctx, other_node)
+            self.assertEqual({'reconciled': 3, 'incremental': 1},
+                             self.rt.usage_audits)
+
+            # The instance of the other node is still tracked, so its
+            # deletion is accounted for before the node is reconciled.
+            instance = self._fake_instance(uuids.inst2, other_node)
+            instance.vm_state = vm_states.DELETED
+            self.rt.update_usage(ctx, instance, other_node)
+
+        self.assertEqual(set(), self.rt.tracked_instances[other_node])
+        self.assertEqual(0, self.rt.compute_nodes[other_node].memory_mb_used)
+        self.assertEqual({uuids.inst1}, self.rt.tracked_instances[_NODENAME])
+        self.assertEqual(128, self.rt.compute_nodes[_NODENAME].memory_mb_used)
+
+    @mock.patch('nova.compute.utils.is_volume_backed_instance',
+                return_value=False)
+    @mock.patch('nova.objects.InstancePCIRequests.get_by_instance',
+                return_value=objects.InstancePCIRequests(requests=[]))
+    @mock.patch('nova.objects.PciDeviceList.get_by_compute_node',
+                return_value=objects.PciDeviceList())
+    @mock.patch('nova.objects.ComputeNode.get_by_host_and_nodename')
+    @mock.patch('nova.objects.MigrationList.get_in_progress_and_error')
+    @mock.patch('nova.objects.InstanceList.get_by_host_and_node')
+    def test_concurrent_node_updates(self, get_mock, migr_mock, get_cn_mock,
+                                     pci_mock, instance_pci_mock, bfv_mock):
+        self.flags(resource_update_workers=2, group='compute')
+        other_node = self._setup_two_nodes(get_mock, migr_mock, get_cn_mock)
+        compute = manager.ComputeManager()
+        compute.rt = self.rt
+        events = []
+        get_instances = get_mock.side_effect
+
+        def fake_get_instances(ctx, host, nodename, **kwargs):
+            events.append(('load', nodename))
+            # Let the update of the other node run in the meantime.
+            greenthread.sleep(0)
+            return get_instances(ctx, host, nodename, **kwargs)
+
+        get_mock.side_effect = fake_get_instances
+        with mock.patch.object(
+                self.rt, '_update',
+                side_effect=lambda ctx, cn, **kw: events.append(
+                    ('update', cn.hypervisor_hostname))):
+            for _ in range(2):
+                del events[:]
+                compute._update_available_resource_for_nodes(
+                    mock.MagicMock(), [_NODENAME, other_node])
+                # The updates of the nodes interleaved.
+                self.assertEqual({('load', _NODENAME), ('load', other_node)},
+                                 set(events[:2]))
+                self.assertEqual(4, len(events))
+
+        self.assertEqual({uuids.inst1}, self.rt.tracked_instances[_NODENAME])
+        self.assertEqual({uuids.inst2}, self.rt.tracked_instances[other_node])
+        self.assertEqual(128, self.rt.compute_nodes[_NODENAME].memory_mb_used)
+        self.assertEqual(128, self.rt.compute_nodes[other_node].memory_mb_used)
+
     @mock.patch('nova.objects.InstancePCIRequests.get_by_instance',
                 return_value=objects.InstancePCIRequests(requests=[]))
     @mock.patch('nova.objects.PciDeviceList.get_by_compute_node',
@@ -1189,7 +1557,7 @@ class TestUpdateAvailableResources(BaseTestCase):
                 "CUSTOM_RESOURCE_1": {self.resource_1, self.resource_2}
             }}
         self.assertEqual(expected_assigned_resources,
-                         self.rt.assigned_resources)
+                         self.rt.assigned_resources[_NODENAME])
 
     @mock.patch('nova.compute.utils.is_volume_backed_instance',
                 new=mock.Mock(return_value=False))
@@ -1807,6 +2175,110 @@ class TestUpdateComputeNode(BaseTestCase):
         self.assertIn('Unable to find services table record for nova-compute',
                       mock_log_error.call_args[0][0])
 
+    @mock.patch('nova.compute.resource_tracker.ResourceTracker.'
+                '_sync_compute_service_disabled_trait', new=mock.Mock())
+    @mock.patch('nova.objects.ComputeNode.save', new=mock.Mock())
+    @mock.patch('time.monotonic')
+    def test_update_skips_providers_update(self, mock_monotonic):
+        self.flags(provider_update_interval=300, group='compute')
+        self._setup_rt()
+        compute = _COMPUTE_NODE_FIXTURES[0].obj_clone()
+        self.rt.compute_nodes[_NODENAME] = compute
+        upt_mock = self.driver_mock.update_provider_tree
+        ufpt_mock = self.rt.reportclient.update_from_provider_tree
+
+        mock_monotonic.return_value = 1000
+        self.rt._update(mock.sentinel.ctx, compute)
+        self.assertEqual(1, upt_mock.call_count)
+        self.assertEqual(1, ufpt_mock.call_count)
+
+        # Nothing changed, even though the usage of the node did.
+        mock_monotonic.return_value = 1299
+        compute.memory_mb_used += 256
+        self.rt._update(mock.sentinel.ctx, compute)
+        self.assertEqual(1, upt_mock.call_count)
+        self.assertEqual(1, ufpt_mock.call_count)
+        self.assertEqual({'performed': 1, 'skipped': 1},
+                         self.rt.provider_updates)
+
+        # The providers are marked for update.
+        mock_monotonic.return_value = 1300
+        self.rt.mark_providers_for_update(_NODENAME)
+        self.rt._update(mock.sentinel.ctx, compute)
+        self.assertEqual(2, upt_mock.call_count)
+
+        # The interval elapsed.
+        mock_monotonic.return_value = 1599
+        self.rt._update(mock.sentinel.ctx, compute)
+        self.assertEqual(2, upt_mock.call_count)
+        mock_monotonic.return_value = 1600
+        self.rt._update(mock.sentinel.ctx, compute)
+        self.assertEqual(3, upt_mock.call_count)
+
+        # On startup.
+        self.rt._update(mock.sentinel.ctx, compute, startup=True)
+        self.assertEqual(4, upt_mock.call_count)
+        self.assertEqual({'performed': 4, 'skipped': 2},
+                         self.rt.provider_updates)
+
+    @mock.patch('nova.compute.resource_tracker.ResourceTracker.'
+                '_sync_compute_service_disabled_trait', new=mock.Mock())
+    @mock.patch('nova.objects.ComputeNode.save', new=mock.Mock())
+    def test_update_providers_update_fails(self):
+        self.flags(provider_update_interval=300, group='compute')
+        self._setup_rt()
+        compute = _COMPUTE_NODE_FIXTURES[0].obj_clone()
+        self.rt.compute_nodes[_NODENAME] = compute
+        self.rt._update(mock.sentinel.ctx, compute)
+
+        self.rt.mark_providers_for_update()
+        ufpt_mock = self.rt.reportclient.update_from_provider_tree
+        ufpt_mock.side_effect = exc.ResourceProviderSyncFailed()
+        self.assertRaises(exc.ResourceProviderSyncFailed,
+                          self.rt._update, mock.sentinel.ctx, compute)
+
+        # The failed update is not skipped.
+        ufpt_mock.side_effect = None
+        ufpt_mock.reset_mock()
+        self.rt._update(mock.sentinel.ctx, compute)
+        ufpt_mock.assert_called_once()
+
+    @mock.patch('nova.compute.resource_tracker.ResourceTracker.'
+                '_sync_compute_service_disabled_trait', new=mock.Mock())
+    def test_update_providers_always_updated_by_default(self):
+        self._setup_rt()
+        compute = _COMPUTE_NODE_FIXTURES[0].obj_clone()
+        self.rt.compute_nodes[_NODENAME] = compute
+        self.rt.old_resources[_NODENAME] = compute
+
+        self.rt._update(mock.sentinel.ctx, compute)
+        self.rt._update(mock.sentinel.ctx, compute)
+        self.assertEqual(2, self.driver_mock.update_provider_tree.call_count)
+        self.assertEqual({'performed': 2}, self.rt.provider_updates)
+
+    @mock.patch.object(obj_base, 'obj_equal_prims')
+    def test_resource_change_unchanged_fields(self, mock_equal):
+        self._setup_rt()
+        compute = _COMPUTE_NODE_FIXTURES[0].obj_clone()
+        self.rt.old_resources[_NODENAME] = compute.obj_clone()
+        compute.obj_reset_changes(recursive=True)
+
+        self.assertFalse(self.rt._resource_change(compute))
+        mock_equal.assert_not_called()
+
+    def test_resource_change_same_values(self):
+        self._setup_rt()
+        compute = _COMPUTE_NODE_FIXTURES[0].obj_clone()
+        self.rt.old_resources[_NODENAME] = compute.obj_clone()
+        # The fields are set to the same values.
+        compute.vcpus = compute.vcpus
+
+        self.assertFalse(self.rt._resource_change(compute))
+        self.assertEqual(set(), compute.obj_what_changed())
+
+        compute.vcpus += 1
+        self.assertTrue(self.rt._resource_change(compute))
+
     def test_update_compute_node_save_fails_restores_old_resources(self):
         """Tests the scenario that compute_node.save() fails and the
         old_resources value for the node is restored to its previous value
@@ -1849,6 +2321,31 @@ class TestUpdateComputeNode(BaseTestCase):
             attr_name = '%s_allocation_ratio' % res
             self.assertNotIn(attr_name, changes)
 
+    def test_copy_resources_keep_usage(self):
+        self._setup_rt()
+        compute = _COMPUTE_NODE_FIXTURES[0].obj_clone()
+        compute.vcpus_used = 2
+        compute.memory_mb_used = 256
+        stats = self.rt.stats[_NODENAME]
+        stats.update_stats_for_instance(_INSTANCE_FIXTURES[0], False)
+        resources = dict(self.driver_mock.get_available_resource.return_value,
+                         memory_mb=1024, memory_mb_used=128,
+                         stats={'cpu_arch': 'x86_64'})
+
+        self.rt._copy_resources(compute, resources, keep_usage=True)
+
+        # The inventory is updated but not the usage of the instances.
+        self.assertEqual(1024, compute.memory_mb)
+        self.assertEqual(256, compute.memory_mb_used)
+        self.assertEqual(2, compute.vcpus_used)
+        self.assertEqual('1', compute.stats['num_instances'])
+        self.assertEqual('x86_64', compute.stats['cpu_arch'])
+
+        self.rt._copy_resources(compute, resources)
+
+        self.assertEqual(128, compute.memory_mb_used)
+        self.assertNotIn('num_instances', compute.stats)
+
     def test_copy_resources_update_allocation_zero_ratios(self):
         """Tests that a ComputeNode object's allocation ratio fields are
         not set if the configured allocation ratio values are 0.0.
@@ -1934,6 +2431,39 @@ class TestInstanceClaim(BaseTestCase):
                                          "%(expected)s, but got: %(got)s" %
                                          {'expected': expected, 'got': got})
 
+    @mock.patch('nova.compute.utils.is_volume_backed_instance',
+                return_value=False)
+    def test_claim_node_lock(self, mock_bfv):
+        self.instance.pci_requests = objects.InstancePCIRequests(requests=[])
+        self.rt.compute_nodes['other-node'] = mock.sentinel.other_cn
+        orig_node_lock = self.rt._node_lock
+
+        with test.nested(
+            mock.patch.object(self.rt, '_node_lock',
+                              side_effect=orig_node_lock),
+            mock.patch.object(self.rt, '_update'),
+            mock.patch.object(self.instance, 'save'),
+        ) as (mock_node_lock, mock_update, mock_save):
+            self.rt.instance_claim(self.ctx, self.instance, _NODENAME,
+                                   self.allocations, None)
+            self.rt.update_usage(self.ctx, self.instance,
+                                 nodename=_NODENAME)
+
+        # Only the node of the instance is locked.
+        mock_node_lock.assert_has_calls([mock.call(_NODENAME)] * 2)
+        self.assertEqual(2, mock_node_lock.call_count)
+        self.assertEqual(2, self.rt.usage_generations[_NODENAME])
+        self.assertEqual(0, self.rt.usage_generations['other-node'])
+
+    @mock.patch('nova.compute.claims.Claim',
+                side_effect=exc.ComputeResourcesUnavailable(reason='fake'))
+    def test_claim_failed_node_generation(self, mock_claim):
+        self.assertRaises(exc.ComputeResourcesUnavailable,
+                          self.rt.instance_claim, self.ctx, self.instance,
+                          _NODENAME, self.allocations, None)
+        # The usage of the node may have changed before the claim failed.
+        self.assertEqual(1, self.rt.usage_generations[_NODENAME])
+
     def test_claim_disabled(self):
         self.rt.compute_nodes = {}
         self.assertTrue(self.rt.disabled(_NODENAME))
@@ -2037,8 +2567,8 @@ class TestInstanceClaim(BaseTestCase):
             # Verify that the assigned resources are tracked
             for rc, amount in [("CUSTOM_RESOURCE_0", 1),
                                ("CUSTOM_RESOURCE_1", 2)]:
-                self.assertEqual(amount,
-                                 len(self.rt.assigned_resources[cn.uuid][rc]))
+                self.assertEqual(amount, len(
+                    self.rt.assigned_resources[_NODENAME][cn.uuid][rc]))
 
         expected_updated = copy.deepcopy(_COMPUTE_NODE_FIXTURES[0])
         vals = {
@@ -2061,7 +2591,8 @@ class TestInstanceClaim(BaseTestCase):
         self.assertTrue(obj_base.obj_equal_prims(expected_updated, cn))
         # Verify that the resources are released
         for rc in ["CUSTOM_RESOURCE_0", "CUSTOM_RESOURCE_1"]:
-            self.assertEqual(0, len(self.rt.assigned_resources[cn.uuid][rc]))
+            self.assertEqual(
+                0, len(self.rt.assigned_resources[_NODENAME][cn.uuid][rc]))
 
     @mock.patch('nova.compute.utils.is_volume_backed_instance')
     @mock.patch('nova.objects.MigrationList.get_in_progress_and_error')
@@ -2188,7 +2719,7 @@ class TestInstanceClaim(BaseTestCase):
     def test_claim_with_resources_from_free(self):
         self.instance.pci_requests = objects.InstancePCIRequests(requests=[])
         cn = self.rt.compute_nodes[_NODENAME]
-        self.rt.assigned_resources = {
+        self.rt.assigned_resources[_NODENAME] = {
             self.resource_1.provider_uuid: {
                 self.resource_1.resource_class: {self.resource_1}}}
         allocations = {
@@ -2232,7 +2763,8 @@ class TestInstanceClaim(BaseTestCase):
                               self.rt.instance_claim, self.ctx, self.instance,
                               _NODENAME, allocations, None)
         self.assertEqual(
-            0, len(self.rt.assigned_resources[cn.uuid]['CUSTOM_RESOURCE_0']))
+            0, len(self.rt.assigned_resources[_NODENAME][cn.uuid][
+                'CUSTOM_RESOURCE_0']))
 
     @mock.patch('nova.compute.resource_tracker.ResourceTracker.'
                 '_sync_compute_service_disabled_trait', new=mock.Mock())
@@ -2440,7 +2972,7 @@ class TestResize(BaseTestCase):
         self.assertIsInstance(claim, claims.MoveClaim)
         cn = self.rt.compute_nodes[_NODENAME]
         self.assertTrue(obj_base.obj_equal_prims(expected, cn))
-        self.assertEqual(1, len(self.rt.tracked_migrations))
+        self.assertEqual(1, len(self.rt.tracked_migrations[_NODENAME]))
 
         # Now abort the resize claim and check that the resources have been set
         # back to their original values.
@@ -2452,7 +2984,7 @@ class TestResize(BaseTestCase):
         self.assertEqual(1, cn.vcpus_used)
         self.assertEqual(1, cn.local_gb_used)
         self.assertEqual(128, cn.memory_mb_used)
-        self.assertEqual(0, len(self.rt.tracked_migrations))
+        self.assertEqual(0, len(self.rt.tracked_migrations[_NODENAME]))
 
     @mock.patch('nova.compute.resource_tracker.ResourceTracker.'
                 '_sync_compute_service_disabled_trait', new=mock.Mock())
@@ -2521,7 +3053,8 @@ class TestResize(BaseTestCase):
         ))
         # Verify that resources are assigned and tracked
         self.assertEqual(
-            1, len(self.rt.assigned_resources[cn.uuid]["CUSTOM_RESOURCE_0"]))
+            1, len(self.rt.assigned_resources[_NODENAME][cn.uuid][
+                "CUSTOM_RESOURCE_0"]))
 
         # allocation for resize
         allocations = {
@@ -2578,8 +3111,8 @@ class TestResize(BaseTestCase):
         # Verify that resources are assigned and tracked
         for rc, amount in [("CUSTOM_RESOURCE_0", 1),
                            ("CUSTOM_RESOURCE_1", 2)]:
-            self.assertEqual(amount,
-                             len(self.rt.assigned_resources[cn.uuid][rc]))
+            self.assertEqual(amount, len(
+                self.rt.assigned_resources[_NODENAME][cn.uuid][rc]))
 
         # Confirm or revert resize
         with test.nested(
@@ -2603,20 +3136,20 @@ class TestResize(BaseTestCase):
         if revert:
             # Verify that the new resources are released
             self.assertEqual(
-                0, len(self.rt.assigned_resources[cn.uuid][
+                0, len(self.rt.assigned_resources[_NODENAME][cn.uuid][
                     "CUSTOM_RESOURCE_1"]))
             # Old resources are not released
             self.assertEqual(
-                1, len(self.rt.assigned_resources[cn.uuid][
+                1, len(self.rt.assigned_resources[_NODENAME][cn.uuid][
                     "CUSTOM_RESOURCE_0"]))
         else:
             # Verify that the old resources are released
             self.assertEqual(
-                0, len(self.rt.assigned_resources[cn.uuid][
+                0, len(self.rt.assigned_resources[_NODENAME][cn.uuid][
                     "CUSTOM_RESOURCE_0"]))
             # new resources are not released
             self.assertEqual(
-                2, len(self.rt.assigned_resources[cn.uuid][
+                2, len(self.rt.assigned_resources[_NODENAME][cn.uuid][
                     "CUSTOM_RESOURCE_1"]))
 
     def test_instance_build_resize_revert(self):
@@ -2764,7 +3297,7 @@ class TestResize(BaseTestCase):
             dest_node=cn.hypervisor_hostname,
             migration_type='resize',
         )
-        self.rt.tracked_migrations = {instance.uuid: migration}
+        self.rt.tracked_migrations[_NODENAME] = {instance.uuid: migration}
 
         # not using mock.sentinel.ctx because _drop_move_claim calls elevated
         ctx = mock.MagicMock()
@@ -2918,9 +3451,9 @@ class TestResize(BaseTestCase):
                                  None, self.allocations)
         cn = self.rt.compute_nodes[_NODENAME]
         self.assertTrue(obj_base.obj_equal_prims(expected, cn))
-        self.assertEqual(2, len(self.rt.tracked_migrations),
+        self.assertEqual(2, len(self.rt.tracked_migrations[_NODENAME]),
                          "Expected 2 tracked migrations but got %s"
-                         % self.rt.tracked_migrations)
+                         % self.rt.tracked_migrations[_NODENAME])
 
 
 class TestRebuild(BaseTestCase):
@@ -3012,7 +3545,7 @@ class TestRebuild(BaseTestCase):
         self.assertEqual(_HOSTNAME, migration.dest_compute)
         self.assertEqual(_NODENAME, migration.dest_node)
         self.assertEqual("pre-migrating", migration.status)
-        self.assertEqual(1, len(self.rt.tracked_migrations))
+        self.assertEqual(1, len(self.rt.tracked_migrations[_NODENAME]))
         mig_save_mock.assert_called_once_with()
         inst_save_mock.assert_called_once_with()
 
@@ -3080,7 +3613,8 @@ class TestUpdateUsageFromMigration(test.NoDBTestCase):
             ctxt, instance, migration, migration.source_node)
         self.assertNotIn('Starting to track outgoing migration',
                          self.stdlog.logger.output)
-        self.assertNotIn(migration.instance_uuid, rt.tracked_migrations)
+        self.assertNotIn(migration.instance_uuid,
+                         rt.tracked_migrations[migration.source_node])
 
 
 class TestUpdateUsageFromMigrations(BaseTestCase):
@@ -3306,7 +3840,7 @@ class TestUpdateUsageFromInstance(BaseTestCase):
         # Stub out the is_bfv cache to make sure we remove the instance
         # from it after updating usage.
         self.rt.is_bfv[self.instance.uuid] = False
-        self.rt.tracked_instances = set([self.instance.uuid])
+        self.rt.tracked_instances[_NODENAME] = set([self.instance.uuid])
         self.rt._update_usage_from_instance(mock.sentinel.ctx, self.instance,
                                             _NODENAME)
         # The instance should have been removed from the is_bfv cache.
@@ -3334,7 +3868,7 @@ class TestUpdateUsageFromInstance(BaseTestCase):
     def test_deleted(self, mock_update_usage, mock_check_bfv):
         mock_check_bfv.return_value = False
         self.instance.vm_state = vm_states.DELETED
-        self.rt.tracked_instances = set([self.instance.uuid])
+        self.rt.tracked_instances[_NODENAME] = set([self.instance.uuid])
         self.rt._update_usage_from_instance(mock.sentinel.ctx,
                                             self.instance, _NODENAME, True)
 
@@ -3342,7 +3876,7 @@ class TestUpdateUsageFromInstance(BaseTestCase):
             self.rt._get_usage_dict(self.instance, self.instance),
             _NODENAME, sign=-1)
 
-    @mock.patch('nova.objects.Instance.get_by_uuid')
+    @mock.patch('nova.objects.InstanceList.get_by_filters')
     def test_remove_deleted_instances_allocations_deleted_instance(self,
             mock_inst_get):
         rc = self.rt.reportclient
@@ -3350,24 +3884,72 @@ class TestUpdateUsageFromInstance(BaseTestCase):
             allocations={uuids.deleted: "fake_deleted_instance"})
         rc.get_allocations_for_resource_provider = mock.MagicMock(
             return_value=allocs)
-        rc.delete_allocation_for_instance = mock.MagicMock()
-        mock_inst_get.return_value = objects.Instance(
-            uuid=uuids.deleted, deleted=True, hidden=False)
+        rc.delete_allocations_for_instances = mock.MagicMock()
+        mock_inst_get.return_value = [objects.Instance(
+            uuid=uuids.deleted, deleted=True, hidden=False)]
         cn = self.rt.compute_nodes[_NODENAME]
         ctx = mock.MagicMock()
         # Call the method.
         self.rt._remove_deleted_instances_allocations(ctx, cn, [], {})
         # Only one call should be made to delete allocations, and that should
         # be for the first instance created above
-        rc.delete_allocation_for_instance.assert_called_once_with(
-            ctx, uuids.deleted)
+        rc.delete_allocations_for_instances.assert_called_once_with(
+            ctx, [uuids.deleted])
         mock_inst_get.assert_called_once_with(
             ctx.elevated.return_value,
-            uuids.deleted,
+            {'uuid': [uuids.deleted]},
             expected_attrs=[])
         ctx.elevated.assert_called_once_with(read_deleted='yes')
 
-    @mock.patch('nova.objects.Instance.get_by_uuid')
+    @mock.patch('nova.objects.InstanceList.get_by_filters')
+    def test_remove_deleted_instances_allocations_bulk(self, mock_inst_get):
+        rc = self.rt.reportclient
+        cn = self.rt.compute_nodes[_NODENAME]
+        self.rt.tracked_instances[_NODENAME] = set([uuids.known])
+        allocs = report.ProviderAllocInfo(
+            allocations={uuids.known: "fake_known_instance",
+                         uuids.deleted1: "fake_deleted_instance",
+                         uuids.moved: "fake_moved_instance",
+                         uuids.deleted2: "fake_deleted_instance",
+                         uuids.archived: "fake_archived_instance"})
+        rc.get_allocations_for_resource_provider = mock.MagicMock(
+            return_value=allocs)
+        rc.delete_allocations_for_instances = mock.MagicMock()
+        rc.delete_allocation_for_instance = mock.MagicMock()
+        mock_inst_get.return_value = [
+            objects.Instance(uuid=uuids.deleted1, deleted=True, hidden=False),
+            objects.Instance(uuid=uuids.moved, deleted=False, hidden=False,
+                             host='other-host', node='other-node'),
+            objects.Instance(uuid=uuids.deleted2, deleted=True, hidden=False)]
+        instance_by_uuid = {}
+        ctx = mock.MagicMock()
+
+        self.rt._remove_deleted_instances_allocations(ctx, cn, [],
+                                                      instance_by_uuid)
+
+        # A single query for all the instances not on this node, and a single
+        # deletion of the allocations of all the deleted ones.
+        mock_inst_get.assert_called_once_with(
+            ctx.elevated.return_value,
+            {'uuid': [uuids.deleted1, uuids.moved, uuids.deleted2,
+                      uuids.archived]},
+            expected_attrs=[])
+        rc.delete_allocations_for_instances.assert_called_once_with(
+            ctx, [uuids.deleted1, uuids.deleted2])
+        rc.delete_allocation_for_instance.assert_not_called()
+        # The instances of the node passed in are left untouched.
+        self.assertEqual({}, instance_by_uuid)
+
+        # If the bulk deletion fails, the allocations are deleted one by one.
+        rc.delete_allocations_for_instances.side_effect = (
+            exc.AllocationDeleteFailed(consumer_uuid=uuids.deleted1,
+                                       error='conflict'))
+        self.rt._remove_deleted_instances_allocations(ctx, cn, [],
+                                                      instance_by_uuid)
+        rc.delete_allocation_for_instance.assert_has_calls(
+            [mock.call(ctx, uuids.deleted1), mock.call(ctx, uuids.deleted2)])
+
+    @mock.patch('nova.objects.InstanceList.get_by_filters')
     def test_remove_deleted_instances_allocations_deleted_hidden_instance(self,
             mock_inst_get):
         """Tests the scenario where there are allocations against the local
@@ -3380,23 +3962,24 @@ class TestUpdateUsageFromInstance(BaseTestCase):
             allocations={uuids.deleted: "fake_deleted_instance"})
         rc.get_allocations_for_resource_provider = mock.MagicMock(
             return_value=allocs)
-        rc.delete_allocation_for_instance = mock.MagicMock()
+        rc.delete_allocations_for_instances = mock.MagicMock()
         cn = self.rt.compute_nodes[_NODENAME]
-        mock_inst_get.return_value = objects.Instance(
+        mock_inst_get.return_value = [objects.Instance(
             uuid=uuids.deleted, deleted=True, hidden=True,
             host=cn.host, node=cn.hypervisor_hostname,
-            task_state=task_states.RESIZE_MIGRATING)
+            task_state=task_states.RESIZE_MIGRATING)]
         ctx = mock.MagicMock()
         # Call the method.
         self.rt._remove_deleted_instances_allocations(ctx, cn, [], {})
         # Only one call should be made to delete allocations, and that should
         # be for the first instance created above
-        rc.delete_allocation_for_instance.assert_not_called()
+        rc.delete_allocations_for_instances.assert_not_called()
         mock_inst_get.assert_called_once_with(
-            ctx.elevated.return_value, uuids.deleted, expected_attrs=[])
+            ctx.elevated.return_value, {'uuid': [uuids.deleted]},
+            expected_attrs=[])
         ctx.elevated.assert_called_once_with(read_deleted='yes')
 
-    @mock.patch('nova.objects.Instance.get_by_uuid')
+    @mock.patch('nova.objects.InstanceList.get_by_filters')
     def test_remove_deleted_instances_allocations_building_instance(self,
             mock_inst_get):
         rc = self.rt.reportclient
@@ -3404,18 +3987,17 @@ class TestUpdateUsageFromInstance(BaseTestCase):
             allocations={uuids.deleted: "fake_deleted_instance"})
         rc.get_allocations_for_resource_provider = mock.MagicMock(
             return_value=allocs)
-        rc.delete_allocation_for_instance = mock.MagicMock()
-        mock_inst_get.side_effect = exc.InstanceNotFound(
-            instance_id=uuids.deleted)
+        rc.delete_allocations_for_instances = mock.MagicMock()
+        mock_inst_get.return_value = []
         cn = self.rt.compute_nodes[_NODENAME]
         ctx = mock.MagicMock()
         # Call the method.
         self.rt._remove_deleted_instances_allocations(ctx, cn, [], {})
         # Instance wasn't found in the database at all, so the allocation
         # should not have been deleted
-        self.assertFalse(rc.delete_allocation_for_instance.called)
+        self.assertFalse(rc.delete_allocations_for_instances.called)
 
-    @mock.patch('nova.objects.Instance.get_by_uuid')
+    @mock.patch('nova.objects.InstanceList.get_by_filters')
     def test_remove_deleted_instances_allocations_ignores_migrations(self,
             mock_inst_get):
         rc = self.rt.reportclient
@@ -3425,9 +4007,9 @@ class TestUpdateUsageFromInstance(BaseTestCase):
         mig = objects.Migration(uuid=uuids.migration)
         rc.get_allocations_for_resource_provider = mock.MagicMock(
             return_value=allocs)
-        rc.delete_allocation_for_instance = mock.MagicMock()
-        mock_inst_get.return_value = objects.Instance(
-            uuid=uuids.deleted, deleted=True, hidden=False)
+        rc.delete_allocations_for_instances = mock.MagicMock()
+        mock_inst_get.return_value = [objects.Instance(
+            uuid=uuids.deleted, deleted=True, hidden=False)]
         cn = self.rt.compute_nodes[_NODENAME]
         ctx = mock.MagicMock()
         # Call the method.
@@ -3436,10 +4018,10 @@ class TestUpdateUsageFromInstance(BaseTestCase):
                              objects.Instance(uuid=uuids.imigration)})
         # Only one call should be made to delete allocations, and that should
         # be for the first instance created above
-        rc.delete_allocation_for_instance.assert_called_once_with(
-            ctx, uuids.deleted)
+        rc.delete_allocations_for_instances.assert_called_once_with(
+            ctx, [uuids.deleted])
 
-    @mock.patch('nova.objects.Instance.get_by_uuid')
+    @mock.patch('nova.objects.InstanceList.get_by_filters')
     def test_remove_deleted_instances_allocations_scheduled_instance(self,
             mock_inst_get):
         rc = self.rt.reportclient
@@ -3447,7 +4029,7 @@ class TestUpdateUsageFromInstance(BaseTestCase):
             allocations={uuids.scheduled: "fake_scheduled_instance"})
         rc.get_allocations_for_resource_provider = mock.MagicMock(
             return_value=allocs)
-        rc.delete_allocation_for_instance = mock.MagicMock()
+        rc.delete_allocations_for_instances = mock.MagicMock()
         instance_by_uuid = {uuids.scheduled:
                             objects.Instance(uuid=uuids.scheduled,
                                              deleted=False, host=None)}
@@ -3457,7 +4039,7 @@ class TestUpdateUsageFromInstance(BaseTestCase):
         self.rt._remove_deleted_instances_allocations(ctx, cn, [],
                                                       instance_by_uuid)
         # Scheduled instances should not have their allocations removed
-        rc.delete_allocation_for_instance.assert_not_called()
+        rc.delete_allocations_for_instances.assert_not_called()
 
     def test_remove_deleted_instances_allocations_move_ops(self):
         """Test that we do NOT delete allocations for instances that are
@@ -3479,14 +4061,14 @@ class TestUpdateUsageFromInstance(BaseTestCase):
         ctx = mock.MagicMock()
         self.rt._remove_deleted_instances_allocations(
             ctx, cn, [], {uuids.inst0: instance})
-        rpt_clt.delete_allocation_for_instance.assert_not_called()
+        rpt_clt.delete_allocations_for_instances.assert_not_called()
 
     def test_remove_deleted_instances_allocations_known_instance(self):
         """Tests the case that actively tracked instances for the
         given node do not have their allocations removed.
         """
         rc = self.rt.reportclient
-        self.rt.tracked_instances = set([uuids.known])
+        self.rt.tracked_instances[_NODENAME] = set([uuids.known])
         allocs = report.ProviderAllocInfo(
             allocations={
                 uuids.known: {
@@ -3500,7 +4082,7 @@ class TestUpdateUsageFromInstance(BaseTestCase):
         )
         rc.get_allocations_for_resource_provider = mock.MagicMock(
             return_value=allocs)
-        rc.delete_allocation_for_instance = mock.MagicMock()
+        rc.delete_allocations_for_instances = mock.MagicMock()
         cn = self.rt.compute_nodes[_NODENAME]
         ctx = mock.MagicMock()
         instance_by_uuid = {uuids.known: objects.Instance(uuid=uuids.known)}
@@ -3509,10 +4091,10 @@ class TestUpdateUsageFromInstance(BaseTestCase):
             instance_by_uuid)
         # We don't delete the allocation because the node is tracking the
         # instance and has allocations for it.
-        rc.delete_allocation_for_instance.assert_not_called()
+        rc.delete_allocations_for_instances.assert_not_called()
 
     @mock.patch('nova.compute.resource_tracker.LOG.warning')
-    @mock.patch('nova.objects.Instance.get_by_uuid')
+    @mock.patch('nova.objects.InstanceList.get_by_filters')
     def test_remove_deleted_instances_allocations_unknown_instance(
             self, mock_inst_get, mock_log_warning):
         """Tests the case that an instance is found with allocations for
@@ -3521,7 +4103,7 @@ class TestUpdateUsageFromInstance(BaseTestCase):
         how this happened or what to do.
         """
         instance = _INSTANCE_FIXTURES[0]
-        mock_inst_get.return_value = instance
+        mock_inst_get.return_value = [instance]
         rc = self.rt.reportclient
         # No tracked instances on this node.
         # But there is an allocation for an instance on this node.
@@ -3538,7 +4120,7 @@ class TestUpdateUsageFromInstance(BaseTestCase):
         )
         rc.get_allocations_for_resource_provider = mock.MagicMock(
             return_value=allocs)
-        rc.delete_allocation_for_instance = mock.MagicMock()
+        rc.delete_allocations_for_instances = mock.MagicMock()
         cn = self.rt.compute_nodes[_NODENAME]
         ctx = mock.MagicMock()
         # Call the method.
@@ -3548,7 +4130,7 @@ class TestUpdateUsageFromInstance(BaseTestCase):
         # NOTE(mriedem): This is not actually the behavior we want. This is
         # testing the current behavior but in the future when we get smart
         # and figure things out, this should actually be an error.
-        rc.delete_allocation_for_instance.assert_not_called()
+        rc.delete_allocations_for_instances.assert_not_called()
         # Assert the expected warning was logged.
         mock_log_warning.assert_called_once()
         self.assertIn("Instance %s is not being actively managed by "
@@ -3557,7 +4139,7 @@ class TestUpdateUsageFromInstance(BaseTestCase):
                       mock_log_warning.call_args[0][0])
 
     @mock.patch('nova.compute.resource_tracker.LOG.debug')
-    @mock.patch('nova.objects.Instance.get_by_uuid')
+    @mock.patch('nova.objects.InstanceList.get_by_filters')
     def test_remove_deleted_instances_allocations_state_transition_instance(
             self, mock_inst_get, mock_log_debug):
         """Tests the case that an instance is found with allocations for
@@ -3567,7 +4149,7 @@ class TestUpdateUsageFromInstance(BaseTestCase):
         """
         instance = copy.deepcopy(_INSTANCE_FIXTURES[0])
         instance.task_state = task_states.SPAWNING
-        mock_inst_get.return_value = instance
+        mock_inst_get.return_value = [instance]
         rc = self.rt.reportclient
         # No tracked instances on this node.
         # But there is an allocation for an instance on this node.
@@ -3584,7 +4166,7 @@ class TestUpdateUsageFromInstance(BaseTestCase):
         )
         rc.get_allocations_for_resource_provider = mock.MagicMock(
             return_value=allocs)
-        rc.delete_allocation_for_instance = mock.MagicMock()
+        rc.delete_allocations_for_instances = mock.MagicMock()
         cn = self.rt.compute_nodes[_NODENAME]
         ctx = mock.MagicMock()
         # Call the method.
@@ -3592,7 +4174,7 @@ class TestUpdateUsageFromInstance(BaseTestCase):
             ctx, cn, [], {})
         # We don't delete the allocation because the instance is on this host
         # but is transitioning task states.
-        rc.delete_allocation_for_instance.assert_not_called()
+        rc.delete_allocations_for_instances.assert_not_called()
         # Assert the expected debug message was logged.
         mock_log_debug.assert_called_once()
         self.assertIn('Instance with task_state "%s" is not being '
@@ -3880,6 +4462,50 @@ class TestPciTrackerDelegationMethods(BaseTestCase):
             self.context, pci_requests, mock.sentinel.numa_topology)
         self.assertTrue(self.rt.pci_tracker.save.called)
 
+    def test_pci_devices_lock(self):
+        self.rt.compute_nodes = {'node2': mock.sentinel.cn2,
+                                 'node1': mock.sentinel.cn1}
+        orig_pci_lock = self.rt._pci_lock
+        with test.nested(
+            mock.patch.object(self.rt, '_pci_lock',
+                              side_effect=orig_pci_lock),
+            mock.patch.object(self.rt, '_node_lock'),
+        ) as (mock_pci_lock, mock_node_lock):
+            self.rt.allocate_pci_devices_for_instance(
+                self.context, self.instance)
+
+        # Only the lock of the PCI devices of the host is held, so that it
+        # can be taken under the lock of a node.
+        mock_pci_lock.assert_called_once_with()
+        mock_node_lock.assert_not_called()
+        self.rt.pci_tracker.allocate_instance.assert_called_once_with(
+            self.instance)
+
+    @mock.patch('nova.pci.manager.PciDevTracker')
+    def test_setup_pci_tracker_concurrent(self, mock_pci_tracker):
+        self.rt.pci_tracker = None
+
+        def fake_tracker(*args, **kwargs):
+            # Let the setup of the other node run.
+            greenthread.sleep(0)
+            tracker = mock.MagicMock()
+            tracker.stats.to_device_pools_obj.return_value = (
+                objects.PciDevicePoolList())
+            return tracker
+        mock_pci_tracker.side_effect = fake_tracker
+
+        cn1 = _COMPUTE_NODE_FIXTURES[0].obj_clone()
+        cn2 = _COMPUTE_NODE_FIXTURES[0].obj_clone()
+        threads = [greenthread.spawn(self.rt._setup_pci_tracker,
+                                     self.context, cn, {})
+                   for cn in (cn1, cn2)]
+        for thread in threads:
+            thread.wait()
+
+        # A single tracker is shared by the nodes.
+        mock_pci_tracker.assert_called_once_with(self.context,
+                                                 node_id=cn1.id)
+
     def test_unclaim_pci_devices(self):
         self.rt.unclaim_pci_devices(
             self.context, mock.sentinel.pci_device, mock.sentinel.instance)
@@ -1826,6 +1826,26 @@ class InstanceTestCase(test.TestCase, ModelsObjectComparatorMixin):
         instances = db.instance_get_all_by_filters(self.ctxt, {}, limit=0)
         self.assertEqual([], instances)
 
+    def test_instance_get_all_by_filters_sort_columns(self):
+        instances = [self.create_instance_with_args(display_name='inst%d' % i)
+                     for i in range(3)]
+        result = db.instance_get_all_by_filters_sort(
+            self.ctxt, {}, columns_to_join=['info_cache'],
+            sort_keys=['display_name'], sort_dirs=['desc'],
+            columns=['display_name'])
+        self.assertEqual(
+            [inst['uuid'] for inst in reversed(instances)],
+            [inst['uuid'] for inst in result])
+        # Only the uuid, the given columns, the sort keys and the joined
+        # columns are returned, along with the manually joined ones.
+        self.assertEqual(
+            set(['uuid', 'display_name', 'created_at', 'id', 'info_cache',
+                 'metadata', 'system_metadata', 'fault']),
+            set(result[0]))
+        self.assertEqual('inst2', result[0]['display_name'])
+        self.assertEqual(instances[2]['uuid'],
+                         result[0]['info_cache']['instance_uuid'])
+
     def test_instance_metadata_get_multi(self):
         uuids = [self.create_instance_with_args()['uuid'] for i in range(3)]
 
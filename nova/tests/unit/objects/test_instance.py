@@ -1712,7 +1712,8 @@ class _TestInstanceListObject(object):
                                             limit=None, marker=None,
                                             columns_to_join=['metadata'],
                                             sort_keys=['uuid'],
-                                            sort_dirs=['asc'])
+                                            sort_dirs=['asc'],
+                                            columns=None)
 
     @mock.patch.object(db, 'instance_get_all_by_filters_sort')
     @mock.patch.object(db, 'instance_get_all_by_filters')
@@ -1743,9 +1744,35 @@ class _TestInstanceListObject(object):
         mock_get_by_filters_sort.assert_called_once_with(
             self.context, {'foo': 'bar'}, limit=100,
             marker='uuid', columns_to_join=None,
-            sort_keys=['key1', 'key2'], sort_dirs=['dir1', 'dir2'])
+            sort_keys=['key1', 'key2'], sort_dirs=['dir1', 'dir2'],
+            columns=None)
         self.assertEqual(0, mock_get_by_filters.call_count)
 
+    @mock.patch.object(db, 'instance_get_all_by_filters_sort')
+    @mock.patch.object(db, 'instance_get_all_by_filters')
+    def test_get_all_by_filters_columns(self, mock_get_by_filters,
+                                        mock_get_by_filters_sort):
+        fake = self.fake_instance(1)
+        mock_get_by_filters_sort.return_value = [
+            {'uuid': fake['uuid'], 'display_name': 'foo',
+             'created_at': None, 'metadata': [], 'system_metadata': []}]
+
+        # The columns are only supported by the sorted DB function.
+        inst_list = objects.InstanceList.get_by_filters(
+            self.context, {'foo': 'bar'}, sort_key='key', sort_dir='dir',
+            columns=['display_name'])
+        mock_get_by_filters_sort.assert_called_once_with(
+            self.context, {'foo': 'bar'}, limit=None, marker=None,
+            columns_to_join=None, sort_keys=['key'], sort_dirs=['dir'],
+            columns=['display_name'])
+        self.assertEqual(0, mock_get_by_filters.call_count)
+
+        inst = inst_list[0]
+        self.assertEqual(fake['uuid'], inst.uuid)
+        self.assertEqual('foo', inst.display_name)
+        self.assertFalse(inst.obj_attr_is_set('host'))
+        self.assertFalse(inst.obj_attr_is_set('vm_state'))
+
     @mock.patch.object(db, 'instance_get_all_by_filters')
     def test_get_all_by_filters_works_for_cleaned(self, mock_get_all):
         fakes = [self.fake_instance(1),
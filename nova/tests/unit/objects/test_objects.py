@@ -1087,7 +1087,7 @@ object_data = {
     'InstanceGroup': '1.11-852ac511d30913ee88f3c3a869a8f30a',
     'InstanceGroupList': '1.8-90f8f1a445552bb3bbc9fa1ae7da27d4',
     'InstanceInfoCache': '1.5-cd8b96fefe0fc8d4d337243ba0bf0e1e',
-    'InstanceList': '2.6-238f125650c25d6d12722340d726f723',
+    'InstanceList': '2.7-22378676d4e924e196a353d3efc13620',
     'InstanceMapping': '1.2-3bd375e65c8eb9c45498d2f87b882e03',
     'InstanceMappingList': '1.3-d34b6ebb076d542ae0f8b440534118da',
     'InstanceNUMACell': '1.6-25d9120d83a18356f4146f2a6fe2cc8d',
@@ -10,9 +10,11 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 import copy
+import socket
 import time
 from urllib import parse
 
+import eventlet
 import fixtures
 from keystoneauth1 import exceptions as ks_exc
 import mock
@@ -20,6 +22,7 @@ import os_resource_classes as orc
 from oslo_serialization import jsonutils
 from oslo_utils.fixture import uuidsentinel as uuids
 
+from nova.compute import provider_tree
 import nova.conf
 from nova import context
 from nova import exception
@@ -156,6 +159,7 @@ class TestConstructor(test.NoDBTestCase):
         ksafx = self.useFixture(nova_fixtures.KSAFixture())
         self.load_auth_mock = ksafx.mock_load_auth
         self.load_sess_mock = ksafx.mock_load_sess
+        self.session_mock = ksafx.mock_session
 
     def test_constructor(self):
         client = report.SchedulerReportClient()
@@ -178,6 +182,35 @@ class TestConstructor(test.NoDBTestCase):
         self.assertEqual({'accept': 'application/json'},
                          client._client.additional_headers)
 
+    def test_constructor_connection_pool(self):
+        self.flags(connection_pool_size=25, connection_keepalive=30,
+                   group='placement')
+        report.SchedulerReportClient()
+
+        mock_mount = self.session_mock.session.mount
+        self.assertEqual(['https://', 'http://'],
+                         [c[0][0] for c in mock_mount.call_args_list])
+        adapter = mock_mount.call_args[0][1]
+        self.assertIs(adapter, mock_mount.call_args_list[0][0][1])
+        self.assertIsInstance(adapter, report._PooledKeepAliveAdapter)
+        self.assertEqual(25, adapter._pool_maxsize)
+        socket_options = adapter.poolmanager.connection_pool_kw[
+            'socket_options']
+        self.assertIn((socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1),
+                      socket_options)
+        if hasattr(socket, 'TCP_KEEPIDLE'):
+            self.assertIn((socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, 30),
+                          socket_options)
+
+    def test_constructor_adapter(self):
+        adapter = mock.Mock()
+        client = report.SchedulerReportClient(adapter=adapter)
+
+        self.assertIs(adapter, client._client)
+        # The connections of a given adapter are left alone.
+        adapter.session.session.mount.assert_not_called()
+        self.session_mock.session.mount.assert_not_called()
+
 
 class SchedulerReportClientTestCase(test.NoDBTestCase):
 
@@ -257,6 +290,104 @@ class SchedulerReportClientTestCase(test.NoDBTestCase):
                           (name_or_uuid, attr, expected))
 
 
+class TestCoalescing(SchedulerReportClientTestCase):
+
+    def setUp(self):
+        super(TestCoalescing, self).setUp()
+        self.responses = []
+
+        def fake_get(url, **kwargs):
+            # Let the other greenthreads issue their requests meanwhile.
+            for _ in range(3):
+                eventlet.sleep(0)
+            resp = mock.Mock(url=url)
+            self.responses.append(resp)
+            return resp
+
+        self.ks_adap_mock.get.side_effect = fake_get
+
+    def _get_concurrently(self, *urls):
+        threads = [eventlet.spawn(self.client.get, url, version='1.6')
+                   for url in urls]
+        return [thread.wait() for thread in threads]
+
+    def test_get_coalesced(self):
+        responses = self._get_concurrently('/traits', '/traits', '/traits')
+
+        self.ks_adap_mock.get.assert_called_once_with(
+            '/traits', microversion='1.6', global_request_id=None)
+        self.assertEqual(['/traits'] * 3, [resp.url for resp in responses])
+        # Each caller gets its own response.
+        self.assertEqual(3, len(set(map(id, responses))))
+        self.assertEqual(1, self.client._call_counts['GET'])
+        self.assertEqual(2, self.client._coalesced_count)
+        self.assertEqual({}, self.client._in_flight_gets)
+
+        # The requests sent later are not coalesced.
+        self.client.get('/traits', version='1.6')
+        self.assertEqual(2, self.ks_adap_mock.get.call_count)
+
+    def test_get_different_requests(self):
+        responses = self._get_concurrently('/traits', '/usages')
+
+        self.assertEqual(2, self.ks_adap_mock.get.call_count)
+        self.assertEqual(['/traits', '/usages'],
+                         [resp.url for resp in responses])
+        self.assertEqual(0, self.client._coalesced_count)
+
+    def test_get_after_write(self):
+        """A GET request issued after a write does not wait for a request
+        which was sent before it.
+        """
+        thread = eventlet.spawn(self.client.get, '/traits', version='1.6')
+        # Let the first GET be sent.
+        eventlet.sleep(0)
+        self.client.put('/traits/CUSTOM_FOO', None, version='1.6')
+        response = self.client.get('/traits', version='1.6')
+
+        self.assertEqual(2, self.ks_adap_mock.get.call_count)
+        self.assertIsNot(thread.wait(), response)
+        self.assertEqual(0, self.client._coalesced_count)
+
+    def test_get_after_write_returned(self):
+        """A GET request issued after a write returned does not wait for a
+        request which was sent while the write was in progress.
+        """
+        def fake_put(url, **kwargs):
+            for _ in range(3):
+                eventlet.sleep(0)
+
+        def put_and_get():
+            self.client.put('/traits/CUSTOM_FOO', None, version='1.6')
+            return self.client.get('/traits', version='1.6')
+
+        self.ks_adap_mock.put.side_effect = fake_put
+        writer = eventlet.spawn(put_and_get)
+        # Let the write be sent, then send a GET before it returns.
+        eventlet.sleep(0)
+        reader = eventlet.spawn(self.client.get, '/traits', version='1.6')
+
+        self.assertIsNot(reader.wait(), writer.wait())
+        self.assertEqual(2, self.ks_adap_mock.get.call_count)
+        self.assertEqual(0, self.client._coalesced_count)
+        self.assertEqual(1, self.client._completed_writes)
+
+    def test_get_error(self):
+        def fake_get(url, **kwargs):
+            eventlet.sleep(0)
+            raise ks_exc.EndpointNotFound()
+
+        self.ks_adap_mock.get.side_effect = fake_get
+
+        threads = [eventlet.spawn(self.client.get, '/traits')
+                   for _ in range(2)]
+        errors = [self.assertRaises(ks_exc.EndpointNotFound, thread.wait)
+                  for thread in threads]
+        self.assertIsNot(errors[0], errors[1])
+        self.ks_adap_mock.get.assert_called_once()
+        self.assertEqual({}, self.client._in_flight_gets)
+
+
 class TestPutAllocations(SchedulerReportClientTestCase):
     @mock.patch('nova.scheduler.client.report.SchedulerReportClient.put')
     def test_put_allocations(self, mock_put):
@@ -2029,11 +2160,53 @@ class TestProviderOperations(SchedulerReportClientTestCase):
                                                                uuids.root))
         mock_gpit.assert_called_once_with(self.context, uuids.root)
         mock_ref_assoc.assert_has_calls(
-            [mock.call(self.context, uuid, force=True)
+            [mock.call(self.context, uuid, force=True, generation=None)
              for uuid in tree_uuids])
         self.assertEqual(tree_uuids,
                          set(self.client._provider_tree.get_provider_uuids()))
 
+    @mock.patch('nova.scheduler.client.report.SchedulerReportClient.'
+                'get_providers_in_tree')
+    @mock.patch('nova.scheduler.client.report.SchedulerReportClient.'
+                '_refresh_associations')
+    def test_ensure_resource_provider_refresh_generation(self, mock_ref_assoc,
+                                                         mock_gpit):
+        """Make sure the cached associations of the providers whose
+        generation did not change are kept when we fetch the provider tree
+        from placement.
+        """
+        self.flags(resource_provider_association_refresh=1, group='compute')
+        ptree = self.client._provider_tree
+        ptree.new_root('root', uuids.root, generation=1)
+        ptree.new_child('one', uuids.root, uuid=uuids.one, generation=2)
+        ptree.update_inventory(uuids.root, {'VCPU': {'total': 8}},
+                               generation=1)
+        ptree.update_traits(uuids.root, ['CUSTOM_GOLD'])
+        ptree.update_aggregates(uuids.root, [uuids.agg])
+        ptree.update_traits(uuids.one, ['CUSTOM_SILVER'])
+        self.client._association_refresh_time = {
+            uuids.root: time.time() - 2, uuids.one: time.time() - 2}
+        mock_gpit.return_value = [
+            {'uuid': uuids.root, 'name': 'root', 'generation': 1},
+            {'uuid': uuids.one, 'name': 'one', 'generation': 3,
+             'parent_provider_uuid': uuids.root},
+        ]
+
+        self.client._ensure_resource_provider(self.context, uuids.root)
+
+        mock_gpit.assert_called_once_with(self.context, uuids.root)
+        mock_ref_assoc.assert_has_calls([
+            mock.call(self.context, uuids.root, force=True, generation=1),
+            mock.call(self.context, uuids.one, force=True, generation=None)])
+        # The root did not change and was restored.
+        self._validate_provider(uuids.root, generation=1,
+                                inventory={'VCPU': {'total': 8}},
+                                traits=set(['CUSTOM_GOLD']),
+                                aggregates=set([uuids.agg]))
+        # The child changed and will be refreshed.
+        self._validate_provider(uuids.one, generation=3, traits=set(),
+                                parent_uuid=uuids.root)
+
     @mock.patch('nova.scheduler.client.report.SchedulerReportClient.'
                 'get_providers_in_tree')
     @mock.patch('nova.scheduler.client.report.SchedulerReportClient.'
@@ -2172,6 +2345,120 @@ class TestProviderOperations(SchedulerReportClientTestCase):
             global_request_id=self.context.global_id)
         self.assertEqual(mock.sentinel.p_sums, p_sums)
 
+    def _get_allocation_candidates(self, ac_json):
+        text = jsonutils.dumps(ac_json)
+        resp_mock = mock.Mock(status_code=200, text=text)
+        resp_mock.json.side_effect = lambda: jsonutils.loads(text)
+        self.ks_adap_mock.get.return_value = resp_mock
+        flavor = objects.Flavor(
+            vcpus=1, memory_mb=1024, root_gb=10, ephemeral_gb=0, swap=0)
+        req_spec = objects.RequestSpec(flavor=flavor, is_bfv=False)
+        resources = scheduler_utils.ResourceRequest.from_request_spec(req_spec)
+        return self.client.get_allocation_candidates(self.context, resources)
+
+    def test_get_allocation_candidates_compact(self):
+        self.flags(compact_allocation_candidates=True, group='scheduler')
+        ac_json = {
+            'allocation_requests': [
+                {'allocations': {
+                    rp_uuid: {'resources': {'VCPU': 1, 'MEMORY_MB': 1024}},
+                    uuids.ss: {'resources': {'DISK_GB': 10}}},
+                 'mappings': {'': [rp_uuid, uuids.ss]}}
+                for rp_uuid in (uuids.cn1, uuids.cn2)],
+            'provider_summaries': {
+                rp_uuid: {
+                    'resources': {
+                        'VCPU': {'capacity': 16, 'used': 2},
+                        'MEMORY_MB': {'capacity': 2048, 'used': 1024}},
+                    'traits': ['HW_CPU_X86_AVX'],
+                    'parent_provider_uuid': None,
+                    'root_provider_uuid': rp_uuid}
+                for rp_uuid in (uuids.cn1, uuids.cn2)},
+        }
+        ac_json['provider_summaries'][uuids.ss] = {
+            'resources': {'DISK_GB': {'capacity': 100, 'used': 0}},
+            'traits': ['MISC_SHARES_VIA_AGGREGATE'],
+            'parent_provider_uuid': None,
+            'root_provider_uuid': uuids.ss}
+
+        with mock.patch.object(report, 'decode_allocation_candidates',
+                               wraps=report.decode_allocation_candidates
+                               ) as mock_decode:
+            alloc_reqs, p_sums, _ = self._get_allocation_candidates(
+                copy.deepcopy(ac_json))
+
+        # The response is made compact while it is decoded, instead of being
+        # fully decoded first.
+        mock_decode.assert_called_once_with(
+            self.ks_adap_mock.get.return_value.text)
+        self.ks_adap_mock.get.return_value.json.assert_not_called()
+
+        # The compact representation compares equal to the plain one
+        self.assertEqual(ac_json['allocation_requests'], alloc_reqs)
+        self.assertEqual(ac_json['provider_summaries'], p_sums)
+        self.assertEqual(jsonutils.loads(jsonutils.dumps(alloc_reqs)),
+                         ac_json['allocation_requests'])
+
+        # Provider summaries are compact objects still supporting item
+        # access, sharing their identical capacity and usage
+        cn1_sum = p_sums[uuids.cn1]
+        cn2_sum = p_sums[uuids.cn2]
+        self.assertIsInstance(cn1_sum, report.ProviderSummary)
+        self.assertEqual(16, cn1_sum['resources']['VCPU']['capacity'])
+        self.assertEqual(2, cn1_sum.resources['VCPU'].used)
+        self.assertEqual(('HW_CPU_X86_AVX',), cn1_sum.traits)
+        self.assertIsNone(cn1_sum['parent_provider_uuid'])
+        self.assertEqual(uuids.cn1, cn1_sum.root_provider_uuid)
+        self.assertIs(cn1_sum.resources['VCPU'], cn2_sum.resources['VCPU'])
+        self.assertIs(cn1_sum.traits[0], cn2_sum.traits[0])
+        self.assertRaises(KeyError, cn1_sum.__getitem__, 'bogus')
+
+        # They are read-only mappings
+        self.assertEqual({'resources': cn1_sum.resources,
+                          'traits': ('HW_CPU_X86_AVX',),
+                          'parent_provider_uuid': None,
+                          'root_provider_uuid': uuids.cn1},
+                         dict(cn1_sum.items()))
+        self.assertEqual(set(ac_json['provider_summaries'][uuids.cn1]),
+                         set(cn1_sum))
+        self.assertIn('traits', cn1_sum)
+        self.assertNotIn('bogus', cn1_sum)
+        self.assertEqual({'capacity': 16, 'used': 2},
+                         dict(cn1_sum['resources']['VCPU']))
+        self.assertEqual(ac_json['provider_summaries'],
+                         jsonutils.loads(jsonutils.dumps(p_sums)))
+
+        # Identical allocations are shared between allocation requests
+        self.assertIs(alloc_reqs[0]['allocations'][uuids.cn1]['resources'],
+                      alloc_reqs[1]['allocations'][uuids.cn2]['resources'])
+        self.assertIs(alloc_reqs[0]['allocations'][uuids.ss],
+                      alloc_reqs[1]['allocations'][uuids.ss])
+        # and so are the identical mappings and strings.
+        self.assertIs(alloc_reqs[0]['mappings'][''][1],
+                      alloc_reqs[1]['mappings'][''][1])
+        self.assertIs(cn1_sum.root_provider_uuid,
+                      alloc_reqs[0]['mappings'][''][0])
+
+    def test_get_allocation_candidates_not_compact(self):
+        ac_json = {
+            'allocation_requests': [
+                {'allocations': {
+                    uuids.cn1: {'resources': {'VCPU': 1}}}}],
+            'provider_summaries': {
+                uuids.cn1: {
+                    'resources': {'VCPU': {'capacity': 16, 'used': 2}},
+                    'traits': [],
+                    'parent_provider_uuid': None,
+                    'root_provider_uuid': uuids.cn1}},
+        }
+
+        alloc_reqs, p_sums, _ = self._get_allocation_candidates(ac_json)
+
+        # The response is returned as decoded by default
+        self.assertEqual(ac_json['allocation_requests'], alloc_reqs)
+        self.assertEqual(ac_json['provider_summaries'], p_sums)
+        self.assertIsInstance(p_sums[uuids.cn1], dict)
+
     def test_get_allocation_candidates_not_found(self):
         # Ensure _get_resource_provider() just returns None when the placement
         # API doesn't find a resource provider matching a UUID
@@ -2712,6 +2999,105 @@ class TestProviderOperations(SchedulerReportClientTestCase):
             self.client.get_resource_provider_name,
             self.context, uuids.rp)
 
+    @mock.patch.object(report.LOG, 'info')
+    def test_update_from_provider_tree_summary(self, mock_log):
+        new_tree = provider_tree.ProviderTree()
+        new_tree.new_root('cn', uuids.cn)
+
+        def fake_update(context, new_tree, allocations):
+            self.client.get('/resource_providers/%s' % uuids.cn)
+            self.client.put('/resource_providers/%s/traits' % uuids.cn, {})
+            self.client.put('/resource_providers/%s/inventories' % uuids.cn,
+                            {})
+            return 1
+
+        with mock.patch.object(self.client, '_update_from_provider_tree',
+                               side_effect=fake_update) as mock_update:
+            self.client.update_from_provider_tree(self.context, new_tree)
+        mock_update.assert_called_once_with(self.context, new_tree, None)
+
+        summary = mock_log.call_args[0][1]
+        self.assertEqual('Synced', summary['result'])
+        self.assertEqual(1, summary['flushed'])
+        self.assertEqual(1, summary['total'])
+        self.assertEqual(3, summary['count'])
+        self.assertEqual('GET: 1, PUT: 2', summary['calls'])
+        self.assertEqual(1, summary['workers'])
+
+    @mock.patch.object(report.LOG, 'debug')
+    def test_update_from_provider_tree_summary_failed(self, mock_log):
+        new_tree = provider_tree.ProviderTree()
+        with mock.patch.object(
+                self.client, '_update_from_provider_tree',
+                side_effect=exception.ResourceProviderSyncFailed):
+            self.assertRaises(exception.ResourceProviderSyncFailed,
+                              self.client.update_from_provider_tree,
+                              self.context, new_tree)
+        summary = mock_log.call_args[0][1]
+        self.assertEqual('Failed to sync', summary['result'])
+        self.assertEqual(0, summary['count'])
+
+    def _init_provider_trees(self, count):
+        new_tree = provider_tree.ProviderTree()
+        for i in range(count):
+            name = 'node%d' % i
+            uuid = getattr(uuids, name)
+            self.client._provider_tree.new_root(name, uuid, generation=1)
+            new_tree.new_root(name, uuid, generation=1)
+        return new_tree
+
+    @mock.patch.object(report.SchedulerReportClient, 'set_traits_for_provider')
+    @mock.patch.object(report.SchedulerReportClient,
+                       'set_aggregates_for_provider')
+    @mock.patch.object(report.SchedulerReportClient,
+                       'set_inventory_for_provider')
+    def test_update_from_provider_tree_workers(self, mock_set_inv,
+                                               mock_set_aggs,
+                                               mock_set_traits):
+        self.flags(provider_sync_workers=3, group='compute')
+        new_tree = self._init_provider_trees(6)
+        for uuid in (uuids.node1, uuids.node2, uuids.node4, uuids.node5):
+            new_tree.update_traits(uuid, ['CUSTOM_FOO'])
+
+        self.client.update_from_provider_tree(self.context, new_tree)
+
+        # Only the changed providers are flushed, each with its calls in
+        # order.
+        self.assertEqual(
+            set([uuids.node1, uuids.node2, uuids.node4, uuids.node5]),
+            set(c[0][1] for c in mock_set_traits.call_args_list))
+        self.assertEqual(4, mock_set_inv.call_count)
+        self.assertEqual(4, mock_set_aggs.call_count)
+        mock_set_traits.assert_any_call(
+            self.context, uuids.node4, set(['CUSTOM_FOO']))
+
+    @mock.patch.object(report.SchedulerReportClient, 'set_traits_for_provider')
+    @mock.patch.object(report.SchedulerReportClient,
+                       'set_aggregates_for_provider')
+    @mock.patch.object(report.SchedulerReportClient,
+                       'set_inventory_for_provider')
+    def test_update_from_provider_tree_workers_fail(self, mock_set_inv,
+                                                    mock_set_aggs,
+                                                    mock_set_traits):
+        self.flags(provider_sync_workers=3, group='compute')
+        new_tree = self._init_provider_trees(4)
+        for uuid in (uuids.node0, uuids.node1, uuids.node2, uuids.node3):
+            new_tree.update_traits(uuid, ['CUSTOM_FOO'])
+
+        def fake_set_traits(context, rp_uuid, traits):
+            if rp_uuid == uuids.node2:
+                raise exception.TraitRetrievalFailed(error='')
+
+        mock_set_traits.side_effect = fake_set_traits
+
+        self.assertRaises(exception.ResourceProviderSyncFailed,
+                          self.client.update_from_provider_tree,
+                          self.context, new_tree)
+        # Only the tree of the failing provider is invalidated.
+        self.assertEqual(
+            set([uuids.node0, uuids.node1, uuids.node3]),
+            set(self.client._provider_tree.get_provider_uuids()))
+
 
 class TestAggregates(SchedulerReportClientTestCase):
     def test_get_provider_aggregates_found(self):
@@ -3087,6 +3473,61 @@ class TestAssociations(SchedulerReportClientTestCase):
         self.client._refresh_associations(self.context, uuid)
         self.assert_getters_were_called(uuid)
 
+    def test_refresh_associations_generation_unchanged(self):
+        """Test that the associations of a provider whose generation did not
+        change are not fetched again.
+        """
+        uuid = uuids.compute_node
+        self.client._provider_tree.new_root('compute', uuid, generation=1)
+        self.client._provider_tree.update_aggregates(uuid, [uuids.agg1])
+        self.client._association_refresh_time[uuid] = 1234
+        self.mock_get_sharing.return_value = []
+
+        self.client._refresh_associations(self.context, uuid, force=True,
+                                          generation=1)
+
+        self.mock_get_inv.assert_not_called()
+        self.mock_get_aggs.assert_not_called()
+        self.mock_get_traits.assert_not_called()
+        # The sharing providers are still refreshed, from the cached
+        # aggregates.
+        self.mock_get_sharing.assert_called_once_with(
+            self.context, set([uuids.agg1]))
+        self.assertNotEqual(1234, self.client._association_refresh_time[uuid])
+
+        # A different generation triggers the refresh.
+        self.mock_get_sharing.reset_mock()
+        self.client._refresh_associations(self.context, uuid, force=True,
+                                          generation=2)
+        self.assert_getters_were_called(uuid)
+
+    def test_refresh_associations_generation_not_loaded(self):
+        """Test that the generation is ignored if the associations of the
+        provider were never fetched.
+        """
+        uuid = uuids.compute_node
+        self.client._provider_tree.new_root('compute', uuid, generation=1)
+        self.client._refresh_associations(self.context, uuid, generation=1)
+        self.assert_getters_were_called(uuid)
+
+    def test_refresh_associations_sharing_generation(self):
+        """Test that the sharing providers whose generation did not change
+        are not refreshed.
+        """
+        uuid = uuids.compute_node
+        self.client._provider_tree.new_root('compute', uuid, generation=1)
+        self.client._provider_tree.new_root('ssp', uuids.ssp, generation=7)
+        self.client._association_refresh_time[uuids.ssp] = 1234
+        self.mock_get_sharing.return_value = [
+            {'uuid': uuids.ssp, 'name': 'ssp', 'generation': 7}]
+
+        self.client._refresh_associations(self.context, uuid, force=True)
+
+        self.mock_get_inv.assert_called_once_with(self.context, uuid)
+        self.mock_get_aggs.assert_called_once_with(self.context, uuid)
+        self.mock_get_traits.assert_called_once_with(self.context, uuid)
+        self.assertIn(uuids.ssp, self.client._association_refresh_time)
+
     def test_refresh_associations_no_refresh_sharing(self):
         """Test refresh_sharing=False."""
         uuid = uuids.compute_node
@@ -3404,6 +3845,88 @@ class TestAllocations(SchedulerReportClientTestCase):
             '/allocations/consumer', version='1.28',
             global_request_id=self.context.global_id)
 
+    @mock.patch("nova.scheduler.client.report.SchedulerReportClient.post")
+    @mock.patch("nova.scheduler.client.report.SchedulerReportClient.get")
+    def test_delete_allocations_for_instances(self, mock_get, mock_post):
+        def fake_get(url, **kwargs):
+            if url == '/allocations/%s' % uuids.missing:
+                return fake_requests.FakeResponse(
+                    200, content=jsonutils.dumps({'allocations': {}}))
+            return fake_requests.FakeResponse(
+                200, content=jsonutils.dumps({
+                    'allocations': {uuids.rp: {'resources': {'VCPU': 1}}},
+                    'project_id': uuids.project_id,
+                    'user_id': uuids.user_id,
+                    'consumer_generation': 3}))
+
+        mock_get.side_effect = fake_get
+        mock_post.return_value = fake_requests.FakeResponse(204)
+
+        deleted = self.client.delete_allocations_for_instances(
+            self.context, [uuids.inst1, uuids.missing, uuids.inst2])
+
+        self.assertEqual([uuids.inst1, uuids.inst2], deleted)
+        self.assertEqual(3, mock_get.call_count)
+        mock_get.assert_has_calls([
+            mock.call('/allocations/%s' % uuid, version='1.28',
+                      global_request_id=self.context.global_id)
+            for uuid in (uuids.inst1, uuids.missing, uuids.inst2)])
+        expected = {
+            'allocations': {},
+            'project_id': uuids.project_id,
+            'user_id': uuids.user_id,
+            'consumer_generation': 3,
+        }
+        mock_post.assert_called_once_with(
+            '/allocations', {uuids.inst1: expected, uuids.inst2: expected},
+            version='1.28', global_request_id=self.context.global_id)
+
+    @mock.patch("nova.scheduler.client.report.SchedulerReportClient.post")
+    @mock.patch("nova.scheduler.client.report.SchedulerReportClient.get")
+    def test_delete_allocations_for_instances_none(self, mock_get,
+                                                   mock_post):
+        mock_get.return_value = fake_requests.FakeResponse(
+            200, content=jsonutils.dumps({'allocations': {}}))
+
+        self.assertEqual([], self.client.delete_allocations_for_instances(
+            self.context, [uuids.inst1]))
+        mock_post.assert_not_called()
+
+    @mock.patch("nova.scheduler.client.report.SchedulerReportClient.post")
+    @mock.patch("nova.scheduler.client.report.SchedulerReportClient.get")
+    def test_delete_allocations_for_instances_conflict(self, mock_get,
+                                                       mock_post):
+        mock_get.return_value = fake_requests.FakeResponse(
+            200, content=jsonutils.dumps({
+                'allocations': {uuids.rp: {'resources': {'VCPU': 1}}},
+                'project_id': uuids.project_id,
+                'user_id': uuids.user_id,
+                'consumer_generation': 3}))
+        mock_post.return_value = fake_requests.FakeResponse(
+            409, content=jsonutils.dumps(
+                {'errors': [{'code': 'placement.concurrent_update',
+                             'detail': 'consumer generation conflict'}]}))
+
+        ex = self.assertRaises(
+            exception.AllocationDeleteFailed,
+            self.client.delete_allocations_for_instances,
+            self.context, [uuids.inst1, uuids.inst2])
+        self.assertIn(uuids.inst1, str(ex))
+        self.assertIn(uuids.inst2, str(ex))
+
+    @mock.patch("nova.scheduler.client.report.SchedulerReportClient.post")
+    @mock.patch("nova.scheduler.client.report.SchedulerReportClient.get")
+    def test_delete_allocations_for_instances_get_fails(self, mock_get,
+                                                        mock_post):
+        mock_get.return_value = fake_requests.FakeResponse(500, content='err')
+
+        self.assertRaises(
+            exception.AllocationDeleteFailed,
+            self.client.delete_allocations_for_instances,
+            self.context, [uuids.inst1, uuids.inst2])
+        mock_get.assert_called_once()
+        mock_post.assert_not_called()
+
     def _test_remove_res_from_alloc(
             self, current_allocations, resources_to_remove,
             updated_allocations):
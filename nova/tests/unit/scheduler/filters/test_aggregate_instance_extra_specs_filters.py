@@ -90,3 +90,22 @@ class TestAggregateInstanceExtraSpecsFilter(test.NoDBTestCase):
             'opt2': '222'
         }
         self._do_test_aggregate_filter_extra_specs(especs, passes=False)
+
+    def test_aggregate_filter_host_passes_all(self, agg_mock):
+        agg1 = objects.Aggregate(metadata={'opt1': '1'})
+        agg2 = objects.Aggregate(metadata={'opt1': '2'})
+        hosts = [
+            fakes.FakeHostState('host1', 'node1', {'aggregates': [agg1]}),
+            fakes.FakeHostState('host2', 'node1', {'aggregates': [agg2]}),
+            fakes.FakeHostState('host3', 'node1', {'aggregates': [agg1]}),
+        ]
+        agg_mock.side_effect = [{'opt1': set(['1'])}, {'opt1': set(['2'])}]
+        spec_obj = objects.RequestSpec(
+            context=mock.sentinel.ctx,
+            flavor=objects.Flavor(memory_mb=1024,
+                                  extra_specs={'opt1': '1'}))
+        self.assertEqual([hosts[0], hosts[2]],
+                         self.filt_cls.filter_all(hosts, spec_obj))
+        # The aggregate metadata is only matched once per set of aggregates.
+        agg_mock.assert_has_calls([mock.call(hosts[0]), mock.call(hosts[1])])
+        self.assertEqual(2, agg_mock.call_count)
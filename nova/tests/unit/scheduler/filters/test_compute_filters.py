@@ -52,3 +52,34 @@ class TestComputeFilter(test.NoDBTestCase):
         service_up_mock.return_value = False
         self.assertFalse(filt_cls.host_passes(host, spec_obj))
         service_up_mock.assert_called_once_with(service)
+
+    def test_compute_filter_filter_all(self, service_up_mock):
+        filt_cls = compute_filter.ComputeFilter()
+        spec_obj = objects.RequestSpec(
+            flavor=objects.Flavor(memory_mb=1024))
+        hosts = [
+            fakes.FakeHostState('host1', 'node1',
+                                {'service': {'disabled': False}}),
+            fakes.FakeHostState('host2', 'node1',
+                                {'service': {'disabled': True}}),
+            fakes.FakeHostState('host3', 'node1',
+                                {'service': {'disabled': False}}),
+        ]
+        service_up_mock.side_effect = [True, False]
+        self.assertEqual([hosts[0]], filt_cls.filter_all(hosts, spec_obj))
+        self.assertEqual(2, service_up_mock.call_count)
+
+    def test_compute_filter_filter_all_same_service(self, service_up_mock):
+        filt_cls = compute_filter.ComputeFilter()
+        spec_obj = objects.RequestSpec(
+            flavor=objects.Flavor(memory_mb=1024))
+        hosts = [
+            fakes.FakeHostState('host1', 'node%d' % i,
+                                {'service': {'id': 1, 'disabled': False}})
+            for i in range(3)] + [
+            fakes.FakeHostState('host2', 'node1',
+                                {'service': {'id': 2, 'disabled': False}})]
+        service_up_mock.side_effect = [True, False]
+        self.assertEqual(hosts[:3], filt_cls.filter_all(hosts, spec_obj))
+        # The state of each service is only checked once.
+        self.assertEqual(2, service_up_mock.call_count)
@@ -60,3 +60,38 @@ class TestIoOpsFilter(test.NoDBTestCase):
         spec_obj = objects.RequestSpec(context=mock.sentinel.ctx)
         self.assertTrue(self.filt_cls.host_passes(host, spec_obj))
         agg_mock.assert_called_once_with(host, 'max_io_ops_per_host')
+
+    def test_filter_num_iops_host_passes_all(self):
+        self.flags(max_io_ops_per_host=8, group='filter_scheduler')
+        self.filt_cls = io_ops_filter.IoOpsFilter()
+        hosts = [fakes.FakeHostState('host%s' % i, 'node1',
+                                     {'num_io_ops': num_io_ops})
+                 for i, num_io_ops in enumerate([7, 8, 0])]
+        spec_obj = objects.RequestSpec()
+        self.assertEqual([True, False, True],
+                         self.filt_cls.host_passes_all(hosts, spec_obj))
+        self.assertEqual([hosts[0], hosts[2]],
+                         self.filt_cls.filter_all(hosts, spec_obj))
+
+    @mock.patch('nova.scheduler.filters.utils.aggregate_values_from_key')
+    def test_aggregate_filter_num_iops_host_passes_all(self, agg_mock):
+        self.flags(max_io_ops_per_host=7, group='filter_scheduler')
+        self.filt_cls = io_ops_filter.AggregateIoOpsFilter()
+        agg1 = objects.Aggregate(metadata={'max_io_ops_per_host': '8'})
+        agg2 = objects.Aggregate(metadata={})
+        hosts = [
+            fakes.FakeHostState('host1', 'node1',
+                                {'num_io_ops': 7, 'aggregates': [agg1]}),
+            fakes.FakeHostState('host2', 'node1',
+                                {'num_io_ops': 7, 'aggregates': [agg1]}),
+            fakes.FakeHostState('host3', 'node1',
+                                {'num_io_ops': 7, 'aggregates': [agg2]}),
+        ]
+        agg_mock.side_effect = [set(['8']), set()]
+        spec_obj = objects.RequestSpec(context=mock.sentinel.ctx)
+        self.assertEqual([True, True, False],
+                         self.filt_cls.host_passes_all(hosts, spec_obj))
+        # The aggregate values are only looked up once per set of aggregates.
+        agg_mock.assert_has_calls([
+            mock.call(hosts[0], 'max_io_ops_per_host'),
+            mock.call(hosts[2], 'max_io_ops_per_host')])
@@ -60,3 +60,38 @@ class TestNumInstancesFilter(test.NoDBTestCase):
         agg_mock.return_value = set(['XXX'])
         self.assertTrue(self.filt_cls.host_passes(host, spec_obj))
         agg_mock.assert_called_once_with(host, 'max_instances_per_host')
+
+    def test_filter_num_instances_host_passes_all(self):
+        self.flags(max_instances_per_host=5, group='filter_scheduler')
+        self.filt_cls = num_instances_filter.NumInstancesFilter()
+        hosts = [fakes.FakeHostState('host%s' % i, 'node1',
+                                     {'num_instances': num_instances})
+                 for i, num_instances in enumerate([4, 5, 0])]
+        spec_obj = objects.RequestSpec()
+        self.assertEqual([True, False, True],
+                         self.filt_cls.host_passes_all(hosts, spec_obj))
+        self.assertEqual([hosts[0], hosts[2]],
+                         self.filt_cls.filter_all(hosts, spec_obj))
+
+    @mock.patch('nova.scheduler.filters.utils.aggregate_values_from_key')
+    def test_filter_aggregate_num_instances_host_passes_all(self, agg_mock):
+        self.flags(max_instances_per_host=4, group='filter_scheduler')
+        self.filt_cls = num_instances_filter.AggregateNumInstancesFilter()
+        agg1 = objects.Aggregate(metadata={'max_instances_per_host': '6'})
+        agg2 = objects.Aggregate(metadata={})
+        hosts = [
+            fakes.FakeHostState('host1', 'node1',
+                                {'num_instances': 5, 'aggregates': [agg1]}),
+            fakes.FakeHostState('host2', 'node1',
+                                {'num_instances': 5, 'aggregates': [agg2]}),
+            fakes.FakeHostState('host3', 'node1',
+                                {'num_instances': 3, 'aggregates': [agg2]}),
+        ]
+        agg_mock.side_effect = [set(['6']), set()]
+        spec_obj = objects.RequestSpec(context=mock.sentinel.ctx)
+        self.assertEqual([True, False, True],
+                         self.filt_cls.host_passes_all(hosts, spec_obj))
+        # The aggregate values are only looked up once per set of aggregates.
+        agg_mock.assert_has_calls([
+            mock.call(hosts[0], 'max_instances_per_host'),
+            mock.call(hosts[1], 'max_instances_per_host')])
@@ -12,6 +12,7 @@
 
 import itertools
 
+import mock
 from oslo_utils.fixture import uuidsentinel as uuids
 
 from nova import objects
@@ -19,6 +20,7 @@ from nova.objects import fields
 from nova.scheduler.filters import numa_topology_filter
 from nova import test
 from nova.tests.unit.scheduler import fakes
+from nova.virt import hardware
 
 
 class TestNUMATopologyFilter(test.NoDBTestCase):
@@ -56,6 +58,44 @@ class TestNUMATopologyFilter(test.NoDBTestCase):
                                     'ram_allocation_ratio': 1.5})
         self.assertTrue(self.filt_cls.host_passes(host, spec_obj))
 
+    def test_numa_topology_filter_records_fit(self):
+        instance_topology = objects.InstanceNUMATopology(cells=[
+            objects.InstanceNUMACell(id=0, cpuset=set([1]), pcpuset=set(),
+                memory=512),
+            ])
+        spec_obj = self._get_spec_obj(numa_topology=instance_topology)
+        host = fakes.FakeHostState('host1', 'node1',
+                                   {'numa_topology': fakes.NUMA_TOPOLOGY,
+                                    'pci_stats': None,
+                                    'cpu_allocation_ratio': 16.0,
+                                    'ram_allocation_ratio': 1.5})
+        self.assertTrue(self.filt_cls.host_passes(host, spec_obj))
+        host_topology, requested, limits, fitted = host.numa_fit
+        self.assertIs(fakes.NUMA_TOPOLOGY, host_topology)
+        self.assertIs(instance_topology, requested)
+        self.assertIs(host.limits['numa_topology'], limits)
+        self.assertIsInstance(fitted, objects.InstanceNUMATopology)
+        self.assertIsNot(instance_topology, fitted)
+
+    def test_numa_topology_filter_shares_fit_between_hosts(self):
+        instance_topology = objects.InstanceNUMATopology(cells=[
+            objects.InstanceNUMACell(id=0, cpuset=set([1]), pcpuset=set(),
+                memory=512),
+            objects.InstanceNUMACell(id=1, cpuset=set([3]), pcpuset=set(),
+                memory=512),
+            ])
+        spec_obj = self._get_spec_obj(numa_topology=instance_topology)
+        hosts = [fakes.FakeHostState('host%d' % i, 'node%d' % i,
+                                     {'numa_topology': fakes.NUMA_TOPOLOGY,
+                                      'pci_stats': None,
+                                      'cpu_allocation_ratio': 16.0,
+                                      'ram_allocation_ratio': 1.5})
+                 for i in range(2)]
+        self.assertTrue(self.filt_cls.host_passes(hosts[0], spec_obj))
+        with mock.patch.object(hardware, '_numa_fit_instance_cell') as fit:
+            self.assertTrue(self.filt_cls.host_passes(hosts[1], spec_obj))
+        fit.assert_not_called()
+
     def test_numa_topology_filter_numa_instance_no_numa_host_fail(self):
         instance_topology = objects.InstanceNUMATopology(cells=[
             objects.InstanceNUMACell(id=0, cpuset=set([1]), pcpuset=set(),
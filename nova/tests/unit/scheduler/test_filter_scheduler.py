@@ -16,7 +16,10 @@
 Tests For Filter Scheduler.
 """
 
+from eventlet import corolocal
+import fixtures
 import mock
+import oslo_messaging as messaging
 from oslo_serialization import jsonutils
 from oslo_utils.fixture import uuidsentinel as uuids
 
@@ -25,10 +28,12 @@ from nova import exception
 from nova import objects
 from nova.scheduler import filter_scheduler
 from nova.scheduler import host_manager
+from nova.scheduler import sharding
 from nova.scheduler import utils as scheduler_utils
 from nova.scheduler import weights
 from nova import servicegroup
 from nova import test  # noqa
+from nova import trace as nova_trace
 
 
 fake_numa_limit = objects.NUMATopologyLimits(cpu_allocation_ratio=1.0,
@@ -332,7 +337,8 @@ class FilterSchedulerTestCase(test.NoDBTestCase):
                 alloc_reqs_by_rp_uuid[uuids.cn1][0],
             allocation_request_version=fake_version)
 
-        mock_cleanup.assert_not_called()
+        self.driver.placement_client.delete_allocation_for_instance.\
+            assert_not_called()
         # Ensure that we have consumed the resources on the chosen host states
         self.assertFalse(host_state.consume_from_request.called)
 
@@ -389,6 +395,509 @@ class FilterSchedulerTestCase(test.NoDBTestCase):
         # Ensure we cleaned up the first successfully-claimed instance
         mock_cleanup.assert_called_once_with(ctx, [uuids.instance1])
 
+    def _test_schedule_batch(self, claim_side_effect, num_hosts=3,
+                             num_instances=3, instance_group=None):
+        self.flags(claim_concurrency=4, group='filter_scheduler')
+        spec_obj = objects.RequestSpec(
+            num_instances=num_instances,
+            flavor=objects.Flavor(memory_mb=512,
+                                  root_gb=512,
+                                  ephemeral_gb=0,
+                                  swap=0,
+                                  vcpus=1),
+            project_id=uuids.project_id,
+            instance_group=instance_group)
+        host_states = [
+            mock.Mock(spec=host_manager.HostState, host='host%d' % i,
+                      nodename='node%d' % i, uuid=getattr(uuids, 'cn%d' % i),
+                      cell_uuid=uuids.cell, limits={}, aggregates=[],
+                      instances={})
+            for i in range(num_hosts)]
+        alloc_reqs_by_rp_uuid = {
+            host_state.uuid: [{'allocations': {host_state.uuid: {}}}]
+            for host_state in host_states}
+        instance_uuids = [getattr(uuids, 'instance%d' % i)
+                          for i in range(num_instances)]
+
+        def fake_get_sorted_hosts(_spec_obj, hosts, index):
+            # Prefer the hosts which were selected the least.
+            return sorted(hosts,
+                key=lambda h: h.consume_from_request.call_count)
+
+        with test.nested(
+            mock.patch.object(self.driver, '_get_all_host_states',
+                              return_value=host_states),
+            mock.patch.object(self.driver, '_get_sorted_hosts',
+                              side_effect=fake_get_sorted_hosts),
+            mock.patch('nova.scheduler.utils.claim_resources',
+                       side_effect=claim_side_effect),
+        ) as (mock_get_all_states, mock_get_hosts, mock_claim):
+            ctx = mock.Mock()
+            result = self.driver._schedule(ctx, spec_obj, instance_uuids,
+                alloc_reqs_by_rp_uuid, mock.sentinel.provider_summaries)
+        return result, host_states, mock_get_hosts, mock_claim
+
+    def test_schedule_batch(self):
+        selections, host_states, mock_get_hosts, mock_claim = (
+            self._test_schedule_batch(lambda *args, **kwargs: True))
+
+        self.assertEqual([[h.host] for h in host_states],
+                         [[s.service_host for s in sels]
+                          for sels in selections])
+        self.assertEqual(3, mock_claim.call_count)
+        self.assertEqual(3, mock_get_hosts.call_count)
+        self.driver.placement_client.delete_allocation_for_instance.\
+            assert_not_called()
+
+    def test_schedule_batch_traced(self):
+        # Make sure the trace is local to the green thread, whether or not
+        # the module was imported before monkey patching.
+        self.useFixture(fixtures.MonkeyPatch('nova.trace._local',
+                                             corolocal.local()))
+        trace = nova_trace.Trace('req-1', [])
+        nova_trace.set_current(trace)
+
+        def fake_claim(*args, **kwargs):
+            # The claims are made from the green threads of a GreenPool.
+            with nova_trace.phase('claim'):
+                return True
+
+        self._test_schedule_batch(fake_claim)
+
+        self.assertEqual(3, trace.phases['claim'][0])
+
+    def test_schedule_batch_claim_failed(self):
+        def fake_claim(ctx, client, spec_obj, instance_uuid, alloc_req,
+                       allocation_request_version=None):
+            # The claim of the second instance on the second host fails.
+            return not (instance_uuid == uuids.instance1 and
+                        uuids.cn1 in alloc_req['allocations'])
+
+        selections, host_states, mock_get_hosts, mock_claim = (
+            self._test_schedule_batch(fake_claim, num_hosts=4))
+
+        # The second instance was scheduled again to the fourth host.
+        self.assertEqual(['host0', 'host3', 'host2'],
+                         [sels[0].service_host for sels in selections])
+        self.assertEqual(4, mock_claim.call_count)
+        self.assertEqual(4, mock_get_hosts.call_count)
+        # The host the claim failed against isn't considered anymore.
+        self.assertNotIn(host_states[1],
+                         mock_get_hosts.call_args_list[-1][0][1])
+        self.driver.placement_client.delete_allocation_for_instance.\
+            assert_not_called()
+
+    def test_schedule_batch_claim_failed_no_more_hosts(self):
+        def fake_claim(ctx, client, spec_obj, instance_uuid, alloc_req,
+                       allocation_request_version=None):
+            return instance_uuid != uuids.instance1
+
+        self.assertRaises(exception.NoValidHost, self._test_schedule_batch,
+                          fake_claim, num_hosts=2)
+        # The allocations of the other instances were cleaned up.
+        mock_delete = (
+            self.driver.placement_client.delete_allocation_for_instance)
+        self.assertEqual(
+            [mock.call(mock.ANY, uuids.instance0),
+             mock.call(mock.ANY, uuids.instance2)],
+            mock_delete.call_args_list)
+
+    def test_schedule_batch_claim_error(self):
+        def fake_claim(ctx, client, spec_obj, instance_uuid, alloc_req,
+                       allocation_request_version=None):
+            if instance_uuid == uuids.instance1:
+                raise exception.AllocationUpdateFailed(
+                    consumer_uuid=instance_uuid, error='fake')
+            return True
+
+        self.assertRaises(exception.AllocationUpdateFailed,
+                          self._test_schedule_batch, fake_claim)
+        # The allocations of the other instances were cleaned up.
+        mock_delete = (
+            self.driver.placement_client.delete_allocation_for_instance)
+        self.assertEqual(
+            [mock.call(mock.ANY, uuids.instance0),
+             mock.call(mock.ANY, uuids.instance2)],
+            mock_delete.call_args_list)
+
+    @mock.patch('nova.scheduler.filter_scheduler.FilterScheduler.'
+                '_schedule_and_claim_in_batch')
+    def test_schedule_batch_instance_group(self, mock_batch):
+        group = objects.InstanceGroup(hosts=[], policy='anti-affinity')
+        selections = self._test_schedule_batch(
+            lambda *args, **kwargs: True, instance_group=group)[0]
+        self.assertEqual(3, len(selections))
+        mock_batch.assert_not_called()
+
+    @staticmethod
+    def _get_shard_result(raw_weights, selections):
+        # A single weigher, with a multiplier of 1.0 for every host.
+        return {'ranges': [(min(raw_weights), max(raw_weights))],
+                'candidates': [{'raw_weights': [raw_weight],
+                                'multipliers': [1.0],
+                                'selection': selection}
+                               for raw_weight, selection in zip(raw_weights,
+                                                                selections)]}
+
+    def _test_schedule_sharded(self, claim_side_effect, num_instances=2,
+                               instance_group=None, peer_error=None,
+                               provider_summaries=None, hosts=None):
+        self.driver.shards = sharding.SchedulerShards('compute', 'sched1')
+        self.driver.shards.update_hosts(['sched1', 'sched2'])
+        self.driver.scheduler_rpcapi = mock.Mock()
+        spec_obj = objects.RequestSpec(num_instances=num_instances,
+                                       instance_group=instance_group)
+        selections = [
+            objects.Selection(service_host=(hosts[i] if hosts
+                                            else 'host%d' % i),
+                              nodename='node%d' % i,
+                              compute_node_uuid=getattr(uuids, 'cn%d' % i),
+                              cell_uuid=uuids.cell, limits=None,
+                              allocation_request=None,
+                              allocation_request_version=None,
+                              availability_zone=None)
+            for i in range(4)]
+        alloc_reqs_by_rp_uuid = {
+            getattr(uuids, 'cn%d' % i): [
+                {'allocations': {getattr(uuids, 'cn%d' % i): {
+                    'resources': {'MEMORY_MB': 512}}}}]
+            for i in range(3)}
+        if provider_summaries is None:
+            provider_summaries = {uuids.cn0: {}, uuids.cn1: {}}
+        instance_uuids = [getattr(uuids, 'instance%d' % i)
+                          for i in range(num_instances)]
+        # The second shard has the second best host, and a duplicate of a
+        # host of the first shard with a lower weight. The fourth host has no
+        # allocation request.
+        self.driver.scheduler_rpcapi.select_shard_candidates.side_effect = (
+            peer_error or [self._get_shard_result(
+                [20.0, 5.0], [selections[1], selections[0]])])
+        local_candidates = self._get_shard_result(
+            [30.0, 10.0, 2.0], [selections[3], selections[0], selections[2]])
+
+        with test.nested(
+            mock.patch.object(self.driver, 'select_shard_candidates',
+                              return_value=local_candidates),
+            mock.patch.object(self.driver, '_get_all_host_states'),
+            mock.patch('nova.scheduler.utils.claim_resources',
+                       side_effect=claim_side_effect),
+        ) as (mock_select_local, mock_get_all_states, mock_claim):
+            ctx = mock.Mock()
+            result = self.driver._schedule(ctx, spec_obj, instance_uuids,
+                alloc_reqs_by_rp_uuid, provider_summaries,
+                allocation_request_version=fake_alloc_version,
+                return_alternates=True)
+
+        # The default [scheduler] max_attempts is 3.
+        limit = num_instances + 3
+        mock_select_local.assert_called_once_with(ctx.elevated.return_value,
+            spec_obj, list(provider_summaries), limit)
+        self.driver.scheduler_rpcapi.select_shard_candidates.\
+            assert_called_once_with(ctx.elevated.return_value, 'sched2',
+                                    spec_obj, list(provider_summaries),
+                                    limit)
+        mock_get_all_states.assert_not_called()
+        return result, mock_claim
+
+    def test_schedule_sharded(self):
+        selections, mock_claim = self._test_schedule_sharded(
+            lambda *args, **kwargs: True)
+
+        self.assertEqual([['host1', 'host2'], ['host0', 'host2']],
+                         [[s.service_host for s in sels]
+                          for sels in selections])
+        self.assertEqual(
+            {'allocations': {uuids.cn1: {'resources': {'MEMORY_MB': 512}}}},
+            jsonutils.loads(selections[0][0].allocation_request))
+        self.assertEqual(fake_alloc_version,
+                         selections[0][0].allocation_request_version)
+        self.assertEqual(2, mock_claim.call_count)
+
+    def test_schedule_sharded_claim_failed(self):
+        def fake_claim(ctx, client, spec_obj, instance_uuid, alloc_req,
+                       allocation_request_version=None):
+            return uuids.cn1 not in alloc_req['allocations']
+
+        selections, mock_claim = self._test_schedule_sharded(fake_claim)
+
+        # The host the claim failed against isn't tried again.
+        self.assertEqual(['host0', 'host2'],
+                         [sels[0].service_host for sels in selections])
+        self.assertEqual(3, mock_claim.call_count)
+
+    @staticmethod
+    def _get_memory_summaries(used):
+        return {
+            getattr(uuids, 'cn%d' % i): {'resources': {
+                'MEMORY_MB': {'capacity': 2048, 'used': used[i]}}}
+            for i in range(3)}
+
+    def test_schedule_sharded_same_hosts(self):
+        # The hosts are selected again while they have enough memory left,
+        # those selected for fewer instances first.
+        selections, mock_claim = self._test_schedule_sharded(
+            lambda *args, **kwargs: True, num_instances=7,
+            provider_summaries=self._get_memory_summaries([0, 512, 1536]))
+
+        self.assertEqual(
+            ['host1', 'host0', 'host2', 'host1', 'host0', 'host1', 'host0'],
+            [sels[0].service_host for sels in selections])
+        self.assertEqual(7, mock_claim.call_count)
+        # The alternates are the hosts which weren't selected.
+        self.assertEqual([1] * 7, [len(sels) for sels in selections])
+
+    def test_schedule_sharded_not_enough_hosts(self):
+        self.assertRaises(exception.NoValidHost, self._test_schedule_sharded,
+                          lambda *args, **kwargs: True, num_instances=4,
+                          provider_summaries=self._get_memory_summaries(
+                              [1536, 1536, 2048]))
+        # The allocations of the claimed instances were cleaned up.
+        mock_delete = (
+            self.driver.placement_client.delete_allocation_for_instance)
+        self.assertEqual(
+            [mock.call(mock.ANY, getattr(uuids, 'instance%d' % i))
+             for i in range(2)],
+            mock_delete.call_args_list)
+
+    def test_schedule_sharded_anti_affinity(self):
+        # The first two compute nodes are on the same host.
+        group = objects.InstanceGroup(hosts=['host3'],
+                                      policy='anti-affinity', rules={})
+        selections, mock_claim = self._test_schedule_sharded(
+            lambda *args, **kwargs: True, instance_group=group,
+            hosts=['host0', 'host0', 'host2', 'host3'])
+
+        self.assertEqual(['host0', 'host2'],
+                         [sels[0].service_host for sels in selections])
+        self.assertEqual(['host3', 'host0', 'host2'], group.hosts)
+        self.assertNotIn('hosts', group.obj_what_changed())
+
+        # The host can be selected for another instance up to
+        # max_server_per_host.
+        group = objects.InstanceGroup(hosts=[], policy='anti-affinity',
+                                      rules={'max_server_per_host': 2})
+        selections, mock_claim = self._test_schedule_sharded(
+            lambda *args, **kwargs: True, num_instances=3,
+            instance_group=group, hosts=['host0', 'host0', 'host2', 'host3'])
+        self.assertEqual(['host0', 'host0', 'host2'],
+                         [sels[0].service_host for sels in selections])
+
+    def test_schedule_sharded_affinity(self):
+        group = objects.InstanceGroup(hosts=[], policy='affinity')
+        selections, mock_claim = self._test_schedule_sharded(
+            lambda *args, **kwargs: True, instance_group=group)
+
+        self.assertEqual(['host1', 'host1'],
+                         [sels[0].service_host for sels in selections])
+
+    def test_schedule_sharded_soft_affinity(self):
+        # The host of the first instance only has room for one instance.
+        group = objects.InstanceGroup(hosts=[], policy='soft-affinity')
+        selections, mock_claim = self._test_schedule_sharded(
+            lambda *args, **kwargs: True, num_instances=3,
+            instance_group=group,
+            provider_summaries=self._get_memory_summaries([0, 1536, 0]))
+
+        # The other hosts are fallbacks, those selected for more instances
+        # first.
+        self.assertEqual(['host1', 'host0', 'host0'],
+                         [sels[0].service_host for sels in selections])
+        self.assertEqual(3, mock_claim.call_count)
+
+    def test_schedule_sharded_soft_affinity_claim_failed(self):
+        def fake_claim(ctx, client, spec_obj, instance_uuid, alloc_req,
+                       allocation_request_version=None):
+            return (instance_uuid == uuids.instance0 or
+                    uuids.cn1 not in alloc_req['allocations'])
+
+        group = objects.InstanceGroup(hosts=[], policy='soft-affinity')
+        selections, mock_claim = self._test_schedule_sharded(
+            fake_claim, instance_group=group)
+
+        self.assertEqual(['host1', 'host0'],
+                         [sels[0].service_host for sels in selections])
+        self.assertEqual(3, mock_claim.call_count)
+
+    def test_schedule_sharded_peer_error(self):
+        selections, mock_claim = self._test_schedule_sharded(
+            lambda *args, **kwargs: True,
+            peer_error=messaging.MessagingTimeout())
+
+        # Only the hosts of the local shard are selected.
+        self.assertEqual(['host0', 'host2'],
+                         [sels[0].service_host for sels in selections])
+
+    def _test_schedule_sharded_fallback(self, supported, peer_error=None):
+        self.driver.shards = sharding.SchedulerShards('compute', 'sched1')
+        self.driver.shards.update_hosts(['sched1', 'sched2'])
+        self.driver.scheduler_rpcapi = mock.Mock()
+        self.driver.scheduler_rpcapi.supports_select_shard_candidates.\
+            return_value = supported
+        self.driver.scheduler_rpcapi.select_shard_candidates.side_effect = (
+            peer_error)
+        spec_obj = objects.RequestSpec(num_instances=1, instance_group=None)
+
+        with test.nested(
+            mock.patch.object(self.driver, 'select_shard_candidates',
+                              return_value={'ranges': [], 'candidates': []}),
+            mock.patch.object(self.driver, '_get_all_host_states'),
+            mock.patch.object(self.driver, '_get_sorted_hosts',
+                              return_value=[]),
+        ) as (mock_select_local, mock_get_all_states, mock_sorted):
+            ctx = mock.Mock()
+            # No hosts are left once the fallback filtered and weighed them.
+            self.assertRaises(exception.NoValidHost, self.driver._schedule,
+                ctx, spec_obj, [uuids.instance], {uuids.cn0: []},
+                {uuids.cn0: {}}, allocation_request_version=fake_alloc_version,
+                return_alternates=True)
+
+        self.driver.scheduler_rpcapi.supports_select_shard_candidates.\
+            assert_called_once_with(ctx.elevated.return_value)
+        # All the compute nodes are considered instead of the best hosts of
+        # the shards.
+        mock_get_all_states.assert_called_once_with(ctx.elevated.return_value,
+                                                    spec_obj, {uuids.cn0: {}})
+        mock_sorted.assert_called_once_with(spec_obj,
+            mock_get_all_states.return_value, 0)
+        return mock_select_local
+
+    def test_schedule_sharded_not_supported(self):
+        mock_select_local = self._test_schedule_sharded_fallback(False)
+        mock_select_local.assert_not_called()
+        self.driver.scheduler_rpcapi.select_shard_candidates.\
+            assert_not_called()
+
+    def test_schedule_sharded_peer_unsupported_version(self):
+        self._test_schedule_sharded_fallback(
+            True, peer_error=messaging.UnsupportedVersion('4.7'))
+        self.driver.scheduler_rpcapi.select_shard_candidates.\
+            assert_called_once()
+
+    def test_get_shard_candidates_normalized(self):
+        self.driver.shards = sharding.SchedulerShards('compute', 'sched1')
+        self.driver.shards.update_hosts(['sched1', 'sched2'])
+        self.driver.scheduler_rpcapi = mock.Mock()
+        selections = [objects.Selection(compute_node_uuid=uuids.cn0),
+                      objects.Selection(compute_node_uuid=uuids.cn1),
+                      objects.Selection(compute_node_uuid=uuids.cn2)]
+        # The raw weights of the first weigher span a much larger range in
+        # the shard of the peer, so the best host of the local shard has the
+        # best normalized weight within its shard but not across the shards.
+        local_result = {
+            'ranges': [(0.0, 1.0), (0.0, 0.0)],
+            'candidates': [{'raw_weights': [1.0, 0.0],
+                            'multipliers': [1.0, 1.0],
+                            'selection': selections[0]}]}
+        self.driver.scheduler_rpcapi.select_shard_candidates.return_value = {
+            'ranges': [[0.0, 100.0], [0.0, 4.0]],
+            'candidates': [{'raw_weights': [50.0, 0.0],
+                            'multipliers': [1.0, 1.0],
+                            'selection': selections[1]},
+                           {'raw_weights': [0.0, 4.0],
+                            'multipliers': [1.0, 0.25],
+                            'selection': selections[2]}]}
+
+        with mock.patch.object(self.driver, 'select_shard_candidates',
+                               return_value=local_result):
+            candidates = self.driver._get_shard_candidates(self.context,
+                objects.RequestSpec(), [uuids.cn0], 2)
+
+        # Weighed 0.01, 0.5 and 0.25 across the shards.
+        self.assertEqual([uuids.cn1, uuids.cn2, uuids.cn0],
+                         [c.compute_node_uuid for c in candidates])
+
+    def test_get_shard_candidates_traced(self):
+        self.driver.shards = sharding.SchedulerShards('compute', 'sched1')
+        self.driver.shards.update_hosts(['sched1', 'sched2'])
+        self.driver.scheduler_rpcapi = mock.Mock()
+        self.driver.scheduler_rpcapi.select_shard_candidates.return_value = {
+            'ranges': [], 'candidates': []}
+        # Make sure the trace is local to the green thread, whether or not
+        # the module was imported before monkey patching.
+        self.useFixture(fixtures.MonkeyPatch('nova.trace._local',
+                                             corolocal.local()))
+        trace = nova_trace.Trace('req-1', [])
+        nova_trace.set_current(trace)
+
+        def fake_select(*args, **kwargs):
+            # The local shard is called from the green thread of a GreenPool.
+            with nova_trace.phase('host_states'):
+                return {'ranges': [], 'candidates': []}
+
+        with mock.patch.object(self.driver, 'select_shard_candidates',
+                               side_effect=fake_select):
+            self.driver._get_shard_candidates(self.context,
+                objects.RequestSpec(), [uuids.cn0], 2)
+
+        self.assertEqual(1, trace.phases['host_states'][0])
+
+    def test_select_shard_candidates(self):
+        self.driver.shards = mock.sentinel.shards
+        spec_obj = objects.RequestSpec()
+        host_states = [
+            mock.Mock(spec=host_manager.HostState, host='host%d' % i,
+                      nodename='node%d' % i, uuid=getattr(uuids, 'cn%d' % i),
+                      cell_uuid=uuids.cell, limits={}, aggregates=[])
+            for i in range(3)]
+        weighed_hosts = [weights.WeighedHost(host_state, 0.0)
+                         for host_state in host_states]
+
+        def fake_weigh(hosts, spec_obj, limit=None, ranges=None):
+            ranges.append((0.0, 30.0))
+            for i, weighed_host in enumerate(weighed_hosts):
+                weighed_host.weight = 1.0 - i * 0.5
+                weighed_host.raw_weights = [30.0 - i * 15]
+                weighed_host.multipliers = [1.0]
+            return iter(weighed_hosts)
+
+        with test.nested(
+            mock.patch.object(self.driver.host_manager,
+                              'get_host_states_by_uuids',
+                              return_value=iter(host_states)),
+            mock.patch.object(self.driver.host_manager,
+                              'get_filtered_hosts',
+                              return_value=host_states),
+            mock.patch.object(self.driver.host_manager, 'get_weighed_hosts',
+                              side_effect=fake_weigh),
+        ) as (mock_get_states, mock_filter, mock_weigh):
+            result = self.driver.select_shard_candidates(
+                self.context, spec_obj, [uuids.cn0], 2)
+
+        mock_get_states.assert_called_once_with(mock.ANY, [uuids.cn0],
+            spec_obj, shards=mock.sentinel.shards)
+        mock_weigh.assert_called_once_with(host_states, spec_obj, limit=2,
+                                           ranges=[(0.0, 30.0)])
+        # The raw weights are returned, for the hosts of all the shards to be
+        # normalized together.
+        self.assertEqual([(0.0, 30.0)], result['ranges'])
+        candidates = result['candidates']
+        self.assertEqual([[30.0], [15.0]],
+                         [c['raw_weights'] for c in candidates])
+        self.assertEqual([[1.0], [1.0]],
+                         [c['multipliers'] for c in candidates])
+        self.assertEqual([uuids.cn0, uuids.cn1],
+                         [c['selection'].compute_node_uuid
+                          for c in candidates])
+
+    def test_select_shard_candidates_no_hosts(self):
+        with test.nested(
+            mock.patch.object(self.driver.host_manager,
+                              'get_host_states_by_uuids'),
+            mock.patch.object(self.driver.host_manager,
+                              'get_filtered_hosts', return_value=[]),
+        ):
+            result = self.driver.select_shard_candidates(
+                self.context, objects.RequestSpec(), [uuids.cn0], 2)
+        self.assertEqual({'ranges': [], 'candidates': []}, result)
+
+    @mock.patch('nova.scheduler.filter_scheduler.FilterScheduler.hosts_up',
+                return_value=['sched2'])
+    def test_run_periodic_tasks_updates_shards(self, mock_hosts_up):
+        self.driver.shards = sharding.SchedulerShards('compute', 'sched1')
+        self.driver.run_periodic_tasks(self.context)
+        mock_hosts_up.assert_called_once_with(self.context, 'scheduler')
+        self.assertEqual(['sched2'], self.driver.shards.get_peers())
+
     @mock.patch('nova.scheduler.utils.claim_resources')
     @mock.patch('nova.scheduler.filter_scheduler.FilterScheduler.'
                 '_get_all_host_states')
@@ -630,6 +1139,7 @@ class FilterSchedulerTestCase(test.NoDBTestCase):
         hs2 = mock.Mock(spec=host_manager.HostState, host='host2',
                 cell_uuid=uuids.cell2)
         all_host_states = [hs1, hs2]
+        mock_filt.return_value = all_host_states
 
         mock_weighed.return_value = [
             weights.WeighedHost(hs1, 1.0), weights.WeighedHost(hs2, 1.0),
@@ -651,14 +1161,16 @@ class FilterSchedulerTestCase(test.NoDBTestCase):
         mock_filt.assert_called_once_with(all_host_states, mock.sentinel.spec,
             mock.sentinel.index)
 
-        mock_weighed.assert_called_once_with(mock_filt.return_value,
-            mock.sentinel.spec)
+        # The hosts past host_subset_size + max_attempts (3 by default) are
+        # only sorted if they are reached.
+        mock_weighed.assert_called_once_with(all_host_states,
+            mock.sentinel.spec, limit=5)
 
         # We override random.choice() to pick the **second** element of the
         # returned weighed hosts list, which is the host state #2. This tests
         # the code path that combines the randomly-chosen host with the
         # remaining list of weighed host state objects
-        self.assertEqual([hs2, hs1], results)
+        self.assertEqual([hs2, hs1], list(results))
 
     @mock.patch('random.choice', side_effect=lambda x: x[0])
     @mock.patch('nova.scheduler.host_manager.HostManager.get_weighed_hosts')
@@ -674,6 +1186,7 @@ class FilterSchedulerTestCase(test.NoDBTestCase):
         hs2 = mock.Mock(spec=host_manager.HostState, host='host2',
                 cell_uuid=uuids.cell2)
         all_host_states = [hs1, hs2]
+        mock_filt.return_value = all_host_states
 
         mock_weighed.return_value = [
             weights.WeighedHost(hs1, 1.0), weights.WeighedHost(hs2, 1.0),
@@ -685,12 +1198,14 @@ class FilterSchedulerTestCase(test.NoDBTestCase):
         mock_filt.assert_called_once_with(all_host_states, mock.sentinel.spec,
             mock.sentinel.index)
 
-        mock_weighed.assert_called_once_with(mock_filt.return_value,
-            mock.sentinel.spec)
+        # The hosts past host_subset_size + max_attempts (3 by default) are
+        # only sorted if they are reached.
+        mock_weighed.assert_called_once_with(all_host_states,
+            mock.sentinel.spec, limit=4)
 
         # We should be randomly selecting only from a list of one host state
         mock_rand.assert_called_once_with([hs1])
-        self.assertEqual([hs1, hs2], results)
+        self.assertEqual([hs1, hs2], list(results))
 
     @mock.patch('random.choice', side_effect=lambda x: x[0])
     @mock.patch('nova.scheduler.host_manager.HostManager.get_weighed_hosts')
@@ -706,6 +1221,7 @@ class FilterSchedulerTestCase(test.NoDBTestCase):
         hs2 = mock.Mock(spec=host_manager.HostState, host='host2',
                 cell_uuid=uuids.cell2)
         all_host_states = [hs1, hs2]
+        mock_filt.return_value = all_host_states
 
         mock_weighed.return_value = [
             weights.WeighedHost(hs1, 1.0), weights.WeighedHost(hs2, 1.0),
@@ -717,14 +1233,16 @@ class FilterSchedulerTestCase(test.NoDBTestCase):
         mock_filt.assert_called_once_with(all_host_states, mock.sentinel.spec,
             mock.sentinel.index)
 
-        mock_weighed.assert_called_once_with(mock_filt.return_value,
-            mock.sentinel.spec)
+        # The hosts past host_subset_size + max_attempts (3 by default) are
+        # only sorted if they are reached.
+        mock_weighed.assert_called_once_with(all_host_states,
+            mock.sentinel.spec, limit=23)
 
         # We overrode random.choice() to return the first element in the list,
         # so even though we had a host_subset_size greater than the number of
         # weighed hosts (2), we just random.choice() on the entire set of
         # weighed hosts and thus return [hs1, hs2]
-        self.assertEqual([hs1, hs2], results)
+        self.assertEqual([hs1, hs2], list(results))
 
     @mock.patch('random.shuffle', side_effect=lambda x: x.reverse())
     @mock.patch('nova.scheduler.host_manager.HostManager.get_weighed_hosts')
@@ -741,6 +1259,7 @@ class FilterSchedulerTestCase(test.NoDBTestCase):
         hs3 = mock.Mock(spec=host_manager.HostState, host='host3')
         hs4 = mock.Mock(spec=host_manager.HostState, host='host4')
         all_host_states = [hs1, hs2, hs3, hs4]
+        mock_filt.return_value = all_host_states
 
         mock_weighed.return_value = [
             weights.WeighedHost(hs1, 1.0),
@@ -755,13 +1274,57 @@ class FilterSchedulerTestCase(test.NoDBTestCase):
         mock_filt.assert_called_once_with(all_host_states, mock.sentinel.spec,
             mock.sentinel.index)
 
-        mock_weighed.assert_called_once_with(mock_filt.return_value,
-            mock.sentinel.spec)
+        # The hosts past host_subset_size + max_attempts (3 by default) are
+        # only sorted if they are reached.
+        mock_weighed.assert_called_once_with(all_host_states,
+            mock.sentinel.spec, limit=4)
 
         # We override random.shuffle() to reverse the list, thus the
         # head of the list should become [host#2, host#1]
         # (as the host_subset_size is 1) and the tail should stay the same.
-        self.assertEqual([hs2, hs1, hs3, hs4], results)
+        self.assertEqual([hs2, hs1, hs3, hs4], list(results))
+
+    @mock.patch('random.choice', side_effect=lambda x: x[0])
+    @mock.patch('nova.scheduler.host_manager.HostManager.get_weighed_hosts')
+    @mock.patch('nova.scheduler.host_manager.HostManager.get_filtered_hosts')
+    def test_get_sorted_hosts_lazy(self, mock_filt, mock_weighed, mock_rand):
+        """Tests that the hosts are only pulled from the weighed hosts as
+        they are reached.
+        """
+        self.flags(host_subset_size=1, group='filter_scheduler')
+        all_host_states = [
+            mock.Mock(spec=host_manager.HostState, host='host%d' % i)
+            for i in range(5)]
+        mock_filt.return_value = all_host_states
+        pulled = []
+
+        def fake_weighed(hosts, spec_obj, limit=None):
+            for i, host_state in enumerate(hosts):
+                pulled.append(host_state)
+                yield weights.WeighedHost(host_state, 5.0 - i)
+        mock_weighed.side_effect = fake_weighed
+
+        with mock.patch.object(filter_scheduler.LOG, 'isEnabledFor',
+                               return_value=False):
+            results = self.driver._get_sorted_hosts(mock.sentinel.spec,
+                all_host_states, 0)
+            self.assertEqual(all_host_states[:1], pulled)
+            self.assertTrue(results)
+            self.assertEqual(5, len(results))
+            self.assertEqual(all_host_states[:1], pulled)
+            self.assertEqual(all_host_states[:2], results[:2])
+            self.assertEqual(all_host_states[:2], pulled)
+            self.assertEqual(all_host_states, list(results))
+            self.assertEqual(all_host_states, pulled)
+
+            # The hosts are filtered again without going through the sorted
+            # hosts.
+            del pulled[:]
+            results = self.driver._get_sorted_hosts(mock.sentinel.spec,
+                results, 1)
+            mock_filt.assert_called_with(all_host_states, mock.sentinel.spec,
+                                         1)
+            self.assertEqual(all_host_states[:1], pulled)
 
     def test_cleanup_allocations(self):
         instance_uuids = []
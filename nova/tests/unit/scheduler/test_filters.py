@@ -24,6 +24,7 @@ from nova import filters
 from nova import loadables
 from nova import objects
 from nova import test
+from nova import trace as nova_trace
 
 
 class Filter1(filters.BaseFilter):
@@ -233,3 +234,18 @@ class FiltersTestCase(test.NoDBTestCase):
             cargs = mock_log.call_args[0][0]
             self.assertIn("with instance ID '%s'" % fake_uuid, cargs)
             self.assertIn(exp_output, cargs)
+
+    def test_get_filtered_objects_traced(self):
+        trace = nova_trace.Trace('req-1', [])
+        spec_obj = objects.RequestSpec()
+        with mock.patch.object(nova_trace, 'current',
+                               return_value=trace):
+            result = self.filter_handler.get_filtered_objects(
+                [Filter1(), Filter2()], ['obj1', 'obj2'], spec_obj)
+            self.filter_handler.get_filtered_objects(
+                [Filter1()], ['obj1'], spec_obj)
+        self.assertEqual(['obj1', 'obj2'], result)
+        self.assertEqual(['filter:Filter1', 'filter:Filter2'],
+                         list(trace.phases))
+        self.assertEqual(2, trace.phases['filter:Filter1'][0])
+        self.assertEqual(1, trace.phases['filter:Filter2'][0])
@@ -14,6 +14,9 @@
 """
 Tests For Scheduler Host Filters.
 """
+import mock
+
+from nova import objects
 from nova.scheduler import filters
 from nova.scheduler.filters import all_hosts_filter
 from nova.scheduler.filters import compute_filter
@@ -35,3 +38,50 @@ class HostFiltersTestCase(test.NoDBTestCase):
         filt_cls = all_hosts_filter.AllHostsFilter()
         host = fakes.FakeHostState('host1', 'node1', {})
         self.assertTrue(filt_cls.host_passes(host, {}))
+
+    def test_filter_all_per_host(self):
+        filt_cls = all_hosts_filter.AllHostsFilter()
+        hosts = [fakes.FakeHostState('host%s' % i, 'node', {})
+                 for i in range(3)]
+        with mock.patch.object(filt_cls, 'host_passes',
+                               side_effect=[True, False, True]) as mock_hp:
+            result = list(filt_cls.filter_all(hosts, objects.RequestSpec()))
+        self.assertEqual([hosts[0], hosts[2]], result)
+        self.assertEqual(3, mock_hp.call_count)
+
+    def test_filter_all_bulk(self):
+        filt_cls = all_hosts_filter.AllHostsFilter()
+        filt_cls.BULK_FILTER = True
+        hosts = [fakes.FakeHostState('host%s' % i, 'node', {})
+                 for i in range(3)]
+        spec_obj = objects.RequestSpec()
+        with mock.patch.object(filt_cls, 'host_passes_all',
+                               return_value=[False, True, True]) as mock_hpa:
+            result = filt_cls.filter_all(iter(hosts), spec_obj)
+        self.assertEqual([hosts[1], hosts[2]], result)
+        mock_hpa.assert_called_once_with(hosts, spec_obj)
+
+    def test_filter_all_bulk_default_host_passes_all(self):
+        filt_cls = all_hosts_filter.AllHostsFilter()
+        filt_cls.BULK_FILTER = True
+        hosts = [fakes.FakeHostState('host%s' % i, 'node', {})
+                 for i in range(3)]
+        spec_obj = objects.RequestSpec()
+        with mock.patch.object(filt_cls, 'host_passes',
+                               side_effect=[True, False, True]) as mock_hp:
+            result = filt_cls.filter_all(hosts, spec_obj)
+        self.assertEqual([hosts[0], hosts[2]], result)
+        mock_hp.assert_has_calls([mock.call(host, spec_obj)
+                                  for host in hosts])
+
+    def test_filter_all_bulk_rebuild(self):
+        filt_cls = all_hosts_filter.AllHostsFilter()
+        filt_cls.BULK_FILTER = True
+        hosts = [fakes.FakeHostState('host%s' % i, 'node', {})
+                 for i in range(3)]
+        spec_obj = objects.RequestSpec(
+            scheduler_hints={'_nova_check_type': ['rebuild']})
+        with mock.patch.object(filt_cls, 'host_passes_all') as mock_hpa:
+            result = filt_cls.filter_all(hosts, spec_obj)
+        self.assertEqual(hosts, result)
+        mock_hpa.assert_not_called()
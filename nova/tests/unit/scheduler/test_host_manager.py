@@ -23,6 +23,7 @@ import datetime
 import mock
 from oslo_serialization import jsonutils
 from oslo_utils.fixture import uuidsentinel as uuids
+from oslo_utils import timeutils
 from oslo_utils import versionutils
 
 import nova
@@ -51,6 +52,13 @@ class FakeFilterClass2(filters.BaseHostFilter):
         pass
 
 
+class FakeCachedFilterClass(filters.BaseHostFilter):
+    CACHEABLE = True
+
+    def host_passes(self, host_state, filter_properties):
+        return host_state.host != 'fake_host1'
+
+
 class HostManagerTestCase(test.NoDBTestCase):
     """Test case for HostManager class."""
 
@@ -300,6 +308,105 @@ class HostManagerTestCase(test.NoDBTestCase):
         self.assertEqual({'fake-host': set([])},
                          self.host_manager.host_aggregates_map)
 
+    def test_update_aggregates_clears_filter_results_cache(self):
+        self.host_manager.filter_results_cache.results['fake-key'] = {}
+        fake_agg = objects.Aggregate(id=1, hosts=['fake-host'])
+        self.host_manager.update_aggregates([fake_agg])
+        self.assertEqual({}, self.host_manager.filter_results_cache.results)
+
+        self.host_manager.filter_results_cache.results['fake-key'] = {}
+        self.host_manager.delete_aggregate(fake_agg)
+        self.assertEqual({}, self.host_manager.filter_results_cache.results)
+
+    def _get_filtered_hosts_cached(self, spec_obj, index=0):
+        filter_obj = FakeCachedFilterClass()
+        self.host_manager.enabled_filters = [filter_obj, FakeFilterClass1()]
+        with test.nested(
+            mock.patch.object(FakeFilterClass1, 'host_passes',
+                              return_value=True),
+            mock.patch.object(filter_obj, 'host_passes',
+                              wraps=filter_obj.host_passes),
+        ) as (mock_passes, mock_cached_passes):
+            result = self.host_manager.get_filtered_hosts(
+                self.fake_hosts, spec_obj, index)
+        self.assertEqual(self.fake_hosts[1:], list(result))
+        # The other filters always run for every host passing the cached one.
+        self.assertEqual(len(self.fake_hosts) - 1, mock_passes.call_count)
+        return set(c[0][0] for c in mock_cached_passes.call_args_list)
+
+    def test_get_filtered_hosts_filter_results_cache(self):
+        self.flags(filter_results_cache_size=2, group='filter_scheduler')
+        for host_state in self.fake_hosts:
+            host_state.updated = datetime.datetime(2021, 1, 1)
+        spec_obj = objects.RequestSpec(
+            flavor=objects.Flavor(extra_specs={'foo': 'bar'}),
+            image=objects.ImageMeta(
+                properties=objects.ImageMetaProps(hw_architecture='x86_64')),
+            ignore_hosts=[], force_hosts=[], force_nodes=[],
+            instance_uuid=uuids.instance)
+
+        # Nothing is cached yet.
+        self.assertEqual(set(self.fake_hosts),
+                         self._get_filtered_hosts_cached(spec_obj))
+        # The results of the first request are used for the same flavor and
+        # image.
+        self.assertEqual(set(), self._get_filtered_hosts_cached(spec_obj))
+        # Only the updated hosts are filtered again.
+        self.fake_hosts[0].updated = datetime.datetime(2021, 1, 2)
+        self.fake_hosts[1].updated = None
+        self.assertEqual(set(self.fake_hosts[:2]),
+                         self._get_filtered_hosts_cached(spec_obj))
+        self.fake_hosts[1].updated = datetime.datetime(2021, 1, 2)
+        self.assertEqual(set([self.fake_hosts[1]]),
+                         self._get_filtered_hosts_cached(spec_obj))
+
+        # Another flavor isn't served from the cache.
+        other_spec_obj = objects.RequestSpec(
+            flavor=objects.Flavor(extra_specs={'foo': 'baz'}),
+            image=spec_obj.image,
+            ignore_hosts=[], force_hosts=[], force_nodes=[],
+            instance_uuid=uuids.instance)
+        self.assertEqual(set(self.fake_hosts),
+                         self._get_filtered_hosts_cached(other_spec_obj))
+        self.assertEqual(set(), self._get_filtered_hosts_cached(spec_obj))
+
+        # Updating aggregates clears the cache.
+        self.host_manager.update_aggregates(
+            [objects.Aggregate(id=1, hosts=['fake_host1'])])
+        self.assertEqual(set(self.fake_hosts),
+                         self._get_filtered_hosts_cached(spec_obj))
+        self.assertEqual({'hits': 0, 'misses': len(self.fake_hosts)},
+                         self.host_manager.filter_results_cache.stats)
+
+    def test_get_filtered_hosts_filter_results_cache_disabled(self):
+        for host_state in self.fake_hosts:
+            host_state.updated = datetime.datetime(2021, 1, 1)
+        spec_obj = objects.RequestSpec(
+            flavor=objects.Flavor(extra_specs={}),
+            ignore_hosts=[], force_hosts=[], force_nodes=[],
+            instance_uuid=uuids.instance)
+        for i in range(2):
+            self.assertEqual(set(self.fake_hosts),
+                             self._get_filtered_hosts_cached(spec_obj))
+        self.assertEqual({}, self.host_manager.filter_results_cache.results)
+
+    def test_get_filtered_hosts_filter_results_cache_lru(self):
+        self.flags(filter_results_cache_size=1, group='filter_scheduler')
+        for host_state in self.fake_hosts:
+            host_state.updated = datetime.datetime(2021, 1, 1)
+        spec_objs = [
+            objects.RequestSpec(
+                flavor=objects.Flavor(extra_specs={'foo': foo}),
+                ignore_hosts=[], force_hosts=[], force_nodes=[],
+                instance_uuid=uuids.instance)
+            for foo in ('bar', 'baz')]
+        for spec_obj in spec_objs + spec_objs:
+            # Each request evicts the results of the other one.
+            self.assertEqual(set(self.fake_hosts),
+                             self._get_filtered_hosts_cached(spec_obj))
+        self.assertEqual(1,
+                         len(self.host_manager.filter_results_cache.results))
+
     def test_choose_host_filters_not_found(self):
         self.assertRaises(exception.SchedulerHostFilterNotFound,
                           self.host_manager._choose_host_filters,
@@ -643,6 +750,37 @@ class HostManagerTestCase(test.NoDBTestCase):
         self.assertEqual(host_states_map[('host4', 'node4')].free_disk_mb,
                          8388608)
 
+    @mock.patch('nova.objects.ServiceList.get_by_binary')
+    @mock.patch('nova.objects.ComputeNodeList.get_all')
+    @mock.patch('nova.objects.InstanceList.get_uuids_by_host')
+    def test_get_host_states_numa_topology_cache(self, mock_get_by_host,
+                                                 mock_get_all,
+                                                 mock_get_by_binary):
+        mock_get_by_host.return_value = []
+        mock_get_all.return_value = fakes.COMPUTE_NODES
+        mock_get_by_binary.return_value = fakes.SERVICES
+        context = nova_context.get_admin_context()
+        cache = self.host_manager.numa_topology_cache
+
+        topologies = []
+        for _ in range(2):
+            compute_nodes, services = (
+                self.host_manager._get_computes_for_cells(
+                    context, self.host_manager.enabled_cells))
+            host_states_map = {(state.host, state.nodename): state
+                               for state in self.host_manager._get_host_states(
+                                   context, compute_nodes, services)}
+            host_state = host_states_map[('host3', 'node3')]
+            self.assertIs(cache, host_state.numa_topology_cache)
+            topologies.append(host_state.numa_topology)
+
+        # The NUMA topology of the only compute node having one is only
+        # deserialized once
+        self.assertIsInstance(topologies[0], objects.NUMATopology)
+        self.assertIs(topologies[0], topologies[1])
+        self.assertEqual({'hits': 1, 'misses': 1}, cache.stats)
+        self.assertEqual([uuids.cn3], list(cache.topologies))
+
     @mock.patch.object(nova.objects.InstanceList, 'get_uuids_by_host')
     @mock.patch.object(host_manager.HostState, '_update_from_compute_node')
     @mock.patch.object(objects.ComputeNodeList, 'get_all')
@@ -1309,6 +1447,183 @@ class HostManagerChangedNodesTestCase(test.NoDBTestCase):
                            hosts}
         self.assertEqual(len(host_states_map), 0)
 
+    @mock.patch('nova.objects.ServiceList.get_by_binary')
+    @mock.patch('nova.objects.ComputeNodeList.get_all_changed_since')
+    @mock.patch('nova.objects.ComputeNodeList.get_all')
+    @mock.patch('nova.objects.InstanceList.get_uuids_by_host')
+    def test_get_host_states_cached(self, mock_get_by_host, mock_get_all,
+                                    mock_get_changed, mock_get_by_binary):
+        self.flags(host_state_cache_enabled=True, group='filter_scheduler')
+        mock_get_by_host.return_value = []
+        mock_get_all.return_value = fakes.COMPUTE_NODES
+        mock_get_changed.return_value = []
+        mock_get_by_binary.return_value = fakes.SERVICES
+        context = nova_context.get_admin_context()
+        cache = self.host_manager.host_state_cache
+
+        # first call: all nodes are loaded
+        compute_nodes, services = self.host_manager._get_computes_for_cells(
+            context, self.host_manager.enabled_cells)
+        hosts1 = {(state.host, state.nodename): state for state in
+                  self.host_manager._get_host_states(
+                      context, compute_nodes, services)}
+        self.assertEqual(4, len(hosts1))
+        mock_get_all.assert_called_once_with(mock.ANY)
+        mock_get_changed.assert_not_called()
+        self.assertEqual(4, cache.stats['host_state_misses'])
+        self.assertEqual(0, cache.stats['host_state_hits'])
+        cached_states = dict(cache.host_states)
+        # The request consumes from a copy of the cached host state.
+        hosts1[('host1', 'node1')].consume_from_request(objects.RequestSpec(
+            flavor=objects.Flavor(root_gb=0, ephemeral_gb=0, memory_mb=512,
+                                  vcpus=1),
+            pci_requests=None, numa_topology=None))
+
+        # second call: only the changed nodes are loaded and the host states
+        # are reused as is
+        with mock.patch.object(host_manager.HostState,
+                               '_update_from_compute_node') as mock_update:
+            compute_nodes, services = (
+                self.host_manager._get_computes_for_cells(
+                    context, self.host_manager.enabled_cells))
+            hosts2 = {(state.host, state.nodename): state for state in
+                      self.host_manager._get_host_states(
+                          context, compute_nodes, services)}
+            mock_update.assert_not_called()
+        self.assertEqual(4, len(hosts2))
+        for state_key, host_state in hosts2.items():
+            self.assertIsNot(hosts1[state_key], host_state)
+            self.assertIs(cached_states[state_key],
+                          cache.host_states[state_key])
+        # The resources consumed by the previous request were not cached.
+        self.assertEqual(0, hosts1[('host1', 'node1')].free_ram_mb)
+        self.assertEqual(512, hosts2[('host1', 'node1')].free_ram_mb)
+        self.assertEqual(0, hosts2[('host1', 'node1')].num_instances)
+        mock_get_all.assert_called_once_with(mock.ANY)
+        mock_get_changed.assert_called_once_with(mock.ANY, mock.ANY)
+        self.assertEqual(4, cache.stats['host_state_hits'])
+        self.assertEqual(1, cache.stats['full_polls'])
+        self.assertEqual(1, cache.stats['delta_polls'])
+        self.assertEqual(0.5, cache.get_stats()['host_state_hit_rate'])
+
+    @mock.patch('nova.objects.ServiceList.get_by_binary')
+    @mock.patch('nova.objects.ComputeNodeList.get_all_changed_since')
+    @mock.patch('nova.objects.ComputeNodeList.get_all')
+    @mock.patch('nova.objects.InstanceList.get_uuids_by_host')
+    def test_get_host_states_cached_changed_and_deleted(
+            self, mock_get_by_host, mock_get_all, mock_get_changed,
+            mock_get_by_binary):
+        self.flags(host_state_cache_enabled=True, group='filter_scheduler')
+        updated_node = fakes.COMPUTE_NODES[0].obj_clone()
+        updated_node.free_ram_mb = 256
+        updated_node.updated_at = datetime.datetime(2015, 11, 11, 12, 0, 0)
+        deleted_node = fakes.COMPUTE_NODES[3].obj_clone()
+        deleted_node.deleted = True
+        mock_get_by_host.return_value = []
+        mock_get_all.return_value = fakes.COMPUTE_NODES
+        mock_get_changed.return_value = [updated_node, deleted_node]
+        mock_get_by_binary.return_value = fakes.SERVICES
+        context = nova_context.get_admin_context()
+
+        for i in range(2):
+            compute_nodes, services = (
+                self.host_manager._get_computes_for_cells(
+                    context, self.host_manager.enabled_cells))
+            hosts = {(state.host, state.nodename): state for state in
+                     self.host_manager._get_host_states(
+                         context, compute_nodes, services)}
+
+        self.assertEqual(3, len(hosts))
+        self.assertNotIn(('host4', 'node4'), hosts)
+        self.assertNotIn(('host4', 'node4'),
+                         self.host_manager.host_state_cache.host_states)
+        self.assertEqual(256, hosts[('host1', 'node1')].free_ram_mb)
+        stats = self.host_manager.host_state_cache.stats
+        self.assertEqual(2, stats['host_state_hits'])
+        self.assertEqual(5, stats['host_state_misses'])
+
+    @mock.patch('nova.objects.ServiceList.get_by_binary')
+    @mock.patch('nova.objects.ComputeNodeList.get_all_changed_since')
+    @mock.patch('nova.objects.ComputeNodeList.get_all')
+    @mock.patch('nova.objects.InstanceList.get_uuids_by_host')
+    def test_get_host_states_cached_outdated_node(
+            self, mock_get_by_host, mock_get_all, mock_get_changed,
+            mock_get_by_binary):
+        self.flags(host_state_cache_enabled=True, group='filter_scheduler')
+        outdated_node = fakes.COMPUTE_NODES[0].obj_clone()
+        outdated_node.free_ram_mb = 256
+        outdated_node.updated_at = datetime.datetime(2015, 11, 11, 10, 0, 0)
+        updated_node = outdated_node.obj_clone()
+        updated_node.updated_at = datetime.datetime(2015, 11, 11, 12, 0, 0)
+        compute_nodes = [node.obj_clone() for node in fakes.COMPUTE_NODES]
+        compute_nodes[0].updated_at = datetime.datetime(2015, 11, 11, 11, 0, 0)
+        mock_get_by_host.return_value = []
+        mock_get_all.return_value = compute_nodes
+        mock_get_changed.side_effect = [[outdated_node], [], [updated_node]]
+        mock_get_by_binary.return_value = fakes.SERVICES
+        context = nova_context.get_admin_context()
+        cache = self.host_manager.host_state_cache
+
+        free_ram_mb = []
+        for i in range(4):
+            computes, services = self.host_manager._get_computes_for_cells(
+                context, self.host_manager.enabled_cells)
+            hosts = {(state.host, state.nodename): state for state in
+                     self.host_manager._get_host_states(
+                         context, computes, services)}
+            free_ram_mb.append(hosts[('host1', 'node1')].free_ram_mb)
+
+        # The outdated record is not applied to the host state, which is
+        # still updated once the record is reloaded again.
+        self.assertEqual([512, 512, 512, 256], free_ram_mb)
+        # The update from the outdated record was tried again on the next
+        # request instead of being recorded as done.
+        self.assertEqual(4 + 1 + 1 + 1, cache.stats['host_state_misses'])
+
+    def test_host_state_cache_outdated_poll(self):
+        cache = host_manager.HostStateCache()
+        poll_time = timeutils.utcnow()
+        compute = fakes.COMPUTE_NODES[0].obj_clone()
+        self.assertTrue(cache.update_cell(uuids.cell, [compute], poll_time,
+                                          True, 0.1))
+        # A poll which started before the last applied one is dropped.
+        changed = compute.obj_clone()
+        self.assertFalse(cache.update_cell(
+            uuids.cell, [changed], poll_time - datetime.timedelta(seconds=1),
+            False, 0.1))
+        self.assertIs(compute, cache.get_computes(uuids.cell)[0])
+        # So is a delta poll which started before the cache was cleared.
+        cache.clear()
+        self.assertFalse(cache.update_cell(uuids.cell, [changed], poll_time,
+                                           False, 0.1))
+        self.assertEqual([], cache.get_computes(uuids.cell))
+        self.assertEqual(0, cache.generation)
+
+    @mock.patch('nova.objects.ServiceList.get_by_binary')
+    @mock.patch('nova.objects.ComputeNodeList.get_all_changed_since')
+    @mock.patch('nova.objects.ComputeNodeList.get_all')
+    def test_refresh_host_state_cache(self, mock_get_all, mock_get_changed,
+                                      mock_get_by_binary):
+        mock_get_all.return_value = fakes.COMPUTE_NODES
+        mock_get_changed.return_value = []
+        mock_get_by_binary.return_value = fakes.SERVICES
+        context = nova_context.get_admin_context()
+        cache = self.host_manager.host_state_cache
+
+        self.host_manager.refresh_host_state_cache(context)
+        self.assertEqual(len(fakes.COMPUTE_NODES), len(cache.get_computes(
+            self.host_manager.enabled_cells[0].uuid)))
+        self.host_manager.refresh_host_state_cache(context)
+        mock_get_all.assert_called_once_with(mock.ANY)
+        mock_get_changed.assert_called_once_with(mock.ANY, mock.ANY)
+
+        # Resetting the cells caches resets the host state cache so the next
+        # refresh loads all the compute nodes again.
+        self.host_manager.refresh_cells_caches()
+        self.assertEqual({}, cache.host_states)
+        self.host_manager.refresh_host_state_cache(context)
+        self.assertEqual(2, mock_get_all.call_count)
+
     @mock.patch('nova.objects.ServiceList.get_by_binary')
     @mock.patch('nova.objects.ComputeNodeList.get_all_by_uuids')
     @mock.patch('nova.objects.InstanceList.get_uuids_by_host')
@@ -1362,6 +1677,29 @@ class HostManagerChangedNodesTestCase(test.NoDBTestCase):
         mock_get_host_states.assert_called_once_with(
             ctxt, mock.sentinel.compute_nodes, mock.sentinel.services)
 
+    @mock.patch('nova.scheduler.host_manager.HostManager.'
+                '_get_computes_for_cells',
+                return_value=(mock.sentinel.compute_nodes,
+                              mock.sentinel.services))
+    @mock.patch('nova.scheduler.host_manager.HostManager._get_host_states')
+    def test_get_host_states_by_uuids_sharded(
+            self, mock_get_host_states, mock_get_computes):
+        """Tests that get_host_states_by_uuids only considers the compute
+        nodes of the shard of the scheduler.
+        """
+        ctxt = nova_context.get_admin_context()
+        shards = mock.Mock()
+        self.host_manager.get_host_states_by_uuids(
+            ctxt, [uuids.cn1, uuids.cn2], objects.RequestSpec(),
+            shards=shards)
+        shards.filter_cells.assert_called_once_with(
+            self.host_manager.enabled_cells)
+        shards.filter_compute_uuids.assert_called_once_with(
+            [uuids.cn1, uuids.cn2])
+        mock_get_computes.assert_called_once_with(
+            ctxt, shards.filter_cells.return_value,
+            compute_uuids=shards.filter_compute_uuids.return_value)
+
 
 class HostStateTestCase(test.NoDBTestCase):
     """Test case for HostState class."""
@@ -1543,6 +1881,119 @@ class HostStateTestCase(test.NoDBTestCase):
         self.assertEqual(2, host.num_io_ops)
         self.assertIsNotNone(host.updated)
 
+    def _get_numa_spec_obj(self, pci_requests=None):
+        return objects.RequestSpec(
+            instance_uuid=uuids.instance,
+            flavor=objects.Flavor(root_gb=0, ephemeral_gb=0, memory_mb=0,
+                                  vcpus=0),
+            numa_topology=objects.InstanceNUMATopology(
+                cells=[objects.InstanceNUMACell(
+                    id=0, cpuset=set([0]), pcpuset=set(), memory=512)]),
+            pci_requests=objects.InstancePCIRequests(
+                requests=pci_requests or []))
+
+    @mock.patch('nova.virt.hardware.numa_fit_instance_to_host')
+    def test_stat_consumption_from_instance_reuses_numa_fit(self,
+                                                             numa_fit_mock):
+        spec_obj = self._get_numa_spec_obj()
+        host = host_manager.HostState("fakehost", "fakenode", uuids.cell)
+        host.numa_topology = fakes.NUMA_TOPOLOGY
+        limits = objects.NUMATopologyLimits(
+            cpu_allocation_ratio=16.0, ram_allocation_ratio=1.5)
+        host.limits['numa_topology'] = limits
+        fitted_topology = objects.InstanceNUMATopology(
+            cells=[objects.InstanceNUMACell(
+                id=1, cpuset=set([0]), pcpuset=set(), memory=512)])
+        host.set_numa_fit(spec_obj.numa_topology, limits, fitted_topology)
+
+        host.consume_from_request(spec_obj)
+
+        numa_fit_mock.assert_not_called()
+        self.assertIs(fitted_topology, spec_obj.numa_topology)
+        self.assertEqual(512, host.numa_topology.cells[1].memory_usage)
+        self.assertIsNone(host.numa_fit)
+
+    @mock.patch('nova.virt.hardware.numa_fit_instance_to_host')
+    def test_stat_consumption_from_instance_outdated_numa_fit(self,
+                                                              numa_fit_mock):
+        numa_fit_mock.return_value = None
+        limits = objects.NUMATopologyLimits(
+            cpu_allocation_ratio=16.0, ram_allocation_ratio=1.5)
+        fitted_topology = objects.InstanceNUMATopology(
+            cells=[objects.InstanceNUMACell(
+                id=1, cpuset=set([0]), pcpuset=set(), memory=512)])
+
+        def _consume(other_host_topology=False, other_request=False,
+                     other_limits=False):
+            spec_obj = self._get_numa_spec_obj()
+            host = host_manager.HostState("fakehost", "fakenode", uuids.cell)
+            host.numa_topology = fakes.NUMA_TOPOLOGY
+            host.limits['numa_topology'] = limits
+            host.set_numa_fit(
+                spec_obj.numa_topology if not other_request else
+                spec_obj.numa_topology.obj_clone(),
+                limits if not other_limits else limits.obj_clone(),
+                fitted_topology)
+            if other_host_topology:
+                host.numa_topology = fakes.NUMA_TOPOLOGY.obj_clone()
+            host.consume_from_request(spec_obj)
+            self.assertIsNone(host.numa_fit)
+
+        for kwarg in ('other_host_topology', 'other_request', 'other_limits'):
+            numa_fit_mock.reset_mock()
+            _consume(**{kwarg: True})
+            numa_fit_mock.assert_called_once()
+
+    @mock.patch('nova.virt.hardware.numa_fit_instance_to_host')
+    def test_stat_consumption_from_instance_numa_fit_pci(self,
+                                                         numa_fit_mock):
+        # The fit isn't reused with PCI requests as it depends on the PCI
+        # pools of the host, which may have changed since it was computed
+        numa_fit_mock.return_value = None
+        spec_obj = self._get_numa_spec_obj(pci_requests=[
+            objects.InstancePCIRequest(
+                request_id=uuids.request_id, count=1,
+                spec=[{'vendor_id': '8086'}])])
+        host = host_manager.HostState("fakehost", "fakenode", uuids.cell)
+        host.numa_topology = fakes.NUMA_TOPOLOGY
+        host.pci_stats = pci_stats.PciDeviceStats()
+        host.set_numa_fit(spec_obj.numa_topology, None, mock.sentinel.fit)
+
+        with mock.patch.object(host.pci_stats, 'apply_requests'):
+            host.consume_from_request(spec_obj)
+
+        numa_fit_mock.assert_called_once()
+        self.assertIsNone(host.numa_fit)
+
+    def test_numa_topology_cache(self):
+        cache = host_manager.NUMATopologyCache()
+        compute = objects.ComputeNode(
+            uuid=uuids.cn1, numa_topology=fakes.NUMA_TOPOLOGY._to_json())
+
+        topology = cache.get(compute)
+        self.assertIsInstance(topology, objects.NUMATopology)
+        self.assertEqual(fakes.NUMA_TOPOLOGY.cells[0].cpuset,
+                         topology.cells[0].cpuset)
+        # the same serialized value, even from another compute node object,
+        # returns the deserialized topology
+        compute = objects.ComputeNode(
+            uuid=uuids.cn1, numa_topology=fakes.NUMA_TOPOLOGY._to_json())
+        self.assertIs(topology, cache.get(compute))
+        self.assertEqual({'hits': 1, 'misses': 1}, cache.stats)
+
+        # a changed value is deserialized again
+        new_topology = fakes.NUMA_TOPOLOGY.obj_clone()
+        new_topology.cells[0].memory_usage = 256
+        compute.numa_topology = new_topology._to_json()
+        topology = cache.get(compute)
+        self.assertEqual(256, topology.cells[0].memory_usage)
+        self.assertEqual({'hits': 1, 'misses': 2}, cache.stats)
+
+        # and a compute node without NUMA topology is evicted
+        compute.numa_topology = None
+        self.assertIsNone(cache.get(compute))
+        self.assertEqual({}, cache.topologies)
+
     def test_stat_consumption_from_instance_pci(self):
 
         inst_topology = objects.InstanceNUMATopology(
@@ -27,9 +27,11 @@ from nova import objects
 from nova.scheduler import filter_scheduler
 from nova.scheduler import host_manager
 from nova.scheduler import manager
+from nova.scheduler import trace as scheduler_trace
 from nova import test
 from nova.tests.unit import fake_server_actions
 from nova.tests.unit.scheduler import fakes
+from nova import trace as nova_trace
 
 
 class SchedulerManagerInitTestCase(test.NoDBTestCase):
@@ -403,12 +405,94 @@ class SchedulerManagerTestCase(test.NoDBTestCase):
                                               mock.sentinel.host_name,
                                               mock.sentinel.instance_uuids)
 
+    @mock.patch('nova.scheduler.request_filter.process_reqspec')
+    @mock.patch('nova.scheduler.utils.resources_from_request_spec')
+    @mock.patch('nova.scheduler.client.report.SchedulerReportClient.'
+                'get_allocation_candidates')
+    def test_select_destination_traced(self, mock_get_ac, mock_rfrs,
+                                       mock_process):
+        fake_spec = objects.RequestSpec()
+        mock_get_ac.return_value = (fakes.get_fake_alloc_reqs(),
+                                    mock.Mock(), '1.17')
+        mock_rfrs.return_value.cpu_pinning_requested = False
+        with mock.patch.object(self.manager.driver, 'select_destinations'):
+            self.manager.select_destinations(self.context, spec_obj=fake_spec,
+                    instance_uuids=[uuids.instance])
+            self.manager.driver.select_destinations.side_effect = (
+                exception.NoValidHost(reason=''))
+            self.assertRaises(messaging.ExpectedException,
+                self.manager.select_destinations, self.context,
+                spec_obj=fake_spec, instance_uuids=[uuids.instance])
+
+        result = self.manager.get_traces(self.context)
+        self.assertTrue(result['enabled'])
+        self.assertEqual(self.manager.host, result['host'])
+        self.assertIsNone(result['histograms'])
+        self.assertEqual(['NoValidHost', 'Success'],
+                         [t['result'] for t in result['traces']])
+        trace = result['traces'][1]
+        self.assertEqual(self.context.request_id, trace['request_id'])
+        self.assertEqual([uuids.instance], trace['instance_uuids'])
+        self.assertEqual(['request_filters', 'placement'],
+                         [phase['name'] for phase in trace['phases']])
+        self.assertIsNone(nova_trace.current())
+
+        self.assertEqual(1, len(self.manager.get_traces(
+            self.context, limit=1)['traces']))
+
+    @mock.patch.object(host_manager.HostManager, '_init_instance_info')
+    @mock.patch.object(host_manager.HostManager, '_init_aggregates')
+    def test_get_traces_histograms(self, mock_init_agg, mock_init_inst):
+        self.flags(trace_histograms=True, group='scheduler')
+        sched = self.manager_cls()
+        with scheduler_trace.tracing(sched.traces, 'req-1', []):
+            with nova_trace.phase('placement'):
+                pass
+
+        result = sched.get_traces(self.context, histograms=True)
+        self.assertEqual(['placement'], list(result['histograms']))
+        self.assertEqual(1, result['histograms']['placement']['count'])
+
+    @mock.patch.object(host_manager.HostManager, '_init_instance_info')
+    @mock.patch.object(host_manager.HostManager, '_init_aggregates')
+    def test_get_traces_disabled(self, mock_init_agg, mock_init_inst):
+        self.flags(trace_buffer_size=0, group='scheduler')
+        sched = self.manager_cls()
+        self.assertIsNone(sched.traces)
+        self.assertEqual(
+            {'host': sched.host, 'enabled': False, 'traces': [],
+             'histograms': None},
+            sched.get_traces(self.context, histograms=True))
+
+    def test_select_shard_candidates(self):
+        with mock.patch.object(self.manager.driver,
+                               'select_shard_candidates') as mock_select:
+            self.assertEqual(mock_select.return_value,
+                             self.manager.select_shard_candidates(
+                                 self.context, mock.sentinel.spec_obj,
+                                 [uuids.cn], 4))
+        mock_select.assert_called_once_with(
+            self.context, mock.sentinel.spec_obj, [uuids.cn], 4)
+
     def test_reset(self):
         with mock.patch.object(self.manager.driver.host_manager,
                                'refresh_cells_caches') as mock_refresh:
             self.manager.reset()
             mock_refresh.assert_called_once_with()
 
+    def test_refresh_host_state_cache_disabled(self):
+        with mock.patch.object(self.manager.driver.host_manager,
+                               'refresh_host_state_cache') as mock_refresh:
+            self.manager._refresh_host_state_cache(mock.sentinel.context)
+            mock_refresh.assert_not_called()
+
+    def test_refresh_host_state_cache(self):
+        self.flags(host_state_cache_enabled=True, group='filter_scheduler')
+        with mock.patch.object(self.manager.driver.host_manager,
+                               'refresh_host_state_cache') as mock_refresh:
+            self.manager._refresh_host_state_cache(mock.sentinel.context)
+            mock_refresh.assert_called_once_with(mock.sentinel.context)
+
     @mock.patch('nova.objects.host_mapping.discover_hosts')
     def test_discover_hosts(self, mock_discover):
         cm1 = objects.CellMapping(name='cell1')
@@ -42,6 +42,7 @@ class SchedulerRpcAPITestCase(test.NoDBTestCase):
         expected_retval = 'foo' if rpc_method == 'call' else None
         expected_version = kwargs.pop('version', None)
         expected_fanout = kwargs.pop('fanout', None)
+        expected_server = kwargs.pop('server', None)
         expected_kwargs = kwargs.copy()
 
         if expected_args:
@@ -55,6 +56,8 @@ class SchedulerRpcAPITestCase(test.NoDBTestCase):
             })
         if expected_fanout:
             prepare_kwargs['fanout'] = True
+        if expected_server:
+            prepare_kwargs['server'] = expected_server
         if expected_version:
             prepare_kwargs['version'] = expected_version
 
@@ -165,3 +168,35 @@ class SchedulerRpcAPITestCase(test.NoDBTestCase):
                 instance_uuids=['fake1', 'fake2'],
                 fanout=True,
                 version='4.2')
+
+    def test_get_traces(self):
+        self._test_scheduler_api('get_traces', rpc_method='call',
+                expected_args={'limit': 5, 'histograms': True},
+                limit=5, histograms=True,
+                version='4.6')
+
+    def test_get_traces_from_host(self):
+        self._test_scheduler_api('get_traces', rpc_method='call',
+                expected_args={'limit': None, 'histograms': False},
+                host='fake_host',
+                server='fake_host',
+                version='4.6')
+
+    def test_select_shard_candidates(self):
+        self._test_scheduler_api('select_shard_candidates', rpc_method='call',
+                expected_args={'spec_obj': 'fake_spec',
+                               'compute_uuids': ['fake_uuid'],
+                               'limit': 4},
+                host='fake_host', spec_obj='fake_spec',
+                compute_uuids=['fake_uuid'], limit=4,
+                server='fake_host',
+                version='4.7')
+
+    def test_supports_select_shard_candidates(self):
+        ctxt = context.RequestContext('fake_user', 'fake_project')
+        rpcapi = scheduler_rpcapi.SchedulerAPI()
+        self.assertTrue(rpcapi.supports_select_shard_candidates(ctxt))
+
+        self.flags(scheduler='4.6', group='upgrade_levels')
+        rpcapi = scheduler_rpcapi.SchedulerAPI()
+        self.assertFalse(rpcapi.supports_select_shard_candidates(ctxt))
@@ -0,0 +1,77 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from oslo_utils import uuidutils
+
+from nova import objects
+from nova.scheduler import sharding
+from nova import test
+
+
+class SchedulerShardsTestCase(test.NoDBTestCase):
+
+    def setUp(self):
+        super(SchedulerShardsTestCase, self).setUp()
+        self.hosts = ['sched1', 'Sched2', 'sched3']
+        self.uuids = [uuidutils.generate_uuid() for i in range(100)]
+
+    def _get_shards(self, mode):
+        shards = []
+        for host in self.hosts:
+            shard = sharding.SchedulerShards(mode, host)
+            shard.update_hosts(self.hosts)
+            shards.append(shard)
+        return shards
+
+    def test_update_hosts(self):
+        shards = sharding.SchedulerShards('compute', 'sched1')
+        self.assertEqual(['sched1'], shards.hosts)
+        self.assertEqual([], shards.get_peers())
+        # Only this scheduler is in the ring, so it owns everything.
+        self.assertEqual(self.uuids, shards.filter_compute_uuids(self.uuids))
+
+        ring = shards.hash_ring
+        shards.update_hosts(['sched2'])
+        self.assertEqual(['sched1', 'sched2'], shards.hosts)
+        self.assertEqual(['sched2'], shards.get_peers())
+        self.assertIsNot(ring, shards.hash_ring)
+
+        # The ring isn't rebuilt if the schedulers didn't change.
+        ring = shards.hash_ring
+        shards.update_hosts(['sched2', 'sched1'])
+        self.assertIs(ring, shards.hash_ring)
+
+    def test_filter_compute_uuids(self):
+        owned = [set(shard.filter_compute_uuids(self.uuids))
+                 for shard in self._get_shards('compute')]
+        # Every compute node is in exactly one shard.
+        self.assertEqual(set(self.uuids), set.union(*owned))
+        self.assertEqual(len(self.uuids), sum(len(o) for o in owned))
+        for o in owned:
+            self.assertTrue(o)
+
+    def test_filter_compute_uuids_cell_mode(self):
+        shard = self._get_shards('cell')[0]
+        self.assertEqual(self.uuids, shard.filter_compute_uuids(self.uuids))
+        self.assertIsNone(shard.filter_compute_uuids(None))
+
+    def test_filter_cells(self):
+        cells = [objects.CellMapping(uuid=uuid) for uuid in self.uuids]
+        owned = [shard.filter_cells(cells)
+                 for shard in self._get_shards('cell')]
+        self.assertEqual(sorted(self.uuids),
+                         sorted(cell.uuid for o in owned for cell in o))
+
+    def test_filter_cells_compute_mode(self):
+        cells = [objects.CellMapping(uuid=uuid) for uuid in self.uuids]
+        shard = self._get_shards('compute')[0]
+        self.assertEqual(cells, shard.filter_cells(cells))
@@ -0,0 +1,93 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import mock
+from oslo_utils.fixture import uuidsentinel as uuids
+
+from nova import exception
+from nova.scheduler import trace
+from nova import test
+from nova import trace as nova_trace
+
+
+class TraceBufferTestCase(test.NoDBTestCase):
+
+    def _add_traces(self, buffer, count):
+        for i in range(count):
+            t = nova_trace.Trace('req-%d' % i, [])
+            t.record('placement', 0.001)
+            t.finish('Success')
+            buffer.add(t)
+
+    def test_get_traces(self):
+        buffer = trace.TraceBuffer(3)
+        self._add_traces(buffer, 5)
+
+        self.assertEqual(['req-4', 'req-3', 'req-2'],
+                         [t['request_id'] for t in buffer.get_traces()])
+        self.assertEqual(['req-4'],
+                         [t['request_id']
+                          for t in buffer.get_traces(limit=1)])
+        self.assertIsNone(buffer.get_histograms())
+
+    def test_get_histograms(self):
+        buffer = trace.TraceBuffer(3, histograms=True)
+        self._add_traces(buffer, 5)
+
+        histograms = buffer.get_histograms()
+        # The histograms cover all the traces, not only the buffered ones.
+        self.assertEqual(['placement'], list(histograms))
+        self.assertEqual(5, histograms['placement']['count'])
+
+
+class TracingTestCase(test.NoDBTestCase):
+
+    def test_tracing(self):
+        buffer = trace.TraceBuffer(10)
+        with trace.tracing(buffer, 'req-1', [uuids.instance]) as t:
+            self.assertIs(t, nova_trace.current())
+            with nova_trace.phase('placement'):
+                pass
+            with nova_trace.phase('placement'):
+                pass
+
+        self.assertIsNone(nova_trace.current())
+        traces = buffer.get_traces()
+        self.assertEqual(1, len(traces))
+        self.assertEqual('Success', traces[0]['result'])
+        self.assertEqual(['placement'],
+                         [p['name'] for p in traces[0]['phases']])
+        self.assertEqual(2, traces[0]['phases'][0]['count'])
+
+    def test_tracing_error(self):
+        buffer = trace.TraceBuffer(10)
+
+        def _fail():
+            with trace.tracing(buffer, 'req-1', None):
+                with nova_trace.phase('placement'):
+                    raise exception.NoValidHost(reason='')
+
+        self.assertRaises(exception.NoValidHost, _fail)
+        self.assertIsNone(nova_trace.current())
+        traces = buffer.get_traces()
+        self.assertEqual('NoValidHost', traces[0]['result'])
+        self.assertEqual([], traces[0]['instance_uuids'])
+        self.assertEqual(1, traces[0]['phases'][0]['count'])
+
+    @mock.patch.object(nova_trace, 'Trace')
+    def test_tracing_disabled(self, mock_trace):
+        with trace.tracing(None, 'req-1', []) as t:
+            self.assertIsNone(t)
+            self.assertIsNone(nova_trace.current())
+            with nova_trace.phase('placement'):
+                pass
+        mock_trace.assert_not_called()
@@ -174,6 +174,17 @@ class MetricsWeigherTestCase(test.NoDBTestCase):
                           8192,
                           'host4')
 
+    def test_metric_not_found_required_zero_multiplier(self):
+        # The weigher still runs when its multiplier is zero for every host,
+        # so that it fails for the missing metrics.
+        self.flags(weight_multiplier=0.0, group='metrics')
+        setting = [idle + '=1', user + '=2']
+        self.assertRaises(exception.ComputeHostMetricNotFound,
+                          self._do_test,
+                          setting,
+                          0.0,
+                          'host1')
+
     def test_metric_not_found_non_required(self):
         # host1: idle=512,  kernel=1
         # host2: idle=1024, kernel=2
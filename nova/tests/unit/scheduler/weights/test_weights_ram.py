@@ -16,6 +16,8 @@
 Tests For Scheduler RAM weights.
 """
 
+import mock
+
 from nova import objects
 from nova.scheduler import weights
 from nova.scheduler.weights import ram
@@ -169,3 +171,22 @@ class RamWeigherTestCase(test.NoDBTestCase):
         weighed_host = weights[0]
         self.assertEqual(1.0 * 1.5, weighed_host.weight)
         self.assertEqual('host4', weighed_host.obj.host)
+
+    def test_weight_multipliers_per_aggregates(self):
+        hostinfo_list = self._get_all_hosts()
+        agg = objects.Aggregate(
+            id=1,
+            name='foo',
+            hosts=['host1', 'host2'],
+            metadata={'ram_weight_multiplier': '1.5'},
+        )
+        hostinfo_list[0].aggregates = [agg]
+        hostinfo_list[1].aggregates = [agg]
+        with mock.patch.object(self.ram_weigher, 'weight_multiplier',
+                               wraps=self.ram_weigher.weight_multiplier
+                               ) as mock_multiplier:
+            multipliers = self.ram_weigher.weight_multipliers(hostinfo_list)
+        self.assertEqual([1.5, 1.5, 1.0, 1.0], multipliers)
+        # The multiplier is only computed once for the hosts in the aggregate
+        # and once for the hosts without aggregates.
+        self.assertEqual(2, mock_multiplier.call_count)
@@ -0,0 +1,84 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import mock
+from oslo_utils.fixture import uuidsentinel as uuids
+
+from nova import cell_health
+from nova import test
+
+
+@mock.patch('time.monotonic', return_value=100)
+class CellHealthTestCase(test.NoDBTestCase):
+
+    def test_circuit_disabled(self, mock_time):
+        for i in range(10):
+            cell_health.record_call(uuids.cell, 0.002, True)
+        self.assertTrue(cell_health.allow_call(uuids.cell))
+        health = cell_health.get_health()[uuids.cell]
+        self.assertEqual(cell_health.CIRCUIT_CLOSED, health['circuit'])
+        self.assertEqual(10, health['failures'])
+        self.assertEqual(10, health['consecutive_failures'])
+        self.assertEqual(10, health['latencies']['count'])
+
+    def test_circuit(self, mock_time):
+        self.flags(cell_circuit_failure_threshold=3,
+                   cell_circuit_retry_interval=10)
+        self.assertTrue(cell_health.allow_call(uuids.cell))
+
+        # A success resets the count of consecutive failures.
+        cell_health.record_call(uuids.cell, 0.002, True)
+        cell_health.record_call(uuids.cell, 0.002, True)
+        cell_health.record_call(uuids.cell, 0.002, False)
+        cell_health.record_call(uuids.cell, 0.002, True)
+        cell_health.record_call(uuids.cell, 0.002, True)
+        self.assertTrue(cell_health.allow_call(uuids.cell))
+        cell_health.record_call(uuids.cell, 0.002, True)
+        self.assertFalse(cell_health.allow_call(uuids.cell))
+        self.assertEqual(cell_health.CIRCUIT_OPEN,
+                         cell_health.get_health()[uuids.cell]['circuit'])
+        # The other cells are still called.
+        self.assertTrue(cell_health.allow_call(uuids.other))
+
+        # A single probe call is made after the retry interval.
+        mock_time.return_value = 110
+        self.assertTrue(cell_health.allow_call(uuids.cell))
+        self.assertFalse(cell_health.allow_call(uuids.cell))
+        self.assertEqual(cell_health.CIRCUIT_HALF_OPEN,
+                         cell_health.get_health()[uuids.cell]['circuit'])
+
+        # The circuit opens again if it fails.
+        cell_health.record_call(uuids.cell, 0.002, True)
+        self.assertFalse(cell_health.allow_call(uuids.cell))
+        mock_time.return_value = 119
+        self.assertFalse(cell_health.allow_call(uuids.cell))
+
+        # And closes if it succeeds.
+        mock_time.return_value = 120
+        self.assertTrue(cell_health.allow_call(uuids.cell))
+        cell_health.record_call(uuids.cell, 0.002, False)
+        self.assertTrue(cell_health.allow_call(uuids.cell))
+        self.assertTrue(cell_health.allow_call(uuids.cell))
+        health = cell_health.get_health()[uuids.cell]
+        self.assertEqual(cell_health.CIRCUIT_CLOSED, health['circuit'])
+        self.assertEqual(6, health['failures'])
+        self.assertEqual(0, health['consecutive_failures'])
+
+    def test_report(self, mock_time):
+        cell_health.record_call(uuids.cell, 0.002, False)
+        cell_health.record_call(uuids.cell, 20, True)
+        report = cell_health._report()
+        report.set_current_view_type('text')
+        self.assertIn('buckets = <= 0.1ms: 0, <= 0.5ms: 0, <= 1ms: 0, '
+                      '<= 5ms: 1, <= 10ms: 0, <= 50ms: 0, <= 100ms: 0, '
+                      '<= 500ms: 0, <= 1000ms: 0, <= 5000ms: 0, more: 1',
+                      str(report))
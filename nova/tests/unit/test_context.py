@@ -433,6 +433,52 @@ class ContextTestCase(test.NoDBTestCase):
         # NovaExceptions are not logged, the caller should handle them.
         mock_log_exception.assert_not_called()
 
+    @mock.patch('time.monotonic', return_value=100)
+    @mock.patch('nova.context.LOG.exception', new=mock.Mock())
+    @mock.patch('nova.objects.InstanceList.get_by_filters')
+    def test_scatter_gather_cells_circuit_open(self, mock_get_inst,
+                                               mock_time):
+        self.flags(cell_circuit_failure_threshold=2,
+                   cell_circuit_retry_interval=30)
+        # This is needed because we're mocking get_by_filters.
+        self.useFixture(nova_fixtures.SpawnIsSynchronousFixture())
+        ctxt = context.get_context()
+        mapping0 = objects.CellMapping(database_connection='fake://db0',
+                                       transport_url='none:///',
+                                       uuid=objects.CellMapping.CELL0_UUID)
+        mapping1 = objects.CellMapping(database_connection='fake://db1',
+                                       transport_url='fake://mq1',
+                                       uuid=uuids.cell1)
+        mappings = objects.CellMappingList(objects=[mapping0, mapping1])
+
+        # cell1 fails twice in a row, then it is no longer called.
+        mock_get_inst.side_effect = [
+            mock.sentinel.instances, test.TestingException(),
+            mock.sentinel.instances, test.TestingException(),
+            mock.sentinel.instances]
+        for i in range(2):
+            results = context.scatter_gather_cells(
+                ctxt, mappings, 30, objects.InstanceList.get_by_filters)
+            self.assertIsInstance(results[mapping1.uuid], Exception)
+        results = context.scatter_gather_cells(
+            ctxt, mappings, 30, objects.InstanceList.get_by_filters)
+        self.assertEqual({mapping0.uuid: mock.sentinel.instances,
+                          mapping1.uuid: context.did_not_respond_sentinel},
+                         results)
+        self.assertEqual(5, mock_get_inst.call_count)
+
+        # It is called again once the probe succeeds.
+        mock_time.return_value = 130
+        mock_get_inst.side_effect = None
+        mock_get_inst.return_value = mock.sentinel.instances
+        for i in range(2):
+            results = context.scatter_gather_cells(
+                ctxt, mappings, 30, objects.InstanceList.get_by_filters)
+            self.assertEqual({mapping0.uuid: mock.sentinel.instances,
+                              mapping1.uuid: mock.sentinel.instances},
+                             results)
+        self.assertEqual(9, mock_get_inst.call_count)
+
     @mock.patch('nova.context.scatter_gather_cells')
     @mock.patch('nova.objects.CellMappingList.get_all')
     def test_scatter_gather_all_cells(self, mock_get_all, mock_scatter):
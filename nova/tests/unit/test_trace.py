@@ -0,0 +1,98 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import eventlet
+from eventlet import corolocal
+import fixtures
+import mock
+from oslo_utils.fixture import uuidsentinel as uuids
+
+from nova import test
+from nova import trace
+
+
+class TraceTestCase(test.NoDBTestCase):
+
+    def test_record(self):
+        t = trace.Trace('req-1', [uuids.instance])
+        t.record('placement', 0.01)
+        t.record('filter:ComputeFilter', 0.0005)
+        t.record('placement', 0.02)
+        t.finish('Success')
+
+        primitive = t.to_dict()
+        self.assertEqual('req-1', primitive['request_id'])
+        self.assertEqual([uuids.instance], primitive['instance_uuids'])
+        self.assertEqual('Success', primitive['result'])
+        self.assertIsNotNone(primitive['duration_ms'])
+        self.assertEqual(
+            [{'name': 'placement', 'count': 2, 'duration_ms': 30.0},
+             {'name': 'filter:ComputeFilter', 'count': 1,
+              'duration_ms': 0.5}],
+            primitive['phases'])
+
+    def test_histogram(self):
+        histogram = trace.Histogram()
+        histogram.add(0.00005)
+        histogram.add(0.001)
+        histogram.add(0.003)
+        histogram.add(10)
+
+        primitive = histogram.to_dict()
+        self.assertEqual(4, primitive['count'])
+        self.assertEqual(10004.05, primitive['duration_ms'])
+        buckets = {bound: count for bound, count in primitive['buckets']}
+        self.assertEqual(1, buckets[0.1])
+        self.assertEqual(1, buckets[1])
+        self.assertEqual(1, buckets[5])
+        self.assertEqual(1, buckets[None])
+        self.assertEqual(4, sum(buckets.values()))
+
+    def test_phase(self):
+        t = trace.Trace('req-1', [])
+        trace.set_current(t)
+        self.addCleanup(trace.set_current, None)
+        with trace.phase('placement'):
+            pass
+        self.assertEqual(['placement'], list(t.phases))
+        self.assertEqual(1, t.phases['placement'][0])
+
+    def test_phase_no_trace(self):
+        with trace.phase('placement'):
+            self.assertIsNone(trace.current())
+
+    def test_propagate(self):
+        # Make sure the trace is local to the green thread, whether or not
+        # the module was imported before monkey patching.
+        self.useFixture(fixtures.MonkeyPatch('nova.trace._local',
+                                             corolocal.local()))
+        t = trace.Trace('req-1', [])
+        trace.set_current(t)
+
+        def _record(name):
+            with trace.phase(name):
+                return trace.current()
+
+        pool = eventlet.GreenPool()
+        result = list(pool.imap(trace.propagate(_record), ['a', 'b']))
+        self.assertEqual([t, t], result)
+        self.assertEqual(['a', 'b'], sorted(t.phases))
+        # Not propagated, the phase is lost.
+        self.assertIsNone(pool.spawn(_record, 'c').wait())
+        self.assertNotIn('c', t.phases)
+        # Calling the wrapper in the same green thread keeps its trace.
+        trace.propagate(_record)('d')
+        self.assertIs(t, trace.current())
+
+    def test_propagate_no_trace(self):
+        func = mock.Mock()
+        self.assertIs(func, trace.propagate(func))
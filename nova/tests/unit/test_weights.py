@@ -16,12 +16,15 @@
 Tests For weights.
 """
 
+import itertools
+
 import mock
 
 from nova.scheduler import weights as scheduler_weights
 from nova.scheduler.weights import ram
 from nova import test
 from nova.tests.unit.scheduler import fakes
+from nova import trace as nova_trace
 from nova import weights
 
 
@@ -72,3 +75,108 @@ class TestWeigher(test.NoDBTestCase):
         self.assertEqual(1, len(weighed_host))
         self.assertEqual('host1', weighed_host[0].obj.host)
         self.assertFalse(mock_weigh.called)
+
+    def _get_weighed_hosts(self, free_ram_mbs, limit=None, ranges=None):
+        hostinfo = [fakes.FakeHostState('host%d' % i, 'node%d' % i,
+                                        {'free_ram_mb': free_ram_mb})
+                    for i, free_ram_mb in enumerate(free_ram_mbs)]
+        weight_handler = scheduler_weights.HostWeightHandler()
+        return weight_handler.get_weighed_objects([ram.RAMWeigher()],
+                                                  hostinfo, {}, limit=limit,
+                                                  ranges=ranges)
+
+    def test_limit(self):
+        free_ram_mbs = [512, 4096, 1024, 8192, 2048, 256]
+        weighed_hosts = self._get_weighed_hosts(free_ram_mbs, limit=2)
+        with mock.patch('nova.weights.sorted', create=True,
+                        side_effect=sorted) as mock_sorted:
+            # The two best hosts are selected without sorting the others.
+            best_hosts = list(itertools.islice(weighed_hosts, 2))
+            mock_sorted.assert_not_called()
+            other_hosts = list(weighed_hosts)
+            mock_sorted.assert_called_once()
+        self.assertEqual(['host3', 'host1', 'host4', 'host2', 'host0',
+                          'host5'],
+                         [w.obj.host for w in best_hosts + other_hosts])
+        sorted_hosts = self._get_weighed_hosts(free_ram_mbs)
+        self.assertEqual([w.weight for w in sorted_hosts],
+                         [w.weight for w in best_hosts + other_hosts])
+
+    def test_limit_same_weights(self):
+        # The hosts come in the same order as if they were all sorted.
+        weighed_hosts = self._get_weighed_hosts([512, 1024, 512, 1024, 512],
+                                                limit=3)
+        self.assertEqual(['host1', 'host3', 'host0', 'host2', 'host4'],
+                         [w.obj.host for w in weighed_hosts])
+
+    def test_limit_greater_than_num_hosts(self):
+        weighed_hosts = self._get_weighed_hosts([512, 4096, 1024], limit=10)
+        self.assertEqual(['host1', 'host2', 'host0'],
+                         [w.obj.host for w in weighed_hosts])
+
+    def test_ranges(self):
+        free_ram_mbs = [512, 4096, 1024]
+        ranges = []
+        weighed_hosts = self._get_weighed_hosts(free_ram_mbs, ranges=ranges)
+        # The RAMWeigher has a minval of 0.
+        self.assertEqual([(0, 4096)], ranges)
+        self.assertEqual([[4096], [1024], [512]],
+                         [w.raw_weights for w in weighed_hosts])
+        self.assertEqual([[1.0]] * 3, [w.multipliers for w in weighed_hosts])
+        # The weights are the same once combined.
+        self.assertEqual([w.weight for w in weighed_hosts],
+                         [weights.combine_weights(w.raw_weights,
+                                                  w.multipliers, ranges)
+                          for w in weighed_hosts])
+
+    def test_ranges_only_one_host(self):
+        ranges = []
+        weighed_hosts = self._get_weighed_hosts([512], ranges=ranges)
+        self.assertEqual([(0, 512)], ranges)
+        self.assertEqual([[512]], [w.raw_weights for w in weighed_hosts])
+
+    def test_ranges_zero_multiplier(self):
+        self.flags(ram_weight_multiplier=0.0, group='filter_scheduler')
+        ranges = []
+        weighed_hosts = self._get_weighed_hosts([512, 4096], ranges=ranges)
+        self.assertEqual([(0.0, 0.0)], ranges)
+        self.assertEqual([[0.0], [0.0]],
+                         [w.raw_weights for w in weighed_hosts])
+        self.assertEqual([[0.0], [0.0]],
+                         [w.multipliers for w in weighed_hosts])
+
+    def test_merge_ranges(self):
+        self.assertEqual([(0.0, 4.0), (-1.0, 1.0)],
+                         weights.merge_ranges([[(1.0, 4.0), (0.0, 0.0)],
+                                               [[0.0, 2.0], [-1.0, 1.0]]]))
+
+    def test_combine_weights(self):
+        ranges = [(0.0, 4.0), (5.0, 5.0), (-1.0, 1.0)]
+        self.assertEqual(0.5 + 0.0 - 2.0 * 0.5,
+                         weights.combine_weights([2.0, 5.0, 0.0],
+                                                 [1.0, 3.0, -2.0], ranges))
+
+    @mock.patch('nova.weights.BaseWeigher.weigh_objects')
+    def test_zero_multiplier_not_weighed(self, mock_weigh):
+        self.flags(ram_weight_multiplier=0.0, group='filter_scheduler')
+        weighed_hosts = self._get_weighed_hosts([512, 4096])
+        self.assertEqual([0.0, 0.0], [w.weight for w in weighed_hosts])
+        self.assertFalse(mock_weigh.called)
+
+    @mock.patch('nova.weights.BaseWeigher.weigh_objects',
+                return_value=[1.0, 2.0])
+    def test_zero_multiplier_weighed(self, mock_weigh):
+        self.flags(ram_weight_multiplier=0.0, group='filter_scheduler')
+        with mock.patch.object(ram.RAMWeigher, 'skip_if_no_multiplier',
+                               return_value=False):
+            weighed_hosts = self._get_weighed_hosts([512, 4096])
+        self.assertEqual([0.0, 0.0], [w.weight for w in weighed_hosts])
+        mock_weigh.assert_called_once()
+
+    def test_traced(self):
+        trace = nova_trace.Trace('req-1', [])
+        with mock.patch.object(nova_trace, 'current',
+                               return_value=trace):
+            self._get_weighed_hosts([512, 4096])
+        self.assertEqual({'weigher:RAMWeigher'}, set(trace.phases))
+        self.assertEqual(1, trace.phases['weigher:RAMWeigher'][0])
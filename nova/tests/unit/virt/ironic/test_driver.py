@@ -3213,6 +3213,131 @@ class NodeCacheTestCase(test.NoDBTestCase):
         expected_cache = {n.uuid: n for n in nodes[1:]}
         self.assertEqual(expected_cache, self.driver.node_cache)
 
+    def _get_polled_nodes(self, nodes, **updated_at):
+        return [
+            _get_cached_node(
+                uuid=node.uuid, instance_uuid=node.instance_uuid,
+                updated_at=updated_at.get(node.uuid, node.updated_at),
+                fields=ironic_driver._NODE_POLL_FIELDS)
+            for node in nodes]
+
+    @mock.patch.object(ironic_driver.IronicDriver, '_refresh_hash_ring')
+    @mock.patch.object(objects.InstanceList, 'get_uuids_by_host')
+    @mock.patch.object(ironic_driver.IronicDriver, '_get_node')
+    @mock.patch.object(ironic_driver.IronicDriver, '_get_node_list')
+    @mock.patch('time.monotonic')
+    def test__refresh_cache_changed_nodes(self, mock_time, mock_nodes,
+                                          mock_get_node, mock_instances,
+                                          mock_hash_ring):
+        self.flags(node_cache_full_refresh_interval=60, group='ironic')
+        mock_time.return_value = 1000
+        mock_instances.return_value = [uuids.instance]
+        self.driver.hash_ring = mock.Mock()
+        self.driver.hash_ring.get_nodes.return_value = {self.host}
+        nodes = [
+            _get_cached_node(
+                uuid=getattr(uuids, 'node%d' % i), instance_uuid=None,
+                updated_at='2021-01-01T00:00:00+00:00')
+            for i in range(20)]
+        nodes[0].instance_uuid = uuids.instance
+
+        # The first refresh lists all the nodes with the cached fields.
+        mock_nodes.return_value = nodes
+        self.driver._refresh_cache()
+        mock_nodes.assert_called_once_with(
+            fields=ironic_driver._NODE_CACHE_FIELDS)
+        self.assertEqual({n.uuid: n for n in nodes}, self.driver.node_cache)
+        self.assertEqual({uuids.instance: nodes[0]},
+                         self.driver.node_cache_by_instance)
+
+        # Then only the polled fields are listed and the changed nodes are
+        # fetched.
+        mock_time.return_value = 1030
+        mock_nodes.reset_mock()
+        mock_nodes.return_value = self._get_polled_nodes(
+            nodes[:19], **{nodes[3].uuid: '2021-01-01T00:01:00+00:00'})
+        node3 = _get_cached_node(
+            uuid=nodes[3].uuid, updated_at='2021-01-01T00:01:00+00:00')
+        mock_get_node.return_value = node3
+        self.driver._refresh_cache()
+        mock_nodes.assert_called_once_with(
+            fields=ironic_driver._NODE_POLL_FIELDS)
+        mock_get_node.assert_called_once_with(
+            nodes[3].uuid, fields=ironic_driver._NODE_CACHE_FIELDS)
+        expected_cache = {n.uuid: n for n in nodes[:19]}
+        expected_cache[node3.uuid] = node3
+        self.assertEqual(expected_cache, self.driver.node_cache)
+
+        # The changed nodes are listed again if there are many of them.
+        mock_nodes.reset_mock()
+        mock_get_node.reset_mock()
+        changed = {node.uuid: '2021-01-01T00:02:00+00:00'
+                   for node in nodes[:5]}
+        relisted = [
+            _get_cached_node(uuid=node.uuid, instance_uuid=node.instance_uuid,
+                             updated_at=changed.get(node.uuid,
+                                                    node.updated_at))
+            for node in nodes[:19]]
+        mock_nodes.side_effect = [
+            self._get_polled_nodes(nodes[:19], **changed), relisted]
+        self.driver._refresh_cache()
+        mock_nodes.assert_has_calls([
+            mock.call(fields=ironic_driver._NODE_POLL_FIELDS),
+            mock.call(fields=ironic_driver._NODE_CACHE_FIELDS)])
+        mock_get_node.assert_not_called()
+        expected_cache = {n.uuid: n for n in relisted}
+        self.assertEqual(expected_cache, self.driver.node_cache)
+
+        # All the nodes are listed again after the interval.
+        mock_time.return_value = 1060
+        mock_nodes.reset_mock()
+        mock_nodes.side_effect = None
+        mock_nodes.return_value = nodes
+        self.driver._refresh_cache()
+        mock_nodes.assert_called_once_with(
+            fields=ironic_driver._NODE_CACHE_FIELDS)
+        self.assertEqual({n.uuid: n for n in nodes}, self.driver.node_cache)
+
+    @mock.patch.object(ironic_driver.IronicDriver, '_get_node')
+    def test__fetch_changed_nodes_deleted(self, mock_get_node):
+        nodes = [_get_cached_node(uuid=getattr(uuids, 'node%d' % i),
+                                  updated_at='2021-01-01T00:00:00+00:00')
+                 for i in range(20)]
+        self.driver.node_cache = {n.uuid: n for n in nodes}
+        polled = self._get_polled_nodes(
+            nodes, **{nodes[0].uuid: '2021-01-01T00:01:00+00:00'})
+        mock_get_node.side_effect = sdk_exc.ResourceNotFound
+        get_node_list = mock.Mock()
+
+        node_cache = self.driver._fetch_changed_nodes(
+            {n.uuid: n for n in polled}, get_node_list)
+
+        self.assertEqual({n.uuid: n for n in nodes[1:]}, node_cache)
+        get_node_list.assert_not_called()
+
+    def test_get_info_from_cache(self):
+        node = _get_cached_node(uuid=uuids.node, instance_uuid=uuids.instance,
+                                power_state=ironic_states.POWER_ON)
+        self.driver.node_cache = {node.uuid: node}
+        self.driver.node_cache_by_instance = {uuids.instance: node}
+        instance = fake_instance.fake_instance_obj(self.ctx,
+                                                   uuid=uuids.instance)
+        with mock.patch.object(self.driver, '_validate_instance_and_node',
+                               ) as mock_validate:
+            self.assertEqual(
+                hardware.InstanceInfo(state=nova_states.RUNNING),
+                self.driver.get_info(instance))
+
+            # The node was removed from the cache since the last refresh.
+            other = _get_cached_node(uuid=uuids.other)
+            self.driver.node_cache = {other.uuid: other}
+            node.power_state = ironic_states.POWER_OFF
+            mock_validate.return_value = node
+            self.assertEqual(
+                hardware.InstanceInfo(state=nova_states.SHUTDOWN),
+                self.driver.get_info(instance))
+            mock_validate.assert_called_once_with(instance)
+
 
 @mock.patch.object(FAKE_CLIENT, 'node')
 class IronicDriverConsoleTestCase(test.NoDBTestCase):
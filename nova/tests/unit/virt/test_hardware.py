@@ -14,6 +14,7 @@
 
 import collections
 import copy
+import itertools
 import ddt
 
 import mock
@@ -2882,6 +2883,161 @@ class VirtNUMAHostTopologyTestCase(test.NoDBTestCase):
         self.assertIsInstance(instance_topology, objects.InstanceNUMATopology)
         self.assertEqual(1, instance_topology.cells[0].id)
 
+    def _get_host_with_cells(self, num_cells, full_cells=()):
+        cells = []
+        for cell_id in range(num_cells):
+            cpus = set([cell_id * 2, cell_id * 2 + 1])
+            cells.append(objects.NUMACell(
+                id=cell_id,
+                cpuset=cpus,
+                pcpuset=set(),
+                memory=512 if cell_id in full_cells else 2048,
+                cpu_usage=0,
+                memory_usage=0,
+                pinned_cpus=set(),
+                mempages=[objects.NUMAPagesTopology(
+                    size_kb=4,
+                    total=131072 if cell_id in full_cells else 524288,
+                    used=0)],
+                siblings=[set([cpu]) for cpu in sorted(cpus)]))
+        return objects.NUMATopology(cells=cells)
+
+    def _get_instance_with_cells(self, num_cells):
+        return objects.InstanceNUMATopology(cells=[
+            objects.InstanceNUMACell(
+                id=cell_id, cpuset=set([cell_id]), pcpuset=set(),
+                memory=1024)
+            for cell_id in range(num_cells)])
+
+    def test_fit_permutations_order(self):
+        # With no misfits, the permutations are the same and in the same
+        # order as the ones from itertools.permutations
+        perms = []
+        perm = []
+        for depth, host_cell_idx in hw._numa_fit_permutations(4, 2, set()):
+            del perm[depth:]
+            perm.append(host_cell_idx)
+            if len(perm) == 2:
+                perms.append(tuple(perm))
+        self.assertEqual(list(itertools.permutations(range(4), 2)), perms)
+
+    def test_fit_permutations_pruned(self):
+        misfits = set([(0, 0), (2, 1)])
+        perms = []
+        perm = []
+        for depth, host_cell_idx in hw._numa_fit_permutations(
+                3, 2, misfits):
+            del perm[depth:]
+            perm.append(host_cell_idx)
+            if len(perm) == 2:
+                perms.append(tuple(perm))
+        self.assertEqual([(1, 0), (2, 0), (2, 1)], perms)
+
+    def test_get_fitting_misfits_not_retried(self):
+        # The first two host cells are full, so the instance cells can only
+        # go on the last two ones. Each host and instance cell pair must only
+        # be attempted once.
+        host = self._get_host_with_cells(4, full_cells=(0, 1))
+        instance = self._get_instance_with_cells(2)
+
+        with mock.patch.object(
+                hw, '_numa_fit_instance_cell',
+                wraps=hw._numa_fit_instance_cell) as mock_fit:
+            fitted_instance = hw.numa_fit_instance_to_host(host, instance)
+
+        self.assertIsInstance(fitted_instance, objects.InstanceNUMATopology)
+        self.assertEqual([2, 3], [cell.id for cell in fitted_instance.cells])
+        attempts = [(call[0][0].id, call[0][1]) for call in
+                    mock_fit.call_args_list]
+        # cell 0: host cells 0, 1, 2; cell 1: host cells 0, 1, 3
+        self.assertEqual(6, len(attempts))
+        self.assertEqual(
+            [0, 1, 2, 0, 1, 3], [host_cell_id for host_cell_id, _ in attempts])
+
+    def test_get_fitting_no_fit_prunes_permutations(self):
+        host = self._get_host_with_cells(8, full_cells=range(7))
+        instance = self._get_instance_with_cells(2)
+
+        with mock.patch.object(
+                hw, '_numa_fit_instance_cell',
+                wraps=hw._numa_fit_instance_cell) as mock_fit:
+            fitted_instance = hw.numa_fit_instance_to_host(host, instance)
+
+        self.assertIsNone(fitted_instance)
+        # Each of the 8 host cells is attempted once for the first instance
+        # cell and only the remaining 7 ones for the second instance cell,
+        # instead of the 56 permutations being walked.
+        self.assertEqual(15, mock_fit.call_count)
+
+    def test_get_fitting_cache(self):
+        cache = hw.NUMAFitCache()
+        host1 = self._get_host_with_cells(2, full_cells=(0,))
+        host2 = self._get_host_with_cells(2, full_cells=(0,))
+
+        fitted_instance1 = hw.numa_fit_instance_to_host(
+            host1, self._get_instance_with_cells(1), cache=cache)
+        with mock.patch.object(hw, '_numa_fit_instance_cell') as mock_fit:
+            fitted_instance2 = hw.numa_fit_instance_to_host(
+                host2, self._get_instance_with_cells(1), cache=cache)
+        mock_fit.assert_not_called()
+
+        self.assertEqual(1, fitted_instance1.cells[0].id)
+        self.assertEqual(1, fitted_instance2.cells[0].id)
+        self.assertIsNot(fitted_instance1, fitted_instance2)
+        self.assertIsNot(fitted_instance1.cells[0], fitted_instance2.cells[0])
+
+        # A host with a different usage doesn't share the result
+        host3 = self._get_host_with_cells(2, full_cells=(1,))
+        fitted_instance3 = hw.numa_fit_instance_to_host(
+            host3, self._get_instance_with_cells(1), cache=cache)
+        self.assertEqual(0, fitted_instance3.cells[0].id)
+
+    def test_get_fitting_cache_no_fit(self):
+        cache = hw.NUMAFitCache()
+        host = self._get_host_with_cells(2, full_cells=(0, 1))
+
+        self.assertIsNone(hw.numa_fit_instance_to_host(
+            host, self._get_instance_with_cells(1), cache=cache))
+        with mock.patch.object(hw, '_numa_fit_instance_cell') as mock_fit:
+            self.assertIsNone(hw.numa_fit_instance_to_host(
+                host, self._get_instance_with_cells(1), cache=cache))
+        mock_fit.assert_not_called()
+
+    def test_get_fitting_cache_lru(self):
+        cache = hw.NUMAFitCache(max_size=1)
+        host1 = self._get_host_with_cells(2, full_cells=(0,))
+        host2 = self._get_host_with_cells(2, full_cells=(1,))
+
+        for host in (host1, host2, host1):
+            hw.numa_fit_instance_to_host(
+                host, self._get_instance_with_cells(1), cache=cache)
+
+        with mock.patch.object(
+                hw, '_numa_fit_instance_cell',
+                wraps=hw._numa_fit_instance_cell) as mock_fit:
+            hw.numa_fit_instance_to_host(
+                host1, self._get_instance_with_cells(1), cache=cache)
+            mock_fit.assert_not_called()
+            hw.numa_fit_instance_to_host(
+                host2, self._get_instance_with_cells(1), cache=cache)
+            mock_fit.assert_called()
+
+    def test_get_fitting_cache_pci_requests(self):
+        # Results depending on the PCI pools of the host aren't cached
+        cache = hw.NUMAFitCache()
+        pci_request = objects.InstancePCIRequest(count=1,
+            spec=[{'vendor_id': '8086'}])
+        pci_stats = stats.PciDeviceStats()
+
+        with mock.patch.object(stats.PciDeviceStats,
+                'support_requests', return_value=True):
+            fitted_instance = hw.numa_fit_instance_to_host(
+                self.host, self.instance1, pci_requests=[pci_request],
+                pci_stats=pci_stats, cache=cache)
+
+        self.assertIsInstance(fitted_instance, objects.InstanceNUMATopology)
+        self.assertEqual(0, len(cache._results))
+
 
 class NumberOfSerialPortsTest(test.NoDBTestCase):
     def test_flavor(self):
@@ -0,0 +1,157 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Timings of the phases of a request and distributions of durations.
+
+A service sets the trace of the request being handled with
+:func:`set_current`, the code handling the request then records the time
+spent in each phase against :func:`current`, for example with
+:func:`phase`. The trace is local to the green thread handling the request,
+so the functions run in other green threads on behalf of the request must be
+wrapped with :func:`propagate`.
+
+Recording a phase only costs a couple of clock reads and a dict update, and
+nothing at all when no trace is set.
+"""
+
+import bisect
+import contextlib
+import functools
+import threading
+import time
+
+from oslo_utils import timeutils
+
+# The upper bounds, in milliseconds, of the buckets of the histograms. The
+# last bucket has no upper bound.
+HISTOGRAM_BUCKETS = (0.1, 0.5, 1, 5, 10, 50, 100, 500, 1000, 5000)
+
+# NOTE: The services are monkey patched by eventlet, so this is local to the
+# green thread handling the request.
+_local = threading.local()
+
+
+class Trace(object):
+    """The timings of the phases of a single request."""
+
+    def __init__(self, request_id, instance_uuids):
+        self.request_id = request_id
+        self.instance_uuids = list(instance_uuids or [])
+        self.started_at = timeutils.utcnow()
+        self.result = None
+        self.duration = None
+        # Keyed by phase name, of [number of times recorded, total seconds].
+        self.phases = {}
+        self._start = time.monotonic()
+
+    def record(self, name, elapsed):
+        """Adds elapsed seconds to the phase name."""
+        phase = self.phases.get(name)
+        if phase is None:
+            self.phases[name] = [1, elapsed]
+        else:
+            phase[0] += 1
+            phase[1] += elapsed
+
+    def finish(self, result):
+        self.duration = time.monotonic() - self._start
+        self.result = result
+
+    def to_dict(self):
+        return {
+            'request_id': self.request_id,
+            'instance_uuids': self.instance_uuids,
+            'started_at': self.started_at.isoformat(),
+            'result': self.result,
+            'duration_ms': to_ms(self.duration),
+            'phases': [{'name': name, 'count': count,
+                        'duration_ms': to_ms(elapsed)}
+                       for name, (count, elapsed) in self.phases.items()],
+        }
+
+
+class Histogram(object):
+    """Distribution of recorded durations."""
+
+    def __init__(self):
+        self.counts = [0] * (len(HISTOGRAM_BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def add(self, elapsed):
+        self.counts[bisect.bisect_left(HISTOGRAM_BUCKETS,
+                                       elapsed * 1000)] += 1
+        self.count += 1
+        self.total += elapsed
+
+    def to_dict(self):
+        bounds = list(HISTOGRAM_BUCKETS) + [None]
+        return {
+            'count': self.count,
+            'duration_ms': to_ms(self.total),
+            'buckets': [[bound, count]
+                        for bound, count in zip(bounds, self.counts)],
+        }
+
+
+def to_ms(seconds):
+    if seconds is None:
+        return None
+    return round(seconds * 1000, 3)
+
+
+def current():
+    """Returns the trace of the request being handled, if any."""
+    return getattr(_local, 'trace', None)
+
+
+def set_current(trace):
+    """Sets the trace of the request being handled, or clears it if trace is
+    None.
+    """
+    _local.trace = trace
+
+
+def propagate(func):
+    """Returns func wrapped to record against the current trace when it is
+    called from another green thread, like the ones of a GreenPool.
+    """
+    trace = current()
+    if trace is None:
+        return func
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        previous = current()
+        set_current(trace)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            set_current(previous)
+    return wrapper
+
+
+@contextlib.contextmanager
+def phase(name):
+    """Records the time spent in the context against the phase name of the
+    current trace.
+    """
+    trace = current()
+    if trace is None:
+        yield
+        return
+    start = time.monotonic()
+    try:
+        yield
+    finally:
+        trace.record(name, time.monotonic() - start)
@@ -2232,12 +2232,121 @@ def _numa_cells_support_network_metadata(
     return True
 
 
+_UNSET = object()
+
+
+def _numa_fit_fingerprint(value):
+    """Build a hashable fingerprint of a NUMA object graph.
+
+    The fingerprint only depends on the content of the objects, so two hosts
+    with the same topology and the same usage yield the same fingerprint.
+    """
+    if isinstance(value, objects.base.NovaObject):
+        # Read the fields values directly, this is called for every host and
+        # going through the field getters is the most expensive part of it
+        fingerprint = [value.obj_name()]
+        for key in value.fields:
+            attr = getattr(value, objects.base.get_attrname(key), _UNSET)
+            if attr is not _UNSET:
+                fingerprint.append((key, _numa_fit_fingerprint(attr)))
+        return tuple(fingerprint)
+    if isinstance(value, (set, frozenset)):
+        return frozenset(value)
+    if isinstance(value, (list, tuple)):
+        # Lists of sets, like the CPU siblings, are common enough to be
+        # worth a shortcut
+        return tuple(
+            frozenset(val) if isinstance(val, set)
+            else _numa_fit_fingerprint(val) for val in value)
+    if isinstance(value, dict):
+        return frozenset(
+            (key, _numa_fit_fingerprint(val)) for key, val in value.items())
+    return value
+
+
+class NUMAFitCache(object):
+    """A bounded LRU cache of NUMA fitting results.
+
+    Fitting an instance onto a host is a pure function of the host topology
+    and usage, the requested instance topology and the limits, so results can
+    be shared between hosts that have identical fingerprints, which is common
+    for large fleets of identical, mostly empty compute nodes.
+    """
+
+    def __init__(self, max_size=128):
+        self.max_size = max_size
+        self._results = collections.OrderedDict()
+
+    def clear(self):
+        self._results.clear()
+
+    def get(self, key):
+        """Return a copy of the cached result for key.
+
+        :raises: KeyError if there is no result cached for key
+        """
+        primitive = self._results[key]
+        self._results.move_to_end(key)
+        if primitive is None:
+            return None
+        # Rebuilding the object from its primitive is about twice as fast as
+        # a deep copy and callers are free to modify the result
+        return objects.InstanceNUMATopology.obj_from_primitive(primitive)
+
+    def set(self, key, result):
+        self._results[key] = (
+            result.obj_to_primitive() if result is not None else None)
+        self._results.move_to_end(key)
+        while len(self._results) > self.max_size:
+            self._results.popitem(last=False)
+
+
+def _has_pci_requests(pci_requests):
+    if isinstance(pci_requests, objects.InstancePCIRequests):
+        return 'requests' in pci_requests and bool(pci_requests.requests)
+    return bool(pci_requests)
+
+
+def _numa_fit_permutations(num_host_cells, num_instance_cells, misfits):
+    """Generate permutations of host cell indexes for the instance cells.
+
+    Permutations are generated in the same order as
+    ``itertools.permutations(range(num_host_cells), num_instance_cells)`` but
+    any permutation placing instance cell ``j`` on host cell ``i`` with
+    ``(i, j)`` in misfits is skipped, along with every other permutation
+    sharing the same prefix. Since misfits is only read lazily, pairs added to
+    it while the generator is consumed prune the remaining permutations too.
+
+    Each element is a tuple ``(depth, host_cell_idx)``, telling the caller to
+    place instance cell ``depth`` on host cell ``host_cell_idx``. Following an
+    element, the caller must either add the pair to misfits if the instance
+    cell does not fit, or accept it and continue with the next instance cell.
+    """
+    used = [False] * num_host_cells
+
+    def _place(depth):
+        for host_cell_idx in range(num_host_cells):
+            if used[host_cell_idx] or (host_cell_idx, depth) in misfits:
+                continue
+            yield depth, host_cell_idx
+            if (host_cell_idx, depth) in misfits:
+                continue
+            if depth + 1 == num_instance_cells:
+                continue
+            used[host_cell_idx] = True
+            yield from _place(depth + 1)
+            used[host_cell_idx] = False
+
+    return _place(0)
+
+
 def numa_fit_instance_to_host(
     host_topology: 'objects.NUMATopology',
     instance_topology: 'objects.InstanceNUMATopology',
     limits: ty.Optional['objects.NUMATopologyLimit'] = None,
     pci_requests: ty.Optional['objects.InstancePCIRequests'] = None,
     pci_stats: ty.Optional[stats.PciDeviceStats] = None,
+    cache: ty.Optional[NUMAFitCache] = None,
 ):
     """Fit the instance topology onto the host topology.
 
@@ -2253,6 +2362,8 @@ def numa_fit_instance_to_host(
     :param limits: objects.NUMATopologyLimits that defines limits
     :param pci_requests: instance pci_requests
     :param pci_stats: pci_stats for the host
+    :param cache: an optional NUMAFitCache used to share results between
+                  hosts with identical topologies and usage
 
     :returns: objects.InstanceNUMATopology with its cell IDs set to host
               cell ids of the first successful permutation, or None
@@ -2282,53 +2393,99 @@ def numa_fit_instance_to_host(
     # If PCI device(s) are not required, prefer host cells that don't have
     # devices attached. Presence of a given numa_node in a PCI pool is
     # indicative of a PCI device being associated with that node
+    pci_numa_nodes = None
     if not pci_requests and pci_stats:
         # TODO(stephenfin): pci_stats can't be None here but mypy can't figure
         # that out for some reason
-        host_cells = sorted(host_cells, key=lambda cell: cell.id in [
-            pool['numa_node'] for pool in pci_stats.pools])  # type: ignore
-
-    for host_cell_perm in itertools.permutations(
-            host_cells, len(instance_topology)):
-        chosen_instance_cells: ty.List['objects.InstanceNUMACell'] = []
-        chosen_host_cells: ty.List['objects.NUMACell'] = []
-        for host_cell, instance_cell in zip(
-                host_cell_perm, instance_topology.cells):
-            try:
-                cpuset_reserved = 0
-                if (instance_topology.emulator_threads_isolated and
-                    len(chosen_instance_cells) == 0):
-                    # For the case of isolate emulator threads, to
-                    # make predictable where that CPU overhead is
-                    # located we always configure it to be on host
-                    # NUMA node associated to the guest NUMA node
-                    # 0.
-                    cpuset_reserved = 1
-                got_cell = _numa_fit_instance_cell(
-                    host_cell, instance_cell, limits, cpuset_reserved)
-            except exception.MemoryPageSizeNotSupported:
-                # This exception will been raised if instance cell's
-                # custom pagesize is not supported with host cell in
-                # _numa_cell_supports_pagesize_request function.
-                break
-            if got_cell is None:
-                break
-            chosen_host_cells.append(host_cell)
-            chosen_instance_cells.append(got_cell)
-
-        if len(chosen_instance_cells) != len(host_cell_perm):
+        pci_numa_nodes = set(
+            pool['numa_node'] for pool in pci_stats.pools)  # type: ignore
+        host_cells = sorted(
+            host_cells, key=lambda cell: cell.id in pci_numa_nodes)
+
+    # The result only depends on the content of the topologies,
+    # the limits and the order of the host cells, so hosts sharing all of
+    # these share the result. Requests for PCI devices also depend on the
+    # state of the PCI pools, which we don't fingerprint.
+    cache_key = None
+    if cache is not None and not _has_pci_requests(pci_requests):
+        cache_key = _numa_fit_fingerprint(
+            [host_topology, instance_topology.cells, emulator_threads_policy,
+             limits, [cell.id for cell in host_cells]])
+        try:
+            return cache.get(cache_key)
+        except KeyError:
+            pass
+
+    result = _numa_fit_instance_to_host_cells(
+        host_topology, host_cells, instance_topology, limits, pci_requests,
+        pci_stats, network_metadata, emulator_threads_policy)
+
+    if cache_key is not None:
+        cache.set(cache_key, result)
+
+    return result
+
+
+def _numa_fit_instance_to_host_cells(
+    host_topology, host_cells, instance_topology, limits, pci_requests,
+    pci_stats, network_metadata, emulator_threads_policy,
+):
+    instance_cells = instance_topology.cells
+    num_instance_cells = len(instance_cells)
+
+    # Whether an instance cell fits onto a host cell doesn't
+    # depend on where the other instance cells were placed, so a pair that
+    # failed to fit once is never attempted again for this host. The first
+    # matching permutation and the order in which pairs are attempted are the
+    # same as with a plain walk of itertools.permutations.
+    misfits: ty.Set[ty.Tuple[int, int]] = set()
+    chosen_instance_cells: ty.List['objects.InstanceNUMACell'] = []
+    chosen_host_cells: ty.List['objects.NUMACell'] = []
+    for depth, host_cell_idx in _numa_fit_permutations(
+            len(host_cells), num_instance_cells, misfits):
+        del chosen_instance_cells[depth:]
+        del chosen_host_cells[depth:]
+
+        host_cell = host_cells[host_cell_idx]
+        instance_cell = instance_cells[depth]
+        try:
+            cpuset_reserved = 0
+            if instance_topology.emulator_threads_isolated and depth == 0:
+                # For the case of isolate emulator threads, to
+                # make predictable where that CPU overhead is
+                # located we always configure it to be on host
+                # NUMA node associated to the guest NUMA node
+                # 0.
+                cpuset_reserved = 1
+            got_cell = _numa_fit_instance_cell(
+                host_cell, instance_cell, limits, cpuset_reserved)
+        except exception.MemoryPageSizeNotSupported:
+            # This exception will been raised if instance cell's
+            # custom pagesize is not supported with host cell in
+            # _numa_cell_supports_pagesize_request function.
+            got_cell = None
+        if got_cell is None:
+            misfits.add((host_cell_idx, depth))
             continue
+        chosen_host_cells.append(host_cell)
+        chosen_instance_cells.append(got_cell)
+
+        if len(chosen_instance_cells) != num_instance_cells:
+            continue
+
+        instance_cells_perm = list(chosen_instance_cells)
+        host_cells_perm = list(chosen_host_cells)
 
         if pci_requests and pci_stats and not pci_stats.support_requests(
-                pci_requests, chosen_instance_cells):
+                pci_requests, instance_cells_perm):
             continue
 
         if network_metadata and not _numa_cells_support_network_metadata(
-                host_topology, chosen_host_cells, network_metadata):
+                host_topology, host_cells_perm, network_metadata):
             continue
 
         return objects.InstanceNUMATopology(
-            cells=chosen_instance_cells,
+            cells=instance_cells_perm,
             emulator_threads_policy=emulator_threads_policy)
 
 
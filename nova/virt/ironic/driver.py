@@ -83,6 +83,15 @@ _NODE_FIELDS = ('uuid', 'power_state', 'target_power_state', 'provision_state',
                 'target_provision_state', 'last_error', 'maintenance',
                 'properties', 'instance_uuid', 'traits', 'resource_class')
 
+# The fields of the nodes kept in the node cache, and the fields polled to find
+# the nodes which changed since they were cached.
+_NODE_CACHE_FIELDS = _NODE_FIELDS + ('updated_at',)
+_NODE_POLL_FIELDS = ('uuid', 'instance_uuid', 'updated_at')
+
+# Above this share of changed nodes, the changed nodes are listed again with
+# all the cached fields rather than fetched one by one.
+_NODE_CACHE_RELIST_RATIO = 0.1
+
 # Console state checking interval in seconds
 _CONSOLE_STATE_CHECKING_INTERVAL = 1
 
@@ -196,6 +205,9 @@ class IronicDriver(virt_driver.ComputeDriver):
 
         self.node_cache = {}
         self.node_cache_time = 0
+        # The cached nodes by the UUID of their instance.
+        self.node_cache_by_instance = {}
+        self.node_cache_full_refresh_time = None
         self.servicegroup_api = servicegroup.API()
 
         self.ironicclient = client_wrapper.IronicClientWrapper()
@@ -211,13 +223,13 @@ class IronicDriver(virt_driver.ComputeDriver):
                 'baremetal', check_service=True)
         return self._ironic_connection
 
-    def _get_node(self, node_id):
+    def _get_node(self, node_id, fields=_NODE_FIELDS):
         """Get a node by its UUID.
 
            Some methods pass in variables named nodename, but are
            actually UUID's.
         """
-        node = self.ironic_connection.get_node(node_id, fields=_NODE_FIELDS)
+        node = self.ironic_connection.get_node(node_id, fields=fields)
         # TODO(dustinc): Make consumers use the right fields and remove this
         node.uuid = node.id
         node.instance_uuid = node.instance_id
@@ -730,35 +742,53 @@ class IronicDriver(virt_driver.ComputeDriver):
                                             partitions=_HASH_RING_PARTITIONS)
         LOG.debug('Hash ring members are %s', services)
 
+    def _need_full_node_refresh(self):
+        """Returns whether all the fields of the nodes should be listed again,
+        rather than only fetching those of the nodes which changed.
+        """
+        interval = CONF.ironic.node_cache_full_refresh_interval
+        return (not interval or not self.node_cache or
+                self.node_cache_full_refresh_time is None or
+                time.monotonic() - self.node_cache_full_refresh_time >=
+                interval)
+
     def _refresh_cache(self):
         ctxt = nova_context.get_admin_context()
         self._refresh_hash_ring(ctxt)
         instances = objects.InstanceList.get_uuids_by_host(ctxt, CONF.host)
         node_cache = {}
 
-        def _get_node_list(**kwargs):
-            return self._get_node_list(fields=_NODE_FIELDS, **kwargs)
-
-        # NOTE(jroll) if partition_key is set, we need to limit nodes that
-        # can be managed to nodes that have a matching conductor_group
-        # attribute. If the API isn't new enough to support conductor groups,
-        # we fall back to managing all nodes. If it is new enough, we can
-        # filter it in the API.
-        partition_key = CONF.ironic.partition_key
-        if partition_key is not None:
-            try:
-                self._can_send_version(min_version='1.46')
-                nodes = _get_node_list(conductor_group=partition_key)
-                LOG.debug('Limiting manageable ironic nodes to conductor '
-                          'group %s', partition_key)
-            except exception.IronicAPIVersionNotAvailable:
-                LOG.error('Required Ironic API version 1.46 is not '
-                          'available to filter nodes by conductor group. '
-                          'All nodes will be eligible to be managed by '
-                          'this compute service.')
-                nodes = _get_node_list()
+        full_refresh = self._need_full_node_refresh()
+        if not CONF.ironic.node_cache_full_refresh_interval:
+            fields = _NODE_FIELDS
+        elif full_refresh:
+            fields = _NODE_CACHE_FIELDS
         else:
-            nodes = _get_node_list()
+            fields = _NODE_POLL_FIELDS
+
+        def _get_node_list(fields):
+            # NOTE(jroll) if partition_key is set, we need to limit nodes that
+            # can be managed to nodes that have a matching conductor_group
+            # attribute. If the API isn't new enough to support conductor
+            # groups, we fall back to managing all nodes. If it is new enough,
+            # we can filter it in the API.
+            partition_key = CONF.ironic.partition_key
+            if partition_key is not None:
+                try:
+                    self._can_send_version(min_version='1.46')
+                    nodes = self._get_node_list(fields=fields,
+                                                conductor_group=partition_key)
+                    LOG.debug('Limiting manageable ironic nodes to conductor '
+                              'group %s', partition_key)
+                    return nodes
+                except exception.IronicAPIVersionNotAvailable:
+                    LOG.error('Required Ironic API version 1.46 is not '
+                              'available to filter nodes by conductor group. '
+                              'All nodes will be eligible to be managed by '
+                              'this compute service.')
+            return self._get_node_list(fields=fields)
+
+        nodes = _get_node_list(fields)
 
         for node in nodes:
             # NOTE(jroll): we always manage the nodes for instances we manage
@@ -776,9 +806,58 @@ class IronicDriver(virt_driver.ComputeDriver):
                   self.hash_ring.get_nodes(node.uuid.encode('utf-8'))):
                 node_cache[node.uuid] = node
 
+        if full_refresh:
+            self.node_cache_full_refresh_time = time.monotonic()
+        else:
+            node_cache = self._fetch_changed_nodes(node_cache, _get_node_list)
+
         self.node_cache = node_cache
+        self.node_cache_by_instance = {
+            node.instance_uuid: node for node in node_cache.values()
+            if node.instance_uuid is not None}
         self.node_cache_time = time.time()
 
+    def _fetch_changed_nodes(self, polled_nodes, get_node_list):
+        """Returns the node cache for the polled nodes.
+
+        The cached nodes whose updated_at did not move since they were cached
+        are kept, and the others are fetched from Ironic with all the cached
+        fields.
+
+        :param polled_nodes: A dict of the nodes to cache by UUID, with only
+            the polled fields.
+        :param get_node_list: A function listing the manageable nodes with the
+            given fields.
+        """
+        node_cache = {}
+        changed = []
+        for node_uuid, polled in polled_nodes.items():
+            cached = self.node_cache.get(node_uuid)
+            if (cached is not None and
+                    getattr(cached, 'updated_at', None) == polled.updated_at):
+                node_cache[node_uuid] = cached
+            else:
+                changed.append(node_uuid)
+        if not changed:
+            return node_cache
+
+        LOG.debug('Fetching %(changed)d changed node(s) out of %(num_nodes)d',
+                  {'changed': len(changed), 'num_nodes': len(polled_nodes)})
+        if len(changed) > _NODE_CACHE_RELIST_RATIO * len(polled_nodes):
+            for node in get_node_list(_NODE_CACHE_FIELDS):
+                if node.uuid in polled_nodes:
+                    node_cache[node.uuid] = node
+            return node_cache
+
+        for node_uuid in changed:
+            try:
+                node_cache[node_uuid] = self._get_node(
+                    node_uuid, fields=_NODE_CACHE_FIELDS)
+            except sdk_exc.ResourceNotFound:
+                # The node was deleted since it was polled.
+                pass
+        return node_cache
+
     def get_available_nodes(self, refresh=False):
         """Returns the UUIDs of Ironic nodes managed by this compute service.
 
@@ -966,12 +1045,16 @@ class IronicDriver(virt_driver.ComputeDriver):
         if not self.node_cache:
             self._refresh_cache()
 
-        for node in self.node_cache.values():
-            if instance.uuid == node.instance_uuid:
-                break
-        else:
-            # if we can't find the instance, fall back to ironic
-            return _fetch_from_ironic(self, instance)
+        node = self.node_cache_by_instance.get(instance.uuid)
+        if node is None or self.node_cache.get(node.uuid) is not node:
+            # The node may have been added to the cache, or removed from it,
+            # since the last refresh.
+            for node in self.node_cache.values():
+                if instance.uuid == node.instance_uuid:
+                    break
+            else:
+                # if we can't find the instance, fall back to ironic
+                return _fetch_from_ironic(self, instance)
 
         return hardware.InstanceInfo(state=map_power_state(node.power_state))
 
@@ -18,8 +18,13 @@ Pluggable Weighing support
 """
 
 import abc
+import heapq
+import itertools
+import operator
+import time
 
 from nova import loadables
+from nova import trace as nova_trace
 
 
 def normalize(weight_list, minval=None, maxval=None):
@@ -51,6 +56,31 @@ def normalize(weight_list, minval=None, maxval=None):
     return ((i - minval) / range_ for i in weight_list)
 
 
+def merge_ranges(ranges_list):
+    """Merge the ranges of the raw weights returned by get_weighed_objects()
+    for separate lists of objects, weigher by weigher.
+
+    The lists of objects must have been weighed by the same weighers.
+    """
+    return [(min(minval for minval, maxval in ranges),
+             max(maxval for minval, maxval in ranges))
+            for ranges in zip(*ranges_list)]
+
+
+def combine_weights(raw_weights, multipliers, ranges):
+    """Return the weight of an object from its raw weight and its weight
+    multiplier for each weigher, the raw weights being normalized against
+    the ranges of each weigher like get_weighed_objects() does.
+    """
+    weight = 0.0
+    for raw_weight, multiplier, (minval, maxval) in zip(raw_weights,
+                                                        multipliers, ranges):
+        if multiplier and minval != maxval:
+            weight += (multiplier * (raw_weight - float(minval)) /
+                       (float(maxval) - float(minval)))
+    return weight
+
+
 class WeighedObject(object):
     """Object with weight information."""
     def __init__(self, obj, weight):
@@ -91,6 +121,33 @@ class BaseWeigher(metaclass=abc.ABCMeta):
     def _weigh_object(self, obj, weight_properties):
         """Weigh an specific object."""
 
+    def weight_multipliers(self, obj_list):
+        """Return the weight multiplier of each object in obj_list.
+
+        Override in a subclass if the multipliers can be computed more
+        efficiently for all the objects at once.
+        """
+        return [self.weight_multiplier(obj) for obj in obj_list]
+
+    def skip_if_no_multiplier(self):
+        """Return True if the objects don't need to be weighed when the
+        weight multiplier is zero for all of them.
+
+        Override in a subclass if weighing the objects must happen anyway,
+        for example to fail for invalid objects.
+        """
+        return True
+
+    def _weigh_objects(self, obj_list, weight_properties):
+        """Return the raw weights of all the objects in obj_list.
+
+        Override in a subclass if the weights can be computed more
+        efficiently for all the objects at once, otherwise _weigh_object()
+        is called for each object.
+        """
+        return [self._weigh_object(obj, weight_properties)
+                for obj in obj_list]
+
     def weigh_objects(self, weighed_obj_list, weight_properties):
         """Weigh multiple objects.
 
@@ -99,17 +156,16 @@ class BaseWeigher(metaclass=abc.ABCMeta):
         just return a list of weights.
         """
         # Calculate the weights
-        weights = []
-        for obj in weighed_obj_list:
-            weight = self._weigh_object(obj.obj, weight_properties)
-
-            # don't let the weight go beyond the defined max/min
-            if self.minval is not None:
-                weight = max(weight, self.minval)
-            if self.maxval is not None:
-                weight = min(weight, self.maxval)
+        weights = self._weigh_objects([obj.obj for obj in weighed_obj_list],
+                                      weight_properties)
 
-            weights.append(weight)
+        # don't let the weight go beyond the defined max/min
+        if self.minval is not None:
+            minval = self.minval
+            weights = [max(weight, minval) for weight in weights]
+        if self.maxval is not None:
+            maxval = self.maxval
+            weights = [min(weight, maxval) for weight in weights]
 
         return weights
 
@@ -117,23 +173,91 @@ class BaseWeigher(metaclass=abc.ABCMeta):
 class BaseWeightHandler(loadables.BaseLoader):
     object_class = WeighedObject
 
-    def get_weighed_objects(self, weighers, obj_list, weighing_properties):
-        """Return a sorted (descending), normalized list of WeighedObjects."""
+    def get_weighed_objects(self, weighers, obj_list, weighing_properties,
+                            limit=None, ranges=None):
+        """Return a sorted (descending), normalized list of WeighedObjects.
+
+        If limit is set, an iterator over the sorted WeighedObjects is
+        returned instead, on which the best limit WeighedObjects are selected
+        up front and the others are only sorted once they are reached.
+
+        If ranges is a list, the minimum and maximum raw weights each weigher
+        normalized the weights against are appended to it, and the raw weight
+        and the weight multiplier of each weigher are kept in the raw_weights
+        and multipliers attributes of the WeighedObjects, so that objects
+        weighed separately can be weighed against each other with
+        merge_ranges() and combine_weights().
+        """
+        obj_list = list(obj_list)
         weighed_objs = [self.object_class(obj, 0.0) for obj in obj_list]
 
-        if len(weighed_objs) <= 1:
+        if ranges is not None:
+            if not weighed_objs:
+                return weighed_objs
+            for obj in weighed_objs:
+                obj.raw_weights = []
+                obj.multipliers = []
+        elif len(weighed_objs) <= 1:
             return weighed_objs
 
+        trace = nova_trace.current()
         for weigher in weighers:
+            if trace is not None:
+                start = time.monotonic()
+            multipliers = weigher.weight_multipliers(obj_list)
+            # NOTE: A weigher with a zero multiplier for every object cannot
+            # change the result, so don't bother weighing the objects unless
+            # the weigher needs to, like the MetricsWeigher does to fail for
+            # missing metrics with [metrics]/required=True.
+            if not any(multipliers) and weigher.skip_if_no_multiplier():
+                if ranges is not None:
+                    ranges.append((0.0, 0.0))
+                    for obj, multiplier in zip(weighed_objs, multipliers):
+                        obj.raw_weights.append(0.0)
+                        obj.multipliers.append(multiplier)
+                continue
+
             weights = weigher.weigh_objects(weighed_objs, weighing_properties)
 
+            if ranges is not None:
+                weights = list(weights)
+                ranges.append((
+                    weigher.minval if weigher.minval is not None
+                    else min(weights),
+                    weigher.maxval if weigher.maxval is not None
+                    else max(weights)))
+                for obj, multiplier, weight in zip(weighed_objs, multipliers,
+                                                   weights):
+                    obj.raw_weights.append(weight)
+                    obj.multipliers.append(multiplier)
+
             # Normalize the weights
             weights = normalize(weights,
                                 minval=weigher.minval,
                                 maxval=weigher.maxval)
 
-            for i, weight in enumerate(weights):
-                obj = weighed_objs[i]
-                obj.weight += weigher.weight_multiplier(obj.obj) * weight
-
-        return sorted(weighed_objs, key=lambda x: x.weight, reverse=True)
+            for obj, multiplier, weight in zip(weighed_objs, multipliers,
+                                               weights):
+                obj.weight += multiplier * weight
+            if trace is not None:
+                trace.record('weigher:' + weigher.__class__.__name__,
+                             time.monotonic() - start)
+
+        key = operator.attrgetter('weight')
+        if limit is None or limit >= len(weighed_objs):
+            return sorted(weighed_objs, key=key, reverse=True)
+
+        # Select the best objects with a heap rather than sorting the whole
+        # list, which matters when weighing thousands of objects. The
+        # selection is stable like sorted(), so the objects come in the same
+        # order as if they were all sorted.
+        best_objs = heapq.nlargest(limit, weighed_objs, key=key)
+        best_ids = set(id(obj) for obj in best_objs)
+        other_objs = [obj for obj in weighed_objs if id(obj) not in best_ids]
+        return itertools.chain(best_objs, _sort_lazily(other_objs, key))
+
+
+def _sort_lazily(objs, key):
+    # A generator, so the objects are only sorted once the first of them is
+    # needed.
+    yield from sorted(objs, key=key, reverse=True)
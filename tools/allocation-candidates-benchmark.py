@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Benchmark decoding GET /allocation_candidates responses.
+
+Builds synthetic responses where every candidate is a compute node with
+nested NUMA and GPU providers, and reports the time taken and the memory
+allocated to decode them into plain dicts and into the compact
+representation built by the SchedulerReportClient.
+"""
+
+import argparse
+import json
+import timeit
+import tracemalloc
+import uuid
+
+from nova.scheduler.client import report
+
+TRAITS = ['HW_CPU_X86_AVX', 'HW_CPU_X86_AVX2', 'HW_CPU_X86_SSE42',
+          'COMPUTE_NET_ATTACH_INTERFACE', 'COMPUTE_VOLUME_EXTEND',
+          'COMPUTE_IMAGE_TYPE_QCOW2', 'COMPUTE_IMAGE_TYPE_RAW']
+
+
+def make_response(count):
+    allocation_requests = []
+    provider_summaries = {}
+    for _ in range(count):
+        root = str(uuid.uuid4())
+        numa = [str(uuid.uuid4()) for _ in range(2)]
+        gpu = str(uuid.uuid4())
+        provider_summaries[root] = {
+            'resources': {'DISK_GB': {'capacity': 1000, 'used': 100}},
+            'traits': TRAITS,
+            'parent_provider_uuid': None,
+            'root_provider_uuid': root,
+        }
+        for node in numa:
+            provider_summaries[node] = {
+                'resources': {
+                    'VCPU': {'capacity': 64, 'used': 8},
+                    'MEMORY_MB': {'capacity': 131072, 'used': 16384}},
+                'traits': [],
+                'parent_provider_uuid': root,
+                'root_provider_uuid': root,
+            }
+        provider_summaries[gpu] = {
+            'resources': {'VGPU': {'capacity': 8, 'used': 1}},
+            'traits': ['CUSTOM_GPU'],
+            'parent_provider_uuid': numa[0],
+            'root_provider_uuid': root,
+        }
+        for node in numa:
+            allocation_requests.append({
+                'allocations': {
+                    root: {'resources': {'DISK_GB': 10}},
+                    node: {'resources': {'VCPU': 2, 'MEMORY_MB': 4096}},
+                    gpu: {'resources': {'VGPU': 1}},
+                },
+                'mappings': {'': [root, node], '_GPU': [gpu]},
+            })
+    return json.dumps({'allocation_requests': allocation_requests,
+                       'provider_summaries': provider_summaries})
+
+
+def measure(func, repeat):
+    elapsed = min(timeit.repeat(func, repeat=repeat, number=1))
+    tracemalloc.start()
+    result = func()
+    size, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return elapsed * 1000, size / 1024.0 / 1024, peak / 1024.0 / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--candidates', type=int, nargs='+',
+                        default=[1000, 10000],
+                        help='Number of compute nodes in the responses')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='Number of runs, the best one is reported')
+    args = parser.parse_args()
+
+    print('%10s %8s %10s %10s %10s %10s %10s %10s' % (
+        'candidates', 'MB', 'dict (ms)', 'kept MB', 'peak MB',
+        'compact', 'kept MB', 'peak MB'))
+    for count in args.candidates:
+        text = make_response(count)
+        plain = measure(lambda: json.loads(text), args.repeat)
+        compact = measure(
+            lambda: report.decode_allocation_candidates(text),
+            args.repeat)
+        print('%10d %8.1f %10.1f %10.1f %10.1f %10.1f %10.1f %10.1f' % (
+            (count, len(text) / 1024.0 / 1024) + plain + compact))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Benchmark fitting instance NUMA topologies onto hosts.
+
+Fits a pinned instance with two NUMA nodes (by default) onto synthetic hosts
+with 2, 4 and 8 NUMA nodes where only as many nodes as the instance needs are
+free, and reports the time taken by a plain walk of all the permutations of
+the host NUMA nodes, by numa_fit_instance_to_host and by
+numa_fit_instance_to_host sharing a NUMAFitCache between the hosts, as the
+NUMATopologyFilter does.
+"""
+
+import argparse
+import itertools
+import random
+import timeit
+
+from nova import conf
+from nova import objects
+from nova.objects import fields
+from nova.virt import hardware
+
+CONF = conf.CONF
+
+CPUS_PER_NODE = 16
+
+
+def make_host_topology(num_nodes, num_free_nodes, rand):
+    free_nodes = rand.sample(range(num_nodes), num_free_nodes)
+    cells = []
+    for node in range(num_nodes):
+        cpus = set(range(node * CPUS_PER_NODE, (node + 1) * CPUS_PER_NODE))
+        pinned_cpus = set()
+        if node not in free_nodes:
+            pinned_cpus = set(sorted(cpus)[:CPUS_PER_NODE - 2])
+        cells.append(objects.NUMACell(
+            id=node,
+            cpuset=set(),
+            pcpuset=cpus,
+            memory=65536,
+            cpu_usage=0,
+            memory_usage=0,
+            pinned_cpus=pinned_cpus,
+            mempages=[objects.NUMAPagesTopology(
+                size_kb=4, total=65536 * 256, used=0)],
+            siblings=[set([cpu]) for cpu in sorted(cpus)]))
+    return objects.NUMATopology(cells=cells)
+
+
+def make_instance_topology(num_nodes, cpus_per_node):
+    return objects.InstanceNUMATopology(cells=[
+        objects.InstanceNUMACell(
+            id=node,
+            cpuset=set(),
+            pcpuset=set(range(node * cpus_per_node,
+                              (node + 1) * cpus_per_node)),
+            memory=4096,
+            cpu_policy=fields.CPUAllocationPolicy.DEDICATED)
+        for node in range(num_nodes)])
+
+
+def permutations_fit(host_topology, instance_topology, limits):
+    """Fit the instance by walking all the permutations of host cells."""
+    for host_cell_perm in itertools.permutations(
+            host_topology.cells, len(instance_topology)):
+        cells = []
+        for host_cell, instance_cell in zip(
+                host_cell_perm, instance_topology.cells):
+            got_cell = hardware._numa_fit_instance_cell(
+                host_cell, instance_cell, limits)
+            if got_cell is None:
+                break
+            cells.append(got_cell)
+        if len(cells) == len(instance_topology):
+            return objects.InstanceNUMATopology(cells=cells)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--nodes', type=int, nargs='+', default=[2, 4, 8],
+                        help='Number of NUMA nodes of the hosts')
+    parser.add_argument('--instance-nodes', type=int, default=2,
+                        help='Number of NUMA nodes of the instance')
+    parser.add_argument('--hosts', type=int, default=200,
+                        help='Number of hosts to fit the instance on')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='Number of runs, the best one is reported')
+    args = parser.parse_args()
+
+    CONF([], project='nova')
+    objects.register_all()
+    # Only keep the log of the benchmark itself
+    hardware.LOG.logger.disabled = True
+    rand = random.Random(42)
+    limits = objects.NUMATopologyLimits(
+        cpu_allocation_ratio=1.0, ram_allocation_ratio=1.0)
+
+    print('%6s %16s %16s %16s' % (
+        'nodes', 'permutations (ms)', 'pruned (ms)', 'pruned+cache (ms)'))
+    for num_nodes in args.nodes:
+        if num_nodes < args.instance_nodes:
+            continue
+        # Hosts only have as many free NUMA nodes as the instance needs,
+        # placed randomly, so that most permutations of the host NUMA nodes
+        # can't fit the instance
+        hosts = [make_host_topology(num_nodes, args.instance_nodes, rand)
+                 for _ in range(args.hosts)]
+        instance = make_instance_topology(args.instance_nodes, 4)
+
+        def run_permutations():
+            for host in hosts:
+                permutations_fit(host, instance.obj_clone(), limits)
+
+        def run_pruned():
+            for host in hosts:
+                hardware.numa_fit_instance_to_host(
+                    host, instance.obj_clone(), limits)
+
+        def run_cached():
+            cache = hardware.NUMAFitCache()
+            for host in hosts:
+                hardware.numa_fit_instance_to_host(
+                    host, instance.obj_clone(), limits, cache=cache)
+
+        results = [
+            min(timeit.repeat(func, repeat=args.repeat, number=1)) * 1000
+            for func in (run_permutations, run_pruned, run_cached)]
+        print('%6d %16.1f %16.1f %16.1f' % ((num_nodes,) + tuple(results)))
+
+
+if __name__ == '__main__':
+    main()
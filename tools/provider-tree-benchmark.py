@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Benchmark the ProviderTree against large trees of nested providers.
+
+Builds provider dicts for compute nodes with NUMA cell children, each of
+them with device grandchildren (like PGPU or SR-IOV PF providers), and
+reports the time taken to populate a ProviderTree from them in random
+order, and to look every provider up by UUID and by name.
+"""
+
+import argparse
+import random
+import timeit
+import uuid
+
+from nova.compute import provider_tree
+
+
+def make_provider_dicts(roots, cells, devices):
+    provider_dicts = []
+    for r in range(roots):
+        root_uuid = str(uuid.uuid4())
+        provider_dicts.append({'uuid': root_uuid, 'name': 'compute%d' % r,
+                               'generation': 0})
+        for c in range(cells):
+            cell_uuid = str(uuid.uuid4())
+            provider_dicts.append({
+                'uuid': cell_uuid, 'name': 'compute%d_numa%d' % (r, c),
+                'generation': 0, 'parent_provider_uuid': root_uuid})
+            for d in range(devices):
+                provider_dicts.append({
+                    'uuid': str(uuid.uuid4()),
+                    'name': 'compute%d_numa%d_dev%d' % (r, c, d),
+                    'generation': 0, 'parent_provider_uuid': cell_uuid})
+    random.shuffle(provider_dicts)
+    return provider_dicts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--roots', type=int, default=1000,
+                        help='Number of root providers')
+    parser.add_argument('--cells', type=int, default=3,
+                        help='Number of children of each root provider')
+    parser.add_argument('--devices', type=int, default=2,
+                        help='Number of children of each child provider')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='Number of runs, the best one is reported')
+    args = parser.parse_args()
+
+    provider_dicts = make_provider_dicts(args.roots, args.cells,
+                                         args.devices)
+    print('%d providers' % len(provider_dicts))
+
+    def populate():
+        pt = provider_tree.ProviderTree()
+        pt.populate_from_iterable(provider_dicts)
+        return pt
+
+    pt = populate()
+    elapsed = min(timeit.repeat(populate, repeat=args.repeat, number=1))
+    print('populate_from_iterable: %8.1f ms' % (elapsed * 1000))
+
+    for key in ('uuid', 'name'):
+        keys = [pd[key] for pd in provider_dicts]
+        elapsed = min(timeit.repeat(
+            lambda: [pt.exists(k) for k in keys],
+            repeat=args.repeat, number=1))
+        print('exists() by %-4s:       %8.1f ms' % (key, elapsed * 1000))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Benchmark the scheduler weighers against large lists of hosts.
+
+Weighs synthetic HostState objects with the default scheduler weighers and
+reports the time taken to return a fully sorted list of weighed hosts and
+only the best of them, as the schedulers do for the hosts of their shard.
+"""
+
+import argparse
+import random
+import timeit
+
+from oslo_utils.fixture import uuidsentinel as uuids
+
+from nova import conf
+from nova import objects
+from nova.scheduler import host_manager
+from nova.scheduler import weights
+
+CONF = conf.CONF
+
+DEFAULT_WEIGHERS = ['RAMWeigher', 'CPUWeigher', 'DiskWeigher',
+                    'IoOpsWeigher', 'BuildFailureWeigher', 'CrossCellWeigher']
+
+
+def make_host_states(count, aggregates):
+    aggs = [objects.Aggregate(id=i, name='agg%d' % i, hosts=[],
+                              metadata={'ram_weight_multiplier': '2.0'})
+            for i in range(aggregates)]
+    host_states = []
+    for i in range(count):
+        host_state = host_manager.HostState('host%d' % i, 'node%d' % i,
+                                            uuids.cell1)
+        host_state.free_ram_mb = random.randint(0, 512 * 1024)
+        host_state.free_disk_mb = random.randint(0, 4 * 1024 * 1024)
+        host_state.vcpus_total = 64
+        host_state.vcpus_used = random.randint(0, 64)
+        host_state.cpu_allocation_ratio = 16.0
+        host_state.num_io_ops = random.randint(0, 8)
+        host_state.failed_builds = random.randint(0, 1)
+        if aggs:
+            host_state.aggregates = [aggs[i % len(aggs)]]
+        host_states.append(host_state)
+    return host_states
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--hosts', type=int, nargs='+',
+                        default=[1000, 10000, 50000],
+                        help='Number of hosts to weigh')
+    parser.add_argument('--aggregates', type=int, default=10,
+                        help='Number of aggregates the hosts are spread in')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='Number of runs, the best one is reported')
+    args = parser.parse_args()
+
+    CONF([], project='nova')
+    objects.register_all()
+    handler = weights.HostWeightHandler()
+    weighers = [cls() for cls in handler.get_matching_classes(
+        ['nova.scheduler.weights.all_weighers'])
+        if cls.__name__ in DEFAULT_WEIGHERS]
+    limit = (CONF.filter_scheduler.host_subset_size +
+             CONF.scheduler.max_attempts)
+
+    print('%8s %12s %12s' % ('hosts', 'sorted (ms)', 'top-k (ms)'))
+    for count in args.hosts:
+        host_states = make_host_states(count, args.aggregates)
+        spec_obj = objects.RequestSpec()
+        results = []
+        for top_k in (None, limit):
+            results.append(min(timeit.repeat(
+                lambda: handler.get_weighed_objects(weighers, host_states,
+                                                    spec_obj, limit=top_k),
+                repeat=args.repeat, number=1)) * 1000)
+        print('%8d %12.1f %12.1f' % (count, results[0], results[1]))
+
+
+if __name__ == '__main__':
+    main()